@@ -0,0 +1,518 @@
+"""
+Performance benchmarks of MODFLOW 6 with scalable synthetic models.
+
+The benchmark models are generated by benchmark_models.py for every
+combination of case, grid type (DIS, DISV, DISU), and number of cells:
+
+    gwf-npf, gwf-xt3d, gwf-csub, gwf-sfr-lak-maw, gwt-advdsp
+
+The input files are written once to temp/benchmark/<case>-<grid>-<cells>
+and are only written again when benchmark_models.py, the flopy version, or
+the grid size changed.  Every benchmark is run a number of times (warm-up
+runs) to load the executable and the input files into the file cache
+before the timed runs.  The wall time of every timed run is measured and
+the minimum, median, mean, standard deviation, and coefficient of
+variation of the run times, the number of cells per second of the median
+run, the numbers of outer and inner iterations, and the peak resident set
+size are appended as a record to an append-only JSON lines file.  A record
+also contains the git commit of the MODFLOW 6 sources (and whether the
+sources have uncommitted changes), the hash of the executable, and the
+computer and the path of the executable, so the results can be followed
+across commits.  The location of
+the file can be changed with the MF6_BENCHMARK_DB environment variable.
+
+Run from the autotest directory:
+
+    python benchmark.py
+    python benchmark.py --cases gwf-npf gwf-xt3d --dis dis disu
+    python benchmark.py --cells 1e4 1e5 1e6 --reps 5 --warmup 1
+    python benchmark.py --exe ../bin/mf6 --clean
+
+The default is all cases and grid types with 1e4 and 1e5 cells, three
+timed runs, and one warm-up run.  Models with 1e7 cells need several GB of
+memory and disk space and take a long time to write with flopy, use
+--clean to remove the input files of the benchmarks after the runs.
+
+Report the trend of the median run times across commits, or plot it
+(requires matplotlib):
+
+    python benchmark.py --report
+    python benchmark.py --report --threshold 0.1 --window 5
+    python benchmark.py --plot benchmark.png
+
+The report lists the benchmarks whose median run time, number of
+iterations, or peak memory regressed beyond the threshold relative to the
+median of the previous window records (see runtimes.py).  Only the
+records of a benchmark run on the same computer with the same executable
+path are compared.
+
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import hashlib
+import platform
+import statistics
+import subprocess
+
+try:
+    import flopy
+except:
+    msg = 'Error. FloPy package is not available.\n'
+    msg += 'Try installing using the following command:\n'
+    msg += ' pip install flopy'
+    raise Exception(msg)
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+except ImportError:
+    plt = None
+
+import runtimes
+import targets
+import disu_util
+import benchmark_models
+
+autotest_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(autotest_dir)
+
+db_file = os.environ.get('MF6_BENCHMARK_DB',
+                         os.path.join(autotest_dir, '.benchmarks.jsonl'))
+
+benchmark_dir = os.path.join(autotest_dir, 'temp', 'benchmark')
+
+# name of the file with the key of the input files in a benchmark folder
+key_file = 'benchmark.key'
+
+sfmt = '{:25s} - {}'
+
+
+def git(*args):
+    """
+    Output of a git command in the repository, None if git fails
+
+    """
+    try:
+        proc = subprocess.Popen(('git',) + args, cwd=root_dir,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE)
+    except OSError:
+        return None
+    stdout, stderr = proc.communicate()
+    if proc.returncode != 0:
+        return None
+    return stdout.decode().strip()
+
+
+def get_commit():
+    """
+    Git commit of the MODFLOW 6 sources and a flag that indicates if the
+    sources have uncommitted changes
+
+    """
+    commit = git('rev-parse', 'HEAD')
+    if commit is None:
+        return None, None
+    status = git('status', '--porcelain', '--untracked-files=no', '--',
+                 'src', 'srcbmi')
+    return commit, status is None or len(status) > 0
+
+
+def get_key(case, distype, ncells):
+    """
+    Key of the input files of a benchmark model
+
+    """
+    h = hashlib.sha256()
+    for module in (benchmark_models, disu_util):
+        with open(module.__file__, 'rb') as f:
+            h.update(f.read())
+    h.update('flopy {}\n'.format(flopy.__version__).encode())
+    h.update('{} {} {}\n'.format(case, distype, int(ncells)).encode())
+    return h.hexdigest()
+
+
+def run_mf6(ws, exe):
+    """
+    Run MODFLOW 6 in a simulation folder and return the wall time and the
+    peak resident set size, the wall time is None if the run failed
+
+    """
+    with runtimes.PeakMemory() as mem:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen([exe], cwd=ws, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT)
+        stdout = proc.communicate()[0]
+        elapsed = time.perf_counter() - t0
+    if proc.returncode != 0 or \
+            b'Normal termination of simulation' not in stdout:
+        print(stdout.decode(errors='replace')[-2000:])
+        print('MODFLOW 6 run in {} failed'.format(ws))
+        return None, mem.peak_rss
+    return elapsed, mem.peak_rss
+
+
+def build(case, distype, ncells, exe):
+    """
+    Write the input files of a benchmark model, unless the input files
+    for the same key exist, and run the simulations the benchmark depends
+    on (the flow simulation of a transport benchmark)
+
+    Returns
+    -------
+    ws : str
+        folder of the benchmark simulation, None if the build failed
+
+    """
+    name = benchmark_models.get_name(case, distype, ncells)
+    pth = os.path.join(benchmark_dir, name)
+    key = get_key(case, distype, ncells)
+    fpth = os.path.join(pth, key_file)
+    if os.path.isfile(fpth):
+        with open(fpth, 'r') as f:
+            cached = json.load(f)
+        if cached.get('key') == key:
+            return cached['ws']
+
+    if os.path.isdir(pth):
+        shutil.rmtree(pth)
+    print(sfmt.format('Writing', pth))
+    t0 = time.perf_counter()
+    sims = benchmark_models.write_models(case, distype, ncells, pth)
+    print(sfmt.format('Write time', '{:.1f} s'.format(time.perf_counter() -
+                                                      t0)))
+    for ws in sims[:-1]:
+        elapsed, peak_rss = run_mf6(ws, exe)
+        if elapsed is None:
+            return None
+    ws = os.path.relpath(sims[-1], pth)
+    with open(fpth, 'w') as f:
+        json.dump({'key': key, 'ws': ws}, f)
+    return ws
+
+
+def get_stats(times):
+    """
+    Statistics of the run times of the timed runs
+
+    """
+    stats = {'min': min(times),
+             'median': statistics.median(times),
+             'mean': statistics.mean(times),
+             'stdev': None,
+             'cv': None}
+    if len(times) > 1:
+        stats['stdev'] = statistics.stdev(times)
+        if stats['mean'] > 0.:
+            stats['cv'] = stats['stdev'] / stats['mean']
+    return stats
+
+
+def benchmark(case, distype, ncells, exe, reps=3, warmup=1, fpth=None):
+    """
+    Run a benchmark and add the record to the database
+
+    Parameters
+    ----------
+    case : str
+        benchmark case, one of benchmark_models.cases
+    distype : str
+        'dis', 'disv', or 'disu'
+    ncells : int
+        approximate number of cells
+    exe : str
+        path of the MODFLOW 6 executable
+    reps : int
+        number of timed runs
+    warmup : int
+        number of runs before the timed runs
+
+    Returns
+    -------
+    record : dict
+
+    """
+    name = benchmark_models.get_name(case, distype, ncells)
+    grid = benchmark_models.Grid(distype, ncells)
+    commit, dirty = get_commit()
+    record = {'test': name,
+              'case': case,
+              'distype': distype,
+              'ncells': grid.ncells,
+              'shape': [grid.nlay, grid.nrow, grid.ncol],
+              'exe': exe,
+              'exe_hash': runtimes.get_exe_hash(exe),
+              'commit': commit,
+              'dirty': dirty,
+              'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'host': socket.gethostname(),
+              'platform': platform.platform(),
+              'cpu_count': os.cpu_count(),
+              'flopy': flopy.__version__,
+              'warmup': warmup,
+              'reps': reps,
+              'success': False,
+              'times': [],
+              'run_time': None,
+              'stats': None,
+              'cells_per_second': None,
+              'outer': None,
+              'inner': None,
+              'peak_rss': None}
+
+    ws = build(case, distype, ncells, exe)
+    if ws is not None:
+        ws = os.path.join(benchmark_dir, name, ws)
+        times = []
+        peak_rss = []
+        for irun in range(warmup + reps):
+            elapsed, rss = run_mf6(ws, exe)
+            if elapsed is None:
+                times = []
+                break
+            if irun >= warmup:
+                times.append(elapsed)
+                if rss is not None:
+                    peak_rss.append(rss)
+        if len(times) > 0:
+            stats = get_stats(times)
+            outer, inner = runtimes.parse_listing(os.path.join(ws,
+                                                               'mfsim.lst'))
+            record.update({'success': True,
+                           'times': times,
+                           'run_time': stats['median'],
+                           'stats': stats,
+                           'cells_per_second': grid.ncells / stats['median'],
+                           'outer': outer,
+                           'inner': inner,
+                           'peak_rss': max(peak_rss) if peak_rss else None})
+
+    try:
+        runtimes.append_record(record, fpth=fpth or db_file)
+    except OSError:
+        print('could not write benchmark record to {}'.format(fpth or
+                                                               db_file))
+    return record
+
+
+def write_record(record):
+    stats = record['stats']
+    if not record['success']:
+        print('{:35s} {:>10d} {:>10s}'.format(record['test'],
+                                              record['ncells'], 'FAILED'))
+        return
+    cv = stats['cv']
+    print('{:35s} {:10d} {:10.3f} {:10.3f} {:>8s} {:12.4g} {:>8} {:>8} '
+          '{:>10}'.format(record['test'], record['ncells'], stats['median'],
+                          stats['min'],
+                          '-' if cv is None else '{:.1%}'.format(cv),
+                          record['cells_per_second'], record['outer'],
+                          record['inner'], format_bytes(record['peak_rss'])))
+    return
+
+
+def write_header():
+    print('{:35s} {:>10s} {:>10s} {:>10s} {:>8s} {:>12s} {:>8s} {:>8s} '
+          '{:>10s}'.format('BENCHMARK', 'CELLS', 'MEDIAN', 'MIN', 'CV',
+                           'CELLS/S', 'OUTER', 'INNER', 'PEAK RSS'))
+    return
+
+
+def format_bytes(value):
+    if value is None:
+        return '-'
+    return '{:.1f} MB'.format(value / 2. ** 20)
+
+
+def get_group(record):
+    """
+    Name of the group of a benchmark record.  The run times of a benchmark
+    on different computers or of different builds of MODFLOW 6 (for example
+    a debug and an optimized executable) are not comparable, so the runs
+    are grouped by benchmark, computer, and path of the executable.
+
+    """
+    return '{} [{}:{}]'.format(record['test'], record.get('host', '-'),
+                               record.get('exe', '-'))
+
+
+def get_trends(records):
+    """
+    Median run time of every successful benchmark by commit, in the order
+    of the records, for every group of records (see get_group)
+
+    """
+    trends = {}
+    for test, runs in runtimes.get_history(records,
+                                           group=get_group).items():
+        commits = []
+        values = {}
+        for run in runs:
+            commit = run.get('commit') or '-'
+            if run.get('dirty'):
+                commit += '+'
+            if commit not in values:
+                commits.append(commit)
+                values[commit] = []
+            values[commit].append(run['run_time'])
+        trends[test] = [(commit, runtimes.median(values[commit]))
+                        for commit in commits]
+    return trends
+
+
+def write_report(records, threshold=0.2, window=10):
+    """
+    Write the trend of the median run time of every benchmark across
+    commits and the regressions
+
+    """
+    for test, trend in sorted(get_trends(records).items()):
+        print(test)
+        base = trend[0][1]
+        for commit, value in trend:
+            print('    {:12s} {:10.3f} s {:+8.1%}'.format(commit[:12], value,
+                                                          value / base - 1.))
+    regressions = runtimes.get_regressions(records, threshold=threshold,
+                                           window=window, min_time=0.,
+                                           group=get_group)
+    print()
+    runtimes.write_report(regressions)
+    return len(regressions)
+
+
+def plot_trends(records, fpth):
+    """
+    Plot the median run time of every benchmark across commits
+
+    """
+    if plt is None:
+        print('matplotlib is not available')
+        return
+    trends = get_trends(records)
+    commits = []
+    for test, trend in sorted(trends.items()):
+        for commit, value in trend:
+            if commit not in commits:
+                commits.append(commit)
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for test, trend in sorted(trends.items()):
+        x = [commits.index(commit) for commit, value in trend]
+        y = [value for commit, value in trend]
+        ax.plot(x, y, marker='o', label=test)
+    ax.set_xticks(range(len(commits)))
+    ax.set_xticklabels([commit[:8] for commit in commits], rotation=90)
+    ax.set_yscale('log')
+    ax.set_xlabel('commit')
+    ax.set_ylabel('median run time, in seconds')
+    ax.legend(fontsize='x-small', ncol=2)
+    fig.tight_layout()
+    fig.savefig(fpth)
+    plt.close(fig)
+    print(sfmt.format('Plot', fpth))
+    return
+
+
+def get_values(idx):
+    values = []
+    for arg in sys.argv[idx + 1:]:
+        if arg.startswith('--'):
+            break
+        values.append(arg)
+    return values
+
+
+def main():
+    cases = list(benchmark_models.cases)
+    distypes = list(benchmark_models.distypes)
+    cells = [10000, 100000]
+    reps = 3
+    warmup = 1
+    exe = os.path.abspath(targets.target_dict['mf6'])
+    clean = False
+    report = False
+    plot = None
+    threshold = 0.2
+    window = 10
+    for idx, arg in enumerate(sys.argv):
+        if arg == '--cases':
+            cases = get_values(idx)
+        elif arg == '--dis':
+            distypes = get_values(idx)
+        elif arg == '--cells':
+            cells = [int(float(value)) for value in get_values(idx)]
+        elif arg == '--reps':
+            reps = int(sys.argv[idx + 1])
+        elif arg == '--warmup':
+            warmup = int(sys.argv[idx + 1])
+        elif arg == '--exe':
+            exe = os.path.abspath(sys.argv[idx + 1])
+        elif arg == '--clean':
+            clean = True
+        elif arg == '--report':
+            report = True
+        elif arg == '--plot':
+            plot = sys.argv[idx + 1]
+        elif arg == '--threshold':
+            threshold = float(sys.argv[idx + 1])
+        elif arg == '--window':
+            window = int(sys.argv[idx + 1])
+
+    if report or plot is not None:
+        records = runtimes.load_records(fpth=db_file)
+        print('{} records in {}'.format(len(records), db_file))
+        if plot is not None:
+            plot_trends(records, plot)
+        if report:
+            return write_report(records, threshold=threshold, window=window)
+        return 0
+
+    for case in cases:
+        if case not in benchmark_models.cases:
+            print('unknown case "{}"'.format(case))
+            return 1
+    for distype in distypes:
+        if distype not in benchmark_models.distypes:
+            print('unknown grid type "{}"'.format(distype))
+            return 1
+    if not os.path.isfile(exe):
+        print('MODFLOW 6 executable "{}" does not exist'.format(exe))
+        return 1
+
+    commit, dirty = get_commit()
+    print(sfmt.format('Executable', exe))
+    print(sfmt.format('Commit', '{}{}'.format(commit,
+                                              ' (modified)' if dirty
+                                              else '')))
+    print(sfmt.format('Runs', '{} warm-up, {} timed'.format(warmup, reps)))
+    print(sfmt.format('Database', db_file))
+
+    failed = 0
+    records = []
+    for ncells in cells:
+        for case in cases:
+            for distype in distypes:
+                record = benchmark(case, distype, ncells, exe, reps=reps,
+                                   warmup=warmup)
+                records.append(record)
+                if not record['success']:
+                    failed += 1
+                if clean:
+                    pth = os.path.join(benchmark_dir, record['test'])
+                    if os.path.isdir(pth):
+                        shutil.rmtree(pth)
+
+    print()
+    write_header()
+    for record in records:
+        write_record(record)
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(main())
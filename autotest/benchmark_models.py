@@ -0,0 +1,526 @@
+"""
+Scalable synthetic models for the MODFLOW 6 benchmarks in benchmark.py.
+
+Every benchmark case is a layered aquifer of square cells (delr = delc =
+100 m) that is built for a requested number of cells with a DIS, DISV, or
+DISU grid.  The number of rows and columns is chosen so the grid is close
+to square; the DISU grid is the structured grid written with
+disu_util.get_disu_kwargs().  The cases differ in the packages that are
+used:
+
+    gwf-npf          NPF with heterogeneous hydraulic conductivity, CHD on
+                     the west and east columns, RCH, and WEL
+    gwf-xt3d         gwf-npf with anisotropic hydraulic conductivity that is
+                     rotated 30 degrees and XT3D
+    gwf-csub         gwf-npf with a steady state and a transient stress
+                     period, STO, and CSUB with no-delay interbeds in the
+                     second layer and delay interbeds in the third layer
+    gwf-sfr-lak-maw  gwf-npf with a SFR reach in every column of the
+                     middle row, a lake that replaces a block of cells in
+                     the first layer, and multi-layer MAW wells instead of
+                     WEL
+    gwt-advdsp       GWT with ADV (TVD), DSP, MST, and SSM for the flow
+                     field of gwf-npf, the concentration of the water that
+                     enters from the west CHD cells is 1
+
+The transport model of gwt-advdsp reads the heads and flows of a separate
+GWF simulation with FMI, the flow simulation has to be run before the
+transport simulation.  The recharge rate is scaled with the size of the
+grid so the recharge mound is about 1 m for every grid size, and the
+pumping rates are a fixed fraction of the recharge.  The hydraulic
+conductivity field is generated with a fixed seed, so a case is the same
+model on every computer.
+
+    sims = benchmark_models.write_models('gwf-xt3d', 'disu', 100000, ws)
+
+"""
+
+import os
+import numpy as np
+
+try:
+    import flopy
+except:
+    msg = 'Error. FloPy package is not available.\n'
+    msg += 'Try installing using the following command:\n'
+    msg += ' pip install flopy'
+    raise Exception(msg)
+
+from disu_util import get_disu_kwargs
+
+cases = ('gwf-npf', 'gwf-xt3d', 'gwf-csub', 'gwf-sfr-lak-maw', 'gwt-advdsp')
+distypes = ('dis', 'disv', 'disu')
+
+# grid geometry
+nlay = 3
+delr = delc = 100.
+top = 0.
+thickness = 50.
+
+# average hydraulic conductivity, heads of the west and east CHD cells,
+# and the height of the recharge mound
+hk = 10.
+hwest = 10.
+heast = 0.
+mound = 1.
+
+# cells per well
+cells_per_well = 2500
+
+
+def get_shape(ncells, nlay=nlay):
+    """
+    Number of layers, rows, and columns of a grid with about ncells cells
+
+    """
+    ncpl = max(9, int(ncells) // nlay)
+    nrow = max(3, int(round(np.sqrt(ncpl))))
+    ncol = max(3, ncpl // nrow)
+    return nlay, nrow, ncol
+
+
+def get_name(case, distype, ncells):
+    """
+    Name of the folder of a benchmark model
+
+    """
+    return '{}-{}-{}'.format(case, distype, int(ncells))
+
+
+def get_locations(nrow, ncol, n, exclude=None):
+    """
+    Rows and columns of n cells on a regular lattice in the interior of the
+    grid, cells for which exclude(i, j) is True are moved to the next row or
+    skipped
+
+    """
+    nr = max(1, int(round(np.sqrt(n * nrow / float(ncol)))))
+    nc = max(1, int(np.ceil(n / float(nr))))
+    rows = np.linspace(0, nrow - 1, nr + 2)[1:-1].round().astype(int)
+    cols = np.linspace(1, ncol - 2, nc + 2)[1:-1].round().astype(int)
+    locations = []
+    for i in rows:
+        for j in cols:
+            for ii in (i, i + 1):
+                if ii < nrow and (exclude is None or not exclude(ii, j)):
+                    locations.append((int(ii), int(j)))
+                    break
+    return locations[:n]
+
+
+def get_vertices(nrow, ncol):
+    """
+    Vertices and cell2d records of the cells of a layer of a DISV grid
+
+    """
+    iv = np.arange((nrow + 1) * (ncol + 1))
+    iy, ix = np.divmod(iv, ncol + 1)
+    vertices = list(zip(iv.tolist(), (ix * delr).tolist(),
+                        ((nrow - iy) * delc).tolist()))
+    icell = np.arange(nrow * ncol)
+    i, j = np.divmod(icell, ncol)
+    iv0 = i * (ncol + 1) + j
+    cell2d = list(zip(icell.tolist(), ((j + .5) * delr).tolist(),
+                      ((nrow - i - .5) * delc).tolist(),
+                      [4] * icell.shape[0], iv0.tolist(), (iv0 + 1).tolist(),
+                      (iv0 + ncol + 2).tolist(), (iv0 + ncol + 1).tolist()))
+    return vertices, cell2d
+
+
+class Grid(object):
+    """
+    Layered grid of a benchmark model
+
+    Parameters
+    ----------
+    distype : str
+        'dis', 'disv', or 'disu'
+    ncells : int
+        approximate number of cells
+
+    """
+
+    def __init__(self, distype, ncells, nlay=nlay):
+        if distype not in distypes:
+            msg = 'distype must be one of {}'.format(', '.join(distypes))
+            raise ValueError(msg)
+        self.distype = distype
+        self.nlay, self.nrow, self.ncol = get_shape(ncells, nlay=nlay)
+        self.ncpl = self.nrow * self.ncol
+        self.ncells = self.nlay * self.ncpl
+        self.botm = [top - thickness * (k + 1) for k in range(self.nlay)]
+        self.idomain = np.ones((self.nlay, self.nrow, self.ncol), dtype=int)
+
+    @property
+    def shape(self):
+        if self.distype == 'dis':
+            return self.nlay, self.nrow, self.ncol
+        elif self.distype == 'disv':
+            return self.nlay, self.ncpl
+        return self.ncells,
+
+    def cellid(self, k, i, j):
+        if self.distype == 'dis':
+            return k, i, j
+        elif self.distype == 'disv':
+            return k, i * self.ncol + j
+        return (k * self.nrow + i) * self.ncol + j,
+
+    def get_array(self, a):
+        """
+        Reshape a (nlay, nrow, ncol) array to the shape of the grid
+
+        """
+        return np.asarray(a).reshape(self.shape)
+
+    def add_dis(self, model, vertices=False):
+        """
+        Add the discretization package to a GWF or GWT model, the cell
+        vertices of a DISU grid are only written if vertices is True
+
+        """
+        mtype = model.model_type[:3].capitalize()
+        cls = getattr(flopy.mf6, 'Modflow{}{}'.format(mtype, self.distype))
+        if self.distype == 'dis':
+            return cls(model, nlay=self.nlay, nrow=self.nrow, ncol=self.ncol,
+                       delr=delr, delc=delc, top=top, botm=self.botm,
+                       idomain=self.idomain)
+        elif self.distype == 'disv':
+            verts, cell2d = get_vertices(self.nrow, self.ncol)
+            return cls(model, nlay=self.nlay, ncpl=self.ncpl,
+                       nvert=len(verts), top=top, botm=self.botm,
+                       vertices=verts, cell2d=cell2d,
+                       idomain=self.get_array(self.idomain))
+        kw = get_disu_kwargs(self.nlay, self.nrow, self.ncol,
+                             np.ones(self.ncol) * delr,
+                             np.ones(self.nrow) * delc, top, self.botm)
+        kw.pop('nvert')
+        if vertices:
+            kw.update(self.get_disu_geometry())
+        return cls(model, idomain=self.idomain.ravel(),
+                   vertical_offset_tolerance=None, **kw)
+
+    def get_disu_geometry(self):
+        """
+        Connection angles, vertices, and cell2d records of the DISU grid,
+        these are required by XT3D and by the GWT dispersion package
+
+        """
+        # the connections of a cell are in the order diagonal, up, back,
+        # left, right, front, and bottom (see get_disu_kwargs())
+        n = np.arange(self.ncells)
+        k, ij = np.divmod(n, self.ncpl)
+        i, j = np.divmod(ij, self.ncol)
+        mask = np.column_stack((np.ones(n.shape, dtype=bool), k > 0, i > 0,
+                                j > 0, j < self.ncol - 1,
+                                i < self.nrow - 1, k < self.nlay - 1))
+        angles = np.array([0., 0., 90., 180., 0., 270., 0.])
+        angldegx = np.broadcast_to(angles, mask.shape)[mask]
+        verts, cell2d = get_vertices(self.nrow, self.ncol)
+        cell2d = [(node,) + cell2d[node % self.ncpl][1:]
+                  for node in range(self.ncells)]
+        return {'angldegx': angldegx, 'nvert': len(verts),
+                'vertices': verts, 'cell2d': cell2d}
+
+
+def get_hk(grid):
+    """
+    Log-normally distributed hydraulic conductivity
+
+    """
+    rs = np.random.RandomState(0)
+    shape = (grid.nlay, grid.nrow, grid.ncol)
+    return hk * np.exp(.5 * rs.randn(*shape))
+
+
+def get_recharge(grid):
+    """
+    Recharge rate that creates a mound of about mound meters between the
+    west and east CHD cells
+
+    """
+    length = (grid.ncol - 1) * delr
+    transmissivity = hk * thickness * grid.nlay
+    return 8. * transmissivity * mound / length ** 2
+
+
+def get_pumping_rate(grid, nwells, fraction):
+    """
+    Rate of every well for a total pumping rate that is a fraction of the
+    total recharge
+
+    """
+    area = grid.ncpl * delr * delc
+    return -fraction * get_recharge(grid) * area / max(1, nwells)
+
+
+def add_ims(sim, model, linear_acceleration='BICGSTAB'):
+    # the outer and inner iterations are written to the simulation listing
+    # file with print_option SUMMARY
+    ims = flopy.mf6.ModflowIms(sim, print_option='SUMMARY',
+                               outer_dvclose=1e-6, outer_maximum=100,
+                               inner_maximum=500, inner_dvclose=1e-8,
+                               rcloserecord=1e-3,
+                               linear_acceleration=linear_acceleration,
+                               filename='{}.ims'.format(model.name))
+    sim.register_ims_package(ims, [model.name])
+    return ims
+
+
+def add_gwf(sim, grid, case, tdis_rc):
+    """
+    Add the GWF model of a case to the simulation
+
+    """
+    # the Newton-Raphson formulation improves the convergence of the
+    # stream and lake stages
+    gwf = flopy.mf6.ModflowGwf(sim, modelname='gwf', save_flows=True,
+                               newtonoptions=case == 'gwf-sfr-lak-maw')
+    add_ims(sim, gwf)
+
+    exclude = None
+    if case == 'gwf-sfr-lak-maw':
+        # the lake replaces a block of cells in the first layer, the SFR
+        # reaches are in the middle row
+        nb = max(1, min(grid.nrow, grid.ncol) // 10)
+        lak_rows = range(grid.nrow // 4, grid.nrow // 4 + nb)
+        lak_cols = range(grid.ncol // 4, grid.ncol // 4 + nb)
+        grid.idomain[0, grid.nrow // 4:grid.nrow // 4 + nb,
+                     grid.ncol // 4:grid.ncol // 4 + nb] = 0
+        sfr_row = grid.nrow // 2
+
+        def exclude(i, j):
+            return i == sfr_row or (i in lak_rows and j in lak_cols)
+    # XT3D and the specific discharge for the transport model use the
+    # connection vectors of the cells
+    grid.add_dis(gwf, vertices=case in ('gwf-xt3d', 'gwt-advdsp'))
+
+    k = get_hk(grid)
+    if case == 'gwf-xt3d':
+        flopy.mf6.ModflowGwfnpf(gwf, icelltype=0, k=grid.get_array(k),
+                                k22=grid.get_array(.2 * k),
+                                k33=grid.get_array(.1 * k), angle1=30.,
+                                xt3doptions=True)
+    else:
+        # the transport model reads the specific discharge and saturation
+        flopy.mf6.ModflowGwfnpf(gwf, icelltype=0, k=grid.get_array(k),
+                                k33=grid.get_array(.1 * k),
+                                save_specific_discharge=case == 'gwt-advdsp',
+                                save_saturation=case == 'gwt-advdsp')
+    flopy.mf6.ModflowGwfic(gwf, strt=hwest)
+
+    if case == 'gwf-csub':
+        nper = len(tdis_rc)
+        # the storage of the aquifer is defined with cg_ske_cr in CSUB
+        flopy.mf6.ModflowGwfsto(gwf, iconvert=0, ss=0., sy=0.,
+                                steady_state={0: True},
+                                transient={nper - 1: True})
+
+    # the concentration of the water that enters the model through the west
+    # CHD cells is used by the transport model
+    chd = []
+    for kk in range(grid.nlay):
+        for i in range(grid.nrow):
+            chd.append((grid.cellid(kk, i, 0), hwest, 1.))
+            chd.append((grid.cellid(kk, i, grid.ncol - 1), heast, 0.))
+    flopy.mf6.ModflowGwfchd(gwf, auxiliary=['concentration'],
+                            stress_period_data={0: chd}, pname='CHD-1')
+
+    rch = get_recharge(grid)
+    if grid.distype == 'disu':
+        rchlist = [(grid.cellid(0, i, j), rch) for i in range(grid.nrow)
+                   for j in range(grid.ncol) if grid.idomain[0, i, j] > 0]
+        flopy.mf6.ModflowGwfrch(gwf, stress_period_data={0: rchlist},
+                                pname='RCH-1')
+    else:
+        flopy.mf6.ModflowGwfrcha(gwf, recharge=rch, pname='RCH-1')
+
+    nwells = max(1, grid.ncpl // cells_per_well)
+    locations = get_locations(grid.nrow, grid.ncol, nwells, exclude=exclude)
+    if case == 'gwf-sfr-lak-maw':
+        add_sfr_lak_maw(gwf, grid, sfr_row, lak_rows, lak_cols, locations)
+    else:
+        fraction = .5 if case == 'gwf-csub' else .2
+        q = get_pumping_rate(grid, len(locations), fraction)
+        wel = [(grid.cellid(grid.nlay - 1, i, j), q) for i, j in locations]
+        flopy.mf6.ModflowGwfwel(gwf, stress_period_data={len(tdis_rc) - 1:
+                                                         wel},
+                                pname='WEL-1')
+
+    if case == 'gwf-csub':
+        add_csub(gwf, grid)
+
+    saverecord = [('HEAD', 'LAST'), ('BUDGET', 'LAST')]
+    if case == 'gwt-advdsp':
+        saverecord = [('HEAD', 'ALL'), ('BUDGET', 'ALL')]
+    flopy.mf6.ModflowGwfoc(gwf, head_filerecord='gwf.hds',
+                           budget_filerecord='gwf.cbc',
+                           saverecord=saverecord,
+                           printrecord=[('BUDGET', 'LAST')])
+    return gwf
+
+
+def add_csub(gwf, grid):
+    """
+    No-delay interbeds in every cell of the second layer and delay
+    interbeds in every tenth cell of the third layer
+
+    """
+    theta = .45
+    kv = 1e-5
+    records = []
+    for i in range(grid.nrow):
+        for j in range(grid.ncol):
+            records.append([len(records), grid.cellid(1, i, j), 'nodelay',
+                            hwest, 5., 1., .01, 1e-4, theta, kv, hwest])
+    for idx, (i, j) in enumerate(np.ndindex(grid.nrow, grid.ncol)):
+        if idx % 10 == 0:
+            records.append([len(records), grid.cellid(2, i, j), 'delay',
+                            hwest, 2., 2., .01, 1e-4, theta, kv, hwest])
+    flopy.mf6.ModflowGwfcsub(gwf, head_based=True, ndelaycells=9,
+                             ninterbeds=len(records), beta=0.,
+                             cg_ske_cr=1e-6, packagedata=records)
+    return
+
+
+def add_sfr_lak_maw(gwf, grid, sfr_row, lak_rows, lak_cols, locations):
+    """
+    SFR reach in every column of the middle row, a lake that is connected
+    vertically to the cells in the second layer below it, and MAW wells
+    that are screened in all layers
+
+    """
+    # the streambed is below the top of the aquifer and the heads of the
+    # CHD cells, so the reaches are gaining
+    rtp = top - 1.
+    nreaches = grid.ncol - 2
+    packagedata = []
+    connectiondata = []
+    for rno in range(nreaches):
+        ic = [rno]
+        if rno > 0:
+            ic.append(rno - 1)
+        if rno < nreaches - 1:
+            ic.append(-(rno + 1))
+        connectiondata.append(ic)
+        packagedata.append((rno, grid.cellid(0, sfr_row, rno + 1), delr, 10.,
+                            1e-4, rtp, 1., 1., .035, len(ic) - 1, 1., 0))
+    flopy.mf6.ModflowGwfsfr(gwf, nreaches=nreaches, packagedata=packagedata,
+                            connectiondata=connectiondata,
+                            perioddata=[(0, 'INFLOW', 1e4)],
+                            pname='SFR-1')
+
+    lakeconn = []
+    for i in lak_rows:
+        for j in lak_cols:
+            lakeconn.append((0, len(lakeconn), grid.cellid(1, i, j),
+                             'vertical', .1, 0., 0., 0., 0.))
+    flopy.mf6.ModflowGwflak(gwf, nlakes=1,
+                            packagedata=[(0, hwest, len(lakeconn))],
+                            connectiondata=lakeconn,
+                            perioddata=[(0, 'RAINFALL', get_recharge(grid))],
+                            pname='LAK-1')
+
+    q = get_pumping_rate(grid, len(locations), .2)
+    packagedata = []
+    connectiondata = []
+    perioddata = []
+    for wellno, (i, j) in enumerate(locations):
+        packagedata.append((wellno, .15, grid.botm[-1], hwest, 'thiem',
+                            grid.nlay))
+        for kk in range(grid.nlay):
+            ztop = top if kk == 0 else grid.botm[kk - 1]
+            connectiondata.append((wellno, kk, grid.cellid(kk, i, j), ztop,
+                                   grid.botm[kk], 0., 0.))
+        perioddata.append((wellno, 'rate', q))
+    flopy.mf6.ModflowGwfmaw(gwf, nmawwells=len(locations),
+                            packagedata=packagedata,
+                            connectiondata=connectiondata,
+                            perioddata=perioddata, pname='MAW-1')
+    return
+
+
+def add_gwt(sim, grid):
+    """
+    Add the GWT model that reads the flows of the gwf-npf flow simulation
+    in the flow folder
+
+    """
+    gwt = flopy.mf6.ModflowGwt(sim, modelname='gwt')
+    add_ims(sim, gwt)
+    grid.add_dis(gwt, vertices=True)
+    flopy.mf6.ModflowGwtic(gwt, strt=0.)
+    flopy.mf6.ModflowGwtmst(gwt, porosity=.3)
+    flopy.mf6.ModflowGwtadv(gwt, scheme='TVD')
+    flopy.mf6.ModflowGwtdsp(gwt, alh=100., ath1=10., atv=1.)
+    flopy.mf6.ModflowGwtssm(gwt,
+                            sources=[('CHD-1', 'AUX', 'CONCENTRATION')])
+    flopy.mf6.ModflowGwtfmi(gwt, packagedata=[
+        ('GWFHEAD', os.path.join('..', 'flow', 'gwf.hds'), None),
+        ('GWFBUDGET', os.path.join('..', 'flow', 'gwf.cbc'), None)])
+    flopy.mf6.ModflowGwtoc(gwt, concentration_filerecord='gwt.ucn',
+                           budget_filerecord='gwt.cbc',
+                           saverecord=[('CONCENTRATION', 'LAST'),
+                                       ('BUDGET', 'LAST')],
+                           printrecord=[('BUDGET', 'LAST')])
+    return gwt
+
+
+def get_simulation(name, ws, tdis_rc, exe_name='mf6'):
+    sim = flopy.mf6.MFSimulation(sim_name=name, version='mf6',
+                                 exe_name=exe_name, sim_ws=ws)
+    flopy.mf6.ModflowTdis(sim, time_units='DAYS', nper=len(tdis_rc),
+                          perioddata=tdis_rc)
+    return sim
+
+
+def write_models(case, distype, ncells, ws, nlay=nlay, exe_name='mf6'):
+    """
+    Write the input files of a benchmark case
+
+    Parameters
+    ----------
+    case : str
+        benchmark case, one of cases
+    distype : str
+        'dis', 'disv', or 'disu'
+    ncells : int
+        approximate number of cells
+    ws : str
+        folder for the input files
+
+    Returns
+    -------
+    sims : list
+        folders of the simulations that have to be run in this order, the
+        last simulation is the benchmark
+
+    """
+    if case not in cases:
+        msg = 'case must be one of {}'.format(', '.join(cases))
+        raise ValueError(msg)
+    grid = Grid(distype, ncells, nlay=nlay)
+    if case == 'gwf-csub':
+        tdis_rc = [(1., 1, 1.), (365., 10, 1.2)]
+    elif case == 'gwt-advdsp':
+        tdis_rc = [(3650., 10, 1.)]
+    else:
+        tdis_rc = [(1., 1, 1.)]
+
+    sims = []
+    if case == 'gwt-advdsp':
+        sim_ws = os.path.join(ws, 'flow')
+        sim = get_simulation(case, sim_ws, tdis_rc, exe_name=exe_name)
+        add_gwf(sim, grid, case, tdis_rc)
+        sim.write_simulation(silent=True)
+        sims.append(sim_ws)
+        sim_ws = os.path.join(ws, 'transport')
+        sim = get_simulation(case, sim_ws, tdis_rc, exe_name=exe_name)
+        add_gwt(sim, grid)
+    else:
+        sim_ws = ws
+        sim = get_simulation(case, sim_ws, tdis_rc, exe_name=exe_name)
+        add_gwf(sim, grid, case, tdis_rc)
+    sim.write_simulation(silent=True)
+    sims.append(sim_ws)
+    return sims
@@ -1,20 +1,37 @@
 import numpy as np
 
+# record headers of MODFLOW 6 binary head and budget files
+head_dtype = np.dtype([('kstp', np.int32),
+                       ('kper', np.int32),
+                       ('pertim', np.float64),
+                       ('totim', np.float64),
+                       ('text', 'S16'),
+                       ('ncol', np.int32),
+                       ('nrow', np.int32),
+                       ('ilay', np.int32)])
+
+budget_dtype = np.dtype([('kstp', np.int32),
+                         ('kper', np.int32),
+                         ('text', 'S16'),
+                         ('ndim1', np.int32),
+                         ('ndim2', np.int32),
+                         ('ndim3', np.int32),
+                         ('imeth', np.int32),
+                         ('delt', np.float64),
+                         ('pertim', np.float64),
+                         ('totim', np.float64), ])
+
+textid_dtype = np.dtype([('text1id1', 'S16'),
+                         ('text1id2', 'S16'),
+                         ('text2id1', 'S16'),
+                         ('text2id2', 'S16'), ])
+
+
 def write_head(fbin, data, kstp=1, kper=1, pertim=1.0, totim=1.0,
                text='            HEAD', ilay=1):
-    dt = np.dtype([('kstp', np.int32),
-                   ('kper', np.int32),
-                   ('pertim', np.float64),
-                   ('totim', np.float64),
-                   ('text', 'S16'),
-                   ('ncol', np.int32),
-                   ('nrow', np.int32),
-                   ('ilay', np.int32)])
-    nrow = data.shape[0]
-    ncol = data.shape[1]
-    h = np.array((kstp, kper, pertim, totim, text, ncol, nrow, ilay), dtype=dt)
+    h = get_head_records(data, kstp=kstp, kper=kper, pertim=pertim,
+                         totim=totim, text=text, ilay=ilay)
     h.tofile(fbin)
-    data.tofile(fbin)
     return
 
 
@@ -24,78 +41,241 @@ def write_budget(fbin, data, kstp=1, kper=1, text='    FLOW-JA-FACE',
                  text2id1='           GWF-1',
                  text1id2='           GWF-1',
                  text2id2='             NPF'):
-    dt = np.dtype([('kstp', np.int32),
-                   ('kper', np.int32),
-                   ('text', 'S16'),
-                   ('ndim1', np.int32),
-                   ('ndim2', np.int32),
-                   ('ndim3', np.int32),
-                   ('imeth', np.int32),
-                   ('delt', np.float64),
-                   ('pertim', np.float64),
-                   ('totim', np.float64), ])
-
-    if imeth == 1:
-        ndim1 = data.shape[0]
-        ndim2 = 1
-        ndim3 = -1
-        h = np.array((kstp, kper, text,
-                      ndim1, ndim2, ndim3,
-                      imeth, delt, pertim, totim), dtype=dt)
-        h.tofile(fbin)
-        data.tofile(fbin)
-
-    elif imeth == 6:
-        ndim1 = 1
-        ndim2 = 1
-        ndim3 = -1
-        h = np.array((kstp, kper, text,
-                      ndim1, ndim2, ndim3,
-                      imeth, delt, pertim, totim), dtype=dt)
-        h.tofile(fbin)
-
-        # write text1id1, ...
-        dt = np.dtype([('text1id1', 'S16'),
-                       ('text1id2', 'S16'),
-                       ('text2id1', 'S16'),
-                       ('text2id2', 'S16'), ])
-        h = np.array((text1id1, text1id2, text2id1, text2id2), dtype=dt)
-        h.tofile(fbin)
-
-        # write ndat (number of floating point columns)
-        colnames = data.dtype.names
-        ndat = len(colnames) - 2
-        dt = np.dtype([('ndat', np.int32)])
-        h = np.array([(ndat,)], dtype=dt)
-        h.tofile(fbin)
-
-        # write auxiliary column names
-        naux = ndat - 1
-        if naux > 0:
-            auxtxt = ['{:16}'.format(colname) for colname in colnames[3:]]
-            auxtxt = tuple(auxtxt)
-            dt = np.dtype([(colname, 'S16') for colname in colnames[3:]])
-            h = np.array(auxtxt, dtype=dt)
-            h.tofile(fbin)
-
-        # write nlist
-        nlist = data.shape[0]
-        dt = np.dtype([('nlist', np.int32)])
-        h = np.array([(nlist,)], dtype=dt)
-        h.tofile(fbin)
-
-        # write the data
-        data.tofile(fbin)
-
-        pass
-    else:
-        raise Exception('unknown method code {}'.format(imeth))
+    record = BudgetRecord(data, text=text, imeth=imeth, text1id1=text1id1,
+                          text2id1=text2id1, text1id2=text1id2,
+                          text2id2=text2id2)
+    record.tofile(fbin, kstp=kstp, kper=kper, delt=delt, pertim=pertim,
+                  totim=totim)
     return
 
 
+def get_head_records(data, kstp=1, kper=1, pertim=1.0, totim=1.0,
+                     text='            HEAD', ilay=1):
+    """
+    Get a structured array with a record (header and data) for every layer
+    of a two-dimensional (nrow, ncol) or three-dimensional (nlay, nrow,
+    ncol) array. The first record is for layer ilay.
+
+    """
+    data = np.asarray(data, dtype=np.float64)
+    if data.ndim == 2:
+        data = data.reshape((1,) + data.shape)
+    nlay, nrow, ncol = data.shape
+    dt = np.dtype([('header', head_dtype),
+                   ('data', np.float64, (nrow, ncol))])
+    h = np.empty(nlay, dtype=dt)
+    h['header']['kstp'] = kstp
+    h['header']['kper'] = kper
+    h['header']['pertim'] = pertim
+    h['header']['totim'] = totim
+    h['header']['text'] = text
+    h['header']['ncol'] = ncol
+    h['header']['nrow'] = nrow
+    h['header']['ilay'] = np.arange(ilay, ilay + nlay)
+    h['data'] = data
+    return h
+
+
+class BudgetRecord(object):
+    """
+    A budget record with the data and auxiliary information converted to
+    bytes once, so the record can be written for many time steps by only
+    updating the header
+
+    """
+
+    def __init__(self, data, text='    FLOW-JA-FACE', imeth=1,
+                 text1id1='           GWF-1',
+                 text2id1='           GWF-1',
+                 text1id2='           GWF-1',
+                 text2id2='             NPF'):
+        self.header = np.zeros(1, dtype=budget_dtype)
+        self.header['text'] = text
+        self.header['imeth'] = imeth
+        self.header['ndim2'] = 1
+        self.header['ndim3'] = -1
+
+        if imeth == 1:
+            self.header['ndim1'] = data.shape[0]
+            self.body = [np.ascontiguousarray(data)]
+
+        elif imeth == 6:
+            self.header['ndim1'] = 1
+            ids = np.array((text1id1, text1id2, text2id1, text2id2),
+                           dtype=textid_dtype)
+
+            # ndat (number of floating point columns)
+            colnames = data.dtype.names
+            ndat = len(colnames) - 2
+            body = [ids, np.array([ndat], dtype=np.int32)]
+
+            # auxiliary column names
+            naux = ndat - 1
+            if naux > 0:
+                auxtxt = ['{:16}'.format(colname) for colname in colnames[3:]]
+                body.append(np.array(auxtxt, dtype='S16'))
+
+            # nlist and the data
+            body.append(np.array([data.shape[0]], dtype=np.int32))
+            body.append(np.ascontiguousarray(data))
+            self.body = body
+        else:
+            raise Exception('unknown method code {}'.format(imeth))
+        self.data = b''.join([b.tobytes() for b in self.body])
+
+    def get_header(self, kstp=1, kper=1, delt=1., pertim=1., totim=1.):
+        h = self.header
+        h['kstp'] = kstp
+        h['kper'] = kper
+        h['delt'] = delt
+        h['pertim'] = pertim
+        h['totim'] = totim
+        return h.tobytes()
+
+    def tofile(self, fbin, kstp=1, kper=1, delt=1., pertim=1., totim=1.):
+        fbin.write(self.get_header(kstp=kstp, kper=kper, delt=delt,
+                                   pertim=pertim, totim=totim))
+        fbin.write(self.data)
+        return
+
+
+class BinaryFileWriter(object):
+    """
+    Stream records to a MODFLOW 6 binary head or budget file
+
+    The file is kept open and records are collected in a buffer that is
+    written in chunks of about chunk_size bytes.
+
+        with BinaryFileWriter(fname) as fbin:
+            fbin.write_heads(top * np.ones((nrow, ncol)), totim=times)
+
+        records = [BudgetRecord(flowja),
+                   BudgetRecord(spdis, text='      DATA-SPDIS', imeth=6)]
+        with BinaryFileWriter(fname) as fbin:
+            fbin.write_budgets(records, kstp=kstp, kper=kper, totim=times)
+
+    Parameters
+    ----------
+    fname : str
+        path of the binary file
+    chunk_size : int
+        approximate size of the chunks written to the file (bytes)
+
+    """
+
+    def __init__(self, fname, chunk_size=2 ** 26):
+        self.fname = fname
+        self.chunk_size = chunk_size
+        self.f = open(fname, 'wb')
+        self.buffer = []
+        self.nbytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+    def write(self, b):
+        self.buffer.append(b)
+        self.nbytes += len(b)
+        if self.nbytes >= self.chunk_size:
+            self.flush()
+        return
+
+    def flush(self):
+        if len(self.buffer) > 0:
+            self.f.write(b''.join(self.buffer))
+        self.buffer = []
+        self.nbytes = 0
+        return
+
+    def close(self):
+        if self.f is not None:
+            self.flush()
+            self.f.close()
+            self.f = None
+        return
+
+    def write_head(self, data, kstp=1, kper=1, pertim=1.0, totim=1.0,
+                   text='            HEAD', ilay=1):
+        """
+        Write a head record for every layer of data
+
+        """
+        h = get_head_records(data, kstp=kstp, kper=kper, pertim=pertim,
+                             totim=totim, text=text, ilay=ilay)
+        self.write(h.tobytes())
+        return
+
+    def write_heads(self, data, kstp=1, kper=1, pertim=1.0, totim=1.0,
+                    text='            HEAD'):
+        """
+        Write the same heads for a series of times. kstp, kper, pertim,
+        and totim can be scalars or arrays with a value for every time.
+
+        """
+        kstp, kper, pertim, totim = np.broadcast_arrays(kstp, kper, pertim,
+                                                        totim)
+        kstp, kper, pertim, totim = [np.atleast_1d(v) for v in
+                                     (kstp, kper, pertim, totim)]
+        h = get_head_records(data, text=text)
+        ntimes = kstp.shape[0]
+        nlay = h.shape[0]
+
+        # write in chunks of times
+        nchunk = max(1, self.chunk_size // max(h.nbytes, 1))
+        for i0 in range(0, ntimes, nchunk):
+            i1 = min(ntimes, i0 + nchunk)
+            hh = np.tile(h, i1 - i0)
+            hh['header']['kstp'] = np.repeat(kstp[i0:i1], nlay)
+            hh['header']['kper'] = np.repeat(kper[i0:i1], nlay)
+            hh['header']['pertim'] = np.repeat(pertim[i0:i1], nlay)
+            hh['header']['totim'] = np.repeat(totim[i0:i1], nlay)
+            self.write(hh.tobytes())
+        return
+
+    def write_budget(self, data, kstp=1, kper=1, text='    FLOW-JA-FACE',
+                     imeth=1, delt=1., pertim=1., totim=1.,
+                     text1id1='           GWF-1',
+                     text2id1='           GWF-1',
+                     text1id2='           GWF-1',
+                     text2id2='             NPF'):
+        """
+        Write a single budget record
+
+        """
+        record = BudgetRecord(data, text=text, imeth=imeth,
+                              text1id1=text1id1, text2id1=text2id1,
+                              text1id2=text1id2, text2id2=text2id2)
+        self.write_budgets([record], kstp=kstp, kper=kper, delt=delt,
+                           pertim=pertim, totim=totim)
+        return
+
+    def write_budgets(self, records, kstp=1, kper=1, delt=1., pertim=1.,
+                      totim=1.):
+        """
+        Write a list of BudgetRecord objects for a series of times. kstp,
+        kper, delt, pertim, and totim can be scalars or arrays with a value
+        for every time.
+
+        """
+        values = np.broadcast_arrays(kstp, kper, delt, pertim, totim)
+        values = [np.atleast_1d(v) for v in values]
+        for kstp, kper, delt, pertim, totim in zip(*values):
+            for record in records:
+                self.write(record.get_header(kstp=kstp, kper=kper,
+                                             delt=delt, pertim=pertim,
+                                             totim=totim))
+                self.write(record.data)
+        return
+
+
 def uniform_flow_field(qx, qy, qz, shape, delr=None, delc=None, delv=None):
 
     nlay, nrow, ncol = shape
+    ncells = nlay * nrow * ncol
 
     # create spdis array for the uniform flow field
     dt = np.dtype([('ID1', np.int32),
@@ -105,41 +285,39 @@ def uniform_flow_field(qx, qy, qz, shape, delr=None, delc=None, delv=None):
                    ('QY', np.float64),
                    ('QZ', np.float64),
                    ])
-    spdis = np.array([(id1, id1, 0., qx, qy, qz) for id1 in
-                      range(nlay * nrow * ncol)],
-                     dtype=dt)
+    spdis = np.zeros(ncells, dtype=dt)
+    spdis['ID1'] = np.arange(ncells)
+    spdis['ID2'] = spdis['ID1']
+    spdis['QX'] = qx
+    spdis['QY'] = qy
+    spdis['QZ'] = qz
 
     # create the flowja array for the uniform flow field (assume top-bot = 1)
-    flowja = []
     if delr is None:
         delr = 1.
     if delc is None:
         delc = 1.
     if delv is None:
         delv = 1.
-    for k in range(nlay):
-        for i in range(nrow):
-            for j in range(ncol):
-                # diagonal
-                flowja.append(0.)
-                # up
-                if k > 0:
-                    flowja.append(-qz * delr * delc)
-                # back
-                if i > 0:
-                    flowja.append(-qy * delr * delv)
-                # left
-                if j > 0:
-                    flowja.append(qx * delc * delv)
-                # right
-                if j < ncol - 1:
-                    flowja.append(-qx * delc * delv)
-                # front
-                if i < nrow - 1:
-                    flowja.append(qy * delr * delv)
-                # bottom
-                if k < nlay - 1:
-                    flowja.append(qz * delr * delc)
-    flowja = np.array(flowja, dtype=np.float64)
-    return spdis, flowja
+    k, i, j = np.meshgrid(np.arange(nlay), np.arange(nrow), np.arange(ncol),
+                          indexing='ij')
+    k, i, j = k.ravel(), i.ravel(), j.ravel()
 
+    # connections of every cell in the order they are in flowja: diagonal,
+    # up, back, left, right, front, and bottom
+    values = np.array([0.,
+                       -qz * delr * delc,
+                       -qy * delr * delv,
+                       qx * delc * delv,
+                       -qx * delc * delv,
+                       qy * delr * delv,
+                       qz * delr * delc], dtype=np.float64)
+    mask = np.column_stack((np.ones(ncells, dtype=bool),
+                            k > 0,
+                            i > 0,
+                            j > 0,
+                            j < ncol - 1,
+                            i < nrow - 1,
+                            k < nlay - 1))
+    flowja = np.broadcast_to(values, mask.shape)[mask]
+    return spdis, flowja
@@ -0,0 +1,285 @@
+"""
+Vectorized budget checks for the autotests.
+
+The flows for a budget term are summed into inflows and outflows for all
+times at once. List (imeth=6) records are scattered into cells with
+numpy.bincount and the inflows and outflows are masked sums of the cell
+flows, which is the same as summing the positive and negative cell values
+one cell at a time.
+
+    cobj = BudgetFileIndex(fpth, precision='double')
+    d = budget_check.get_cbc_budget(cobj, ['STO-SS', 'WEL'], dtype=dtype)
+    diff = budget_check.get_differences(d0, d, bud_lst)
+
+check_budget() compares the budget terms in a cbc file with the budget in
+a listing file (read with flopy.utils.Mf6ListBudget) in a single call.
+
+"""
+
+import numpy as np
+
+try:
+    import flopy
+except:
+    msg = 'Error. FloPy package is not available.\n'
+    msg += 'Try installing using the following command:\n'
+    msg += ' pip install flopy'
+    raise Exception(msg)
+
+
+def get_record_size(cobj, text):
+    """
+    Number of cells for list records, from the record dimensions if cobj
+    is a BudgetFileIndex and None otherwise
+
+    """
+    if not hasattr(cobj, 'get_indices'):
+        return None
+    indices = cobj.get_indices(text=text)
+    if len(indices) < 1:
+        return None
+    record = cobj.records[indices[0]]
+    return record['ndim1'] * record['ndim2'] * abs(record['ndim3'])
+
+
+def scatter(nodes, q, size=None):
+    """
+    Sum list flows into a dense array of cell flows
+
+    Parameters
+    ----------
+    nodes : numpy.ndarray
+        one-based node numbers. A two-dimensional (ntimes, nlist) array or
+        a list of arrays results in a (ntimes, size) array.
+    q : numpy.ndarray
+        flows with the same shape as nodes
+    size : int
+        number of cells, the maximum node number is used if size is None
+
+    Returns
+    -------
+    v : numpy.ndarray
+
+    """
+    if isinstance(nodes, np.ndarray) and nodes.ndim == 1:
+        if size is None:
+            size = int(nodes.max()) if nodes.shape[0] > 0 else 0
+        _check_nodes(nodes, size)
+        return np.bincount(nodes - 1, weights=q, minlength=size)
+
+    nlist = [len(n) for n in nodes]
+    ntimes = len(nlist)
+    nodes = np.concatenate([np.asarray(n) for n in nodes]) if ntimes > 0 \
+        else np.zeros(0, dtype=int)
+    q = np.concatenate([np.asarray(v) for v in q]) if ntimes > 0 \
+        else np.zeros(0, dtype=float)
+    if size is None:
+        size = int(nodes.max()) if nodes.shape[0] > 0 else 0
+    _check_nodes(nodes, size)
+    itime = np.repeat(np.arange(ntimes), nlist)
+    idx = itime * size + nodes.astype(np.int64) - 1
+    v = np.bincount(idx, weights=q, minlength=ntimes * size)
+    return v.reshape(ntimes, size)
+
+
+def _check_nodes(nodes, size):
+    if nodes.shape[0] > 0 and (nodes.min() < 1 or nodes.max() > size):
+        msg = 'node numbers must be between 1 and {}'.format(size)
+        raise ValueError(msg)
+    return
+
+
+def get_in_out(v):
+    """
+    Get the inflows and outflows of a (ntimes, ncells) array of cell flows
+    (or of a single array of cell flows)
+
+    """
+    v = np.asarray(v)
+    if v.ndim > 1:
+        v = v.reshape(v.shape[0], -1)
+    else:
+        v = v.reshape(1, -1)
+    qin = np.where(v > 0., v, 0.).sum(axis=1)
+    qout = np.where(v < 0., -v, 0.).sum(axis=1)
+    return qin, qout
+
+
+def get_term(cobj, text, kstpkper, size=None, block_size=2 ** 24):
+    """
+    Get the inflows and outflows for a budget term for every time
+
+    Parameters
+    ----------
+    cobj : BudgetFileIndex or flopy.utils.CellBudgetFile
+        budget file
+    text : str
+        budget term
+    kstpkper : list
+        list of zero-based (kstp, kper) tuples
+    size : int
+        number of cells for list records
+    block_size : int
+        maximum number of values that are summed at once
+
+    Returns
+    -------
+    qin, qout : numpy.ndarray
+
+    """
+    ntimes = len(kstpkper)
+    qin = np.zeros(ntimes, dtype=float)
+    qout = np.zeros(ntimes, dtype=float)
+    records = [cobj.get_data(kstpkper=k, text=text)[0] for k in kstpkper]
+    if ntimes < 1:
+        return qin, qout
+
+    if records[0].dtype.names is not None:
+        if size is None:
+            # the record dimensions are not the number of cells for all
+            # package budget files
+            size = max([int(v['node'].max()) for v in records
+                        if v.shape[0] > 0] +
+                       [get_record_size(cobj, text) or 0])
+        nvalues = max(size, 1)
+    else:
+        nvalues = max(records[0].size, 1)
+    nblock = max(1, block_size // nvalues)
+
+    for i0 in range(0, ntimes, nblock):
+        i1 = min(ntimes, i0 + nblock)
+        block = records[i0:i1]
+        if block[0].dtype.names is not None:
+            v = scatter([r['node'] for r in block], [r['q'] for r in block],
+                        size=size)
+        else:
+            v = np.stack([np.asarray(r).ravel() for r in block])
+        qin[i0:i1], qout[i0:i1] = get_in_out(v)
+    return qin, qout
+
+
+def get_cbc_budget(cobj, texts, dtype=None, size=None):
+    """
+    Get the inflows and outflows for a list of budget terms
+
+    Parameters
+    ----------
+    cobj : BudgetFileIndex or flopy.utils.CellBudgetFile
+        budget file
+    texts : list
+        budget terms
+    dtype : numpy.dtype
+        dtype of the result (for example the dtype of the budget from
+        Mf6ListBudget), fields that are not calculated are set to zero
+    size : int
+        number of cells for list records
+
+    Returns
+    -------
+    d : numpy.recarray
+        record array with totim, time_step, stress_period, and the
+        TEXT_IN and TEXT_OUT inflows and outflows for every time
+
+    """
+    kstpkper = cobj.get_kstpkper()
+    times = cobj.get_times()
+    if dtype is None:
+        names = [('totim', float), ('time_step', int),
+                 ('stress_period', int)]
+        for text in texts:
+            names += [('{}_IN'.format(text), float),
+                      ('{}_OUT'.format(text), float)]
+        dtype = np.dtype(names)
+    d = np.recarray(len(kstpkper), dtype=dtype)
+    for name in d.dtype.names:
+        d[name] = 0
+    if len(kstpkper) < 1:
+        return d
+    d['totim'] = times
+    d['time_step'] = [k[0] for k in kstpkper]
+    d['stress_period'] = [k[1] for k in kstpkper]
+    for text in texts:
+        qin, qout = get_term(cobj, text, kstpkper, size=size)
+        d['{}_IN'.format(text)] = qin
+        d['{}_OUT'.format(text)] = qout
+    return d
+
+
+def get_differences(d0, d, names):
+    """
+    Get a (ntimes, len(names)) array with the differences d0 - d
+
+    """
+    ntimes = min(d0.shape[0], d.shape[0])
+    diff = np.zeros((ntimes, len(names)), dtype=float)
+    for idx, name in enumerate(names):
+        diff[:, idx] = d0[name][:ntimes] - d[name][:ntimes]
+    return diff
+
+
+def write_summary(fpth, d0, d, diff, names):
+    """
+    Write the listing file budget, the cbc budget, and the differences to
+    fpth
+
+    """
+    f = open(fpth, 'w')
+    line = '{:>10s}'.format('TIME')
+    for name in names:
+        line += '{:>25s}'.format(name + '_LST')
+        line += '{:>25s}'.format(name + '_CBC')
+        line += '{:>25s}'.format(name + '_DIF')
+    f.write(line + '\n')
+    for i in range(diff.shape[0]):
+        line = '{:10g}'.format(d['totim'][i])
+        for idx, name in enumerate(names):
+            line += '{:25g}'.format(d0[name][i])
+            line += '{:25g}'.format(d[name][i])
+            line += '{:25g}'.format(diff[i, idx])
+        f.write(line + '\n')
+    f.close()
+    return
+
+
+def check_budget(lstfpth, cobj, texts, size=None, budgetkey=None,
+                 outfile=None):
+    """
+    Compare the budget terms in a cbc file to the budget in a listing file
+
+    Parameters
+    ----------
+    lstfpth : str
+        path to the listing file
+    cobj : BudgetFileIndex or flopy.utils.CellBudgetFile
+        budget file
+    texts : list
+        budget terms
+    size : int
+        number of cells for list records
+    budgetkey : str
+        budget key passed to flopy.utils.Mf6ListBudget
+    outfile : str
+        path of the summary file
+
+    Returns
+    -------
+    diffmax : float
+        maximum absolute difference
+
+    """
+    names = []
+    for text in texts:
+        names += ['{}_IN'.format(text), '{}_OUT'.format(text)]
+    if budgetkey is None:
+        budl = flopy.utils.Mf6ListBudget(lstfpth)
+    else:
+        budl = flopy.utils.Mf6ListBudget(lstfpth, budgetkey=budgetkey)
+    # Mf6ListBudget.get_budget() appends the time fields to names
+    d0 = budl.get_budget(names=list(names))[0]
+    d = get_cbc_budget(cobj, texts, dtype=d0.dtype, size=size)
+    diff = get_differences(d0, d, names)
+    if outfile is not None:
+        write_summary(outfile, d0, d, diff, names)
+    if diff.size < 1:
+        return 0.
+    return np.abs(diff).max()
@@ -0,0 +1,408 @@
+"""
+Memory mapped reader for MODFLOW 6 binary budget files.
+
+The chain of record headers is scanned once and the location of the data of
+every record is stored in an index that is keyed by (kstp, kper, text). The
+index is cached beside the budget file (fpth + '.idx') and is reused as long
+as the size and modification time of the budget file are unchanged. The
+data are returned as views of a memory map of the file, so repeated access
+to records in large budget files does not require seeking and decoding the
+file again.
+
+BudgetFileIndex supports the parts of the flopy.utils.CellBudgetFile
+interface used by the autotests (get_unique_record_names(), get_kstpkper(),
+get_times(), and get_data()). Full arrays (imeth=0 and imeth=1) are returned
+as arrays with a (nlay, nrow, ncol) shape and list records (imeth=6) are
+returned as record arrays with node, node2, q, and auxiliary fields.
+
+"""
+
+import os
+import json
+import numpy as np
+
+
+def get_header_dtype(precision):
+    if precision == 'double':
+        ftype = np.float64
+    else:
+        ftype = np.float32
+    header = np.dtype([('kstp', np.int32),
+                       ('kper', np.int32),
+                       ('text', 'S16'),
+                       ('ndim1', np.int32),
+                       ('ndim2', np.int32),
+                       ('ndim3', np.int32)])
+    compact = np.dtype([('imeth', np.int32),
+                        ('delt', ftype),
+                        ('pertim', ftype),
+                        ('totim', ftype)])
+    return header, compact
+
+
+def _valid_header(header):
+    try:
+        text = header['text'].decode('ascii')
+    except UnicodeDecodeError:
+        return False
+    if not text.strip() or not text.isprintable():
+        return False
+    return header['kstp'] > 0 and header['kper'] > 0
+
+
+class BudgetFileIndex(object):
+    """
+    Indexed reader for a MODFLOW 6 binary budget file
+
+    Parameters
+    ----------
+    fpth : str
+        path to the binary budget file
+    precision : str
+        'double', 'single', or 'auto'
+    cache : bool
+        boolean indicating if the index should be read from and written
+        to fpth + '.idx'
+    verbose : bool
+        boolean indicating if information should be printed
+
+    """
+
+    version = 1
+
+    def __init__(self, fpth, precision='auto', cache=True, verbose=False):
+        self.fpth = fpth
+        self.verbose = verbose
+        self.nbytes = os.path.getsize(fpth)
+        self.mm = np.memmap(fpth, dtype=np.uint8, mode='r')
+        if precision == 'auto':
+            precision = self.get_precision()
+        self.precision = precision
+        if precision == 'double':
+            self.ftype = np.float64
+        else:
+            self.ftype = np.float32
+        self.hdtype, self.cdtype = get_header_dtype(precision)
+
+        self.idxfile = fpth + '.idx'
+        self.records = None
+        if cache:
+            self.records = self.read_index()
+        if self.records is None:
+            self.records = self.build_index()
+            if cache:
+                self.write_index()
+        self.set_lookup()
+
+    def get_precision(self):
+        """
+        Determine the precision of the file from the first record header
+
+        """
+        for precision in ('double', 'single'):
+            hdtype, cdtype = get_header_dtype(precision)
+            size = hdtype.itemsize + cdtype.itemsize
+            if self.nbytes < size:
+                continue
+            header = np.frombuffer(self.mm, dtype=hdtype, count=1)[0]
+            if not _valid_header(header):
+                continue
+            if header['ndim3'] > 0:
+                return precision
+            compact = np.frombuffer(self.mm, dtype=cdtype, count=1,
+                                    offset=hdtype.itemsize)[0]
+            if compact['imeth'] not in (0, 1, 2, 3, 4, 5, 6):
+                continue
+            delt, pertim, totim = [float(compact[name]) for name in
+                                   ('delt', 'pertim', 'totim')]
+            if np.isfinite(delt) and 0. < pertim <= totim and \
+                    totim < 1e30:
+                return precision
+        msg = 'could not determine the precision of {}'.format(self.fpth)
+        raise ValueError(msg)
+
+    def _get_stamp(self):
+        stat = os.stat(self.fpth)
+        return {'version': self.version, 'size': stat.st_size,
+                'mtime': stat.st_mtime_ns, 'precision': self.precision}
+
+    def read_index(self):
+        """
+        Read the cached index, None is returned if the cached index does not
+        exist or is out of date
+
+        """
+        if not os.path.isfile(self.idxfile):
+            return None
+        try:
+            with open(self.idxfile, 'r') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get('stamp') != self._get_stamp():
+            return None
+        if self.verbose:
+            print('using budget file index {}'.format(self.idxfile))
+        return cached['records']
+
+    def write_index(self):
+        """
+        Write the index beside the budget file, the index is not cached if
+        the directory is not writable
+
+        """
+        cached = {'stamp': self._get_stamp(), 'records': self.records}
+        tmp = '{}.{}'.format(self.idxfile, os.getpid())
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(cached, f)
+            os.replace(tmp, self.idxfile)
+        except OSError:
+            if os.path.isfile(tmp):
+                os.remove(tmp)
+        return
+
+    def build_index(self):
+        """
+        Scan the record headers and return a list with the location and
+        layout of every record
+
+        """
+        hsize = self.hdtype.itemsize
+        csize = self.cdtype.itemsize
+        fsize = np.dtype(self.ftype).itemsize
+        records = []
+        pos = 0
+        while pos + hsize <= self.nbytes:
+            header = np.frombuffer(self.mm, dtype=self.hdtype, count=1,
+                                   offset=pos)[0]
+            pos += hsize
+            record = {'kstp': int(header['kstp']),
+                      'kper': int(header['kper']),
+                      'text': header['text'].decode().strip(),
+                      'ndim1': int(header['ndim1']),
+                      'ndim2': int(header['ndim2']),
+                      'ndim3': int(header['ndim3']),
+                      'imeth': 0, 'delt': None, 'pertim': None,
+                      'totim': None}
+            if record['ndim3'] < 0:
+                compact = np.frombuffer(self.mm, dtype=self.cdtype, count=1,
+                                        offset=pos)[0]
+                pos += csize
+                for name in ('delt', 'pertim', 'totim'):
+                    record[name] = float(compact[name])
+                record['imeth'] = int(compact['imeth'])
+            imeth = record['imeth']
+            size = record['ndim1'] * record['ndim2'] * abs(record['ndim3'])
+
+            if imeth in (0, 1):
+                record['offset'] = pos
+                record['count'] = size
+                pos += size * fsize
+            elif imeth == 6:
+                ids = np.frombuffer(self.mm, dtype='S16', count=4,
+                                    offset=pos)
+                pos += 4 * 16
+                record['modelnam'] = ids[0].decode().strip()
+                record['paknam'] = ids[1].decode().strip()
+                record['modelnam2'] = ids[2].decode().strip()
+                record['paknam2'] = ids[3].decode().strip()
+                ndat = int(np.frombuffer(self.mm, dtype=np.int32, count=1,
+                                         offset=pos)[0])
+                pos += 4
+                aux = np.frombuffer(self.mm, dtype='S16', count=ndat - 1,
+                                    offset=pos)
+                pos += (ndat - 1) * 16
+                record['aux'] = [name.decode().strip() for name in aux]
+                nlist = int(np.frombuffer(self.mm, dtype=np.int32, count=1,
+                                          offset=pos)[0])
+                pos += 4
+                record['offset'] = pos
+                record['count'] = nlist
+                pos += nlist * self.get_list_dtype(record['aux']).itemsize
+            else:
+                msg = 'unsupported method code {} '.format(imeth) + \
+                      'in {}'.format(self.fpth)
+                raise Exception(msg)
+
+            if pos > self.nbytes:
+                msg = 'incomplete record at end of {}'.format(self.fpth)
+                raise ValueError(msg)
+            records.append(record)
+        if self.verbose:
+            print('indexed {} records in {}'.format(len(records), self.fpth))
+        return records
+
+    def set_lookup(self):
+        """
+        Build the dictionaries used to find records
+
+        """
+        self.lookup = {}
+        self.times = []
+        self.kstpkper = []
+        self.unique_names = []
+        for irec, record in enumerate(self.records):
+            kk = (record['kstp'] - 1, record['kper'] - 1)
+            if len(self.kstpkper) < 1 or kk != self.kstpkper[-1]:
+                self.kstpkper.append(kk)
+                self.times.append(record['totim'])
+            key = (record['kstp'], record['kper'], record['text'].upper())
+            self.lookup.setdefault(key, []).append(irec)
+            if record['text'] not in self.unique_names:
+                self.unique_names.append(record['text'])
+        self.totim_lookup = dict(zip(self.times, self.kstpkper))
+        return
+
+    def get_list_dtype(self, aux):
+        names = [('node', np.int32), ('node2', np.int32),
+                 ('q', self.ftype)]
+        return np.dtype(names + [(name, self.ftype) for name in aux])
+
+    def get_unique_record_names(self, decode=False):
+        """
+        Get the record names in the order they are in the file, the names
+        are padded to 16 characters like the names returned by flopy
+
+        """
+        names = ['{:>16s}'.format(name) for name in self.unique_names]
+        if decode:
+            return names
+        return [name.encode() for name in names]
+
+    def get_kstpkper(self):
+        """
+        Get a list of zero-based (kstp, kper) tuples like flopy
+
+        """
+        return list(self.kstpkper)
+
+    def get_times(self):
+        return list(self.times)
+
+    def get_nrecords(self):
+        return len(self.records)
+
+    def get_record(self, irec):
+        """
+        Get the data for record irec as a view of the memory mapped file
+
+        """
+        record = self.records[irec]
+        if record['imeth'] == 6:
+            dt = self.get_list_dtype(record['aux'])
+            arr = np.ndarray(shape=(record['count'],), dtype=dt,
+                             buffer=self.mm, offset=record['offset'])
+            return arr.view(np.recarray)
+        shape = (abs(record['ndim3']), record['ndim2'], record['ndim1'])
+        return np.ndarray(shape=shape, dtype=self.ftype, buffer=self.mm,
+                          offset=record['offset'])
+
+    def get_full(self, irec):
+        """
+        Get the data for record irec as a (nlay, nrow, ncol) array, list
+        records are summed into the cells they belong to
+
+        """
+        record = self.records[irec]
+        v = self.get_record(irec)
+        if record['imeth'] != 6:
+            return v
+        shape = (abs(record['ndim3']), record['ndim2'], record['ndim1'])
+        size = int(np.prod(shape))
+        full = np.bincount(v['node'] - 1, weights=v['q'], minlength=size)
+        if full.shape[0] != size:
+            msg = 'node numbers in {} record '.format(record['text']) + \
+                  'exceed the number of cells ({})'.format(size)
+            raise ValueError(msg)
+        return full.reshape(shape)
+
+    def find_text(self, text):
+        """
+        Find the record name matching text (exact match first and then
+        partial match)
+
+        """
+        if isinstance(text, bytes):
+            text = text.decode()
+        text = text.strip().upper()
+        names = [name.upper() for name in self.unique_names]
+        if text in names:
+            return text
+        for name in names:
+            if text in name:
+                return name
+        return None
+
+    def get_indices(self, kstpkper=None, totim=None, idx=None, text=None,
+                    paknam=None):
+        """
+        Get the record numbers matching the selection
+
+        """
+        if idx is not None:
+            kstpkper = self.kstpkper[idx]
+        elif totim is not None:
+            kstpkper = self.totim_lookup.get(totim)
+            if kstpkper is None:
+                return []
+        text16 = None
+        if text is not None:
+            text16 = self.find_text(text)
+            if text16 is None:
+                return []
+
+        kk = None
+        if kstpkper is not None:
+            kk = (int(kstpkper[0]) + 1, int(kstpkper[1]) + 1)
+        if kk is not None and text16 is not None:
+            indices = list(self.lookup.get(kk + (text16,), []))
+        else:
+            indices = []
+            for key, irecs in self.lookup.items():
+                if kk is not None and key[0:2] != kk:
+                    continue
+                if text16 is not None and key[2] != text16:
+                    continue
+                indices += irecs
+            indices = sorted(indices)
+
+        if paknam is not None:
+            paknam = paknam.strip().upper()
+            indices = [irec for irec in indices
+                       if self.records[irec].get('paknam', '').upper() ==
+                       paknam]
+        return indices
+
+    def get_data(self, kstpkper=None, totim=None, idx=None, text=None,
+                 paknam=None, full3D=False):
+        """
+        Get a list of the data for the records matching the selection
+
+        Parameters
+        ----------
+        kstpkper : tuple
+            zero-based time step and stress period
+        totim : float
+            simulation time
+        idx : int
+            zero-based time index
+        text : str
+            record name
+        paknam : str
+            package name (list records only)
+        full3D : bool
+            boolean indicating if list records should be returned as
+            (nlay, nrow, ncol) arrays
+
+        Returns
+        -------
+        data : list
+            list of memory mapped views (copies for full3D list records)
+
+        """
+        indices = self.get_indices(kstpkper=kstpkper, totim=totim, idx=idx,
+                                   text=text, paknam=paknam)
+        if full3D:
+            return [self.get_full(irec) for irec in indices]
+        return [self.get_record(irec) for irec in indices]
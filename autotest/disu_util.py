@@ -1,96 +1,143 @@
 
 import numpy as np
 
+
 def get_disu_kwargs(nlay, nrow, ncol, delr, delc, tp, botm):
-    def get_nn(k, i, j):
-        return k * nrow * ncol + i * ncol + j
-    nodes = nlay * nrow * ncol
-    iac = np.zeros((nodes), dtype=int)
+    """
+    Get the keyword arguments for a flopy DISU package that is equivalent to
+    a structured nlay x nrow x ncol grid. The connections of every cell are
+    in the order: diagonal, up, back, left, right, front, and bottom.
+
+    The connectivity (iac and ja) and the connection properties (ihc, cl12,
+    and hwva) are calculated with NumPy index arithmetic a block of layers
+    at a time. The integer arrays are int32 and the real arrays are float64.
+
+    Parameters
+    ----------
+    nlay, nrow, ncol : int
+        grid dimensions
+    delr : numpy.ndarray
+        column widths (ncol)
+    delc : numpy.ndarray
+        row widths (nrow)
+    tp : float or numpy.ndarray
+        top of the model (scalar or nrow * ncol array)
+    botm : list
+        bottom of every layer (scalars or nrow * ncol arrays)
+
+    Returns
+    -------
+    kw : dict
+
+    """
+    ncpl = nrow * ncol
+    nodes = nlay * ncpl
+    delr = np.broadcast_to(np.asarray(delr, dtype=np.float64), (ncol,))
+    delc = np.broadcast_to(np.asarray(delc, dtype=np.float64), (nrow,))
+
+    # cell tops, bottoms, and areas
+    top = np.zeros((nlay, ncpl), dtype=np.float64)
+    bot = np.zeros((nlay, ncpl), dtype=np.float64)
+    for k in range(nlay):
+        if k == 0:
+            top[k] = tp
+        else:
+            top[k] = botm[k - 1]
+        bot[k] = botm[k]
+    thk = top - bot
+    area2d = np.outer(delc, delr).ravel()
+
+    # row and column of the cells in a layer
+    i2d, j2d = np.divmod(np.arange(ncpl, dtype=np.int32), ncol)
+    dr = delr[j2d]
+    dc = delc[i2d]
+
+    # process blocks of layers to limit the size of the temporary arrays
+    nblock = max(1, 2 ** 22 // max(ncpl, 1))
+    iac = np.zeros(nodes, dtype=np.int32)
     ja = []
-    area = np.zeros((nodes), dtype=float)
-    top = np.zeros((nodes), dtype=float)
-    bot = np.zeros((nodes), dtype=float)
     ihc = []
     cl12 = []
     hwva = []
-    for k in range(nlay):
-        for i in range(nrow):
-            for j in range(ncol):
-                # diagonal
-                n = get_nn(k, i, j)
-                ja.append(n)
-                iac[n] += 1
-                area[n] = delr[i] * delc[j]
-                ihc.append(n + 1)
-                cl12.append(n + 1)
-                hwva.append(n + 1)
-                if k == 0:
-                    top[n] = tp
-                else:
-                    top[n] = botm[k - 1]
-                bot[n] = botm[k]
-                # up
-                if k > 0:
-                    ja.append(get_nn(k - 1, i, j))
-                    iac[n] += 1
-                    ihc.append(0)
-                    dz = botm[k - 1] - botm[k]
-                    cl12.append(.5 * dz)
-                    hwva.append(delr[i] * delc[j])
-                # back
-                if i > 0:
-                    ja.append(get_nn(k, i - 1, j))
-                    iac[n] += 1
-                    ihc.append(1)
-                    cl12.append(.5 * delc[i])
-                    hwva.append(delr[j])
-                # left
-                if j > 0:
-                    ja.append(get_nn(k, i, j - 1))
-                    iac[n] += 1
-                    ihc.append(1)
-                    cl12.append(.5 * delr[j])
-                    hwva.append(delc[i])
-                # right
-                if j < ncol - 1:
-                    ja.append(get_nn(k, i, j + 1))
-                    iac[n] += 1
-                    ihc.append(1)
-                    cl12.append(.5 * delr[j])
-                    hwva.append(delc[i])
-                # front
-                if i < nrow - 1:
-                    ja.append(get_nn(k, i + 1, j))
-                    iac[n] += 1
-                    ihc.append(1)
-                    cl12.append(.5 * delc[i])
-                    hwva.append(delr[j])
-                # bottom
-                if k < nlay - 1:
-                    ja.append(get_nn(k + 1, i, j))
-                    iac[n] += 1
-                    ihc.append(0)
-                    if k == 0:
-                        dz = tp - botm[k]
-                    else:
-                        dz = botm[k - 1] - botm[k]
-                    cl12.append(.5 * dz)
-                    hwva.append(delr[i] * delc[j])
-    ja = np.array(ja, dtype=int)
+    for k0 in range(0, nlay, nblock):
+        k1 = min(nlay, k0 + nblock)
+        nl = k1 - k0
+        k = np.repeat(np.arange(k0, k1, dtype=np.int32), ncpl)
+        i = np.tile(i2d, nl)
+        j = np.tile(j2d, nl)
+        n = k * ncpl + i * ncol + j
+        zeros = np.zeros(n.shape, dtype=np.int32)
+        ones = np.ones(n.shape, dtype=np.int32)
+        a = np.tile(area2d, nl)
+        hdz = .5 * thk[k0:k1].ravel()
+        hdr = .5 * np.tile(dr, nl)
+        hdc = .5 * np.tile(dc, nl)
+        wr = np.tile(dr, nl)
+        wc = np.tile(dc, nl)
+
+        mask = np.column_stack((np.ones(n.shape, dtype=bool),
+                                k > 0,
+                                i > 0,
+                                j > 0,
+                                j < ncol - 1,
+                                i < nrow - 1,
+                                k < nlay - 1))
+        iac[n] = mask.sum(axis=1)
+        ja.append(np.column_stack((n, n - ncpl, n - ncol, n - 1, n + 1,
+                                   n + ncol, n + ncpl))[mask])
+        ihc.append(np.column_stack((n + 1, zeros, ones, ones, ones, ones,
+                                    zeros))[mask])
+        cl12.append(np.column_stack((n + 1., hdz, hdc, hdr, hdr, hdc,
+                                     hdz))[mask])
+        hwva.append(np.column_stack((n + 1., a, wr, wc, wc, wr, a))[mask])
+
+    ja = np.concatenate(ja).astype(np.int32)
     nja = ja.shape[0]
-    hwva = np.array(hwva, dtype=float)
     kw = {}
     kw['nodes'] = nodes
     kw['nja'] = nja
     kw['nvert'] = None
-    kw['top'] = top
-    kw['bot'] = bot
-    kw['area'] = area
+    kw['top'] = top.ravel()
+    kw['bot'] = bot.ravel()
+    kw['area'] = np.tile(area2d, nlay)
     kw['iac'] = iac
     kw['ja'] = ja
-    kw['ihc'] = ihc
-    kw['cl12'] = cl12
-    kw['hwva'] = hwva
+    kw['ihc'] = np.concatenate(ihc).astype(np.int32)
+    kw['cl12'] = np.concatenate(cl12)
+    kw['hwva'] = np.concatenate(hwva)
     return kw
 
 
+def get_csr_matrix(disukwargs, data=None):
+    """
+    Get a scipy.sparse.csr_matrix view of the connectivity of a DISU grid
+
+    Parameters
+    ----------
+    disukwargs : dict
+        dictionary returned by get_disu_kwargs()
+    data : numpy.ndarray
+        values for the nja connections, the connection numbers (one-based)
+        are used if data is None
+
+    Returns
+    -------
+    csr : scipy.sparse.csr_matrix
+
+    """
+    try:
+        import scipy.sparse
+    except:
+        msg = 'Error. SciPy package is not available.\n'
+        msg += 'Try installing using the following command:\n'
+        msg += ' pip install scipy'
+        raise Exception(msg)
+    nodes = disukwargs['nodes']
+    nja = disukwargs['nja']
+    indptr = np.zeros(nodes + 1, dtype=np.int32)
+    np.cumsum(disukwargs['iac'], out=indptr[1:])
+    if data is None:
+        data = np.arange(1, nja + 1, dtype=np.int32)
+    # the column indices in a row are not sorted (the diagonal is first)
+    return scipy.sparse.csr_matrix((data, disukwargs['ja'], indptr),
+                                   shape=(nodes, nodes))
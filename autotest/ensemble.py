@@ -0,0 +1,339 @@
+"""
+Run ensembles of MODFLOW 6 simulations through libmf6.
+
+A pool of worker processes is started once and every worker loads libmf6
+once.  Realizations are streamed to the workers and a worker reuses its
+loaded library for every realization it runs (initialize, run all time
+steps, collect the outputs, finalize), so the cost of starting a process
+and loading the library is shared by all realizations in the ensemble.
+
+A realization is a dictionary with the simulation workspace and,
+optionally, the values that are set after the model is initialized:
+
+    realizations = [{'ws': 'ens/r{:04d}'.format(i),
+                     'values': {k_tag: k[i]}} for i in range(n)]
+    with EnsembleRunner(libmf6, outputs=[head_tag], nproc=8) as runner:
+        for result in runner.run(realizations):
+            if result['success']:
+                heads[result['index']] = result['outputs'][head_tag]
+
+Realizations that are run at the same time must use different workspaces.
+A module level function passed as prepare is called as prepare(mf6,
+realization) after the values are set, for example to set values that
+depend on other model variables.  The outputs are copies of the variables
+at the end of the simulation, or (ntimes, ...) arrays with the values at
+the end of every time step when every_step is True.
+
+When a realization fails and libmf6 cannot be finalized, the worker loads
+a private copy of the shared library, because the same library cannot be
+loaded a second time in a process.
+
+"""
+
+import os
+import sys
+import time
+import shutil
+import traceback
+import multiprocessing
+import multiprocessing.connection
+
+import numpy as np
+
+try:
+    from xmipy import XmiWrapper
+except:
+    msg = 'Error. xmipy package is not available.\n'
+    msg += 'Try installing using the following command:\n'
+    msg += ' pip install xmipy'
+    raise Exception(msg)
+
+# state of a worker process
+_worker = {}
+
+
+def init_worker(libpath, logdir):
+    """
+    Load libmf6 in a worker process and redirect the output of the worker
+    (including the output of the shared library) to a log file
+
+    """
+    pid = os.getpid()
+    _worker['libpath'] = os.path.abspath(libpath)
+    _worker['logdir'] = os.path.abspath(logdir)
+    _worker['nloaded'] = 0
+    sys.stdout.flush()
+    sys.stderr.flush()
+    f = open(os.path.join(_worker['logdir'], 'worker-{}.log'.format(pid)),
+             'w')
+    os.dup2(f.fileno(), 1)
+    os.dup2(f.fileno(), 2)
+    _worker['log'] = f
+    load_library()
+    return
+
+
+def load_library():
+    """
+    Load libmf6, a private copy of the library is loaded when the library
+    was loaded before by the worker
+
+    """
+    libpath = _worker['libpath']
+    if _worker['nloaded'] > 0:
+        root, ext = os.path.splitext(os.path.basename(libpath))
+        fname = '{}-{}-{}{}'.format(root, os.getpid(), _worker['nloaded'],
+                                    ext)
+        dst = os.path.join(_worker['logdir'], fname)
+        shutil.copy2(libpath, dst)
+        libpath = dst
+    _worker['mf6'] = XmiWrapper(libpath)
+    _worker['nloaded'] += 1
+    return
+
+
+def run_realization(task):
+    """
+    Run a single realization in a worker process
+
+    """
+    index, realization, outputs, prepare, every_step = task
+    result = {'index': index, 'success': False, 'outputs': {},
+              'elapsed': 0., 'message': '', 'worker': os.getpid()}
+    mf6 = _worker['mf6']
+    init_wd = os.getcwd()
+    t0 = time.time()
+    initialized = False
+    try:
+        os.chdir(realization['ws'])
+        mf6.initialize(realization.get('config', 'mfsim.nam'))
+        initialized = True
+
+        for address, value in realization.get('values', {}).items():
+            mf6.set_value(address, np.asarray(value))
+        if prepare is not None:
+            prepare(mf6, realization)
+
+        steps = dict([(address, []) for address in outputs])
+        current_time = mf6.get_current_time()
+        end_time = mf6.get_end_time()
+        while current_time < end_time:
+            mf6.update()
+            current_time = mf6.get_current_time()
+            if every_step:
+                for address in outputs:
+                    steps[address].append(np.array(mf6.get_value(address)))
+
+        for address in outputs:
+            if every_step:
+                result['outputs'][address] = np.array(steps[address])
+            else:
+                result['outputs'][address] = np.array(mf6.get_value(address))
+
+        initialized = False
+        mf6.finalize()
+        result['success'] = True
+    except:
+        result['message'] = traceback.format_exc()
+        if initialized:
+            try:
+                mf6.finalize()
+            except:
+                load_library()
+    finally:
+        os.chdir(init_wd)
+        result['elapsed'] = time.time() - t0
+    sys.stdout.flush()
+    return result
+
+
+def worker_main(conn, libpath, logdir):
+    """
+    Run the realizations that are received from the main process until
+    None is received
+
+    """
+    init_worker(libpath, logdir)
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        conn.send(run_realization(task))
+    conn.close()
+    return
+
+
+class EnsembleRunner(object):
+    """
+    Pool of worker processes with a loaded libmf6
+
+    Parameters
+    ----------
+    libpath : str
+        path to the libmf6 shared library
+    outputs : list
+        memory addresses of the variables that are returned
+    nproc : int
+        number of worker processes, the number of cpus is used if nproc is
+        None
+    prepare : callable
+        module level function that is called as prepare(mf6, realization)
+        after the model is initialized
+    every_step : bool
+        boolean indicating if the outputs are collected at the end of every
+        time step
+    logdir : str
+        folder for the log files of the workers
+    maxruns : int
+        number of realizations after which a worker is replaced, workers
+        are not replaced if maxruns is None
+
+    """
+
+    def __init__(self, libpath, outputs=None, nproc=None, prepare=None,
+                 every_step=False, logdir=None, maxruns=None):
+        if not os.path.isfile(libpath):
+            msg = 'libmf6 does not exist: {}'.format(libpath)
+            raise Exception(msg)
+        if outputs is None:
+            outputs = []
+        if nproc is None:
+            nproc = multiprocessing.cpu_count()
+        if logdir is None:
+            logdir = os.path.join('temp', 'ensemble')
+        if not os.path.isdir(logdir):
+            os.makedirs(logdir)
+        self.libpath = os.path.abspath(libpath)
+        self.outputs = list(outputs)
+        self.nproc = max(1, nproc)
+        self.prepare = prepare
+        self.every_step = every_step
+        self.logdir = os.path.abspath(logdir)
+        self.maxruns = maxruns
+        self.workers = [self._start_worker() for i in range(self.nproc)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+    def _start_worker(self):
+        conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=worker_main,
+                                          args=(child_conn, self.libpath,
+                                                self.logdir))
+        process.daemon = True
+        process.start()
+        child_conn.close()
+        return {'process': process, 'conn': conn, 'nruns': 0}
+
+    def _stop_worker(self, worker, timeout=10.):
+        try:
+            worker['conn'].send(None)
+        except (OSError, ValueError):
+            pass
+        worker['process'].join(timeout)
+        if worker['process'].is_alive():
+            worker['process'].terminate()
+            worker['process'].join()
+        worker['conn'].close()
+        return
+
+    def close(self):
+        for worker in self.workers:
+            self._stop_worker(worker)
+        self.workers = []
+        return
+
+    def _get_tasks(self, realizations):
+        for index, realization in enumerate(realizations):
+            if not isinstance(realization, dict):
+                realization = {'ws': realization}
+            realization = dict(realization)
+            realization['ws'] = os.path.abspath(realization['ws'])
+            yield (index, realization, self.outputs, self.prepare,
+                   self.every_step)
+
+    def _receive(self, worker, task):
+        """
+        Receive the result of a task, a worker that died is replaced
+
+        """
+        try:
+            result = worker['conn'].recv()
+        except (EOFError, OSError):
+            worker['process'].join(10.)
+            exitcode = worker['process'].exitcode
+            result = {'index': task[0], 'success': False, 'outputs': {},
+                      'elapsed': 0., 'worker': worker['process'].pid,
+                      'message': 'worker died with exit code '
+                                 '{}'.format(exitcode)}
+            self._stop_worker(worker, timeout=0.)
+            return result, self._start_worker()
+        worker['nruns'] += 1
+        if self.maxruns is not None and worker['nruns'] >= self.maxruns:
+            self._stop_worker(worker)
+            worker = self._start_worker()
+        return result, worker
+
+    def run(self, realizations, ordered=True):
+        """
+        Stream realizations (dictionaries or workspace paths) to the
+        workers and yield the results, in the order of the realizations
+        when ordered is True and in the order they finish otherwise
+
+        """
+        if len(self.workers) < 1:
+            raise Exception('the ensemble runner is closed')
+        tasks = self._get_tasks(realizations)
+        idle = list(self.workers)
+        busy = {}
+        finished = {}
+        inext = 0
+        exhausted = False
+        try:
+            while True:
+                while len(idle) > 0 and not exhausted:
+                    task = next(tasks, None)
+                    if task is None:
+                        exhausted = True
+                        break
+                    worker = idle.pop()
+                    worker['conn'].send(task)
+                    busy[worker['conn']] = (worker, task)
+                if len(busy) < 1:
+                    break
+
+                sentinels = [worker['process'].sentinel
+                             for worker, task in busy.values()]
+                ready = multiprocessing.connection.wait(list(busy) +
+                                                        sentinels)
+                for conn, (worker, task) in list(busy.items()):
+                    if conn not in ready and \
+                            worker['process'].sentinel not in ready:
+                        continue
+                    del busy[conn]
+                    result, worker = self._receive(worker, task)
+                    idle.append(worker)
+                    if not ordered:
+                        yield result
+                        continue
+                    finished[result['index']] = result
+                    while inext in finished:
+                        yield finished.pop(inext)
+                        inext += 1
+        finally:
+            # wait for the realizations that are still running when the
+            # results are not consumed to the end
+            for worker, task in busy.values():
+                result, worker = self._receive(worker, task)
+                idle.append(worker)
+            self.workers = idle
+
+    def map(self, realizations):
+        """
+        Run all realizations and return a list with the results
+        """
+        return list(self.run(realizations))
@@ -0,0 +1,571 @@
+"""
+Incremental, parallel build of MODFLOW 6 from the Fortran module graph.
+
+The source files are scanned for the modules they define and use.  A file
+is compiled as soon as the files that define the modules it uses are
+compiled, so independent files are compiled at the same time on all
+cores.  The sha256 hash of every source file, the compiler command, and the
+hashes of the .mod files the file depends on are stored in a JSON cache in
+the object directory.  A file is only compiled again when its source, the
+compiler flags, or the interface (.mod file) of one of the modules it uses
+changed, so a change in the body of a routine only recompiles that file.
+
+    build = FortranBuild('mf6', ['../src'], objdir='obj_mf6',
+                         appdir='../bin')
+    returncode = build.build()
+
+    build = FortranBuild('libmf6', ['../srcbmi', '../src'],
+                         objdir='obj_libmf6', appdir='../bin',
+                         excludefiles=['../src/mf6.f90'], sharedobject=True)
+    returncode = build.build()
+
+mf6 and libmf6 can share the object files of the source tree when the
+files are compiled as position independent code (pic=True) in the same
+object directory.  The files of src/ are then compiled once for both
+targets and the libmf6 build only compiles the files in srcbmi/:
+
+    kwargs = {'objdir': 'obj_pic', 'appdir': '../bin', 'pic': True}
+    FortranBuild('mf6', ['../src'], **kwargs).build()
+    FortranBuild('libmf6', ['../srcbmi', '../src'], sharedobject=True,
+                 excludefiles=['../src/mf6.f90'], **kwargs).build()
+
+The flags are the pymake defaults for gfortran and Intel Fortran (ifort
+and mpiifort on Linux and macOS); is_supported() can be used to fall back
+to pymake for other compilers.
+
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import subprocess
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# change this number when the layout of the cache changes
+CACHE_VERSION = 1
+
+FORTRAN_EXTENSIONS = ('.f90', '.fpp', '.f', '.for', '.F90', '.F')
+PREPROCESS_EXTENSIONS = ('.fpp', '.F90', '.F')
+
+RE_MODULE = re.compile(r'^\s*module\s+(\w+)\s*(!.*)?$', re.IGNORECASE)
+RE_USE = re.compile(r'^\s*use\s*(?:,\s*(?:non_)?intrinsic\s*::)?\s*(?:::)?'
+                    r'\s*(\w+)', re.IGNORECASE)
+
+
+def get_osname():
+    osname = sys.platform.lower()
+    if osname == 'linux2':
+        osname = 'linux'
+    return osname
+
+
+def get_compiler_name(fc):
+    """
+    Compiler name without path and extension
+    """
+    return os.path.splitext(os.path.basename(fc))[0].lower()
+
+
+def is_supported(fc, osname=None):
+    """
+    Check if the build flags of a Fortran compiler are known
+    """
+    if osname is None:
+        osname = get_osname()
+    name = get_compiler_name(fc)
+    if name in ('gfortran', 'mpif90'):
+        return True
+    if name in ('ifort', 'mpiifort'):
+        return osname != 'win32'
+    return False
+
+
+def get_hash(fname):
+    """
+    sha256 hash of the content of a file
+    """
+    with open(fname, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def scan_source(fname):
+    """
+    Modules defined and used in a source file, and a flag indicating if
+    the file contains preprocessor directives
+
+    """
+    defines = []
+    uses = []
+    preprocess = fname.endswith(PREPROCESS_EXTENSIONS)
+    with open(fname, 'r') as f:
+        for line in f:
+            if line.startswith('#'):
+                preprocess = True
+                continue
+            m = RE_MODULE.match(line)
+            if m is not None:
+                name = m.group(1).lower()
+                if name != 'procedure' and name not in defines:
+                    defines.append(name)
+                continue
+            m = RE_USE.match(line)
+            if m is not None:
+                name = m.group(1).lower()
+                if name not in uses:
+                    uses.append(name)
+    return {'defines': defines, 'uses': uses, 'preprocess': preprocess}
+
+
+class FortranBuild(object):
+    """
+    Incremental build of a Fortran executable or shared object
+
+    Parameters
+    ----------
+    target : str
+        name of the executable or shared object, without extension
+    srcdirs : list
+        source directories, subdirectories are included
+    objdir : str
+        directory for the object files, module files, and build cache
+    appdir : str
+        directory for the target
+    fc : str
+        Fortran compiler
+    fflags : list or str
+        additional compiler flags
+    optlevel : str
+        optimization level
+    syslibs : list or str
+        additional linker flags
+    excludefiles : list
+        paths of the source files that are not compiled
+    sharedobject : bool
+        boolean indicating if a shared object is built
+    pic : bool
+        boolean indicating if position independent code is compiled, so
+        the object files can be linked into executables and shared objects;
+        the value of sharedobject is used if pic is None
+    double : bool
+        boolean indicating if default real variables are double precision,
+        the PYMAKE_DOUBLE environment variable is used if double is None
+    nproc : int
+        number of files that are compiled at the same time, the number of
+        cpus is used if nproc is None
+    verbose : bool
+        boolean indicating if the compiler commands are printed
+
+    """
+
+    def __init__(self, target, srcdirs, objdir, appdir='.', fc='gfortran',
+                 fflags=None, optlevel='-O2', syslibs=None, excludefiles=None,
+                 sharedobject=False, pic=None, double=None, nproc=None,
+                 verbose=False):
+        if isinstance(srcdirs, str):
+            srcdirs = [srcdirs]
+        if isinstance(fflags, str):
+            fflags = fflags.split()
+        if isinstance(syslibs, str):
+            syslibs = syslibs.split()
+        if excludefiles is None:
+            excludefiles = []
+        if pic is None:
+            pic = sharedobject
+        if double is None:
+            double = 'PYMAKE_DOUBLE' in os.environ
+        if nproc is None:
+            nproc = multiprocessing.cpu_count()
+        self.osname = get_osname()
+        self.srcdirs = [os.path.abspath(d) for d in srcdirs]
+        self.objdir = os.path.abspath(objdir)
+        self.moddir = os.path.join(self.objdir, 'mod')
+        self.appdir = os.path.abspath(appdir)
+        self.fc = fc
+        self.optlevel = optlevel
+        self.fflags = self.get_fortran_flags(fflags or [], pic, sharedobject,
+                                             double)
+        self.syslibs = self.get_linker_flags(syslibs or [], sharedobject)
+        self.excludefiles = [os.path.abspath(f) for f in excludefiles]
+        self.sharedobject = sharedobject
+        self.nproc = max(1, nproc)
+        self.verbose = verbose
+        self.cachefile = os.path.join(self.objdir, '.build_cache.json')
+
+        ext = ''
+        if sharedobject:
+            ext = {'win32': '.dll', 'darwin': '.dylib'}.get(self.osname, '.so')
+        elif self.osname == 'win32':
+            ext = '.exe'
+        if target.endswith(ext):
+            ext = ''
+        self.target = os.path.join(self.appdir, target + ext)
+
+        self.files = []
+        self.sources = {}
+        self.compiled = []
+        self.skipped = []
+
+    def get_fortran_flags(self, fflags, pic, sharedobject, double):
+        """
+        Compiler flags, the pymake defaults for the compiler followed by the
+        additional flags
+        """
+        name = get_compiler_name(self.fc)
+        flags = []
+        if name in ('gfortran', 'mpif90'):
+            if pic and self.osname != 'win32':
+                flags.append('-fPIC')
+            elif not pic and self.osname == 'win32':
+                flags.append('-static')
+            flags += ['-fbacktrace', '-ffpe-summary=overflow',
+                      '-ffpe-trap=overflow,zero,invalid']
+            if double:
+                flags += ['-fdefault-real-8', '-fdefault-double-8']
+            flags.append({'win32': '-D_WIN32',
+                          'darwin': '-D__APPLE__'}.get(self.osname,
+                                                       '-D__LINUX__'))
+        elif name in ('ifort', 'mpiifort'):
+            if pic:
+                flags.append('-fPIC')
+            flags += ['-no-heap-arrays', '-fpe0', '-traceback']
+            if double:
+                flags += ['-r8', '-autodouble']
+        for flag in fflags:
+            if flag not in flags:
+                flags.append(flag)
+        return flags
+
+    def get_linker_flags(self, syslibs, sharedobject):
+        name = get_compiler_name(self.fc)
+        flags = []
+        if sharedobject:
+            if name in ('ifort', 'mpiifort'):
+                flags.append('-static-intel')
+            flags.append('-dynamiclib' if self.osname == 'darwin'
+                         else '-shared')
+        elif self.osname == 'win32':
+            flags += ['-static', '-static-libgfortran', '-static-libgcc',
+                      '-static-libstdc++', '-lm']
+        else:
+            flags.append('-lc')
+        for flag in syslibs:
+            if flag not in flags:
+                flags.append(flag)
+        return flags
+
+    def get_source_files(self):
+        files = []
+        for srcdir in self.srcdirs:
+            for root, dirs, fnames in os.walk(srcdir):
+                dirs.sort()
+                for f in sorted(fnames):
+                    if not f.endswith(FORTRAN_EXTENSIONS):
+                        continue
+                    fpth = os.path.join(root, f)
+                    if os.path.abspath(fpth) in self.excludefiles:
+                        continue
+                    files.append(fpth)
+        return files
+
+    def get_object_name(self, fname):
+        return self.sources[fname]['object']
+
+    def read_cache(self):
+        if not os.path.isfile(self.cachefile):
+            return {}
+        try:
+            with open(self.cachefile, 'r') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cached.get('version') != CACHE_VERSION:
+            return {}
+        return cached
+
+    def write_cache(self, entries, links):
+        cached = {'version': CACHE_VERSION, 'files': entries, 'link': links}
+        tmp = '{}.{}'.format(self.cachefile, os.getpid())
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(cached, f, indent=1)
+            os.replace(tmp, self.cachefile)
+        except OSError:
+            if os.path.isfile(tmp):
+                os.remove(tmp)
+            print('could not write {}'.format(self.cachefile))
+        return
+
+    def scan(self, cached_files=None):
+        """
+        Scan the source files and build the module dependency graph, the
+        cached scan of a file is used when the hash of the file did not
+        change
+        """
+        if cached_files is None:
+            cached_files = {}
+        self.files = self.get_source_files()
+        self.sources = {}
+        roots = [os.path.splitext(os.path.basename(f))[0] for f in self.files]
+        for fpth in self.files:
+            key = os.path.abspath(fpth)
+            stat = os.stat(fpth)
+            entry = cached_files.get(key)
+            if entry is not None and entry['size'] == stat.st_size and \
+                    entry['mtime'] == stat.st_mtime_ns:
+                source = {'hash': entry['hash'], 'defines': entry['defines'],
+                          'uses': entry['uses'],
+                          'preprocess': entry['preprocess']}
+            else:
+                source = scan_source(fpth)
+                source['hash'] = get_hash(fpth)
+            source['size'] = stat.st_size
+            source['mtime'] = stat.st_mtime_ns
+            # source files with the same name in different directories get
+            # an object file name with a hash of the directory
+            root = os.path.splitext(os.path.basename(fpth))[0]
+            if roots.count(root) > 1:
+                root += '-' + hashlib.sha1(
+                    os.path.dirname(key).encode()).hexdigest()[:8]
+            source['object'] = os.path.join(self.objdir, root + '.o')
+            self.sources[key] = source
+        self.files = [os.path.abspath(f) for f in self.files]
+
+        # source file of every module defined in the source tree; other
+        # modules (intrinsic modules, mpi) are not part of the graph
+        self.modules = {}
+        for fpth, source in self.sources.items():
+            for module in source['defines']:
+                if module in self.modules:
+                    msg = 'module {} is defined in {} and {}'.format(
+                        module, self.modules[module], fpth)
+                    raise Exception(msg)
+                self.modules[module] = fpth
+        self.dependencies = {}
+        for fpth, source in self.sources.items():
+            deps = set()
+            for module in source['uses']:
+                upstream = self.modules.get(module)
+                if upstream is not None and upstream != fpth:
+                    deps.add(upstream)
+            self.dependencies[fpth] = deps
+        self.check_cycles()
+        return
+
+    def check_cycles(self):
+        state = {}
+        for start in self.files:
+            if start in state:
+                continue
+            stack = [(start, iter(self.dependencies[start]))]
+            state[start] = 1
+            while stack:
+                fpth, deps = stack[-1]
+                for dep in deps:
+                    if state.get(dep) == 1:
+                        msg = 'circular module dependency between ' + \
+                              '{} and {}'.format(os.path.basename(fpth),
+                                                 os.path.basename(dep))
+                        raise Exception(msg)
+                    if dep not in state:
+                        state[dep] = 1
+                        stack.append((dep, iter(self.dependencies[dep])))
+                        break
+                else:
+                    state[fpth] = 2
+                    stack.pop()
+        return
+
+    def get_mod_file(self, module):
+        return os.path.join(self.moddir, module + '.mod')
+
+    def get_compile_command(self, fpth):
+        source = self.sources[fpth]
+        cmd = [self.fc, self.optlevel] + self.fflags
+        if source['preprocess']:
+            name = get_compiler_name(self.fc)
+            cmd.append('-fpp' if name in ('ifort', 'mpiifort') else '-cpp')
+        cmd += ['-I{}'.format(self.moddir)]
+        if get_compiler_name(self.fc) in ('ifort', 'mpiifort'):
+            cmd += ['-module', self.moddir]
+        else:
+            cmd += ['-J{}'.format(self.moddir)]
+        cmd += ['-c', fpth, '-o', source['object']]
+        return cmd
+
+    def get_interface(self, fpth, modhashes):
+        """
+        Hashes of the interfaces of the modules used by a file
+        """
+        return dict([(module, modhashes.get(module))
+                     for module in self.sources[fpth]['uses']
+                     if module in self.modules])
+
+    def is_current(self, fpth, entry, cmd, modhashes):
+        """
+        Check if the object and module files of a source file are up to date
+        """
+        source = self.sources[fpth]
+        if entry is None or entry['hash'] != source['hash'] or \
+                entry['command'] != cmd:
+            return False
+        if not os.path.isfile(source['object']):
+            return False
+        for module in source['defines']:
+            if entry['mods'].get(module) is None or \
+                    not os.path.isfile(self.get_mod_file(module)):
+                return False
+        return entry['interface'] == self.get_interface(fpth, modhashes)
+
+    def compile(self, fpth, cmd):
+        if self.verbose:
+            print(' '.join(cmd))
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT,
+                              universal_newlines=True)
+        return proc.returncode, proc.stdout
+
+    def build(self):
+        """
+        Compile the source files that changed and link the target
+
+        Returns
+        -------
+        returncode : int
+            zero when the target was built successfully
+
+        """
+        t0 = time.time()
+        for pth in (self.objdir, self.moddir, self.appdir):
+            if not os.path.isdir(pth):
+                os.makedirs(pth)
+        cached = self.read_cache()
+        entries = cached.get('files', {})
+        self.scan(entries)
+
+        modhashes = {}
+        remaining = dict([(fpth, set(deps)) for fpth, deps in
+                          self.dependencies.items()])
+        dependents = dict([(fpth, []) for fpth in self.files])
+        for fpth, deps in self.dependencies.items():
+            for dep in deps:
+                dependents[dep].append(fpth)
+        ready = [fpth for fpth in self.files if len(remaining[fpth]) < 1]
+        self.compiled = []
+        self.skipped = []
+        failed = []
+        new_entries = {}
+
+        def finish(fpth, cmd):
+            source = self.sources[fpth]
+            mods = {}
+            for module in source['defines']:
+                mods[module] = get_hash(self.get_mod_file(module))
+            modhashes.update(mods)
+            entry = dict([(key, source[key]) for key in
+                          ('hash', 'size', 'mtime', 'defines', 'uses',
+                           'preprocess')])
+            entry['command'] = cmd
+            entry['mods'] = mods
+            entry['interface'] = self.get_interface(fpth, modhashes)
+            new_entries[fpth] = entry
+            for downstream in dependents[fpth]:
+                remaining[downstream].discard(fpth)
+                if len(remaining[downstream]) < 1:
+                    ready.append(downstream)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.nproc) as executor:
+            running = {}
+            while ready or running:
+                while ready and not failed:
+                    fpth = ready.pop(0)
+                    cmd = self.get_compile_command(fpth)
+                    if self.is_current(fpth, entries.get(fpth), cmd,
+                                       modhashes):
+                        modhashes.update(entries[fpth]['mods'])
+                        self.skipped.append(fpth)
+                        new_entries[fpth] = entries[fpth]
+                        for downstream in dependents[fpth]:
+                            remaining[downstream].discard(fpth)
+                            if len(remaining[downstream]) < 1:
+                                ready.append(downstream)
+                        continue
+                    future = executor.submit(self.compile, fpth, cmd)
+                    running[future] = (fpth, cmd)
+                if not running:
+                    break
+                done, pending = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    fpth, cmd = running.pop(future)
+                    returncode, output = future.result()
+                    if output.strip():
+                        print(output.rstrip())
+                    if returncode != 0:
+                        print('failed to compile {}'.format(fpth))
+                        failed.append(fpth)
+                        continue
+                    self.compiled.append(fpth)
+                    print('compiled {}'.format(os.path.relpath(fpth)))
+                    finish(fpth, cmd)
+
+        # keep the entries of the files that were not compiled because a
+        # file failed and of the files of other targets that share the
+        # object directory
+        for fpth, entry in entries.items():
+            if fpth not in new_entries:
+                new_entries[fpth] = entry
+        links = cached.get('link', {})
+        if failed:
+            links.pop(self.target, None)
+            self.write_cache(new_entries, links)
+            return 1
+
+        returncode = self.link(links, new_entries)
+        print('{} files compiled and {} files up to date '.format(
+            len(self.compiled), len(self.skipped)) +
+              'in {:.1f} seconds'.format(time.time() - t0))
+        return returncode
+
+    def link(self, links, entries):
+        objects = [self.get_object_name(fpth) for fpth in self.files]
+        cmd = [self.fc, self.optlevel] + self.fflags + ['-o', self.target] + \
+            objects + self.syslibs
+        # the target is linked again when an object file changed, also when
+        # it was compiled by the build of another target
+        mtimes = [os.stat(obj).st_mtime_ns for obj in objects]
+        link = {'command': cmd, 'mtime': max(mtimes + [0])}
+        if links.get(self.target) == link and os.path.isfile(self.target):
+            print('{} is up to date'.format(os.path.relpath(self.target)))
+            self.write_cache(entries, links)
+            return 0
+        if self.verbose:
+            print(' '.join(cmd))
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT,
+                              universal_newlines=True)
+        if proc.stdout.strip():
+            print(proc.stdout.rstrip())
+        if proc.returncode != 0:
+            print('failed to link {}'.format(self.target))
+            links.pop(self.target, None)
+        else:
+            print('linked {}'.format(os.path.relpath(self.target)))
+            links[self.target] = link
+        self.write_cache(entries, links)
+        return proc.returncode
+
+    def clean(self):
+        """
+        Remove the object directory and the target, the object directory
+        is shared by all targets that use it
+        """
+        if os.path.isdir(self.objdir):
+            shutil.rmtree(self.objdir)
+        if os.path.isfile(self.target):
+            os.remove(self.target)
+        return
@@ -16,6 +16,8 @@ except:
     msg += ' pip install flopy'
     raise Exception(msg)
 
+import input_cache
+
 
 def running_on_CI():
     return 'TRAVIS' in os.environ or 'CI' in os.environ
@@ -25,6 +27,14 @@ class testing_framework(object):
     def __init__(self):
         return
 
+    def build_mf6_models(self, build_function, exdirs):
+        """
+        Build the models of a test module, the input files are restored from
+        the input cache when the test module did not change.
+
+        """
+        input_cache.build(build_function, exdirs)
+
     def run_mf6(self, sim):
         """
         Run the MODFLOW 6 simulation and compare to existing head file or
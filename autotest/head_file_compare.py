@@ -0,0 +1,509 @@
+"""
+Vectorized comparison of MODFLOW binary head and concentration files.
+
+The binary files are memory mapped and the record headers are scanned once
+to build an index of the records for every time. The differences between
+two files are then calculated for blocks of times with NumPy reductions
+instead of reading and comparing the files record by record.
+
+compare_heads() is a replacement for pymake.compare_heads() that supports
+the arguments used by Simulation.compare() and writes a similar summary
+to outfile.
+
+"""
+
+import os
+import numpy as np
+
+try:
+    import flopy
+except:
+    msg = 'Error. FloPy package is not available.\n'
+    msg += 'Try installing using the following command:\n'
+    msg += ' pip install flopy'
+    raise Exception(msg)
+
+# header of a record in a structured (HEAD, DRAWDOWN, CONCENTRATION, ...)
+# or unstructured (HEADU) MODFLOW binary output file
+header_names = ['kstp', 'kper', 'pertim', 'totim', 'text',
+                'ncol', 'nrow', 'ilay']
+
+
+def get_header_dtype(precision):
+    if precision == 'double':
+        ftype = np.float64
+    else:
+        ftype = np.float32
+    return np.dtype([('kstp', np.int32),
+                     ('kper', np.int32),
+                     ('pertim', ftype),
+                     ('totim', ftype),
+                     ('text', 'S16'),
+                     ('ncol', np.int32),
+                     ('nrow', np.int32),
+                     ('ilay', np.int32)])
+
+
+def get_record_size(header):
+    """
+    Number of values in a record. For unstructured (HEADU) records the
+    ncol and nrow header fields contain the first and last node.
+
+    """
+    text = header['text'].decode(errors='replace').upper()
+    if 'HEADU' in text:
+        return int(header['nrow']) - int(header['ncol']) + 1
+    return int(header['ncol']) * int(header['nrow'])
+
+
+def _valid_header(header, nbytes):
+    text = header['text']
+    try:
+        text = text.decode('ascii')
+    except UnicodeDecodeError:
+        return False
+    if not text.strip() or not text.isprintable():
+        return False
+    if header['kstp'] < 1 or header['kper'] < 1:
+        return False
+    return 0 < get_record_size(header) <= nbytes
+
+
+class HeadFileIndex(object):
+    """
+    Index of the records in a MODFLOW binary head file
+
+    Parameters
+    ----------
+    fpth : str
+        path to the binary file
+    text : str
+        only records with text containing this string are indexed
+        (for example 'head' or 'concentration')
+    precision : str
+        'double', 'single', or 'auto'
+
+    """
+
+    def __init__(self, fpth, text=None, precision='auto'):
+        self.fpth = fpth
+        self.text = text
+        self.nbytes = os.path.getsize(fpth)
+        if precision == 'auto':
+            precision = self.get_precision()
+        self.precision = precision
+        self.hdtype = get_header_dtype(precision)
+        self.vdtype = self.hdtype['totim']
+        self.mm = np.memmap(fpth, dtype=np.uint8, mode='r')
+        self.build_index()
+
+    def get_precision(self):
+        """
+        Determine the precision of the file from the first record header
+
+        """
+        for precision in ('double', 'single'):
+            dt = get_header_dtype(precision)
+            if self.nbytes < dt.itemsize:
+                continue
+            header = np.fromfile(self.fpth, dtype=dt, count=1)[0]
+            if not _valid_header(header, self.nbytes):
+                continue
+            nval = get_record_size(header)
+            size = dt.itemsize + nval * dt['totim'].itemsize
+            if size <= self.nbytes:
+                return precision
+        msg = 'could not determine the precision of {}'.format(self.fpth)
+        raise ValueError(msg)
+
+    def build_index(self):
+        """
+        Scan the record headers once and store the offset and size of
+        the data for every record, grouped by time
+
+        """
+        hsize = self.hdtype.itemsize
+        vsize = self.vdtype.itemsize
+        records = []
+        pos = 0
+        while pos + hsize <= self.nbytes:
+            header = np.frombuffer(self.mm, dtype=self.hdtype, count=1,
+                                   offset=pos)[0]
+            nval = get_record_size(header)
+            pos += hsize
+            if pos + nval * vsize > self.nbytes:
+                msg = 'incomplete record at end of {}'.format(self.fpth)
+                raise ValueError(msg)
+            text = header['text'].decode().strip()
+            if self.text is None or self.text.upper() in text.upper():
+                records.append((int(header['kstp']), int(header['kper']),
+                                float(header['totim']), text,
+                                int(header['ilay']), pos, nval))
+            pos += nval * vsize
+        self.records = records
+
+        # group the records by time, in the order they are in the file
+        self.times = []
+        self.kstpkper = []
+        self.time_records = []
+        for record in records:
+            kstp, kper, totim = record[0:3]
+            if len(self.times) < 1 or totim != self.times[-1]:
+                self.times.append(totim)
+                self.kstpkper.append((kstp, kper))
+                self.time_records.append([])
+            self.time_records[-1].append(record)
+
+        # the size of the data for every time
+        self.ncells = [sum([r[6] for r in recs])
+                       for recs in self.time_records]
+
+        # determine if the data for all times can be viewed as a
+        # (ntimes, nrecords, nvalues) array without copying, which is the
+        # case when the records have the same size and are equally spaced
+        # in the file (a record for every layer of a DIS grid or a single
+        # record for DISV and DISU grids)
+        self.strides = None
+        if len(self.time_records) > 0:
+            nrec = set([len(recs) for recs in self.time_records])
+            nval = set([r[6] for r in self.records])
+            if len(nrec) == 1 and len(nval) == 1:
+                offsets = np.array([[r[5] for r in recs]
+                                    for recs in self.time_records])
+                rsize = nval.pop() * vsize + hsize
+                tstride = offsets.shape[1] * rsize
+                rstride = rsize
+                if offsets.shape[0] > 1:
+                    tstride = offsets[1, 0] - offsets[0, 0]
+                if offsets.shape[1] > 1:
+                    rstride = offsets[0, 1] - offsets[0, 0]
+                expected = offsets[0, 0] + \
+                           tstride * np.arange(offsets.shape[0])[:, None] + \
+                           rstride * np.arange(offsets.shape[1])[None, :]
+                if np.array_equal(offsets, expected):
+                    self.strides = (int(tstride), int(rstride), vsize)
+        return
+
+    def get_times(self):
+        return list(self.times)
+
+    def get_kstpkper(self):
+        return list(self.kstpkper)
+
+    def get_block(self, i0, i1):
+        """
+        Get the data for times i0 to i1 (exclusive) as a (ntimes, ncells)
+        array. The result is a memory mapped view when the file layout
+        allows it and a copy otherwise.
+
+        """
+        if self.strides is not None:
+            recs = self.time_records[i0]
+            shape = (i1 - i0, len(recs), recs[0][6])
+            arr = np.ndarray(shape=shape, dtype=self.vdtype, buffer=self.mm,
+                             offset=recs[0][5], strides=self.strides)
+            if shape[1] == 1:
+                return arr[:, 0, :]
+            return arr.reshape(shape[0], shape[1] * shape[2])
+        ncells = self.ncells[i0]
+        arr = np.empty((i1 - i0, ncells), dtype=np.float64)
+        for idx in range(i0, i1):
+            if self.ncells[idx] != ncells:
+                msg = 'number of cells changes with time in {}'.format(
+                    self.fpth)
+                raise ValueError(msg)
+            arr[idx - i0] = self.get_data(idx)
+        return arr
+
+    def get_data(self, idx):
+        """
+        Get the data for time idx as a one-dimensional array
+
+        """
+        recs = self.time_records[idx]
+        if len(recs) == 1:
+            r = recs[0]
+            return np.frombuffer(self.mm, dtype=self.vdtype, count=r[6],
+                                 offset=r[5])
+        return np.concatenate([np.frombuffer(self.mm, dtype=self.vdtype,
+                                             count=r[6], offset=r[5])
+                               for r in recs])
+
+
+def read_exclusion_file(exfile):
+    """
+    Read an exclusion file and return a boolean array that is True for the
+    excluded cells (non-zero values in the exclusion file)
+
+    """
+    exd = np.genfromtxt(exfile).flatten()
+    return exd > 0
+
+
+def get_namefile_head_file(namefile, text='head'):
+    """
+    Find the head (or drawdown) file written by a MODFLOW-2005 type model
+    using the output control file listed in the name file
+
+    """
+    pth = os.path.dirname(namefile)
+    entries = []
+    with open(namefile, 'r') as f:
+        for line in f:
+            ll = line.strip().split()
+            if len(ll) < 3 or ll[0].startswith('#'):
+                continue
+            entries.append((ll[0].upper(), abs(int(ll[1])), ll[2]))
+    ocfile = None
+    for ftype, unit, fname in entries:
+        if ftype == 'OC':
+            ocfile = os.path.join(pth, fname)
+            break
+    if ocfile is None:
+        return None
+    hu, hfpth, du, dfpth = flopy.modflow.ModflowOc.get_ocoutput_units(ocfile)
+    iu = hu
+    if text.lower() == 'drawdown':
+        iu = du
+    if iu == 0:
+        return None
+    for ftype, unit, fname in entries:
+        if unit == abs(iu):
+            return os.path.join(pth, fname)
+    return None
+
+
+def compare_heads(namefile1, namefile2, precision='auto', text='head',
+                  text2=None, htol=0.001, outfile=None, files1=None,
+                  files2=None, difftol=False, verbose=False, exfile=None,
+                  exarr=None, maxerr=None, block_size=2 ** 24):
+    """
+    Compare the head (or concentration) results from two simulations
+
+    Parameters
+    ----------
+    namefile1, namefile2 : str
+        name files used to find the files to compare if files1 or files2
+        are not specified
+    precision : str
+        precision of the binary files ('auto', 'single', or 'double')
+    text : str
+        text identifying the records to compare in the first file
+    text2 : str
+        text identifying the records to compare in the second file
+    htol : float
+        maximum allowed absolute difference
+    outfile : str
+        path of the comparison summary
+    files1, files2 : str or list
+        the files to compare
+    difftol : bool
+        write the tolerance to the summary for times exceeding htol
+    verbose : bool
+        write the cells exceeding htol to the summary
+    exfile : str
+        file with an exclusion array, cells with a non-zero value are
+        excluded from the comparison
+    exarr : numpy.ndarray
+        exclusion array, cells with a non-zero value are excluded
+    maxerr : int
+        maximum number of cells exceeding htol to write for each time
+    block_size : int
+        maximum number of values that are compared at once
+
+    Returns
+    -------
+    success : bool
+
+    """
+    if text2 is None:
+        text2 = text
+
+    hfpth1 = _get_file(namefile1, files1, text)
+    hfpth2 = _get_file(namefile2, files2, text2)
+
+    # nothing to compare
+    if hfpth1 is None or hfpth2 is None:
+        print('spth1 or spth2 is None')
+        print('spth1: {}'.format(hfpth1))
+        print('spth2: {}'.format(hfpth2))
+        return True
+
+    if not os.path.isfile(hfpth1) or not os.path.isfile(hfpth2):
+        print('spth1 or spth2 is not a file')
+        print('spth1 isfile: {}'.format(os.path.isfile(hfpth1)))
+        print('spth2 isfile: {}'.format(os.path.isfile(hfpth2)))
+        return False
+
+    f = None
+    if outfile is not None:
+        f = open(outfile, 'w')
+        f.write('Created by head_file_compare.compare_heads\n')
+        f.write('Performing {} to {} comparison\n'.format(text.upper(),
+                                                          text2.upper()))
+        if exfile is not None:
+            f.write('Using exclusion file {}\n'.format(exfile))
+        if exarr is not None:
+            f.write('Using exclusion array\n')
+        f.write('{} is a binary file.\n'.format(hfpth1))
+        f.write('{} is a binary file.\n'.format(hfpth2))
+
+    success, msg = _compare(hfpth1, hfpth2, precision, text, text2, htol,
+                            f, difftol, verbose, exfile, exarr, maxerr,
+                            block_size)
+
+    if f is not None:
+        if msg is not None:
+            f.write('\n{}\n'.format(msg))
+        f.close()
+    if msg is not None:
+        print(msg)
+    return success
+
+
+def _get_file(namefile, files, text):
+    if files is None:
+        if namefile is None:
+            return None
+        return get_namefile_head_file(namefile, text=text)
+    if isinstance(files, str):
+        return files
+    exts = {'head': ('hds', 'hed', 'bhd', 'ahd'),
+            'drawdown': ('ddn',),
+            'concentration': ('ucn',)}
+    for file in files:
+        if file is None:
+            continue
+        ext = exts.get(text.lower())
+        if ext is None:
+            return file
+        if any([e in os.path.basename(file).lower() for e in ext]):
+            return file
+    return None
+
+
+def _compare(hfpth1, hfpth2, precision, text, text2, htol, f, difftol,
+             verbose, exfile, exarr, maxerr, block_size):
+    # exclusion data
+    exclude = None
+    if exfile is not None:
+        if not isinstance(exfile, str):
+            return False, 'exfile is not a valid file path'
+        try:
+            exclude = read_exclusion_file(exfile)
+        except:
+            msg = 'Could not read exclusion file {}'.format(
+                os.path.basename(exfile))
+            return False, msg
+    if exarr is not None:
+        ex = np.asarray(exarr).flatten() > 0
+        if exclude is None:
+            exclude = ex
+        else:
+            exclude = exclude | ex
+
+    if precision not in ('single', 'double'):
+        precision = 'auto'
+    idx1 = HeadFileIndex(hfpth1, text=text, precision=precision)
+    idx2 = HeadFileIndex(hfpth2, text=text2, precision=precision)
+
+    times1 = idx1.get_times()
+    times2 = idx2.get_times()
+    ntimes = min(len(times1), len(times2))
+    if ntimes > 0:
+        t1 = np.array(times1[:ntimes])
+        t2 = np.array(times2[:ntimes])
+        close = np.isclose(t1, t2)
+        if not np.all(close):
+            i = int(np.argmin(close))
+            msg = 'times in two head files are not equal ' + \
+                  '({},{})'.format(t1[i], t2[i])
+            return False, msg
+
+    if verbose:
+        print('Comparing results for {} times'.format(ntimes))
+
+    line_separator = 15 * '-'
+    header = '{:>15s} {:>15s} {:>15s} {:>15s} {:>15s}\n'.format(
+        ' ', ' ', 'MAXIMUM', 'MAXIMUM', 'EXCEEDS')
+    header += '{:>15s} {:>15s} {:>15s} {:>15s} {:>15s}\n'.format(
+        'STRESS PERIOD', 'TIME STEP', 'ABS DIFFERENCE', 'REL DIFFERENCE',
+        'CRITERIA')
+    header += '{0:>15s} {0:>15s} {0:>15s} {0:>15s} {0:>15s}\n'.format(
+        line_separator)
+    if f is not None:
+        f.write(header)
+
+    kstpkper = idx1.get_kstpkper()
+    icnt = 0
+    i0 = 0
+    while i0 < ntimes:
+        # number of times in this block
+        ncells = max(idx1.ncells[i0], 1)
+        i1 = min(ntimes, i0 + max(1, block_size // ncells))
+        i1 = _uniform_block(idx1, i0, i1)
+        i1 = _uniform_block(idx2, i0, i1)
+
+        h1 = idx1.get_block(i0, i1)
+        h2 = idx2.get_block(i0, i1)
+        if h1.shape != h2.shape:
+            msg = 'number of cells in the two head files are not ' + \
+                  'equal ({},{})'.format(h1.shape[1], h2.shape[1])
+            return False, msg
+
+        diff = np.abs(h1 - h2)
+        if exclude is not None:
+            if exclude.shape[0] != diff.shape[1]:
+                msg = 'exclusion array size ({}) '.format(exclude.shape[0]) + \
+                      'is not equal to the number of cells ' + \
+                      '({})'.format(diff.shape[1])
+                return False, msg
+            diff[:, exclude] = 0.
+        denom = np.maximum(np.abs(h1), np.abs(h2))
+        rdiff = np.divide(diff, denom, out=np.zeros_like(diff),
+                          where=denom > 0.)
+        diffmax = diff.max(axis=1)
+        rdiffmax = rdiff.max(axis=1)
+
+        for idx in np.nonzero(diffmax >= htol)[0]:
+            icnt += 1
+            if f is None:
+                continue
+            kstp, kper = kstpkper[i0 + idx]
+            if difftol:
+                ee = '{:15.7g} >= {:15.7g}'.format(diffmax[idx], htol)
+            else:
+                ee = '{:>15s}'.format('*')
+            f.write('{:15d} {:15d} {:15.6g} {:15.6g} {}\n'.format(
+                kper, kstp, diffmax[idx], rdiffmax[idx], ee))
+            if verbose:
+                nodes = np.nonzero(diff[idx] >= htol)[0]
+                if maxerr is not None:
+                    nodes = nodes[:maxerr]
+                f.write('{:>15s} {:>15s} {:>15s} {:>15s}\n'.format(
+                    'NODE', 'VALUE 1', 'VALUE 2', 'DIFFERENCE'))
+                for node in nodes:
+                    f.write('{:15d} {:15.7g} {:15.7g} {:15.7g}\n'.format(
+                        node + 1, h1[idx, node], h2[idx, node],
+                        diff[idx, node]))
+        i0 = i1
+
+    if f is not None:
+        f.write('\n{} times compared\n'.format(ntimes))
+        if icnt > 0:
+            f.write('{} times exceed the maximum difference '.format(icnt) +
+                    '({})\n'.format(htol))
+
+    return icnt == 0, None
+
+
+def _uniform_block(index, i0, i1):
+    """
+    Limit a block of times to times with the same number of cells
+
+    """
+    ncells = index.ncells[i0]
+    for idx in range(i0 + 1, i1):
+        if index.ncells[idx] != ncells:
+            return idx
+    return i1
@@ -0,0 +1,365 @@
+"""
+Change-impact selection of the MODFLOW 6 autotests.
+
+The files that changed relative to a git revision are mapped to the
+autotest modules that can be affected by the change:
+
+    src/*.f90     the module dependency graph of fortran_build.py is followed
+                  from the changed file to the files that use its modules,
+                  directly or indirectly, until a file that implements a
+                  package type is found (gwf3sfr8.f90 is SFR6, gwf3.f90 is
+                  GWF6).  The test modules that use any of these package
+                  types are selected with the package index in
+                  testmodels.py.
+    srcbmi/*.f90  the libmf6 test modules are selected.
+    dfn files     the test modules that use the package type of the dfn
+                  file are selected.
+    test_*.py     the test module is selected.
+
+Changes that cannot be mapped to package types (for example mf6core.f90, a
+helper module in the autotest directory, or a new source file) select the
+fallback tests.  The fallback is a small smoke set by default, it can also
+be all test modules ('all') or nothing ('none').  Other files (documentation,
+make files) do not select any tests.  The smoke set and the fallback can be
+set in the [impact] section of testmodels.cfg:
+
+    [impact]
+    fallback = smoke
+    smoke = test_gwf_chd01.py test_gwt_adv01.py
+
+Run from the autotest directory:
+
+    python impact.py
+    python impact.py --base develop
+    python impact.py --files ../src/Model/GroundWaterFlow/gwf3sfr8.f90
+    python impact.py --base develop --fallback all --run -n 8
+
+Without --base the changes in the working tree relative to HEAD are used.
+With --run the selected test modules are run with scheduler.py.
+
+"""
+
+import os
+import re
+import sys
+import subprocess
+import configparser
+
+import testmodels
+from fortran_build import FortranBuild, FORTRAN_EXTENSIONS
+
+autotest_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(autotest_dir)
+
+sfmt = '{:25s} - {}'
+
+fallbacks = ('smoke', 'all', 'none')
+
+# fast test modules that exercise the common code paths
+smoke_tests = ('test_gwf_chd01.py',
+               'test_gwf_npf01_75x75.py',
+               'test_gwf_sto01.py',
+               'test_gwf_disu01.py',
+               'test_gwf_maw01.py',
+               'test_gwt_adv01.py',
+               'test_gwt_dsp01.py',
+               'test_gwf_libmf6_rch01.py')
+
+# source files that are not named after their package type, None if the
+# file is shared by several package types
+source_ftypes = {'gwf3': 'GWF6',
+                 'gwt1': 'GWT6',
+                 'gwt1apt1': None,
+                 'gwfgwfexchange': 'GWF6-GWF6',
+                 'gwfgwtexchange': 'GWF6-GWT6',
+                 'numericalsolution': 'IMS6',
+                 'ims8linear': 'IMS6',
+                 'ims8reordering': 'IMS6',
+                 'tdis': 'TDIS6'}
+
+# package source files, gwf3sfr8 or gwt1adv1
+RE_PACKAGE = re.compile(r'^gw[ft]\d+([a-z]+?)\d*$')
+
+# dfn files that are not named after their package type
+dfn_ftypes = {'common': None,
+              'sim-nam': None,
+              'gwf-nam': 'GWF6',
+              'gwt-nam': 'GWT6',
+              'exg-gwfgwf': 'GWF6-GWF6',
+              'exg-gwfgwt': 'GWF6-GWT6',
+              'sln-ims': 'IMS6',
+              'sim-tdis': 'TDIS6'}
+
+
+def get_config():
+    """
+    Fallback and smoke set in the [impact] section of testmodels.cfg
+
+    """
+    fallback = 'smoke'
+    smoke = list(smoke_tests)
+    fpth = testmodels.config_file
+    if os.path.isfile(fpth):
+        config = configparser.ConfigParser()
+        try:
+            config.read(fpth)
+        except configparser.Error:
+            print('could not read {}'.format(fpth))
+            return fallback, smoke
+        if config.has_section('impact'):
+            fallback = config.get('impact', 'fallback', fallback=fallback)
+            if config.has_option('impact', 'smoke'):
+                smoke = config.get('impact', 'smoke').split()
+    return fallback, smoke
+
+
+def git(*args):
+    proc = subprocess.Popen(('git',) + args, cwd=root_dir,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stdout, stderr = proc.communicate()
+    if proc.returncode != 0:
+        msg = 'git {} failed:\n{}'.format(' '.join(args),
+                                          stderr.decode().strip())
+        raise Exception(msg)
+    return [line for line in stdout.decode().splitlines()
+            if len(line.strip()) > 0]
+
+
+def get_changed_files(base=None):
+    """
+    Paths (relative to the repository root) of the files that changed in
+    the working tree relative to HEAD, or relative to the merge base with
+    the base revision
+
+    """
+    if base is None:
+        rev = 'HEAD'
+    else:
+        rev = git('merge-base', 'HEAD', base)[0]
+    files = git('diff', '--name-only', rev)
+    for f in git('ls-files', '--others', '--exclude-standard'):
+        if f not in files:
+            files.append(f)
+    return files
+
+
+def get_source_ftype(fpth):
+    """
+    Package type implemented by a source file, None if the source file
+    does not implement a package type
+
+    """
+    name = os.path.splitext(os.path.basename(fpth))[0].lower()
+    if name in source_ftypes:
+        return source_ftypes[name]
+    m = RE_PACKAGE.match(name)
+    if m is not None:
+        return m.group(1).upper() + '6'
+    return None
+
+
+def get_dfn_ftype(fpth):
+    name = os.path.splitext(os.path.basename(fpth))[0].lower()
+    if name in dfn_ftypes:
+        return dfn_ftypes[name]
+    return name.split('-')[-1].upper() + '6'
+
+
+def get_build():
+    """
+    Module dependency graph of the MODFLOW 6 and libmf6 source files, the
+    scan in the build cache of test000_setup.py is reused
+
+    """
+    srcdirs = [os.path.join(root_dir, 'src'), os.path.join(root_dir,
+                                                           'srcbmi')]
+    objdir = os.path.join(root_dir, 'obj_temp', 'pic')
+    build = FortranBuild('libmf6', srcdirs, objdir)
+    build.scan(build.read_cache().get('files'))
+    return build
+
+
+class Impact(object):
+    """
+    Test modules affected by a list of changed files
+
+    Parameters
+    ----------
+    files : list
+        changed files, relative to the repository root
+    fallback : str
+        tests that are selected for changes that cannot be mapped to
+        package types: 'smoke', 'all', or 'none'
+    smoke : list
+        test modules of the smoke set
+
+    """
+
+    def __init__(self, files, fallback=None, smoke=None):
+        config_fallback, config_smoke = get_config()
+        if fallback is None:
+            fallback = config_fallback
+        if smoke is None:
+            smoke = config_smoke
+        if fallback not in fallbacks:
+            msg = 'fallback must be one of {}'.format(', '.join(fallbacks))
+            raise ValueError(msg)
+        self.files = files
+        self.fallback = fallback
+        self.smoke = [os.path.splitext(f)[0] for f in smoke]
+        self.ftypes = set()
+        self.modules = set()
+        self.libmf6 = False
+        self.unmapped = []
+        self.ignored = []
+        self.build = None
+        self.evaluate()
+
+    def get_users(self):
+        """
+        Source files that use a module of every source file
+
+        """
+        users = {}
+        for fpth, deps in self.build.dependencies.items():
+            for dep in deps:
+                users.setdefault(dep, set()).add(fpth)
+        return users
+
+    def get_affected_ftypes(self, fpth, users):
+        """
+        Package types of the source files that depend on fpth, the graph is
+        not followed past a source file that implements a package type
+
+        """
+        srcbmi = os.path.join(root_dir, 'srcbmi')
+        found = set()
+        visited = set([fpth])
+        queue = [fpth]
+        while len(queue) > 0:
+            f = queue.pop()
+            ftype = get_source_ftype(f)
+            if ftype is not None:
+                found.add(ftype)
+                continue
+            for user in users.get(f, []):
+                if user in visited or user.startswith(srcbmi):
+                    continue
+                visited.add(user)
+                queue.append(user)
+        return found
+
+    def evaluate(self):
+        fortran = []
+        for f in self.files:
+            parts = f.replace('\\', '/').split('/')
+            name = parts[-1]
+            if parts[0] in ('src', 'srcbmi') and \
+                    name.endswith(FORTRAN_EXTENSIONS):
+                if parts[0] == 'srcbmi':
+                    self.libmf6 = True
+                else:
+                    fortran.append(os.path.join(root_dir, *parts))
+            elif parts[0] == 'autotest' and len(parts) == 2 and \
+                    name.endswith('.py'):
+                if name.startswith('test'):
+                    self.modules.add(os.path.splitext(name)[0])
+                else:
+                    self.unmapped.append(f)
+            elif parts[:3] == ['doc', 'mf6io', 'mf6ivar'] and \
+                    name.endswith('.dfn'):
+                ftype = get_dfn_ftype(name)
+                if ftype is None:
+                    self.unmapped.append(f)
+                else:
+                    self.ftypes.add(ftype)
+            else:
+                self.ignored.append(f)
+
+        if len(fortran) > 0:
+            self.build = get_build()
+            users = self.get_users()
+            for fpth in fortran:
+                found = set()
+                if fpth in self.build.sources:
+                    found = self.get_affected_ftypes(fpth, users)
+                if len(found) > 0:
+                    self.ftypes |= found
+                else:
+                    self.unmapped.append(os.path.relpath(fpth, root_dir))
+        return
+
+    def get_modules(self):
+        """
+        Sorted list of the affected test modules (file names)
+
+        """
+        index = testmodels.ModuleIndex(autotest_dir)
+        available = index.get_modules()
+        modules = set([m for m in self.modules if m in available])
+        if len(self.ftypes) > 0:
+            modules |= set(index.query(available, sorted(self.ftypes)))
+        if self.libmf6:
+            modules |= set([m for m in available if 'libmf6' in m])
+        if len(self.unmapped) > 0:
+            if self.fallback == 'all':
+                modules |= set(available)
+            elif self.fallback == 'smoke':
+                modules |= set([m for m in self.smoke if m in available])
+        return [m + '.py' for m in sorted(modules)]
+
+    def write_summary(self, modules):
+        print(sfmt.format('Changed files', len(self.files)))
+        if len(self.ftypes) > 0:
+            print(sfmt.format('Affected packages',
+                              ' '.join(sorted(self.ftypes))))
+        if self.libmf6:
+            print(sfmt.format('Affected packages', 'libmf6'))
+        for f in self.unmapped:
+            print(sfmt.format('Not localized', f))
+        if len(self.unmapped) > 0:
+            print(sfmt.format('Fallback', self.fallback))
+        for f in self.ignored:
+            print(sfmt.format('No tests', f))
+        print(sfmt.format('Selected test modules', len(modules)))
+        for m in modules:
+            print('    {}'.format(m))
+        return
+
+
+def main():
+    base = None
+    files = None
+    fallback = None
+    nproc = None
+    run = False
+    for idx, arg in enumerate(sys.argv):
+        if arg == '--base':
+            base = sys.argv[idx + 1]
+        elif arg == '--fallback':
+            fallback = sys.argv[idx + 1]
+        elif arg in ('-n', '--nproc'):
+            nproc = int(sys.argv[idx + 1])
+        elif arg == '--run':
+            run = True
+        elif arg == '--files':
+            files = []
+            for item in sys.argv[idx + 1:]:
+                if item.startswith('--'):
+                    break
+                files.append(os.path.relpath(os.path.abspath(item),
+                                             root_dir))
+    if files is None:
+        files = get_changed_files(base)
+
+    impact = Impact(files, fallback=fallback)
+    modules = impact.get_modules()
+    impact.write_summary(modules)
+    if run and len(modules) > 0:
+        import scheduler
+        return scheduler.run_scheduler(files=modules, nproc=nproc)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+"""
+Content-addressed cache of the model input files written by the autotests.
+
+The build_models() function of a test module creates the flopy simulations
+and writes the input files of every test directory (exdirs).  The written
+input files are stored in a cache directory under a key that is the sha256
+hash of
+
+    - the source of the test module and of the local modules it imports
+      (directly or through other local modules) from its directory,
+    - the flopy version,
+    - the hashes of the dfn files in the compiled dfn cache
+      (doc/mf6io/mf6ivar/.dfn_cache.json), and
+    - the test directories.
+
+On the next run build_models() is not called when an entry for the key
+exists; the input files are hard linked (or copied when a hard link is not
+possible) from the cache into the test directories instead.  The size and
+modification time of every cached file is checked before an entry is
+restored, so an entry that was modified through a hard link is built
+again.  Only the most recent entry of a test module is kept.
+
+    test = testing_framework()
+    test.build_mf6_models(build_models, exdirs)
+
+The location of the cache can be changed with the MF6_INPUT_CACHE
+environment variable, the cache is not used when MF6_NO_INPUT_CACHE is set.
+Run this script to remove all cached input files:
+
+    python input_cache.py --clean
+
+"""
+
+import os
+import sys
+import ast
+import json
+import shutil
+import inspect
+import hashlib
+
+try:
+    import flopy
+except:
+    msg = 'Error. FloPy package is not available.\n'
+    msg += 'Try installing using the following command:\n'
+    msg += ' pip install flopy'
+    raise Exception(msg)
+
+# change this number when the layout of the cache changes
+CACHE_VERSION = 1
+
+autotest_dir = os.path.dirname(os.path.abspath(__file__))
+dfn_dir = os.path.join(os.path.dirname(autotest_dir), 'doc', 'mf6io',
+                       'mf6ivar')
+
+cache_dir = os.environ.get('MF6_INPUT_CACHE',
+                           os.path.join(autotest_dir, '.input_cache'))
+
+manifest_name = 'manifest.json'
+
+# hash of the dfn files, computed once per process
+_dfn_hash = []
+
+
+def is_enabled():
+    return 'MF6_NO_INPUT_CACHE' not in os.environ
+
+
+def get_dfn_hash():
+    """
+    Hash of the hashes of all dfn files in the compiled dfn cache, None if
+    the dfn files are not available
+
+    """
+    if len(_dfn_hash) < 1:
+        value = None
+        if os.path.isdir(os.path.join(dfn_dir, 'dfn')):
+            if dfn_dir not in sys.path:
+                sys.path.append(dfn_dir)
+            import dfn_cache
+            dfns = dfn_cache.DfnCache()
+            h = hashlib.sha256()
+            for name in dfns.get_names():
+                h.update('{} {}\n'.format(name,
+                                          dfns.get_hash(name)).encode())
+            value = h.hexdigest()
+        _dfn_hash.append(value)
+    return _dfn_hash[0]
+
+
+def get_imports(fpth):
+    """
+    Names of the modules imported by the python file fpth
+
+    """
+    with open(fpth, 'rb') as f:
+        tree = ast.parse(f.read(), filename=fpth)
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and \
+                node.module is not None:
+            names.append(node.module)
+    return [name.split('.')[0] for name in names]
+
+
+def get_local_modules(fpth):
+    """
+    Paths of the python file fpth and of all modules in the same directory
+    that it imports, directly or through other modules in the directory
+
+    """
+    pth = os.path.dirname(os.path.abspath(fpth))
+    modules = [os.path.abspath(fpth)]
+    idx = 0
+    while idx < len(modules):
+        for name in get_imports(modules[idx]):
+            module = os.path.join(pth, name + '.py')
+            if module not in modules and os.path.isfile(module):
+                modules.append(module)
+        idx += 1
+    return modules
+
+
+def get_key(fpth, exdirs):
+    """
+    Cache key of the input files written by the test module fpth in
+    exdirs
+
+    """
+    h = hashlib.sha256()
+    for module in get_local_modules(fpth):
+        with open(module, 'rb') as f:
+            h.update('module {}\n'.format(os.path.basename(module)).encode())
+            h.update(f.read())
+    h.update('flopy {}\n'.format(flopy.__version__).encode())
+    h.update('dfn {}\n'.format(get_dfn_hash()).encode())
+    for d in exdirs:
+        h.update('exdir {}\n'.format(os.path.normpath(d)).encode())
+    h.update('version {}\n'.format(CACHE_VERSION).encode())
+    return h.hexdigest()
+
+
+def get_files(pth):
+    """
+    Relative paths of the files in a directory tree
+
+    """
+    files = []
+    for root, dirs, fnames in os.walk(pth):
+        dirs.sort()
+        for f in sorted(fnames):
+            files.append(os.path.relpath(os.path.join(root, f), pth))
+    return files
+
+
+def get_stamp(fpth):
+    stat = os.stat(fpth)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def link_or_copy(src, dst):
+    """
+    Hard link src to dst, copy the file if a hard link is not possible
+
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return
+
+
+def remove_dir(pth):
+    if os.path.isdir(pth):
+        shutil.rmtree(pth, ignore_errors=True)
+    return
+
+
+class InputCache(object):
+    """
+    Cached input files of a test module
+
+    Parameters
+    ----------
+    name : str
+        name of the test module
+    key : str
+        cache key from get_key()
+    exdirs : list
+        test directories written by the build function
+
+    """
+
+    def __init__(self, name, key, exdirs, cachedir=None):
+        if cachedir is None:
+            cachedir = cache_dir
+        self.name = name
+        self.key = key
+        self.exdirs = list(exdirs)
+        self.moddir = os.path.join(cachedir, name)
+        self.entry = os.path.join(self.moddir, key)
+
+    def load_manifest(self):
+        fpth = os.path.join(self.entry, manifest_name)
+        if not os.path.isfile(fpth):
+            return None
+        try:
+            with open(fpth, 'r') as f:
+                manifest = json.load(f)
+        except (ValueError, OSError):
+            return None
+        if manifest.get('version') != CACHE_VERSION:
+            return None
+        return manifest
+
+    def is_valid(self, manifest):
+        """
+        Determine if the cached files were not modified after they were
+        stored
+
+        """
+        for idx, files in enumerate(manifest['files']):
+            base = os.path.join(self.entry, str(idx))
+            for f, stamp in files.items():
+                try:
+                    if get_stamp(os.path.join(base, f)) != stamp:
+                        return False
+                except OSError:
+                    return False
+        return True
+
+    def restore(self):
+        """
+        Restore the input files of all test directories, returns False if
+        there is no valid entry
+
+        """
+        manifest = self.load_manifest()
+        if manifest is None or len(manifest['files']) != len(self.exdirs):
+            return False
+        if not self.is_valid(manifest):
+            print('cached input files of {} were modified'.format(self.name))
+            remove_dir(self.entry)
+            return False
+        for idx, dst in enumerate(self.exdirs):
+            base = os.path.join(self.entry, str(idx))
+            remove_dir(dst)
+            os.makedirs(dst)
+            for f in sorted(manifest['files'][idx]):
+                fpth = os.path.join(dst, f)
+                d = os.path.dirname(fpth)
+                if not os.path.isdir(d):
+                    os.makedirs(d)
+                link_or_copy(os.path.join(base, f), fpth)
+        return True
+
+    def store(self):
+        """
+        Store the input files of all test directories and remove the older
+        entries of the test module
+
+        """
+        tmp = '{}.{}'.format(self.entry, os.getpid())
+        remove_dir(tmp)
+        files = []
+        try:
+            for idx, src in enumerate(self.exdirs):
+                base = os.path.join(tmp, str(idx))
+                os.makedirs(base)
+                stamps = {}
+                if os.path.isdir(src):
+                    for f in get_files(src):
+                        fpth = os.path.join(base, f)
+                        d = os.path.dirname(fpth)
+                        if not os.path.isdir(d):
+                            os.makedirs(d)
+                        shutil.copy2(os.path.join(src, f), fpth)
+                        stamps[f] = get_stamp(fpth)
+                files.append(stamps)
+            manifest = {'version': CACHE_VERSION, 'module': self.name,
+                        'exdirs': self.exdirs, 'files': files}
+            with open(os.path.join(tmp, manifest_name), 'w') as f:
+                json.dump(manifest, f, indent=1)
+
+            # another process may have stored the same entry
+            remove_dir(self.entry)
+            os.replace(tmp, self.entry)
+        except OSError:
+            remove_dir(tmp)
+            print('could not store the input files of {}'.format(self.name))
+            return False
+
+        for d in os.listdir(self.moddir):
+            if d != self.key and '.' not in d:
+                remove_dir(os.path.join(self.moddir, d))
+        return True
+
+
+def build(build_function, exdirs, module=None):
+    """
+    Call build_function() to write the input files in exdirs, or restore
+    them from the cache if the test module did not change
+
+    Parameters
+    ----------
+    build_function : function
+        function without arguments that writes the input files of all
+        test directories
+    exdirs : list
+        test directories written by build_function
+    module : str
+        path to the test module, the file that defines build_function is
+        used if module is None
+
+    Returns
+    -------
+    restored : bool
+        boolean indicating if the input files were restored from the cache
+
+    """
+    if not is_enabled():
+        build_function()
+        return False
+    if module is None:
+        module = inspect.getsourcefile(build_function)
+    name = os.path.splitext(os.path.basename(module))[0]
+    cache = InputCache(name, get_key(module, exdirs), exdirs)
+    if cache.restore():
+        print('restored the input files of {} from {}'.format(name,
+                                                              cache.entry))
+        return True
+    build_function()
+    cache.store()
+    return False
+
+
+def main():
+    if '--clean' in sys.argv:
+        print('removing {}'.format(cache_dir))
+        remove_dir(cache_dir)
+        return 0
+    if not os.path.isdir(cache_dir):
+        print('"{}" does not exist'.format(cache_dir))
+        return 0
+    for name in sorted(os.listdir(cache_dir)):
+        moddir = os.path.join(cache_dir, name)
+        for key in sorted(os.listdir(moddir)):
+            size = 0
+            for f in get_files(os.path.join(moddir, key)):
+                size += os.path.getsize(os.path.join(moddir, key, f))
+            print('{:40s} {} {:10.1f} kB'.format(name, key[:12],
+                                                 size / 1024.))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,476 @@
+"""
+Run MODFLOW 6 simulations in parallel with a local MPI launcher.
+
+A simulation is decomposed by adding the DOMAIN_DECOMPOSITION option to a
+copy of the simulation name file and assigning the GWF models to
+subdomains, one subdomain for every MPI rank.  The copy is run with
+mpiexec (OpenMPI or MPICH) using an mf6 executable that is compiled with
+MPI_PARALLEL, and the outputs that are written by the ranks (the rank
+listings mfsim.lst.p<rank> and the model output files of the models owned
+by every rank) are gathered and compared with the serial run:
+
+    mpi_ws = setup_mpi(sim_ws, 2)
+    success, elapsed = run_mpi(mpi_ws, 2, exe)
+    outputs = gather_outputs(mpi_ws)
+    success = compare_outputs(sim_ws, mpi_ws, htol=0.001)
+
+A strong scaling table (wall time, speedup, and parallel efficiency for a
+fixed problem size) for a simulation that was run with a Simulation is
+written with
+
+    python mpi_util.py temp/npf04 --ranks 1 2 4 8
+
+The MPI launcher is found on the PATH, or set with the MF6_MPIEXEC
+environment variable.  OpenMPI is started with --oversubscribe so more
+ranks than cores can be used on a single machine.
+
+"""
+
+import os
+import re
+import sys
+import time
+import shutil
+import subprocess
+
+try:
+    import pymake
+except:
+    msg = 'Error. Pymake package is not available.\n'
+    msg += 'Try installing using the following command:\n'
+    msg += ' pip install https://github.com/modflowpy/pymake/zipball/master'
+    raise Exception(msg)
+
+import targets
+import runtimes
+import head_file_compare
+
+# MPI vendors keyed by the path of the launcher
+_vendors = {}
+
+head_exts = ('hds', 'hed', 'bhd', 'ahd', 'ucn')
+
+
+def get_mpiexec(mpiexec=None):
+    """
+    Path of the MPI launcher
+
+    """
+    if mpiexec is None:
+        mpiexec = os.environ.get('MF6_MPIEXEC')
+    if mpiexec is None:
+        for name in ('mpiexec', 'mpirun'):
+            mpiexec = shutil.which(name)
+            if mpiexec is not None:
+                break
+    if mpiexec is None or shutil.which(mpiexec) is None:
+        msg = 'Error. MPI launcher (mpiexec or mpirun) is not available.\n'
+        msg += 'Install OpenMPI or MPICH or set MF6_MPIEXEC'
+        raise Exception(msg)
+    return shutil.which(mpiexec)
+
+
+def get_mpi_vendor(mpiexec):
+    """
+    Get the MPI implementation of a launcher ('openmpi', 'mpich', or
+    'unknown')
+
+    """
+    if mpiexec not in _vendors:
+        try:
+            proc = subprocess.run([mpiexec, '--version'],
+                                  stdout=subprocess.PIPE,
+                                  stderr=subprocess.STDOUT,
+                                  universal_newlines=True, timeout=30)
+            text = proc.stdout.lower()
+        except (OSError, subprocess.SubprocessError):
+            text = ''
+        if 'open mpi' in text or 'openrte' in text:
+            vendor = 'openmpi'
+        elif 'hydra' in text or 'mpich' in text or 'intel' in text:
+            vendor = 'mpich'
+        else:
+            vendor = 'unknown'
+        _vendors[mpiexec] = vendor
+    return _vendors[mpiexec]
+
+
+def get_mpi_command(exe, nranks, mpiexec=None):
+    """
+    Command line that runs an executable with nranks MPI ranks
+
+    """
+    mpiexec = get_mpiexec(mpiexec)
+    cmd = [mpiexec, '-n', str(nranks)]
+    if get_mpi_vendor(mpiexec) == 'openmpi':
+        cmd.append('--oversubscribe')
+        if hasattr(os, 'geteuid') and os.geteuid() == 0:
+            cmd.append('--allow-run-as-root')
+    cmd.append(os.path.abspath(exe))
+    return cmd
+
+
+def get_models(namefile):
+    """
+    List of (model type, name file, model name, subdomain) tuples of the
+    models in a simulation name file, the subdomain is None when the
+    simulation is not decomposed
+
+    """
+    models = []
+    inblock = False
+    with open(namefile, 'r') as f:
+        for line in f:
+            ll = line.strip().split()
+            if len(ll) < 1 or ll[0][0] in '#!':
+                continue
+            key = ll[0].upper()
+            if key in ('BEGIN', 'END') and len(ll) > 1:
+                inblock = key == 'BEGIN' and ll[1].upper() == 'MODELS'
+                continue
+            if inblock and len(ll) > 2:
+                isub = None
+                if len(ll) > 3 and ll[3].isdigit():
+                    isub = int(ll[3])
+                models.append((key, ll[1], ll[2], isub))
+    return models
+
+
+def get_subdomains(models, nranks):
+    """
+    Assign the GWF models to nranks subdomains, models that follow each
+    other in the simulation name file are put in the same subdomain
+
+    """
+    names = [m[2] for m in models if m[0] == 'GWF6']
+    if nranks > len(names):
+        msg = '{} ranks for a simulation '.format(nranks) + \
+              'with {} GWF models'.format(len(names))
+        raise ValueError(msg)
+    return dict([(name, 1 + (i * nranks) // len(names))
+                 for i, name in enumerate(names)])
+
+
+def set_domain_decomposition(namefile, nranks, subdomains=None):
+    """
+    Add the DOMAIN_DECOMPOSITION option to a simulation name file and set
+    the subdomain of every GWF model
+
+    Parameters
+    ----------
+    namefile : str
+        path of the simulation name file that is rewritten
+    nranks : int
+        number of subdomains (and MPI ranks)
+    subdomains : dict
+        subdomain (1 to nranks) of every GWF model, the models are
+        assigned to subdomains in the order of the name file if
+        subdomains is None
+
+    """
+    if subdomains is None:
+        subdomains = get_subdomains(get_models(namefile), nranks)
+    subdomains = dict([(k.lower(), v) for k, v in subdomains.items()])
+    with open(namefile, 'r') as f:
+        lines = f.readlines()
+    block = None
+    found = False
+    for idx, line in enumerate(lines):
+        ll = line.strip().split()
+        if len(ll) < 1 or ll[0][0] in '#!':
+            continue
+        key = ll[0].upper()
+        if key == 'BEGIN' and len(ll) > 1:
+            block = ll[1].upper()
+            if block == 'OPTIONS':
+                lines[idx] = line.rstrip() + \
+                    '\n  DOMAIN_DECOMPOSITION {}\n'.format(nranks)
+                found = True
+        elif key == 'END':
+            block = None
+        elif block == 'OPTIONS' and key == 'DOMAIN_DECOMPOSITION':
+            lines[idx] = ''
+        elif block == 'MODELS' and key == 'GWF6' and len(ll) > 2:
+            mname = ll[2].lower()
+            if mname not in subdomains:
+                msg = 'no subdomain for model {}'.format(ll[2])
+                raise ValueError(msg)
+            lines[idx] = '  {}  {}  {}  {}\n'.format(ll[0], ll[1], ll[2],
+                                                     subdomains[mname])
+    if not found:
+        lines.insert(0, 'BEGIN options\n'
+                        '  DOMAIN_DECOMPOSITION {}\n'
+                        'END options\n\n'.format(nranks))
+    with open(namefile, 'w') as f:
+        f.writelines(lines)
+    return
+
+
+def setup_mpi(sim_ws, nranks, mpi_ws=None, subdomains=None):
+    """
+    Copy the input files of a simulation to a workspace for a run with
+    nranks ranks, the simulation is decomposed when nranks is larger than
+    one
+
+    """
+    if mpi_ws is None:
+        mpi_ws = os.path.join(sim_ws, 'mpi-np{}'.format(nranks))
+    namefile = os.path.join(sim_ws, 'mfsim.nam')
+    inpt, outp = pymake.get_mf6_files(namefile)
+    if os.path.isdir(mpi_ws):
+        shutil.rmtree(mpi_ws)
+    os.makedirs(mpi_ws)
+    for fname in ['mfsim.nam'] + inpt:
+        src = os.path.join(sim_ws, fname)
+        if not os.path.isfile(src):
+            continue
+        dst = os.path.join(mpi_ws, fname)
+        if not os.path.isdir(os.path.dirname(dst)):
+            os.makedirs(os.path.dirname(dst))
+        shutil.copy2(src, dst)
+    if nranks > 1:
+        set_domain_decomposition(os.path.join(mpi_ws, 'mfsim.nam'), nranks,
+                                 subdomains=subdomains)
+    return mpi_ws
+
+
+def get_rank_files(ws):
+    """
+    Dictionary with the files written by every rank (file names ending
+    with .p<rank>)
+
+    """
+    files = {}
+    for fname in sorted(os.listdir(ws)):
+        match = re.search(r'\.p(\d+)$', fname)
+        if match is not None:
+            files.setdefault(int(match.group(1)), []).append(fname)
+    return files
+
+
+def run_mpi(ws, nranks, exe=None, mpiexec=None, timeout=None, silent=True):
+    """
+    Run a simulation with nranks ranks, the output of the launcher is
+    written to mpiexec.stdout in the workspace
+
+    Returns
+    -------
+    success : bool
+        the launcher returned zero and all rank listings terminated
+        normally
+    elapsed : float
+        wall time of the run (seconds)
+
+    """
+    if exe is None:
+        exe = targets.target_dict['mf6']
+    cmd = get_mpi_command(exe, nranks, mpiexec=mpiexec)
+    if not silent:
+        print(' '.join(cmd))
+    t0 = time.time()
+    try:
+        proc = subprocess.run(cmd, cwd=ws, stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT,
+                              universal_newlines=True, timeout=timeout)
+        returncode, buff = proc.returncode, proc.stdout
+    except subprocess.TimeoutExpired as e:
+        returncode, buff = None, e.stdout or ''
+    elapsed = time.time() - t0
+    with open(os.path.join(ws, 'mpiexec.stdout'), 'w') as f:
+        f.write(buff)
+    if not silent:
+        print(buff)
+
+    success = returncode == 0
+    for fname in get_listings(ws):
+        with open(os.path.join(ws, fname), 'r') as f:
+            if 'normal termination' not in f.read().lower():
+                success = False
+    return success, elapsed
+
+
+def get_listings(ws):
+    """
+    Simulation listings of a run, a listing for every rank of a parallel
+    run
+
+    """
+    listings = [f for r, files in sorted(get_rank_files(ws).items())
+                for f in files if f.startswith('mfsim.lst')]
+    if len(listings) < 1 and os.path.isfile(os.path.join(ws, 'mfsim.lst')):
+        listings = ['mfsim.lst']
+    return listings
+
+
+def gather_outputs(ws):
+    """
+    Gather the outputs of a parallel run
+
+    Returns
+    -------
+    outputs : dict
+        'ranks' - files written by every rank (file names ending with
+        .p<rank>), 'models' - model names of every rank, 'files' - output
+        files of the simulation that exist, and 'missing' - output files
+        that were not written
+
+    """
+    namefile = os.path.join(ws, 'mfsim.nam')
+    inpt, outp = pymake.get_mf6_files(namefile)
+    models = {}
+    for mtype, fname, mname, isub in get_models(namefile):
+        rank = 0 if isub is None else isub - 1
+        models.setdefault(rank, []).append(mname)
+    outputs = {'ranks': get_rank_files(ws), 'models': models,
+               'files': [], 'missing': []}
+    for fname in outp:
+        if os.path.isfile(os.path.join(ws, fname)):
+            outputs['files'].append(fname)
+        else:
+            outputs['missing'].append(fname)
+    return outputs
+
+
+def compare_outputs(sim_ws, mpi_ws, htol=0.001, verbose=False):
+    """
+    Compare the head (and concentration) files of a parallel run with the
+    serial run of the same simulation
+
+    """
+    outputs = gather_outputs(mpi_ws)
+    success = True
+    for fname in outputs['missing']:
+        print('missing output of parallel run: {}'.format(fname))
+        success = False
+    for fname in outputs['files']:
+        ext = os.path.splitext(fname)[1][1:].lower()
+        if ext not in head_exts:
+            continue
+        text = 'concentration' if ext == 'ucn' else 'head'
+        outfile = os.path.join(mpi_ws, fname + '.cmp.out')
+        success_tst = head_file_compare.compare_heads(
+            None, None, precision='auto', text=text, outfile=outfile,
+            files1=os.path.join(mpi_ws, fname),
+            files2=os.path.join(sim_ws, fname), htol=htol, difftol=True,
+            verbose=verbose)
+        if not success_tst:
+            print('{} of parallel run differs from serial run'.format(fname))
+            success = False
+    return success
+
+
+def strong_scaling(sim_ws, ranks=(1, 2, 4, 8), exe=None, mpiexec=None,
+                   htol=0.001, name=None, record=True, timeout=None):
+    """
+    Run a simulation with an increasing number of ranks and report the
+    wall time, speedup, and parallel efficiency relative to one rank
+
+    The runs are recorded in the run time database with the test name
+    <name>-np<nranks>.  Rank counts larger than the number of GWF models
+    are skipped.
+
+    Returns
+    -------
+    results : list
+        dictionary with nranks, success, compare, time, speedup, and
+        efficiency for every rank count
+
+    """
+    if exe is None:
+        exe = targets.target_dict['mf6']
+    if name is None:
+        name = runtimes.get_test_name(sim_ws)
+    models = get_models(os.path.join(sim_ws, 'mfsim.nam'))
+    ngwf = len([m for m in models if m[0] == 'GWF6'])
+    results = []
+    t1 = None
+    for nranks in ranks:
+        if nranks > max(1, ngwf):
+            print('skipping {} ranks: {} has '.format(nranks, name) +
+                  '{} GWF models'.format(ngwf))
+            continue
+        mpi_ws = setup_mpi(sim_ws, nranks)
+        success, elapsed = run_mpi(mpi_ws, nranks, exe=exe, mpiexec=mpiexec,
+                                   timeout=timeout)
+        cmp_success = False
+        if success:
+            cmp_success = compare_outputs(sim_ws, mpi_ws, htol=htol)
+        if nranks == 1 and success:
+            t1 = elapsed
+        result = {'nranks': nranks, 'success': success,
+                  'compare': cmp_success, 'time': elapsed,
+                  'speedup': None, 'efficiency': None}
+        if t1 is not None and success:
+            result['speedup'] = t1 / elapsed
+            result['efficiency'] = t1 / elapsed / nranks
+        if record:
+            listings = get_listings(mpi_ws)
+            listing = None
+            if len(listings) > 0:
+                listing = os.path.join(mpi_ws, listings[0])
+            runtimes.record_run('{}-np{}'.format(name, nranks), exe,
+                                success and cmp_success, elapsed,
+                                listing=listing)
+        results.append(result)
+    write_scaling(name, results)
+    return results
+
+
+def write_scaling(name, results):
+    """
+    Print a strong scaling table
+
+    """
+    print('strong scaling of {}'.format(name))
+    print('{:>6s} {:>10s} {:>8s} {:>10s} {:>8s}'.format('ranks', 'time (s)',
+                                                     'speedup',
+                                                     'efficiency',
+                                                     'status'))
+    for r in results:
+        if not r['success']:
+            status = 'failed'
+        elif not r['compare']:
+            status = 'differs'
+        else:
+            status = 'ok'
+        speedup = '-' if r['speedup'] is None else \
+            '{:.2f}'.format(r['speedup'])
+        efficiency = '-' if r['efficiency'] is None else \
+            '{:.2f}'.format(r['efficiency'])
+        print('{:>6d} {:>10.3f} {:>8s} {:>10s} {:>8s}'.format(r['nranks'],
+                                                           r['time'],
+                                                           speedup,
+                                                           efficiency,
+                                                           status))
+    return
+
+
+def main():
+    ranks = [1, 2, 4, 8]
+    exe = None
+    htol = 0.001
+    sim_ws = None
+    for idx, arg in enumerate(sys.argv[1:]):
+        if arg == '--ranks':
+            ranks = []
+            for value in sys.argv[idx + 2:]:
+                if not value.isdigit():
+                    break
+                ranks.append(int(value))
+        elif arg == '--exe':
+            exe = sys.argv[idx + 2]
+        elif arg == '--htol':
+            htol = float(sys.argv[idx + 2])
+        elif sim_ws is None and os.path.isdir(arg):
+            sim_ws = arg
+    if sim_ws is None:
+        print('usage: python mpi_util.py sim_ws [--ranks 1 2 4 8] '
+              '[--exe mf6] [--htol 0.001]')
+        return 1
+    results = strong_scaling(sim_ws, ranks=ranks, exe=exe, htol=htol)
+    failed = [r for r in results if not (r['success'] and r['compare'])]
+    return len(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,853 @@
+"""
+Partition a MODFLOW 6 groundwater flow model into sub-models.
+
+The cells of a GWF model with a DIS, DISV, or DISU grid are partitioned in
+nparts balanced parts with a small number of cut connections, and a new
+simulation is written with a DISU sub-model for every part and GWF-GWF
+exchanges for the connections between the parts.  The sub-models and the
+exchanges are solved in a single solution, so the partitioned simulation
+can be run serially or with MPI (see mpi_util.py), and the results of the
+sub-models are mapped back to the grid of the original model:
+
+    partition = ModelPartition('temp/npf01a_75x75', nparts=4)
+    partition.write('temp/npf01a_75x75-p4')
+    times, heads = partition.get_heads('temp/npf01a_75x75-p4')
+
+For DIS and DISV grids the cell columns are partitioned, so all layers of
+a column are in the same part and the vertical connections are not cut.
+The graph is partitioned with METIS when pymetis is installed.  Otherwise
+recursive bisection is used: along the longest axis of the cell centers
+when the cell coordinates are known, and along a breadth first ordering of
+the graph when they are not.  The cut is then improved by moving cells on
+the boundaries of the parts to the neighboring part with the largest
+number of connections, while the parts stay balanced.
+
+The node map of the partition (the part of every cell, -1 for inactive
+cells) is saved to partition.npy in the partitioned simulation, and a
+partition can be created again from it with the parts argument.  Only
+packages without cell data, or with cell data in grid arrays and in
+stress period lists, are supported (IC, NPF, STO, CHD, WEL, DRN, GHB,
+RIV, RCH, EVT, and OC).  Time series, observations, and the advanced
+packages raise an exception.
+
+The partitioned simulation of a test simulation is written with
+
+    python partition_util.py temp/npf01a_75x75 temp/npf01a_75x75-p4 --nparts 4
+
+"""
+
+import os
+import sys
+from collections import deque
+
+import numpy as np
+
+try:
+    import flopy
+    from flopy.mf6.data.mfdatascalar import MFScalarTransient
+except:
+    msg = 'Error. FloPy package is not available.\n'
+    msg += 'Try installing using the following command:\n'
+    msg += ' pip install flopy'
+    raise Exception(msg)
+
+try:
+    import pymetis
+except ImportError:
+    pymetis = None
+
+from disu_util import get_disu_kwargs
+
+# packages that can be partitioned
+supported_packages = ('ic', 'npf', 'sto', 'chd', 'wel', 'drn', 'ghb', 'riv',
+                      'rch', 'evt', 'oc')
+
+# maximum length of a model name
+lenmodelname = 16
+
+hnoflo = 1e30
+
+
+def get_grid(model):
+    """
+    Connectivity and geometry of the cells of a GWF model
+
+    Returns
+    -------
+    grid : dict
+        'type' - discretization type, 'shape' - shape of the arrays of the
+        model, 'nodes' - number of cells, 'ncpl' - number of cells in a
+        layer (None for DISU), 'ia', 'ja', 'ihc', 'cl12', 'hwva',
+        'angldegx' - connections in compressed sparse row format (the
+        diagonal is the first entry of a row, angldegx is None when it is
+        not known), 'top', 'bot', 'area', 'idomain' - cell geometry, and
+        'xc', 'yc' - cell center coordinates of the cells in a layer (of
+        the cells for DISU), None when they are not known
+
+    """
+    dis = model.get_package('dis')
+    if dis is None:
+        dis = model.get_package('disv')
+    if dis is None:
+        dis = model.get_package('disu')
+    if dis is None:
+        msg = 'model {} does not have a discretization'.format(model.name)
+        raise Exception(msg)
+    distype = dis.package_type
+
+    if distype == 'dis':
+        nlay = dis.nlay.get_data()
+        nrow = dis.nrow.get_data()
+        ncol = dis.ncol.get_data()
+        delr = np.broadcast_to(np.asarray(dis.delr.get_data(),
+                                          dtype=np.float64), (ncol,))
+        delc = np.broadcast_to(np.asarray(dis.delc.get_data(),
+                                          dtype=np.float64), (nrow,))
+        top = np.asarray(dis.top.get_data(), dtype=np.float64)
+        botm = np.asarray(dis.botm.get_data(), dtype=np.float64)
+        botm = np.broadcast_to(botm, (nlay, nrow, ncol))
+        kw = get_disu_kwargs(nlay, nrow, ncol, delr, delc,
+                             np.broadcast_to(top, (nrow, ncol)).ravel(),
+                             [b.ravel() for b in botm])
+        ncpl = nrow * ncol
+        grid = _from_disu_kwargs(kw)
+        grid['shape'] = (nlay, nrow, ncol)
+        xc = np.cumsum(delr) - .5 * delr
+        yc = delc.sum() - (np.cumsum(delc) - .5 * delc)
+        i2d, j2d = np.divmod(np.arange(ncpl), ncol)
+        grid['xc'] = xc[j2d]
+        grid['yc'] = yc[i2d]
+    elif distype == 'disv':
+        nlay = dis.nlay.get_data()
+        ncpl = dis.ncpl.get_data()
+        grid = _get_disv_grid(dis, nlay, ncpl)
+        grid['shape'] = (nlay, ncpl)
+    else:
+        nodes = dis.nodes.get_data()
+        ncpl = None
+        grid = _from_disu_kwargs(
+            {'nodes': nodes,
+             'iac': np.asarray(dis.iac.get_data(), dtype=np.int64),
+             'ja': np.asarray(dis.ja.get_data(), dtype=np.int64),
+             'ihc': np.asarray(dis.ihc.get_data(), dtype=np.int64),
+             'cl12': np.asarray(dis.cl12.get_data(), dtype=np.float64),
+             'hwva': np.asarray(dis.hwva.get_data(), dtype=np.float64),
+             'top': np.asarray(dis.top.get_data(), dtype=np.float64),
+             'bot': np.asarray(dis.bot.get_data(), dtype=np.float64),
+             'area': np.asarray(dis.area.get_data(), dtype=np.float64)})
+        grid['shape'] = (nodes,)
+        angldegx = dis.angldegx.get_data()
+        if angldegx is not None:
+            grid['angldegx'] = np.asarray(angldegx, dtype=np.float64)
+        cell2d = dis.cell2d.get_data()
+        if cell2d is not None:
+            grid['xc'] = np.asarray(cell2d['xc'], dtype=np.float64)
+            grid['yc'] = np.asarray(cell2d['yc'], dtype=np.float64)
+
+    grid['type'] = distype
+    grid['ncpl'] = ncpl
+    idomain = dis.idomain.get_data()
+    if idomain is None:
+        idomain = np.ones(grid['nodes'], dtype=np.int64)
+    idomain = np.broadcast_to(np.asarray(idomain), grid['shape']).ravel()
+    if (idomain < 0).any():
+        msg = 'vertical pass-through cells (idomain < 0) are not supported'
+        raise Exception(msg)
+    grid['idomain'] = idomain
+
+    # the direction of the horizontal connections from the cell centers
+    if grid['angldegx'] is None and grid['xc'] is not None:
+        n, m = _get_pairs(grid)
+        if ncpl is not None:
+            n, m = n % ncpl, m % ncpl
+        angldegx = np.degrees(np.arctan2(grid['yc'][m] - grid['yc'][n],
+                                         grid['xc'][m] - grid['xc'][n]))
+        angldegx[angldegx < 0.] += 360.
+        angldegx[grid['ihc'] == 0] = 0.
+        grid['angldegx'] = angldegx
+    return grid
+
+
+def _from_disu_kwargs(kw):
+    nodes = kw['nodes']
+    ia = np.zeros(nodes + 1, dtype=np.int64)
+    np.cumsum(kw['iac'], out=ia[1:])
+    ja = np.asarray(kw['ja'], dtype=np.int64)
+    ihc = np.array(kw['ihc'], dtype=np.int64)
+    cl12 = np.array(kw['cl12'], dtype=np.float64)
+    hwva = np.array(kw['hwva'], dtype=np.float64)
+    # values of the diagonal are not used
+    ihc[ia[:-1]] = 1
+    cl12[ia[:-1]] = 0.
+    hwva[ia[:-1]] = 0.
+    return {'nodes': nodes, 'ia': ia, 'ja': ja, 'ihc': ihc, 'cl12': cl12,
+            'hwva': hwva, 'angldegx': None,
+            'top': np.asarray(kw['top'], dtype=np.float64),
+            'bot': np.asarray(kw['bot'], dtype=np.float64),
+            'area': np.asarray(kw['area'], dtype=np.float64),
+            'xc': None, 'yc': None}
+
+
+def _get_pairs(grid):
+    """
+    Cell numbers (n, m) of every entry of ja
+    """
+    n = np.repeat(np.arange(grid['nodes']), np.diff(grid['ia']))
+    return n, grid['ja']
+
+
+def _get_disv_grid(dis, nlay, ncpl):
+    """
+    Connectivity of a DISV grid, cells in a layer are connected when they
+    share an edge
+    """
+    vertices = dis.vertices.get_data()
+    cell2d = dis.cell2d.get_data()
+    xv = np.asarray(vertices['xv'], dtype=np.float64)
+    yv = np.asarray(vertices['yv'], dtype=np.float64)
+    xc = np.asarray(cell2d['xc'], dtype=np.float64)
+    yc = np.asarray(cell2d['yc'], dtype=np.float64)
+    names = [name for name in cell2d.dtype.names if name.startswith('icvert')]
+    ncvert = np.asarray(cell2d['ncvert'], dtype=np.int64)
+
+    # cell areas and the cells that share every edge
+    area = np.zeros(ncpl, dtype=np.float64)
+    edges = {}
+    for c in range(ncpl):
+        iv = [int(cell2d[names[i]][c]) for i in range(ncvert[c])]
+        if iv[0] == iv[-1]:
+            iv = iv[:-1]
+        x = xv[iv]
+        y = yv[iv]
+        area[c] = .5 * abs(np.dot(x, np.roll(y, -1)) -
+                           np.dot(y, np.roll(x, -1)))
+        for i in range(len(iv)):
+            key = tuple(sorted((iv[i], iv[(i + 1) % len(iv)])))
+            edges.setdefault(key, []).append(c)
+
+    cn, cm, cl, width = [], [], [], []
+    for (v0, v1), cells in edges.items():
+        if len(cells) != 2:
+            continue
+        x0, y0, x1, y1 = xv[v0], yv[v0], xv[v1], yv[v1]
+        length = np.hypot(x1 - x0, y1 - y0)
+        for a, b in (cells, cells[::-1]):
+            # distance from the cell center to the shared edge
+            d = abs((x1 - x0) * (y0 - yc[a]) - (x0 - xc[a]) * (y1 - y0))
+            cn.append(a)
+            cm.append(b)
+            cl.append(d / length)
+            width.append(length)
+    cn = np.array(cn, dtype=np.int64)
+    cm = np.array(cm, dtype=np.int64)
+    cl = np.array(cl, dtype=np.float64)
+    width = np.array(width, dtype=np.float64)
+
+    top = np.asarray(dis.top.get_data(), dtype=np.float64).ravel()
+    botm = np.asarray(dis.botm.get_data(), dtype=np.float64)
+    botm = np.broadcast_to(botm, (nlay, ncpl))
+    tops = np.vstack((top, botm[:-1]))
+    thk = (tops - botm).ravel()
+
+    nodes = nlay * ncpl
+    n, m, ihc, cl12, hwva = [np.arange(nodes)], [np.arange(nodes)], \
+        [np.ones(nodes, dtype=np.int64)], [np.zeros(nodes)], [np.zeros(nodes)]
+    for k in range(nlay):
+        n.append(k * ncpl + cn)
+        m.append(k * ncpl + cm)
+        ihc.append(np.ones(cn.shape, dtype=np.int64))
+        cl12.append(cl)
+        hwva.append(width)
+        for kk in (k - 1, k + 1):
+            if 0 <= kk < nlay:
+                nn = k * ncpl + np.arange(ncpl)
+                n.append(nn)
+                m.append(kk * ncpl + np.arange(ncpl))
+                ihc.append(np.zeros(ncpl, dtype=np.int64))
+                cl12.append(.5 * thk[nn])
+                hwva.append(area)
+    n = np.concatenate(n)
+    m = np.concatenate(m)
+    # sort by cell, with the diagonal first and the connected cells in
+    # increasing order
+    order = np.lexsort((m, m != n, n))
+    ia = np.zeros(nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(n, minlength=nodes), out=ia[1:])
+    return {'nodes': nodes, 'ia': ia, 'ja': m[order],
+            'ihc': np.concatenate(ihc)[order],
+            'cl12': np.concatenate(cl12)[order],
+            'hwva': np.concatenate(hwva)[order], 'angldegx': None,
+            'top': tops.ravel(), 'bot': botm.ravel(),
+            'area': np.tile(area, nlay), 'xc': xc, 'yc': yc}
+
+
+def get_graph(grid):
+    """
+    Graph that is partitioned, the cell columns of DIS and DISV grids and
+    the cells of DISU grids
+
+    Returns
+    -------
+    vertex : numpy.ndarray
+        graph vertex of every cell, -1 for inactive cells
+    xadj, adjncy, eweights : numpy.ndarray
+        adjacency of the graph in compressed sparse row format, the edge
+        weights are the number of connections between the vertices
+    vweights : numpy.ndarray
+        number of active cells of every vertex
+
+    """
+    nodes = grid['nodes']
+    active = grid['idomain'] > 0
+    if grid['ncpl'] is not None:
+        column = np.arange(nodes) % grid['ncpl']
+    else:
+        column = np.arange(nodes)
+    # number the columns (or cells) with active cells
+    vweights = np.bincount(column[active], minlength=column.max() + 1)
+    ivertex = np.full(vweights.shape, -1, dtype=np.int64)
+    ivertex[vweights > 0] = np.arange((vweights > 0).sum())
+    vweights = vweights[vweights > 0]
+    vertex = np.where(active, ivertex[column], -1)
+    nv = vweights.shape[0]
+
+    n, m = _get_pairs(grid)
+    mask = active[n] & active[m] & (vertex[n] != vertex[m])
+    key = vertex[n[mask]] * nv + vertex[m[mask]]
+    key, eweights = np.unique(key, return_counts=True)
+    src, adjncy = np.divmod(key, nv)
+    xadj = np.zeros(nv + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=nv), out=xadj[1:])
+    return vertex, xadj, adjncy, eweights, vweights
+
+
+def partition_graph(xadj, adjncy, nparts, vweights=None, eweights=None,
+                    xc=None, yc=None, ubfactor=1.03, npass=10):
+    """
+    Partition a graph in nparts balanced parts with a small edge cut
+
+    Parameters
+    ----------
+    xadj, adjncy : numpy.ndarray
+        symmetric adjacency of the graph in compressed sparse row format
+    nparts : int
+        number of parts
+    vweights, eweights : numpy.ndarray
+        vertex and edge weights, unit weights are used if None
+    xc, yc : numpy.ndarray
+        vertex coordinates used for the bisections
+    ubfactor : float
+        maximum ratio of the weight of a part and the average weight
+    npass : int
+        maximum number of refinement passes
+
+    Returns
+    -------
+    parts : numpy.ndarray
+        part (0 to nparts - 1) of every vertex
+
+    """
+    nv = xadj.shape[0] - 1
+    if nparts < 1 or nparts > nv:
+        msg = 'cannot partition {} vertices in {} parts'.format(nv, nparts)
+        raise ValueError(msg)
+    if vweights is None:
+        vweights = np.ones(nv, dtype=np.int64)
+    if eweights is None:
+        eweights = np.ones(adjncy.shape, dtype=np.int64)
+    if nparts == 1:
+        return np.zeros(nv, dtype=np.int64)
+
+    if pymetis is not None:
+        ncut, parts = pymetis.part_graph(nparts, xadj=xadj.tolist(),
+                                         adjncy=adjncy.tolist(),
+                                         vweights=vweights.tolist(),
+                                         eweights=eweights.tolist())
+        return np.asarray(parts, dtype=np.int64)
+
+    parts = np.zeros(nv, dtype=np.int64)
+    stack = [(np.arange(nv), 0, nparts)]
+    while len(stack) > 0:
+        index, ipart, n = stack.pop()
+        if n == 1:
+            parts[index] = ipart
+            continue
+        n1 = n // 2
+        order = _get_order(index, xadj, adjncy, xc, yc)
+        w = np.cumsum(vweights[order])
+        i = np.searchsorted(w, w[-1] * n1 / float(n))
+        i = min(max(i, n1), len(order) - (n - n1))
+        if i > 0 and abs(w[i - 1] - w[-1] * n1 / float(n)) < \
+                abs(w[i] - w[-1] * n1 / float(n)):
+            i = max(i - 1, n1)
+        stack.append((np.sort(order[:i]), ipart, n1))
+        stack.append((np.sort(order[i:]), ipart + n1, n - n1))
+    refine(xadj, adjncy, parts, nparts, vweights, eweights,
+           ubfactor=ubfactor, npass=npass)
+    return parts
+
+
+def _get_order(index, xadj, adjncy, xc, yc):
+    """
+    Order of the vertices of a part that is bisected
+    """
+    if xc is not None and yc is not None:
+        x = xc[index]
+        y = yc[index]
+        if np.ptp(x) >= np.ptp(y):
+            return index[np.lexsort((y, x))]
+        return index[np.lexsort((x, y))]
+
+    # breadth first order from a pseudo-peripheral vertex of the part
+    inpart = np.zeros(xadj.shape[0] - 1, dtype=bool)
+    inpart[index] = True
+    start = index[0]
+    for i in range(2):
+        order = _bfs(start, index, inpart, xadj, adjncy)
+        start = order[-1]
+    return np.asarray(_bfs(start, index, inpart, xadj, adjncy),
+                      dtype=np.int64)
+
+
+def _bfs(start, index, inpart, xadj, adjncy):
+    visited = {start}
+    order = []
+    for v0 in [start] + [v for v in index.tolist() if v != start]:
+        # a part can consist of more than one component
+        if v0 != start and v0 in visited:
+            continue
+        visited.add(v0)
+        queue = deque([v0])
+        while len(queue) > 0:
+            v = queue.popleft()
+            order.append(v)
+            for u in adjncy[xadj[v]:xadj[v + 1]].tolist():
+                if inpart[u] and u not in visited:
+                    visited.add(u)
+                    queue.append(u)
+    return order
+
+
+def refine(xadj, adjncy, parts, nparts, vweights, eweights, ubfactor=1.03,
+           npass=10):
+    """
+    Reduce the edge cut of a partition by moving the vertices on the
+    boundaries of the parts to the neighboring part with the largest gain,
+    the parts are changed in place
+
+    """
+    pweights = np.bincount(parts, weights=vweights,
+                           minlength=nparts).astype(np.float64)
+    target = pweights.sum() / nparts
+    upper = max(ubfactor * target, pweights.max())
+    lower = min((2. - ubfactor) * target, pweights.min())
+    src = np.repeat(np.arange(xadj.shape[0] - 1), np.diff(xadj))
+    for ipass in range(npass):
+        boundary = np.unique(src[parts[src] != parts[adjncy]])
+        nmoved = 0
+        for v in boundary.tolist():
+            p = parts[v]
+            conn = {}
+            for idx in range(xadj[v], xadj[v + 1]):
+                q = parts[adjncy[idx]]
+                conn[q] = conn.get(q, 0) + eweights[idx]
+            best, gain = p, 0
+            for q, w in conn.items():
+                g = w - conn.get(p, 0)
+                if q != p and g > gain and \
+                        pweights[q] + vweights[v] <= upper and \
+                        pweights[p] - vweights[v] >= lower:
+                    best, gain = q, g
+            if best != p:
+                parts[v] = best
+                pweights[p] -= vweights[v]
+                pweights[best] += vweights[v]
+                nmoved += 1
+        if nmoved == 0:
+            break
+    return parts
+
+
+def _get_value(data):
+    if isinstance(data, MFScalarTransient):
+        keys = [key for key, value in data.get_active_key_list()]
+        if len(keys) < 1:
+            return None
+        return dict([(key, True) for key in keys])
+    return data.get_data()
+
+
+def _to_records(value):
+    """
+    List of tuples without the trailing None values of a record array
+    """
+    records = []
+    for rec in value:
+        rec = list(rec)
+        while len(rec) > 0 and rec[-1] is None:
+            rec.pop()
+        records.append(tuple(rec))
+    return records
+
+
+class ModelPartition(object):
+    """
+    Partition of a GWF model in sub-models
+
+    Parameters
+    ----------
+    sim_ws : str
+        folder of the simulation with the model
+    nparts : int
+        number of sub-models
+    model : str
+        name of the GWF model, the first model if None
+    parts : numpy.ndarray
+        part of every cell of the model (-1 for inactive cells), the model
+        is partitioned if parts is None
+    ubfactor : float
+        maximum ratio of the number of cells in a sub-model and the
+        average number of cells in a sub-model
+
+    """
+
+    def __init__(self, sim_ws, nparts=None, model=None, parts=None,
+                 ubfactor=1.03):
+        self.sim_ws = sim_ws
+        self.sim = flopy.mf6.MFSimulation.load(sim_ws=sim_ws,
+                                               verbosity_level=0)
+        if model is None:
+            model = self.sim.model_names[0]
+        self.model = self.sim.get_model(model)
+        if len(self.sim.model_names) != 1:
+            msg = 'only simulations with a single model can be partitioned'
+            raise Exception(msg)
+        self.grid = get_grid(self.model)
+        nodes = self.grid['nodes']
+        active = self.grid['idomain'] > 0
+
+        if parts is None:
+            vertex, xadj, adjncy, eweights, vweights = get_graph(self.grid)
+            xc, yc = self.grid['xc'], self.grid['yc']
+            if xc is not None:
+                if self.grid['ncpl'] is not None:
+                    index = np.arange(nodes) % self.grid['ncpl']
+                else:
+                    index = np.arange(nodes)
+                xv = np.zeros(vweights.shape, dtype=np.float64)
+                yv = np.zeros(vweights.shape, dtype=np.float64)
+                xv[vertex[active]] = xc[index[active]]
+                yv[vertex[active]] = yc[index[active]]
+                xc, yc = xv, yv
+            vparts = partition_graph(xadj, adjncy, nparts,
+                                     vweights=vweights, eweights=eweights,
+                                     xc=xc, yc=yc, ubfactor=ubfactor)
+            parts = np.where(active, vparts[vertex], -1)
+        parts = np.asarray(parts, dtype=np.int64).ravel()
+        if parts.shape[0] != nodes:
+            msg = 'parts must have a value for all {} cells'.format(nodes)
+            raise ValueError(msg)
+        if nparts is None:
+            nparts = parts.max() + 1
+        if (parts[active] < 0).any() or parts.max() >= nparts:
+            msg = 'parts must be 0 to {} for active cells'.format(nparts - 1)
+            raise ValueError(msg)
+        self.nparts = nparts
+        self.parts = parts
+
+        # global cell numbers of the sub-models and local cell numbers
+        self.nodemap = [np.where(parts == ipart)[0]
+                        for ipart in range(nparts)]
+        self.local = np.full(nodes, -1, dtype=np.int64)
+        for cells in self.nodemap:
+            self.local[cells] = np.arange(cells.shape[0])
+        for ipart, cells in enumerate(self.nodemap):
+            if cells.shape[0] < 1:
+                msg = 'sub-model {} does not have cells'.format(ipart)
+                raise Exception(msg)
+
+        suffix = '_p{}'.format(nparts - 1)
+        root = self.model.name[:lenmodelname - len(suffix)]
+        self.names = ['{}_p{}'.format(root, ipart)
+                      for ipart in range(nparts)]
+
+    def get_edge_cut(self):
+        """
+        Number of connections between cells in different sub-models
+        """
+        n, m = _get_pairs(self.grid)
+        mask = (self.parts[n] >= 0) & (self.parts[m] >= 0) & \
+            (self.parts[n] != self.parts[m])
+        return int(mask.sum()) // 2
+
+    def _get_node(self, cellid):
+        shape = self.grid['shape']
+        if len(cellid) != len(shape):
+            msg = 'invalid cellid {}'.format(cellid)
+            raise ValueError(msg)
+        return int(np.ravel_multi_index(cellid, shape))
+
+    def _split_records(self, value, ipart):
+        """
+        Records of a list with a cellid that are in a sub-model
+        """
+        records = []
+        for rec in value:
+            node = self._get_node(rec['cellid'])
+            if self.parts[node] != ipart:
+                continue
+            rec = list(rec)
+            rec[value.dtype.names.index('cellid')] = (self.local[node],)
+            records.append(tuple(rec))
+        return records
+
+    def _split_value(self, value, ipart):
+        nodes = self.grid['nodes']
+        if isinstance(value, dict):
+            data = {}
+            for key, v in value.items():
+                data[key] = self._split_value(v, ipart)
+            return data
+        if isinstance(value, np.ndarray):
+            if value.dtype.names is None:
+                if value.size == nodes:
+                    return value.ravel()[self.nodemap[ipart]]
+                return value
+            if 'cellid' in value.dtype.names:
+                return self._split_records(value, ipart)
+            return _to_records(value)
+        return value
+
+    def _get_kwargs(self, package, ipart, skip=()):
+        kwargs = {}
+        for block in package.blocks.values():
+            for name, data in block.datasets.items():
+                if name in skip:
+                    continue
+                value = _get_value(data)
+                if value is None:
+                    continue
+                if name.endswith('_filerecord'):
+                    msg = '{} of package {} is not supported'.format(
+                        name, package.package_name)
+                    raise Exception(msg)
+                kwargs[name.replace('-', '_')] = \
+                    self._split_value(value, ipart)
+        return kwargs
+
+    def _add_model(self, sim, ipart):
+        name = self.names[ipart]
+        kwargs = self._get_kwargs(self.model.name_file, ipart,
+                                  skip=('list', 'packages'))
+        gwf = flopy.mf6.ModflowGwf(sim, modelname=name,
+                                   model_nam_file='{}.nam'.format(name),
+                                   **kwargs)
+
+        # grid of the sub-model
+        cells = self.nodemap[ipart]
+        n, m = _get_pairs(self.grid)
+        mask = (self.parts[n] == ipart) & (self.parts[m] == ipart)
+        # vertical_offset_tolerance is not a DISU option of this version
+        kwargs = {'vertical_offset_tolerance': None,
+                  'nodes': cells.shape[0],
+                  'nja': int(mask.sum()),
+                  'top': self.grid['top'][cells],
+                  'bot': self.grid['bot'][cells],
+                  'area': self.grid['area'][cells],
+                  'iac': np.bincount(self.local[n[mask]],
+                                     minlength=cells.shape[0]),
+                  'ja': self.local[m[mask]],
+                  'ihc': self.grid['ihc'][mask],
+                  'cl12': self.grid['cl12'][mask],
+                  'hwva': self.grid['hwva'][mask]}
+        if self.grid['angldegx'] is not None:
+            kwargs['angldegx'] = self.grid['angldegx'][mask]
+        dis = self.model.get_package(self.grid['type'])
+        for key in ('length_units', 'xorigin', 'yorigin', 'angrot'):
+            value = getattr(dis, key).get_data()
+            if value is not None:
+                kwargs[key] = value
+        flopy.mf6.ModflowGwfdisu(gwf, filename='{}.disu'.format(name),
+                                 **kwargs)
+
+        extensions = []
+        for package in self.model.packagelist:
+            ptype = package.package_type
+            if ptype == self.grid['type']:
+                continue
+            if ptype not in supported_packages:
+                msg = 'package {} ({}) is not supported'.format(
+                    package.package_name, ptype)
+                raise Exception(msg)
+            ext = ptype
+            while ext in extensions:
+                ext = '{}{}'.format(ptype, len(extensions))
+            extensions.append(ext)
+            fname = '{}.{}'.format(name, ext)
+            if ptype == 'oc':
+                self._add_oc(gwf, package, ipart, fname)
+                continue
+            kwargs = self._get_kwargs(package, ipart, skip=('maxbound',))
+            spd = kwargs.get('stress_period_data')
+            if spd is not None:
+                if sum([len(v) for v in spd.values()]) < 1:
+                    continue
+            pclass = getattr(flopy.mf6, 'ModflowGwf{}'.format(ptype))
+            pclass(gwf, filename=fname, pname=package.package_name, **kwargs)
+        return gwf
+
+    def _add_oc(self, gwf, package, ipart, fname):
+        name = self.names[ipart]
+        kwargs = self._get_kwargs(package, ipart,
+                                  skip=('head_filerecord',
+                                        'budget_filerecord',
+                                        'budgetcsv_filerecord'))
+        if package.head_filerecord.get_data() is not None:
+            kwargs['head_filerecord'] = '{}.hds'.format(name)
+        if package.budget_filerecord.get_data() is not None:
+            kwargs['budget_filerecord'] = '{}.cbc'.format(name)
+        flopy.mf6.ModflowGwfoc(gwf, filename=fname, **kwargs)
+        return
+
+    def _add_exchanges(self, sim):
+        grid = self.grid
+        nodes = grid['nodes']
+        n, m = _get_pairs(grid)
+        # index of the connection m-n for every connection n-m
+        key = n * nodes + m
+        order = np.argsort(key)
+        reverse = order[np.searchsorted(key[order], m * nodes + n)]
+
+        options = {}
+        npf = self.model.get_package('npf')
+        if npf is not None:
+            value = npf.alternative_cell_averaging.get_data()
+            if value is not None:
+                options['cell_averaging'] = value
+            value = npf.cvoptions.get_data()
+            if value is not None:
+                options['cvoptions'] = _to_records(value)
+            if npf.save_flows.get_data():
+                options['save_flows'] = True
+        if self.model.name_file.newtonoptions.get_data() is not None:
+            options['newton'] = True
+
+        exchanges = []
+        for ip in range(self.nparts):
+            for iq in range(ip + 1, self.nparts):
+                mask = (self.parts[n] == ip) & (self.parts[m] == iq)
+                if not mask.any():
+                    continue
+                idx = np.where(mask)[0]
+                cl1 = grid['cl12'][idx]
+                cl2 = grid['cl12'][reverse[idx]]
+                exchangedata = []
+                for i, c1, c2 in zip(idx.tolist(), cl1.tolist(),
+                                     cl2.tolist()):
+                    rec = [(int(self.local[n[i]]),),
+                           (int(self.local[m[i]]),),
+                           int(grid['ihc'][i]), c1, c2,
+                           float(grid['hwva'][i])]
+                    if grid['angldegx'] is not None:
+                        rec += [float(grid['angldegx'][i]), c1 + c2]
+                    exchangedata.append(tuple(rec))
+                kwargs = dict(options)
+                if grid['angldegx'] is not None:
+                    kwargs['auxiliary'] = ['angldegx', 'cdist']
+                fname = '{}_{}.gwfgwf'.format(self.names[ip],
+                                              self.names[iq])
+                exchanges.append(flopy.mf6.ModflowGwfgwf(
+                    sim, exgtype='GWF6-GWF6', exgmnamea=self.names[ip],
+                    exgmnameb=self.names[iq], nexg=len(exchangedata),
+                    exchangedata=exchangedata, filename=fname, **kwargs))
+        return exchanges
+
+    def write(self, ws, silent=True):
+        """
+        Write the partitioned simulation and the node map (partition.npy)
+        """
+        sim0 = self.sim
+        sim = flopy.mf6.MFSimulation(sim_name=sim0.name, sim_ws=ws,
+                                     exe_name=sim0.exe_name,
+                                     verbosity_level=0)
+        kwargs = self._get_kwargs(sim0.name_file, None,
+                                  skip=('tdis6', 'models', 'exchanges',
+                                        'solutiongroup'))
+        for key, value in kwargs.items():
+            getattr(sim.name_file, key).set_data(value)
+
+        tdis = sim0.get_package('tdis')
+        flopy.mf6.ModflowTdis(sim, **self._get_kwargs(tdis, None))
+        for ipart in range(self.nparts):
+            self._add_model(sim, ipart)
+        self._add_exchanges(sim)
+
+        ims0 = [p for p in sim0.sim_package_list if p.package_type == 'ims']
+        if len(ims0) != 1:
+            msg = 'only simulations with a single solution can be partitioned'
+            raise Exception(msg)
+        ims = flopy.mf6.ModflowIms(sim, filename=os.path.basename(
+            ims0[0].filename), **self._get_kwargs(ims0[0], None))
+        sim.register_ims_package(ims, self.names)
+
+        sim.write_simulation(silent=silent)
+        np.save(os.path.join(ws, 'partition.npy'), self.parts)
+        return sim
+
+    def get_array(self, arrays, fill=hnoflo):
+        """
+        Array on the grid of the original model from the arrays of the
+        sub-models (a list or a dictionary keyed by the sub-model names)
+        """
+        if isinstance(arrays, dict):
+            arrays = [arrays[name] for name in self.names]
+        a = np.full(self.grid['nodes'], fill, dtype=np.float64)
+        for cells, values in zip(self.nodemap, arrays):
+            a[cells] = np.asarray(values).ravel()
+        return a.reshape(self.grid['shape'])
+
+    def get_heads(self, ws, text='head'):
+        """
+        Times and heads of the partitioned simulation on the grid of the
+        original model, a (ntimes, ...) array
+        """
+        times = None
+        heads = []
+        for name in self.names:
+            fpth = os.path.join(ws, '{}.hds'.format(name))
+            hobj = flopy.utils.HeadFile(fpth, text=text, precision='double')
+            if times is None:
+                times = hobj.get_times()
+            heads.append(hobj.get_alldata().reshape(len(times), -1))
+        heads = np.array([self.get_array([h[i] for h in heads])
+                          for i in range(len(times))])
+        return np.array(times), heads
+
+
+def main():
+    nparts = None
+    model = None
+    paths = []
+    for idx, arg in enumerate(sys.argv[1:]):
+        if arg == '--nparts':
+            nparts = int(sys.argv[idx + 2])
+        elif arg == '--model':
+            model = sys.argv[idx + 2]
+        elif sys.argv[idx] not in ('--nparts', '--model'):
+            paths.append(arg)
+    if len(paths) != 2 or nparts is None:
+        print('usage: python partition_util.py sim_ws new_ws --nparts 4 '
+              '[--model name]')
+        return 1
+    partition = ModelPartition(paths[0], nparts, model=model)
+    partition.write(paths[1])
+    ncells = [cells.shape[0] for cells in partition.nodemap]
+    print('{} sub-models with {} to {} cells, '.format(nparts, min(ncells),
+                                                       max(ncells)) +
+          '{} connections between sub-models'.format(
+              partition.get_edge_cut()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
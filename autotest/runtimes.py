@@ -0,0 +1,330 @@
+"""
+Persistent run time history for the MODFLOW 6 autotests.
+
+Every time a Simulation is run and compared a record is appended to an
+append-only JSON lines file (one JSON object per line). A record is keyed by
+the test name and the hash of the MODFLOW 6 executable and contains
+
+    test        - test name
+    exe_hash    - sha256 hash of the MODFLOW 6 executable
+    date        - time stamp of the run
+    success     - True if the run and the comparison were successful
+    run_time    - wall time of the MODFLOW 6 run (seconds)
+    cmp_time    - wall time of the comparison (seconds)
+    outer       - total number of outer iterations (from mfsim.lst)
+    inner       - total number of inner iterations (from mfsim.lst)
+    peak_rss    - peak resident set size of the MODFLOW 6 run (bytes)
+
+The location of the file can be changed with the MF6_RUNTIMES_DB
+environment variable.
+
+Run this script to report the tests whose run time (or number of
+iterations) regressed beyond a threshold relative to the median of the
+previous runs:
+
+    python runtimes.py
+    python runtimes.py --threshold 0.1 --window 5 --test csub_sub01a
+
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+db_file = os.environ.get('MF6_RUNTIMES_DB',
+                         os.path.join(os.path.dirname(
+                             os.path.abspath(__file__)), '.runtimes.jsonl'))
+
+# cache of executable hashes keyed by (path, mtime, size)
+_exe_hashes = {}
+
+
+def get_exe_hash(exe):
+    """
+    Get the sha256 hash of an executable, None if it does not exist
+
+    """
+    if exe is None or not os.path.isfile(exe):
+        return None
+    stat = os.stat(exe)
+    key = (os.path.abspath(exe), stat.st_mtime, stat.st_size)
+    if key not in _exe_hashes:
+        h = hashlib.sha256()
+        with open(exe, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        _exe_hashes[key] = h.hexdigest()
+    return _exe_hashes[key]
+
+
+def get_test_name(name):
+    """
+    Test name used as the key in the database
+
+    """
+    return os.path.basename(os.path.normpath(name))
+
+
+def parse_listing(fpth):
+    """
+    Get the total number of outer and inner iterations from a simulation
+    listing file. The numbers are only written when the IMS PRINT_OPTION
+    is SUMMARY or ALL, None is returned for both otherwise.
+
+    """
+    outer = None
+    inner = None
+    if not os.path.isfile(fpth):
+        return outer, inner
+    tag_outer = 'CALLS TO NUMERICAL SOLUTION'
+    tag_inner = 'TOTAL ITERATIONS'
+    with open(fpth, 'r', errors='replace') as f:
+        for line in f:
+            if tag_outer in line:
+                outer = (outer or 0) + int(line.split()[0])
+            elif tag_inner in line:
+                inner = (inner or 0) + int(line.split()[0])
+    return outer, inner
+
+
+class PeakMemory(object):
+    """
+    Track the peak resident set size of the child processes started while
+    the context is active.
+
+    psutil is used to sample the child processes if it is available,
+    otherwise the maximum resident set size of the terminated children
+    is used on posix systems (this is only reported if the run exceeded
+    the peak of all previous child processes of this process).
+
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_rss = None
+        self._stop = None
+        self._thread = None
+        self._maxrss0 = None
+
+    def _sample(self):
+        proc = psutil.Process()
+        while not self._stop.is_set():
+            rss = 0
+            try:
+                for child in proc.children(recursive=True):
+                    rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+            if rss > (self.peak_rss or 0):
+                self.peak_rss = rss
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if psutil is not None:
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._sample)
+            self._thread.daemon = True
+            self._thread.start()
+        elif resource is not None:
+            usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            self._maxrss0 = usage.ru_maxrss
+        return self
+
+    def __exit__(self, *args):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+        elif self._maxrss0 is not None:
+            maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            if maxrss > self._maxrss0:
+                # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+                if sys.platform.lower() != 'darwin':
+                    maxrss *= 1024
+                self.peak_rss = maxrss
+        return False
+
+
+def append_record(record, fpth=None):
+    """
+    Append a record to the database
+
+    """
+    if fpth is None:
+        fpth = db_file
+    line = json.dumps(record, sort_keys=True) + '\n'
+    # a single write on a file opened in append mode keeps the records of
+    # tests running in parallel from being interleaved
+    with open(fpth, 'a') as f:
+        f.write(line)
+    return
+
+
+def record_run(name, exe, success, run_time, cmp_time=None,
+               listing=None, peak_rss=None, fpth=None):
+    """
+    Add the timing results for a test to the database
+
+    """
+    outer, inner = None, None
+    if listing is not None:
+        outer, inner = parse_listing(listing)
+    record = {'test': get_test_name(name),
+              'exe_hash': get_exe_hash(exe),
+              'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'success': bool(success),
+              'run_time': run_time,
+              'cmp_time': cmp_time,
+              'outer': outer,
+              'inner': inner,
+              'peak_rss': peak_rss}
+    try:
+        append_record(record, fpth=fpth)
+    except OSError:
+        print('could not write run time record to {}'.format(fpth))
+    return record
+
+
+def load_records(fpth=None, test=None):
+    """
+    Load the records in the database, optionally for a single test
+
+    """
+    if fpth is None:
+        fpth = db_file
+    records = []
+    if not os.path.isfile(fpth):
+        return records
+    with open(fpth, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if len(line) < 1:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # partially written record
+                continue
+            if test is not None and record['test'] != test:
+                continue
+            records.append(record)
+    return records
+
+
+def get_history(records, group=None):
+    """
+    Group successful records by test, in the order they were written.  The
+    optional group function returns the name of the group of a record, the
+    default is the name of the test.
+
+    """
+    history = {}
+    for record in records:
+        if record['success']:
+            if group is None:
+                name = record['test']
+            else:
+                name = group(record)
+            history.setdefault(name, []).append(record)
+    return history
+
+
+def median(values):
+    values = sorted(values)
+    n = len(values)
+    if n < 1:
+        return None
+    if n % 2 == 1:
+        return values[n // 2]
+    return 0.5 * (values[n // 2 - 1] + values[n // 2])
+
+
+def get_regressions(records, threshold=0.2, window=10, min_time=0.1,
+                    group=None):
+    """
+    Compare the last run of every test to the median of the previous
+    window runs and return a list of regressions. A run time regression
+    is only reported for tests with a baseline run time of at least
+    min_time seconds.  Only the runs in the same group (see get_history)
+    are compared.
+
+    """
+    regressions = []
+    for test, runs in sorted(get_history(records, group=group).items()):
+        if len(runs) < 2:
+            continue
+        last = runs[-1]
+        previous = runs[-(window + 1):-1]
+        for key in ('run_time', 'outer', 'inner', 'peak_rss'):
+            values = [run[key] for run in previous if run[key] is not None]
+            baseline = median(values)
+            value = last[key]
+            if baseline is None or value is None or baseline <= 0:
+                continue
+            if key == 'run_time' and baseline < min_time:
+                continue
+            change = (value - baseline) / baseline
+            if change > threshold:
+                regressions.append((test, key, baseline, value, change))
+    return regressions
+
+
+def write_report(regressions):
+    """
+    Write the list of regressions to the screen
+
+    """
+    if len(regressions) < 1:
+        print('no regressions found')
+        return
+    line = '{:40s} {:10s} {:>15s} {:>15s} {:>10s}'.format('TEST', 'VALUE',
+                                                           'BASELINE',
+                                                           'LAST', 'CHANGE')
+    print(line)
+    for test, key, baseline, value, change in regressions:
+        line = '{:40s} {:10s} {:15g} {:15g} {:9.1f}%'.format(test, key,
+                                                             baseline, value,
+                                                             100. * change)
+        print(line)
+    return
+
+
+def main():
+    threshold = 0.2
+    window = 10
+    min_time = 0.1
+    test = None
+    fpth = None
+    for idx, arg in enumerate(sys.argv):
+        if arg == '--threshold':
+            threshold = float(sys.argv[idx + 1])
+        elif arg == '--window':
+            window = int(sys.argv[idx + 1])
+        elif arg == '--min_time':
+            min_time = float(sys.argv[idx + 1])
+        elif arg == '--test':
+            test = sys.argv[idx + 1]
+        elif arg == '--db':
+            fpth = sys.argv[idx + 1]
+    records = load_records(fpth=fpth, test=test)
+    print('{} records in {}'.format(len(records), fpth or db_file))
+    regressions = get_regressions(records, threshold=threshold,
+                                  window=window, min_time=min_time)
+    write_report(regressions)
+    return len(regressions)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,512 @@
+"""
+Run the MODFLOW 6 autotests in parallel.
+
+The test modules are collected in a pool of worker processes (collecting a
+module builds its models), the resulting Simulation objects are sorted so
+that the tests with the longest historical run times are started first, and
+the simulations are then fanned out over the pool. Pass/fail status and
+timings are collected centrally and the run time history is updated so the
+next run can be ordered better.
+
+Run from the autotest directory:
+
+    python scheduler.py
+    python scheduler.py -n 16
+    python scheduler.py test_gwf_csub_sub01.py test_gwt_adv01_fmi.py
+    python scheduler.py --pak csub+mvr maw
+
+The --pak option selects the test modules that use the packages (CSUB and
+MVR, or MAW in the example) from the package index in testmodels.py.
+
+Test modules that do not consist of a single test_mf6model() generator are
+run as a single unit, in the order nose would run their test functions.
+
+"""
+
+import os
+import sys
+import json
+import time
+import inspect
+import importlib
+import traceback
+import multiprocessing
+
+# make sure the test modules and their relative paths can be found
+autotest_dir = os.path.dirname(os.path.abspath(__file__))
+if autotest_dir not in sys.path:
+    sys.path.insert(0, autotest_dir)
+os.chdir(autotest_dir)
+
+import targets
+import runtimes
+import testmodels
+from simulation import Simulation
+
+sfmt = '{:25s} - {}'
+
+# test modules that are not part of a regular autotest run
+exclude_modules = ('test000_setup',)
+
+# test modules that start worker processes, these cannot run in the
+# (daemonic) pool workers and are run one at a time in a separate process
+process_modules = ('test_gwf_libmf6_ensemble01',)
+
+# run time history used to order the tests
+history_file = os.path.join(autotest_dir, '.scheduler_times.json')
+
+# scratch space for the workers
+scheduler_dir = os.path.join('temp', 'scheduler')
+
+
+def get_test_modules(files=None):
+    """
+    Get a sorted list of test module names
+
+    """
+    if files is None or len(files) < 1:
+        files = [f for f in os.listdir(autotest_dir)
+                 if f.startswith('test') and f.endswith('.py')]
+    modules = []
+    for f in files:
+        name = os.path.splitext(os.path.basename(f))[0]
+        if name in exclude_modules:
+            continue
+        if name not in modules:
+            modules.append(name)
+    return sorted(modules)
+
+
+def load_history():
+    """
+    Load the run time history of previous scheduler runs
+
+    """
+    history = {}
+    if os.path.isfile(history_file):
+        try:
+            with open(history_file, 'r') as f:
+                history = json.load(f)
+        except (ValueError, OSError):
+            print('could not read {}'.format(history_file))
+            history = {}
+    return history
+
+
+def save_history(history, results):
+    """
+    Update the run time history with the timings of the current run
+
+    """
+    for result in results:
+        if result['success']:
+            history[result['key']] = result['elapsed']
+    with open(history_file, 'w') as f:
+        json.dump(history, f, indent=1, sort_keys=True)
+    return
+
+
+def get_cost(history, key, label=None, baseline=None):
+    """
+    Estimated cost of a task, tasks without a history are run first. The
+    MODFLOW 6 run times in the run time database are used for tasks that
+    have not been run by the scheduler before.
+
+    """
+    if key in history:
+        return history[key]
+    if label is not None and baseline is not None:
+        test = runtimes.get_test_name(label)
+        if test in baseline:
+            return baseline[test]
+    return float('inf')
+
+
+def get_baseline():
+    """
+    Median MODFLOW 6 run time for every test in the run time database
+
+    """
+    baseline = {}
+    history = runtimes.get_history(runtimes.load_records())
+    for test, runs in history.items():
+        values = [run['run_time'] for run in runs
+                  if run['run_time'] is not None]
+        if len(values) > 0:
+            baseline[test] = runtimes.median(values)
+    return baseline
+
+
+def init_worker():
+    """
+    Set up an isolated workspace for a worker process
+
+    """
+    os.chdir(autotest_dir)
+    pth = os.path.join(scheduler_dir,
+                       'worker-{}'.format(os.getpid()))
+    if not os.path.isdir(pth):
+        os.makedirs(pth)
+    # temporary files created by flopy, pymake, etc. stay in the workspace
+    os.environ['TMPDIR'] = os.path.abspath(pth)
+    os.environ['TEMP'] = os.environ['TMP'] = os.environ['TMPDIR']
+    return
+
+
+def redirect_output(logfile):
+    """
+    Redirect stdout and stderr of the worker (including output from
+    child processes and shared libraries) to logfile
+
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = (os.dup(1), os.dup(2))
+    f = open(logfile, 'w')
+    os.dup2(f.fileno(), 1)
+    os.dup2(f.fileno(), 2)
+    return f, saved
+
+
+def restore_output(f, saved):
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(saved[0], 1)
+    os.dup2(saved[1], 2)
+    os.close(saved[0])
+    os.close(saved[1])
+    f.close()
+    return
+
+
+def get_logfile(key):
+    name = key.replace(os.sep, '_').replace('/', '_').replace(':', '-')
+    return os.path.join(scheduler_dir, name + '.log')
+
+
+def is_simulation_module(module):
+    """
+    Determine if a test module can be fanned out into Simulation objects
+
+    """
+    tests = [name for name, obj in inspect.getmembers(module)
+             if name.startswith('test') and inspect.isfunction(obj) and
+             obj.__module__ == module.__name__]
+    return tests == ['test_mf6model'] and \
+           inspect.isgeneratorfunction(module.test_mf6model)
+
+
+def collect_module(name):
+    """
+    Import a test module and collect its test cases
+
+    A test case is a tuple with a unique key, the module name, a label,
+    and the callable and arguments that are run in the worker.
+
+    """
+    t0 = time.time()
+    logfile = get_logfile(name + '-collect')
+    f, saved = redirect_output(logfile)
+    tasks = []
+    msg = None
+    try:
+        module = importlib.import_module(name)
+        if is_simulation_module(module):
+            for item in module.test_mf6model():
+                func, args = item[0], tuple(item[1:])
+                sim = None
+                for arg in args:
+                    if isinstance(arg, Simulation):
+                        sim = arg
+                        break
+                if sim is None:
+                    label = '{}{}'.format(func.__name__, args)
+                else:
+                    label = sim.name
+                key = '{}:{}'.format(name, label)
+                # executable replacements are made on the global
+                # target_dict when a Simulation is created
+                tasks.append((key, name, label, func, args,
+                              dict(targets.target_dict)))
+        else:
+            tasks.append((name, name, name, None, (),
+                          dict(targets.target_dict)))
+    except:
+        msg = traceback.format_exc()
+    finally:
+        restore_output(f, saved)
+    return name, tasks, time.time() - t0, msg
+
+
+def run_module(module):
+    """
+    Run all of the test functions in a test module in definition order
+
+    """
+    tests = [(obj.__code__.co_firstlineno, name, obj)
+             for name, obj in inspect.getmembers(module)
+             if name.startswith('test') and inspect.isfunction(obj) and
+             obj.__module__ == module.__name__]
+    for lineno, name, test in sorted(tests):
+        print(sfmt.format('Running test function', name))
+        if inspect.isgeneratorfunction(test):
+            for item in test():
+                item[0](*item[1:])
+        else:
+            test()
+    return
+
+
+def run_task(task):
+    """
+    Run a single test case in a worker process
+
+    """
+    key, name, label, func, args, target_dict = task
+    result = {'key': key, 'module': name, 'name': label, 'success': False,
+              'elapsed': 0., 'message': '', 'worker': os.getpid()}
+    targets.target_dict.clear()
+    targets.target_dict.update(target_dict)
+    logfile = get_logfile(key)
+    f, saved = redirect_output(logfile)
+    t0 = time.time()
+    try:
+        if func is None:
+            run_module(importlib.import_module(name))
+        else:
+            func(*args)
+        result['success'] = True
+    except:
+        result['message'] = traceback.format_exc()
+    finally:
+        result['elapsed'] = time.time() - t0
+        restore_output(f, saved)
+    result['logfile'] = logfile
+    return result
+
+
+def uses_libmf6(task):
+    """
+    Tests driving the shared library run in a fresh process, libmf6 can be
+    initialized again after it is finalized but a test that fails before
+    libmf6 is finalized leaves the library unusable in the process
+
+    """
+    for arg in task[4]:
+        if isinstance(arg, Simulation) and arg.bmifunc is not None:
+            return True
+    return 'libmf6' in task[1]
+
+
+def process_main(conn, task):
+    """
+    Run a single test case in a separate process and send the result
+
+    """
+    init_worker()
+    conn.send(run_task(task))
+    conn.close()
+    return
+
+
+def run_process(task):
+    """
+    Run a test case that starts worker processes in a separate process
+
+    """
+    conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=process_main,
+                                      args=(child_conn, task))
+    process.start()
+    child_conn.close()
+    try:
+        result = conn.recv()
+    except EOFError:
+        result = {'key': task[0], 'module': task[1], 'name': task[2],
+                  'success': False, 'elapsed': 0., 'worker': process.pid,
+                  'logfile': get_logfile(task[0]),
+                  'message': 'process died with exit code '
+                             '{}'.format(process.exitcode)}
+    process.join()
+    conn.close()
+    return result
+
+
+def run_tasks(tasks, nproc):
+    """
+    Fan the tasks out over the worker pools and return the results in the
+    order they finish
+
+    """
+    separate = [task for task in tasks if task[1] in process_modules]
+    pooled = [task for task in tasks if task[1] not in process_modules]
+    regular = [task for task in pooled if not uses_libmf6(task)]
+    fresh = [task for task in pooled if uses_libmf6(task)]
+
+    nfresh = 0
+    if len(fresh) > 0:
+        nfresh = min(len(fresh), max(1, nproc // 4))
+        if len(regular) < 1:
+            nfresh = min(len(fresh), nproc)
+    nregular = max(1, nproc - nfresh)
+
+    pools = []
+    pending = []
+    if len(regular) > 0:
+        pool = multiprocessing.Pool(nregular, initializer=init_worker)
+        pools.append(pool)
+        pending.append(pool.imap_unordered(run_task, regular, chunksize=1))
+    if len(fresh) > 0:
+        pool = multiprocessing.Pool(nfresh, initializer=init_worker,
+                                    maxtasksperchild=1)
+        pools.append(pool)
+        pending.append(pool.imap_unordered(run_task, fresh, chunksize=1))
+    # the separate processes are started when the pools are done
+    pending.append(map(run_process, separate))
+
+    results = []
+    ntasks = len(tasks)
+    for iterator in pending:
+        for result in iterator:
+            results.append(result)
+            if result['success']:
+                status = 'passed'
+            else:
+                status = 'FAILED'
+            msg = '{:4d}/{:4d} {:6s} {:10.2f} s  {}'.format(len(results),
+                                                             ntasks, status,
+                                                             result['elapsed'],
+                                                             result['key'])
+            print(msg)
+    for pool in pools:
+        pool.close()
+        pool.join()
+    return results
+
+
+def write_summary(results, wall_time):
+    """
+    Write a summary of the scheduler run and return the number of failures
+
+    """
+    failed = [result for result in results if not result['success']]
+    serial_time = sum([result['elapsed'] for result in results])
+
+    print('\nslowest tests:')
+    results = sorted(results, key=lambda r: r['elapsed'], reverse=True)
+    for result in results[:10]:
+        print('  {:10.2f} s  {}'.format(result['elapsed'], result['key']))
+
+    if len(failed) > 0:
+        print('\nfailed tests:')
+        for result in failed:
+            print('  {} (see {})'.format(result['key'], result['logfile']))
+            print(result['message'])
+
+    print('\n{} tests, {} passed, {} failed'.format(len(results),
+                                                    len(results) - len(failed),
+                                                    len(failed)))
+    print('summed test time {:.2f} s'.format(serial_time))
+    print('wall time        {:.2f} s'.format(wall_time))
+    if wall_time > 0.:
+        print('speedup          {:.2f}'.format(serial_time / wall_time))
+    return len(failed)
+
+
+def run_scheduler(files=None, nproc=None):
+    """
+    Collect and run the test modules in parallel
+
+    """
+    if nproc is None:
+        nproc = multiprocessing.cpu_count()
+    t0 = time.time()
+
+    if not os.path.isdir(scheduler_dir):
+        os.makedirs(scheduler_dir)
+
+    history = load_history()
+    modules = get_test_modules(files)
+    modules = sorted(modules, key=lambda m: get_cost(history, m + '-collect'),
+                     reverse=True)
+    print(sfmt.format('Collecting test modules', len(modules)))
+
+    tasks = []
+    results = []
+    pool = multiprocessing.Pool(nproc, initializer=init_worker,
+                                maxtasksperchild=1)
+    for name, mtasks, elapsed, msg in pool.imap_unordered(collect_module,
+                                                          modules):
+        history[name + '-collect'] = elapsed
+        if msg is not None:
+            results.append({'key': name, 'module': name, 'name': name,
+                            'success': False, 'elapsed': elapsed,
+                            'message': msg, 'worker': None,
+                            'logfile': get_logfile(name + '-collect')})
+            print(sfmt.format('Could not collect', name))
+        tasks += mtasks
+    pool.close()
+    pool.join()
+
+    # make sure simulations do not share a workspace
+    keys = {}
+    for task in tasks:
+        for arg in task[4]:
+            if isinstance(arg, Simulation):
+                pth = os.path.abspath(arg.name)
+                msg = '{} and {} use the same workspace'.format(keys.get(pth),
+                                                                task[0])
+                assert pth not in keys, msg
+                keys[pth] = task[0]
+
+    # longest processing time first
+    baseline = get_baseline()
+    tasks = sorted(tasks, key=lambda t: get_cost(history, t[0], t[2],
+                                                 baseline),
+                   reverse=True)
+    print(sfmt.format('Running tests', len(tasks)))
+    print(sfmt.format('Number of processes', nproc))
+    results += run_tasks(tasks, nproc)
+
+    save_history(history, results)
+    return write_summary(results, time.time() - t0)
+
+
+def get_package_modules(packages, files=None):
+    """
+    Test modules that use the packages, see testmodels.parse_packages()
+
+    """
+    index = testmodels.ModuleIndex(autotest_dir)
+    modules = index.query(get_test_modules(files), packages)
+    print(sfmt.format('Selected packages', ' '.join(packages)))
+    return [name + '.py' for name in modules]
+
+
+def main():
+    nproc = None
+    files = []
+    packages = None
+    for idx, arg in enumerate(sys.argv[1:]):
+        if arg in ('-n', '--nproc'):
+            nproc = int(sys.argv[idx + 2])
+        elif arg == '--pak':
+            packages = []
+            for item in sys.argv[idx + 2:]:
+                if item.startswith('-') or item.endswith('.py'):
+                    break
+                packages.append(item)
+        elif arg.endswith('.py'):
+            files.append(arg)
+    if packages is not None:
+        files = get_package_modules(packages, files)
+        if len(files) < 1:
+            print('no test modules use the selected packages')
+            return 0
+    nfail = run_scheduler(files=files, nproc=nproc)
+    return nfail
+
+
+if __name__ == "__main__":
+    print('standalone run of {}'.format(os.path.basename(__file__)))
+    sys.exit(main())
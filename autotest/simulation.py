@@ -1,6 +1,5 @@
 import os
 import sys
-import shutil
 import time
 
 try:
@@ -20,6 +19,10 @@ except:
     raise Exception(msg)
 
 import targets
+import runtimes
+import mpi_util
+import workspace
+import head_file_compare
 
 sfmt = '{:25s} - {}'
 
@@ -27,11 +30,13 @@ sfmt = '{:25s} - {}'
 class Simulation(object):
     def __init__(self, name, exfunc=None, exe_dict=None, htol=None,
                  idxsim=None, cmp_verbose=True, require_failure=None,
-                 bmifunc=None):
+                 bmifunc=None, nranks=None):
         delFiles = True
         for idx, arg in enumerate(sys.argv):
             if arg.lower() == '--keep':
                 delFiles = False
+            elif arg.lower() == '--nranks':
+                nranks = int(sys.argv[idx + 1])
             elif arg[2:].lower() in list(targets.target_dict.keys()):
                 key = arg[2:].lower()
                 exe0 = targets.target_dict[key]
@@ -67,6 +72,13 @@ class Simulation(object):
         self.coutp = None
         self.bmifunc = bmifunc
 
+        # number of MPI ranks of the parallel run that is compared with
+        # the serial run
+        if nranks is not None and nranks < 2:
+            nranks = None
+        self.nranks = nranks
+        self.mpi_ws = None
+
         # set htol for comparisons
         if htol is None:
             htol = 0.001
@@ -87,6 +99,13 @@ class Simulation(object):
 
         self.delFiles = delFiles
         self.success = False
+
+        # timing results
+        self.exe = None
+        self.run_time = None
+        self.cmp_time = None
+        self.peak_rss = None
+        self.mpi_time = None
         return
 
     def __repr__(self):
@@ -119,23 +138,21 @@ class Simulation(object):
         self.originpath = src
         self.simpath = dst
         # write message
-        print('running pymake.setup_mf6 from ' +
+        print('running workspace.setup_mf6 from ' +
               '{}'.format(os.path.abspath(os.getcwd())))
         try:
-            self.inpt, self.outp = pymake.setup_mf6(src=src, dst=dst)
-            print('waiting...')
-            time.sleep(0.5)
+            self.inpt, self.outp = workspace.setup_mf6(src=src, dst=dst)
             success = True
         except:
             success = False
             print('source:      {}'.format(src))
             print('destination: {}'.format(dst))
-        assert success, 'did not run pymake.setup_mf6'
+        assert success, 'did not run workspace.setup_mf6'
 
-        # Copy comparison simulations if available
+        # Link comparison simulations if available
         if success:
-            action = pymake.setup_mf6_comparison(src, dst,
-                                                 remove_existing=self.delFiles)
+            action = workspace.setup_mf6_comparison(
+                src, dst, remove_existing=self.delFiles)
 
             self.action = action
         return
@@ -155,9 +172,14 @@ class Simulation(object):
         exe = os.path.abspath(targets.target_dict[target])
         msg = sfmt.format('using executable', exe)
         print(msg)
+        self.exe = exe
+        t0 = time.time()
         try:
-            success, buff = flopy.run_model(exe, nam, model_ws=self.simpath,
-                                            silent=False, report=True)
+            with runtimes.PeakMemory() as mem:
+                success, buff = flopy.run_model(exe, nam,
+                                                model_ws=self.simpath,
+                                                silent=False, report=True)
+            self.peak_rss = mem.peak_rss
             msg = sfmt.format('MODFLOW 6 run', self.name)
             if success:
                 print(msg)
@@ -167,6 +189,7 @@ class Simulation(object):
             msg = sfmt.format('MODFLOW 6 run', self.name)
             print(msg)
             success = False
+        self.run_time = time.time() - t0
 
         if self.require_failure is None:
             assert success
@@ -216,6 +239,36 @@ class Simulation(object):
 
                     assert success_cmp
 
+        if success and self.nranks is not None and \
+                self.require_failure is None:
+            self.run_mpi()
+
+        return
+
+    def run_mpi(self):
+        """
+        Run the model with nranks MPI ranks in a subfolder of the
+        simulation folder and assert if all ranks terminated successfully.
+        Only the serial run is used when the simulation has fewer GWF models
+        than nranks.
+        """
+        models = mpi_util.get_models(os.path.join(self.simpath, 'mfsim.nam'))
+        ngwf = len([m for m in models if m[0] == 'GWF6'])
+        if self.nranks > ngwf:
+            msg = sfmt.format('MPI run skipped',
+                              '{} has {} GWF models'.format(self.name, ngwf))
+            print(msg)
+            return
+        msg = sfmt.format('MPI run ({} ranks)'.format(self.nranks),
+                          self.name)
+        print(msg)
+        self.mpi_ws = mpi_util.setup_mpi(self.simpath, self.nranks)
+        success, self.mpi_time = mpi_util.run_mpi(self.mpi_ws, self.nranks,
+                                                  exe=self.exe)
+        if not success:
+            fpth = os.path.join(self.mpi_ws, 'mpiexec.stdout')
+            print(sfmt.format('MPI run failed', fpth))
+        assert success, msg
         return
 
     def compare(self):
@@ -227,9 +280,10 @@ class Simulation(object):
         msgall = ''
         msg = sfmt.format('Comparison test', self.name)
         print(msg)
+        t0 = time.time()
 
         extdict = {'hds': 'head', 'hed': 'head', 'bhd': 'head',
-                   'ucn': 'concentration'}
+                   'ahd': 'head', 'ucn': 'concentration'}
 
         success_tst = False
         if self.action is not None:
@@ -317,17 +371,18 @@ class Simulation(object):
                             print(txt)
 
                 # make comparison
-                success_tst = pymake.compare_heads(None, pth,
-                                                   precision='double',
-                                                   text=extdict[ext],
-                                                   outfile=outfile,
-                                                   files1=file1,
-                                                   files2=file2,
-                                                   htol=self.htol,
-                                                   difftol=True,
-                                                   # Change to true to have list of all nodes exceeding htol
-                                                   verbose=self.cmp_verbose,
-                                                   exfile=exfile)
+                success_tst = head_file_compare.compare_heads(
+                    None, pth,
+                    precision='auto',
+                    text=extdict[ext],
+                    outfile=outfile,
+                    files1=file1,
+                    files2=file2,
+                    htol=self.htol,
+                    difftol=True,
+                    # Change to true to have list of all nodes exceeding htol
+                    verbose=self.cmp_verbose,
+                    exfile=exfile)
                 msg = sfmt.format('{} comparison {}'.format(extdict[ext],
                                                             ipos + 1),
                                   self.name)
@@ -340,9 +395,44 @@ class Simulation(object):
                     self.success = False
                     msgall += msg + '\n'
 
+        # compare the parallel run with the serial run
+        if self.mpi_ws is not None:
+            success_tst = mpi_util.compare_outputs(self.simpath, self.mpi_ws,
+                                                   htol=self.htol,
+                                                   verbose=self.cmp_verbose)
+            msg = sfmt.format('MPI comparison', self.name)
+            print(msg)
+            if not success_tst:
+                self.success = False
+                msgall += msg + '\n'
+
+        self.cmp_time = time.time() - t0
+        self.record_runtime()
+
         assert self.success, msgall
         return
 
+    def record_runtime(self):
+        """
+        Add the timing results for the test to the run time database
+
+        """
+        if self.run_time is None:
+            return
+        listing = os.path.join(self.simpath, 'mfsim.lst')
+        runtimes.record_run(self.name, self.exe, self.success,
+                            self.run_time, cmp_time=self.cmp_time,
+                            listing=listing, peak_rss=self.peak_rss)
+        if self.mpi_time is not None:
+            listings = mpi_util.get_listings(self.mpi_ws)
+            listing = None
+            if len(listings) > 0:
+                listing = os.path.join(self.mpi_ws, listings[0])
+            runtimes.record_run('{}-np{}'.format(self.name, self.nranks),
+                                self.exe, self.success, self.mpi_time,
+                                listing=listing)
+        return
+
     def teardown(self):
         """
         Remove the example folder
@@ -353,12 +443,9 @@ class Simulation(object):
                 msg = sfmt.format('Teardown test', self.name)
                 print(msg)
 
-                # wait to delete on windows
-                if sys.platform.lower() == "win32":
-                    time.sleep(3)
-
+                # retried until the files are released on windows
                 try:
-                    shutil.rmtree(self.simpath)
+                    workspace.remove_tree(self.simpath)
                     success = True
                 except:
                     print('Could not remove test ' + self.name)
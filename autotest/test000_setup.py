@@ -6,12 +6,19 @@
 # can compile only mf6 directly using this command:
 #  python -c "import test000_setup; test000_setup.test_build_modflow6()"
 
+# mf6 and libmf6 are built incrementally and in parallel with fortran_build,
+# only the files that changed since the last build are compiled. The files
+# in src are compiled once as position independent code and are linked into
+# both mf6 and libmf6. To compile all files, run this
+# python test000_setup.py --makeclean
+
 import os
 import sys
 import shutil
 import pymake
 
 from framework import running_on_CI
+from fortran_build import FortranBuild, is_supported
 
 if running_on_CI():
     print('running on CI environment')
@@ -32,6 +39,13 @@ if sys.platform.lower() == 'win32':
 
 mfexe_pth = 'temp/mfexes'
 
+# object files shared by the incremental builds of mf6 and libmf6, kept
+# between runs
+objpth = os.path.join('..', 'obj_temp', 'pic')
+
+# remove the shared object files before the first build
+makeclean = '--makeclean' in sys.argv
+
 # some flags to check for errors in the code
 # add -Werror for compilation to terminate if errors are found
 strict_flags = ('-Wtabs -Wline-truncation -Wunused-label '
@@ -61,7 +75,40 @@ def create_dir(pth):
     return
 
 
+def get_fc():
+    fc = "gfortran"
+    for idx, arg in enumerate(sys.argv):
+        if arg == '-fc':
+            fc = sys.argv[idx + 1]
+            break
+    return fc
+
+
+def incremental_build(target, srcdirs, excludefiles=None,
+                      sharedobject=False):
+    global makeclean
+    fc = get_fc()
+    fflags = None
+    if fc == "gfortran":
+        fflags = strict_flags
+    build = FortranBuild(target, srcdirs, objpth,
+                         appdir=os.path.join('..', 'bin'), fc=fc,
+                         fflags=fflags, excludefiles=excludefiles,
+                         sharedobject=sharedobject, pic=True)
+    if makeclean:
+        build.clean()
+        makeclean = False
+    returncode = build.build()
+
+    msg = '{} does not exist.'.format(relpath_fallback(build.target))
+    assert returncode == 0, msg
+
+
 def build_mf6():
+    if is_supported(get_fc()):
+        incremental_build("mf6", [os.path.join('..', 'src')])
+        return
+
     pm = pymake.Pymake()
     pm.target = "mf6" + eext
     pm.srcdir = os.path.join('..', 'src')
@@ -80,6 +127,13 @@ def build_mf6():
 
 
 def build_mf6_so():
+    if is_supported(get_fc()):
+        incremental_build("libmf6", [os.path.join('..', 'srcbmi'),
+                                     os.path.join('..', 'src')],
+                          excludefiles=[os.path.join('..', 'src', 'mf6.f90')],
+                          sharedobject=True)
+        return
+
     pm = pymake.Pymake(verbose=True)
     pm.target = "libmf6" + soext
     pm.srcdir = os.path.join('..', 'srcbmi')
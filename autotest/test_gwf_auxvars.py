@@ -266,7 +266,7 @@ def test_mf6model():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -280,7 +280,7 @@ def main():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -254,7 +254,7 @@ def test_mf6model():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -268,7 +268,7 @@ def main():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -19,6 +19,8 @@ except:
 
 from framework import testing_framework, running_on_CI
 from simulation import Simulation
+from budget_file_reader import BudgetFileIndex
+import budget_check
 
 ex = (
     "csub_sk04a",
@@ -50,11 +52,6 @@ htol = None
 dtol = 1e-3
 budtol = 0.01
 
-bud_lst = (
-    "CSUB-CGELASTIC_IN",
-    "CSUB-CGELASTIC_OUT",
-)
-
 # static model data
 nlay, nrow, ncol = 2, 1, 2
 nper = 3
@@ -275,72 +272,19 @@ def eval_comp(sim):
     except:
         assert False, 'could not load data from "{}"'.format(fpth)
 
-    # get results from listing file
-    fpth = os.path.join(sim.simpath,
-                        '{}.lst'.format(os.path.basename(sim.name)))
-    budl = flopy.utils.Mf6ListBudget(fpth)
-    names = list(bud_lst)
-    d0 = budl.get_budget(names=names)[0]
-    dtype = d0.dtype
-    nbud = d0.shape[0]
-
-    # get results from cbc file
+    # compare the budget terms in the cbc and listing files
     cbc_bud = ('CSUB-CGELASTIC',)
-    d = np.recarray(nbud, dtype=dtype)
-    for key in bud_lst:
-        d[key] = 0.
     fpth = os.path.join(sim.simpath,
                         '{}.cbc'.format(os.path.basename(sim.name)))
-    cobj = flopy.utils.CellBudgetFile(fpth, precision='double')
-    kk = cobj.get_kstpkper()
-    times = cobj.get_times()
-    for idx, (k, t) in enumerate(zip(kk, times)):
-        for text in cbc_bud:
-            qin = 0.
-            qout = 0.
-            v = cobj.get_data(kstpkper=k, text=text)[0]
-            for kk in range(v.shape[0]):
-                for ii in range(v.shape[1]):
-                    for jj in range(v.shape[2]):
-                        vv = v[kk, ii, jj]
-                        if vv < 0.:
-                            qout -= vv
-                        else:
-                            qin += vv
-            d['totim'][idx] = t
-            d['time_step'][idx] = k[0]
-            d['stress_period'] = k[1]
-            key = '{}_IN'.format(text)
-            d[key][idx] = qin
-            key = '{}_OUT'.format(text)
-            d[key][idx] = qout
-
-    diff = np.zeros((nbud, len(bud_lst)), dtype=float)
-    for idx, key in enumerate(bud_lst):
-        diff[:, idx] = d0[key] - d[key]
-    diffmax = np.abs(diff).max()
+    cobj = BudgetFileIndex(fpth, precision='double')
+    lstfpth = os.path.join(sim.simpath,
+                           '{}.lst'.format(os.path.basename(sim.name)))
+    outfile = os.path.join(sim.simpath,
+                           '{}.bud.cmp.out'.format(os.path.basename(sim.name)))
+    diffmax = budget_check.check_budget(lstfpth, cobj, cbc_bud,
+                                        outfile=outfile)
     msg = 'maximum absolute total-budget difference ({}) '.format(diffmax)
 
-    # write summary
-    fpth = os.path.join(sim.simpath,
-                        '{}.bud.cmp.out'.format(os.path.basename(sim.name)))
-    f = open(fpth, 'w')
-    for i in range(diff.shape[0]):
-        if i == 0:
-            line = '{:>10s}'.format('TIME')
-            for idx, key in enumerate(bud_lst):
-                line += '{:>25s}'.format(key + '_LST')
-                line += '{:>25s}'.format(key + '_CBC')
-                line += '{:>25s}'.format(key + '_DIF')
-            f.write(line + '\n')
-        line = '{:10g}'.format(d['totim'][i])
-        for idx, key in enumerate(bud_lst):
-            line += '{:25g}'.format(d0[key][i])
-            line += '{:25g}'.format(d[key][i])
-            line += '{:25g}'.format(diff[i, idx])
-        f.write(line + '\n')
-    f.close()
-
     if diffmax > budtol:
         sim.success = False
         msg += 'exceeds {}'.format(dtol)
@@ -372,7 +316,7 @@ def test_mf6model():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -389,7 +333,7 @@ def main():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -19,6 +19,8 @@ except:
 
 from framework import testing_framework, running_on_CI
 from simulation import Simulation
+from budget_file_reader import BudgetFileIndex
+import budget_check
 
 cmppth = 'mf6'
 
@@ -252,7 +254,7 @@ def cbc_compare(sim):
     # open cbc file
     fpth = os.path.join(sim.simpath,
                         '{}.cbc'.format(os.path.basename(sim.name)))
-    cobj = flopy.utils.CellBudgetFile(fpth, precision='double')
+    cobj = BudgetFileIndex(fpth, precision='double')
 
     # build list of cbc data to retrieve
     avail = cobj.get_unique_record_names()
@@ -275,65 +277,19 @@ def cbc_compare(sim):
     d0 = budl.get_budget(names=names)[0]
     dtype = d0.dtype
     nbud = d0.shape[0]
-    d = np.recarray(nbud, dtype=dtype)
-    for key in bud_lst:
-        d[key] = 0.
 
 
     # get data from cbc dile
-    kk = cobj.get_kstpkper()
-    times = cobj.get_times()
-    for idx, (k, t) in enumerate(zip(kk, times)):
-        for text in cbc_bud:
-            qin = 0.
-            qout = 0.
-            v = cobj.get_data(kstpkper=k, text=text)[0]
-            if isinstance(v, np.recarray):
-                vt = np.zeros(size3d, dtype=float)
-                for jdx, node in enumerate(v['node']):
-                    vt[node - 1] += v['q'][jdx]
-                v = vt.reshape(shape3d)
-            for kk in range(v.shape[0]):
-                for ii in range(v.shape[1]):
-                    for jj in range(v.shape[2]):
-                        vv = v[kk, ii, jj]
-                        if vv < 0.:
-                            qout -= vv
-                        else:
-                            qin += vv
-            d['totim'][idx] = t
-            d['time_step'][idx] = k[0]
-            d['stress_period'] = k[1]
-            key = '{}_IN'.format(text)
-            d[key][idx] = qin
-            key = '{}_OUT'.format(text)
-            d[key][idx] = qout
-
-    diff = np.zeros((nbud, len(bud_lst)), dtype=float)
-    for idx, key in enumerate(bud_lst):
-        diff[:, idx] = d0[key] - d[key]
+    d = budget_check.get_cbc_budget(cobj, cbc_bud, dtype=dtype, size=size3d)
+
+    diff = budget_check.get_differences(d0, d, bud_lst)
     diffmax = np.abs(diff).max()
     msg = 'maximum absolute total-budget difference ({}) '.format(diffmax)
 
     # write summary
     fpth = os.path.join(sim.simpath,
                         '{}.bud.cmp.out'.format(os.path.basename(sim.name)))
-    f = open(fpth, 'w')
-    for i in range(diff.shape[0]):
-        if i == 0:
-            line = '{:>10s}'.format('TIME')
-            for idx, key in enumerate(bud_lst):
-                line += '{:>25s}'.format(key + '_LST')
-                line += '{:>25s}'.format(key + '_CBC')
-                line += '{:>25s}'.format(key + '_DIF')
-            f.write(line + '\n')
-        line = '{:10g}'.format(d['totim'][i])
-        for idx, key in enumerate(bud_lst):
-            line += '{:25g}'.format(d0[key][i])
-            line += '{:25g}'.format(d[key][i])
-            line += '{:25g}'.format(diff[i, idx])
-        f.write(line + '\n')
-    f.close()
+    budget_check.write_summary(fpth, d0, d, diff, bud_lst)
 
     if diffmax > budtol:
         sim.success = False
@@ -368,7 +324,7 @@ def test_mf6model():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -384,7 +340,7 @@ def main():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
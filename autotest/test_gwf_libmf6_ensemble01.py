@@ -0,0 +1,322 @@
+"""
+MODFLOW 6 Autotest
+Test the libmf6 ensemble runner with more realizations than workers, so
+every worker finalizes libmf6 and initializes it again for the next
+realization.  The starting heads of every realization are set through
+the bmi after the model is initialized.  The heads of the realization
+with the starting heads in the input files are compared with the heads of a single XmiWrapper run and with the heads of a
+repeated run of the same realization.
+"""
+
+import os
+import shutil
+import numpy as np
+from xmipy import XmiWrapper
+
+try:
+    import flopy
+except:
+    msg = 'Error. FloPy package is not available.\n'
+    msg += 'Try installing using the following command:\n'
+    msg += ' pip install flopy'
+    raise Exception(msg)
+
+from framework import testing_framework
+from simulation import Simulation, bmi_return
+from ensemble import EnsembleRunner
+
+ex = ['libgwf_ens01']
+exdirs = []
+for s in ex:
+    exdirs.append(os.path.join('temp', s))
+
+# temporal discretization
+nper = 3
+tdis_rc = []
+for i in range(nper):
+    tdis_rc.append((1., 1, 1))
+
+# model spatial dimensions
+nlay, nrow, ncol = 1, 11, 11
+
+# cell spacing
+delr = 10.
+delc = 10.
+
+# top of the aquifer
+top = 10.
+
+# bottom of the aquifer
+botm = 0.
+
+# hydraulic conductivity
+hk = 1.
+
+# starting head
+strt = 5.
+
+# starting heads of the realizations, the first realization uses the
+# starting head in the input files
+strt_realizations = [strt, 4., 6., 7., 8.]
+
+# number of worker processes
+nproc = 2
+
+# build chd stress period data
+chd_spd = {0: [[(0, 0, 0), strt],
+               [(0, nrow - 1, ncol - 1), strt]]}
+
+# recharge rate
+rch = 0.001
+
+# solver data
+nouter, ninner = 100, 100
+hclose, rclose, relax = 1e-9, 1e-3, 0.97
+
+
+def build_model(ws, name):
+    sim = flopy.mf6.MFSimulation(sim_name=name,
+                                 version='mf6',
+                                 exe_name='mf6',
+                                 sim_ws=ws,
+                                 memory_print_option='all')
+    # create tdis package
+    tdis = flopy.mf6.ModflowTdis(sim, time_units='DAYS',
+                                 nper=nper, perioddata=tdis_rc)
+
+    # create iterative model solution and register the gwf model with it
+    ims = flopy.mf6.ModflowIms(sim,
+                               print_option='SUMMARY',
+                               outer_dvclose=hclose,
+                               outer_maximum=nouter,
+                               under_relaxation='SIMPLE',
+                               under_relaxation_gamma=0.98,
+                               inner_maximum=ninner,
+                               inner_dvclose=hclose, rcloserecord=rclose,
+                               linear_acceleration='BICGSTAB',
+                               relaxation_factor=relax)
+
+    # create gwf model
+    newtonoptions = ['NEWTON', 'UNDER_RELAXATION']
+    gwf = flopy.mf6.ModflowGwf(sim,
+                               newtonoptions=newtonoptions,
+                               modelname=name,
+                               print_input=True,
+                               save_flows=True)
+
+    dis = flopy.mf6.ModflowGwfdis(gwf, nlay=nlay, nrow=nrow, ncol=ncol,
+                                  delr=delr, delc=delc,
+                                  top=top, botm=botm)
+
+    # initial conditions
+    ic = flopy.mf6.ModflowGwfic(gwf, strt=strt)
+
+    # node property flow
+    npf = flopy.mf6.ModflowGwfnpf(gwf, save_flows=True,
+                                  icelltype=1,
+                                  k=hk)
+
+    # storage
+    sto = flopy.mf6.ModflowGwfsto(gwf,
+                                  save_flows=True,
+                                  iconvert=1,
+                                  ss=1e-5, sy=0.1,
+                                  transient={0: True})
+
+    # chd file
+    chd = flopy.mf6.ModflowGwfchd(gwf, stress_period_data=chd_spd)
+
+    # recharge file
+    rcha = flopy.mf6.ModflowGwfrcha(gwf, recharge=rch)
+
+    # output control
+    oc = flopy.mf6.ModflowGwfoc(gwf,
+                                head_filerecord='{}.hds'.format(name),
+                                headprintrecord=[
+                                    ('COLUMNS', 10, 'WIDTH', 15,
+                                     'DIGITS', 6, 'GENERAL')],
+                                saverecord=[('HEAD', 'ALL')],
+                                printrecord=[('HEAD', 'ALL'),
+                                             ('BUDGET', 'ALL')])
+    return sim
+
+
+def get_model(idx, dir):
+    # build MODFLOW 6 files
+    ws = dir
+    name = ex[idx]
+    sim = build_model(ws, name)
+
+    # build comparison model
+    ws = os.path.join(dir, 'libmf6')
+    mc = build_model(ws, name)
+
+    return sim, mc
+
+
+def build_models():
+    for idx, dir in enumerate(exdirs):
+        sim, mc = get_model(idx, dir)
+        sim.write_simulation()
+        if mc is not None:
+            mc.write_simulation()
+    return
+
+
+def get_realizations(model_ws, name):
+    """
+    Copy the input files of the comparison model to a workspace for every
+    realization, the first realization is repeated at the end
+    """
+    head_tag = '{}/X'.format(name)
+    ens_ws = os.path.join(model_ws, 'ensemble')
+    if os.path.isdir(ens_ws):
+        shutil.rmtree(ens_ws)
+    fnames = [f for f in os.listdir(model_ws)
+              if os.path.isfile(os.path.join(model_ws, f))]
+    realizations = []
+    for i, h in enumerate(strt_realizations + strt_realizations[:1]):
+        ws = os.path.join(ens_ws, 'r{:02d}'.format(i))
+        os.makedirs(ws)
+        for f in fnames:
+            shutil.copy2(os.path.join(model_ws, f), ws)
+        realizations.append({'ws': ws,
+                             'values': {head_tag: np.full(nlay * nrow * ncol,
+                                                          h)}})
+    return realizations, os.path.join(ens_ws, 'logs')
+
+
+def run_xmi(exe, head_tag):
+    """
+    Run the comparison model in the current folder with XmiWrapper and
+    return the heads at the end of every time step
+    """
+    mf6 = XmiWrapper(exe)
+    mf6.initialize('mfsim.nam')
+    heads = []
+    current_time = mf6.get_current_time()
+    end_time = mf6.get_end_time()
+    while current_time < end_time:
+        mf6.update()
+        current_time = mf6.get_current_time()
+        heads.append(np.array(mf6.get_value(head_tag)))
+    mf6.finalize()
+    return np.array(heads)
+
+
+def check_ensemble(results, heads):
+    """
+    Compare the heads of the realizations with the heads of the XmiWrapper
+    run
+    """
+    nreal = len(strt_realizations)
+    for result in results:
+        assert result['success'], \
+            'realization {} failed:\n{}'.format(result['index'],
+                                                result['message'])
+
+    # at least one worker ran more than one realization
+    workers = [result['worker'] for result in results]
+    assert len(set(workers)) <= nproc, \
+        'realizations ran on {} workers'.format(len(set(workers)))
+    nruns = max([workers.count(worker) for worker in set(workers)])
+    assert nruns > 1, 'no worker ran more than one realization'
+
+    outputs = [list(result['outputs'].values())[0] for result in results]
+    assert outputs[0].shape == heads.shape, \
+        'ensemble heads {} differ from {}'.format(outputs[0].shape,
+                                                  heads.shape)
+
+    # realization with the starting heads in the input files, and the
+    # repeated run of the same realization
+    for i in (0, nreal):
+        diffmax = np.abs(outputs[i] - heads).max()
+        assert diffmax < 1e-9, \
+            'maximum head difference of realization {} ' \
+            '({})'.format(i, diffmax)
+
+    # the heads at the end of the first time step increase with the
+    # starting head, so every realization used its own values
+    hmax = dict([(strt_realizations[i], outputs[i][0].max())
+                 for i in range(nreal)])
+    hvalues = sorted(hmax)
+    for h0, h1 in zip(hvalues[:-1], hvalues[1:]):
+        assert hmax[h1] > hmax[h0], \
+            'maximum head for a starting head of {} ({}) is not greater ' \
+            'than for {} ({})'.format(h1, hmax[h1], h0, hmax[h0])
+    return
+
+
+def bmifunc(exe, idx, model_ws=None):
+    success = False
+
+    name = ex[idx].upper()
+    init_wd = os.path.abspath(os.getcwd())
+    head_tag = '{}/X'.format(name)
+
+    # run the ensemble before libmf6 is loaded in this process
+    realizations, logdir = get_realizations(model_ws, name)
+    try:
+        with EnsembleRunner(exe, outputs=[head_tag], nproc=nproc,
+                            every_step=True, logdir=logdir) as runner:
+            results = runner.map(realizations)
+    except Exception as e:
+        print("Failed to run the ensemble with " + exe)
+        print("with message: " + str(e))
+        return bmi_return(success, model_ws)
+
+    # single run of the comparison model
+    os.chdir(model_ws)
+    try:
+        heads = run_xmi(exe, head_tag)
+        success = True
+    except Exception as e:
+        print("Failed to run " + exe)
+        print("with message: " + str(e))
+        return bmi_return(success, model_ws)
+    finally:
+        os.chdir(init_wd)
+
+    # compare the ensemble with the single run
+    check_ensemble(results, heads)
+
+    # cleanup and return
+    return bmi_return(success, model_ws)
+
+
+# - No need to change any code below
+def test_mf6model():
+    # initialize testing framework
+    test = testing_framework()
+
+    # build the models
+    test.build_mf6_models(build_models, exdirs)
+
+    # run the test models
+    for idx, dir in enumerate(exdirs):
+        yield test.run_mf6, Simulation(dir, idxsim=idx, bmifunc=bmifunc)
+
+    return
+
+
+def main():
+    # initialize testing framework
+    test = testing_framework()
+
+    # build the models
+    test.build_mf6_models(build_models, exdirs)
+
+    # run the test models
+    for idx, dir in enumerate(exdirs):
+        sim = Simulation(dir, idxsim=idx, bmifunc=bmifunc)
+        test.run_mf6(sim)
+
+    return
+
+
+if __name__ == "__main__":
+    # print message
+    print('standalone run of {}'.format(os.path.basename(__file__)))
+
+    # run main routine
+    main()
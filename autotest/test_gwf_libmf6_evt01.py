@@ -27,6 +27,9 @@ except:
 
 from framework import testing_framework
 from simulation import Simulation, bmi_return
+from xmi_view import get_value_view
+from xmi_capture import OutputCapture, get_solve_statistics, \
+    get_solve_timing
 
 ex = ['libgwf_evt01']
 exdirs = []
@@ -169,6 +172,45 @@ def head2et_wellrate(h):
     return q * area
 
 
+def check_capture(capture, name):
+    """
+    Compare the heads and budgets captured through the XMI with the head
+    file and the listing file budget of the libmf6 run
+    """
+    fpth = '{}.hds'.format(name.lower())
+    hobj = flopy.utils.HeadFile(fpth)
+    hds = np.array([hobj.get_data(totim=t).ravel()
+                    for t in hobj.get_times()])
+    heads = capture.get_heads(name)
+    assert heads.shape == hds.shape, \
+        'captured heads {} differ from {} in {}'.format(heads.shape,
+                                                      hds.shape, fpth)
+    diffmax = np.abs(heads - hds).max()
+    assert diffmax < 1e-9, \
+        'maximum captured head difference ({})'.format(diffmax)
+    assert np.allclose(capture.get_times(), hobj.get_times()), \
+        'captured times differ from the times in {}'.format(fpth)
+
+    # the rates in the listing file are printed with 4 or 5 significant digits
+    fpth = '{}.lst'.format(name.lower())
+    budl = flopy.utils.Mf6ListBudget(fpth)
+    names = ['STO-SS_IN', 'STO-SS_OUT', 'STO-SY_IN', 'STO-SY_OUT',
+             'WEL_IN', 'WEL_OUT']
+    d0 = budl.get_budget(names=list(names))[0]
+    d = capture.get_budget(name)
+    assert d.shape[0] == d0.shape[0], \
+        'captured {} time steps, {} in {}'.format(d.shape[0], d0.shape[0],
+                                                  fpth)
+    for key in names:
+        assert np.allclose(d[key], d0[key], rtol=1e-3, atol=1e-6), \
+            'captured {} differs from the budget in {}'.format(key, fpth)
+
+    # every time step converged
+    assert capture.get_convergence()['converged'].all(), \
+        'not all time steps converged'
+    return
+
+
 def bmifunc(exe, idx, model_ws=None):
     success = False
 
@@ -203,12 +245,15 @@ def bmifunc(exe, idx, model_ws=None):
     mxit_tag = mf6.get_var_address("MXITER", "SLN_1")
     max_iter = mf6.get_value(mxit_tag)
 
-    # get copy of well data
+    # get a writable view of the well data
     well_tag = mf6.get_var_address("BOUND", name, "WEL_0")
-    well = mf6.get_value(well_tag)
+    well = get_value_view(mf6, well_tag)
     
     twell = np.zeros(ncol, dtype=np.float64)
 
+    # heads and budgets of every time step
+    capture = OutputCapture(mf6, [name])
+
     # model time loop
     idx = 0
     while current_time < end_time:
@@ -223,15 +268,21 @@ def bmifunc(exe, idx, model_ws=None):
 
         while kiter < max_iter:
 
-            # update well rate
+            # update well rate in place
             twell[:] = head2et_wellrate(head[0])
             well[:, 0] = twell[:]
-            mf6.set_value(well_tag, well)
 
             # solve with updated well rate
             has_converged = mf6.solve(1)
             kiter += 1
 
+            # the linear solver is called in every outer iteration
+            inner, dvmax, rmax = get_solve_statistics(mf6, 1)
+            if inner < 1:
+                print("no inner iterations in outer iteration "
+                      "{}".format(kiter))
+                return bmi_return(success, model_ws)
+
             if has_converged:
                 msg = "Component {}".format(1) + \
                       " converged in {}".format(kiter) + " outer iterations"
@@ -247,9 +298,15 @@ def bmifunc(exe, idx, model_ws=None):
         # finalize time step and update time
         mf6.finalize_time_step()
         current_time = mf6.get_current_time()
+        capture.record()
 
         # increment counter
         idx += 1
+    # wall clock time spent in the solution
+    timing = get_solve_timing(mf6, 1)
+    print("formulate {formulate:.3f} s, solve {solve:.3f} s, "
+          "budget {budget:.3f} s".format(**timing))
+
     # cleanup
     try:
         mf6.finalize()
@@ -257,6 +314,9 @@ def bmifunc(exe, idx, model_ws=None):
     except:
         return bmi_return(success, model_ws)
 
+    # compare the captured results with the head file and listing file
+    check_capture(capture, name)
+
     if model_ws is not None:
         os.chdir(init_wd)
 
@@ -270,7 +330,7 @@ def test_mf6model():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -284,7 +344,7 @@ def main():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -30,6 +30,7 @@ except:
 
 from framework import testing_framework
 from simulation import Simulation, bmi_return
+from xmi_batch import XmiBatch
 
 ex = ['libgwf_rch01']
 exdirs = []
@@ -192,7 +193,8 @@ def bmifunc(exe, idx, model_ws=None):
 
     # get copy of recharge array
     rch_tag = mf6.get_var_address("BOUND", name, "RCHA")
-    new_recharge = mf6.get_value(rch_tag)
+    batch = XmiBatch(mf6, [rch_tag])
+    new_recharge, = batch.get_values()
     
     # model time loop
     idx = 0
@@ -208,7 +210,7 @@ def bmifunc(exe, idx, model_ws=None):
 
         # update recharge
         new_recharge[:, 0] = rch_spd[idx] * area
-        mf6.set_value(rch_tag, new_recharge)
+        batch.set_values()
 
         while kiter < max_iter:
             has_converged = mf6.solve(1)
@@ -235,6 +237,7 @@ def bmifunc(exe, idx, model_ws=None):
 
     # cleanup
     try:
+        batch.release()
         mf6.finalize()
         success = True
     except:
@@ -253,7 +256,7 @@ def test_mf6model():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -267,7 +270,7 @@ def main():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -25,6 +25,7 @@ except:
 
 from framework import testing_framework
 from simulation import Simulation, bmi_return
+from xmi_batch import XmiBatch
 
 ex = ['libgwf_riv01']
 exdirs = []
@@ -192,7 +193,8 @@ def bmifunc(exe, idx, model_ws=None):
 
     # get copy of (multi-dim) array with river parameters
     riv_tag = mf6.get_var_address("BOUND" , name, riv_packname)
-    new_spd = mf6.get_value(riv_tag)
+    batch = XmiBatch(mf6, [riv_tag])
+    new_spd, = batch.get_values()
     
     # model time loop
     idx = 0
@@ -210,11 +212,11 @@ def bmifunc(exe, idx, model_ws=None):
             # 2D array for convenience, setting only the value for the active
             # stress period should work too)
             new_spd[:] = [riv_stage, riv_cond, riv_bot]
-            mf6.set_value(riv_tag, new_spd)
+            batch.set_values()
         else:
             # change only stage data
             new_spd[:] = [riv_stage2, riv_cond, riv_bot]
-            mf6.set_value(riv_tag, new_spd)
+            batch.set_values()
             
         kiter = 0
         mf6.prepare_solve(1)
@@ -244,6 +246,7 @@ def bmifunc(exe, idx, model_ws=None):
 
     # cleanup
     try:
+        batch.release()
         mf6.finalize()
         success = True
     except:
@@ -262,7 +265,7 @@ def test_mf6model():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -276,7 +279,7 @@ def main():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
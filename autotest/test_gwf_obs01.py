@@ -168,7 +168,7 @@ def test_mf6model():
     test = testing_framework()
 
     # build all of the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -182,7 +182,7 @@ def main():
     test = testing_framework()
 
     # build all of the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -0,0 +1,207 @@
+"""
+MODFLOW 6 Autotest
+Test the model partitioner in partition_util.py.  A transient model with
+inactive cells, heterogeneous hydraulic conductivity, constant heads,
+recharge, and wells is built with a DIS, a DISV, and a DISU grid, and is
+partitioned in DISU sub-models that are connected with GWF-GWF exchanges.
+The heads of the partitioned simulation are mapped back to the grid of the
+original model and compared with the heads of the original model.
+
+"""
+
+import os
+import numpy as np
+
+try:
+    import flopy
+except:
+    msg = 'Error. FloPy package is not available.\n'
+    msg += 'Try installing using the following command:\n'
+    msg += ' pip install flopy'
+    raise Exception(msg)
+
+from framework import testing_framework
+from simulation import Simulation
+from disu_util import get_disu_kwargs
+from partition_util import ModelPartition
+import targets
+
+ex = ['partition01a', 'partition01b', 'partition01c']
+distype = ['dis', 'disv', 'disu']
+nparts = [4, 3, 2]
+exdirs = []
+for s in ex:
+    exdirs.append(os.path.join('temp', s))
+
+# folder with the original model
+single = 'single'
+
+nlay, nrow, ncol = 2, 20, 30
+delr = delc = 10.
+top = 10.
+botm = [0., -10.]
+
+# transient stress period with a steady state stress period first
+nper = 2
+tdis_rc = [(1., 1, 1.), (10., 5, 1.2)]
+
+
+def get_model(idx, ws):
+    name = 'gwf'
+    sim = flopy.mf6.MFSimulation(sim_name=ex[idx], version='mf6',
+                                 exe_name='mf6', sim_ws=ws)
+    flopy.mf6.ModflowTdis(sim, time_units='DAYS', nper=nper,
+                          perioddata=tdis_rc)
+    ims = flopy.mf6.ModflowIms(sim, print_option='SUMMARY',
+                               outer_dvclose=1e-9, outer_maximum=50,
+                               inner_maximum=100, inner_dvclose=1e-10,
+                               rcloserecord=1e-6,
+                               linear_acceleration='BICGSTAB')
+    gwf = flopy.mf6.ModflowGwf(sim, modelname=name, save_flows=True)
+
+    idomain = np.ones((nlay, nrow, ncol), dtype=int)
+    idomain[:, 5:8, 10:12] = 0
+    k = np.exp(np.random.RandomState(idx).randn(nlay, nrow, ncol))
+    icelltype = np.ones((nlay, nrow, ncol), dtype=int)
+    icelltype[1:] = 0
+    if distype[idx] == 'dis':
+        flopy.mf6.ModflowGwfdis(gwf, nlay=nlay, nrow=nrow, ncol=ncol,
+                                delr=delr, delc=delc, top=top, botm=botm,
+                                idomain=idomain)
+        shape = (nlay, nrow, ncol)
+
+        def cellid(k, i, j):
+            return (k, i, j)
+    elif distype[idx] == 'disv':
+        vertices = []
+        for i in range(nrow + 1):
+            for j in range(ncol + 1):
+                vertices.append((len(vertices), j * delr,
+                                 (nrow - i) * delc))
+        cell2d = []
+        for i in range(nrow):
+            for j in range(ncol):
+                iv = i * (ncol + 1) + j
+                cell2d.append((i * ncol + j, (j + .5) * delr,
+                               (nrow - i - .5) * delc, 4, iv, iv + 1,
+                               iv + ncol + 2, iv + ncol + 1))
+        flopy.mf6.ModflowGwfdisv(gwf, nlay=nlay, ncpl=nrow * ncol,
+                                 nvert=len(vertices), top=top, botm=botm,
+                                 vertices=vertices, cell2d=cell2d,
+                                 idomain=idomain.reshape(nlay, -1))
+        shape = (nlay, nrow * ncol)
+
+        def cellid(k, i, j):
+            return (k, i * ncol + j)
+    else:
+        kw = get_disu_kwargs(nlay, nrow, ncol, np.ones(ncol) * delr,
+                             np.ones(nrow) * delc, top, botm)
+        kw.pop('nvert')
+        flopy.mf6.ModflowGwfdisu(gwf, idomain=idomain.ravel(),
+                                 vertical_offset_tolerance=None, **kw)
+        shape = (nlay * nrow * ncol,)
+
+        def cellid(k, i, j):
+            return ((k * nrow + i) * ncol + j,)
+
+    flopy.mf6.ModflowGwfic(gwf, strt=5.)
+    flopy.mf6.ModflowGwfnpf(gwf, save_flows=True,
+                            icelltype=icelltype.reshape(shape),
+                            k=k.reshape(shape))
+    flopy.mf6.ModflowGwfsto(gwf, iconvert=icelltype.reshape(shape), ss=1e-5,
+                            sy=0.1, steady_state={0: True},
+                            transient={1: True})
+    chd = [(cellid(0, i, 0), 8.) for i in range(nrow)] + \
+          [(cellid(0, i, ncol - 1), 3.) for i in range(nrow)]
+    flopy.mf6.ModflowGwfchd(gwf, stress_period_data={0: chd})
+    wel = [(cellid(1, 10, 15), -50.), (cellid(1, 3, 25), -20.)]
+    flopy.mf6.ModflowGwfwel(gwf, stress_period_data={1: wel})
+    rch = [(cellid(0, i, j), 1e-3) for i in range(nrow)
+           for j in range(1, ncol - 1) if idomain[0, i, j] > 0]
+    flopy.mf6.ModflowGwfrch(gwf, stress_period_data={0: rch})
+    flopy.mf6.ModflowGwfoc(gwf, head_filerecord='{}.hds'.format(name),
+                           budget_filerecord='{}.cbc'.format(name),
+                           saverecord=[('HEAD', 'ALL'), ('BUDGET', 'ALL')],
+                           printrecord=[('BUDGET', 'LAST')])
+    return sim
+
+
+def build_models():
+    for idx, dir in enumerate(exdirs):
+        ws = os.path.join(dir, single)
+        sim = get_model(idx, ws)
+        sim.write_simulation()
+
+        # partitioned simulation
+        partition = ModelPartition(ws, nparts[idx])
+        partition.write(dir)
+    return
+
+
+def eval_partition(sim):
+    print('evaluating the heads of the partitioned simulation...')
+
+    # run the original model
+    ws = os.path.join(sim.simpath, single)
+    exe = os.path.abspath(targets.target_dict['mf6'])
+    success, buff = flopy.run_model(exe, None, model_ws=ws, silent=True)
+    assert success, 'could not run the original model'
+    hobj = flopy.utils.HeadFile(os.path.join(ws, 'gwf.hds'))
+    times0 = hobj.get_times()
+    heads0 = hobj.get_alldata()
+
+    # heads of the sub-models on the grid of the original model
+    parts = np.load(os.path.join(sim.simpath, 'partition.npy'))
+    partition = ModelPartition(ws, parts=parts)
+    assert partition.nparts == nparts[sim.idxsim]
+    times, heads = partition.get_heads(sim.simpath)
+
+    assert np.allclose(times, times0), 'times are not the same'
+    heads0 = heads0.reshape(heads.shape)
+    diff = np.abs(heads - heads0).max()
+    msg = 'maximum head difference {} exceeds {}'.format(diff, sim.htol)
+    assert diff < sim.htol, msg
+
+    # the inactive cells are not in a sub-model
+    idomain = partition.grid['idomain']
+    assert (parts[idomain < 1] == -1).all()
+    return
+
+
+# - No need to change any code below
+def test_mf6model():
+    # initialize testing framework
+    test = testing_framework()
+
+    # build the models
+    test.build_mf6_models(build_models, exdirs)
+
+    # run the test models
+    for idx, dir in enumerate(exdirs):
+        yield test.run_mf6, Simulation(dir, exfunc=eval_partition,
+                                       idxsim=idx, htol=1e-6)
+
+    return
+
+
+def main():
+    # initialize testing framework
+    test = testing_framework()
+
+    # build the models
+    test.build_mf6_models(build_models, exdirs)
+
+    # run the test models
+    for idx, dir in enumerate(exdirs):
+        sim = Simulation(dir, exfunc=eval_partition, idxsim=idx, htol=1e-6)
+        test.run_mf6(sim)
+
+    return
+
+
+if __name__ == "__main__":
+    # print message
+    print('standalone run of {}'.format(os.path.basename(__file__)))
+
+    # run main routine
+    main()
@@ -19,6 +19,7 @@ except:
 
 from framework import testing_framework
 from simulation import Simulation
+from budget_file_reader import BudgetFileIndex
 
 paktest = 'lak'
 budtol = 1e-2
@@ -272,11 +273,11 @@ def eval_budget(sim):
 
     # open first cbc file
     fpth = os.path.join(sim.simpath, fname)
-    cobj0 = flopy.utils.CellBudgetFile(fpth, precision='double')
+    cobj0 = BudgetFileIndex(fpth, precision='double')
 
     # open second cbc file
     fpth = os.path.join(sim.simpath, 'mf6', fname)
-    cobj1 = flopy.utils.CellBudgetFile(fpth, precision='double')
+    cobj1 = BudgetFileIndex(fpth, precision='double')
 
     # build list of cbc data to retrieve
     avail = cobj1.get_unique_record_names()
@@ -365,7 +366,7 @@ def test_mf6model():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -379,7 +380,7 @@ def main():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
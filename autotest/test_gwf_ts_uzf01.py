@@ -11,6 +11,7 @@ except:
 
 from framework import testing_framework
 from simulation import Simulation
+from budget_file_reader import BudgetFileIndex
 
 paktest = 'uzf'
 ex = ['ts_uzf01']
@@ -379,11 +380,11 @@ def eval_model(sim):
 
     # open first gwf cbc file
     fpth = os.path.join(sim.simpath, fname)
-    cobj0 = flopy.utils.CellBudgetFile(fpth, precision='double')
+    cobj0 = BudgetFileIndex(fpth, precision='double')
 
     # open second gwf cbc file
     fpth = os.path.join(sim.simpath, 'mf6', fname)
-    cobj1 = flopy.utils.CellBudgetFile(fpth, precision='double')
+    cobj1 = BudgetFileIndex(fpth, precision='double')
 
     # define file path and evaluate difference
     fname = '{}.cbc.cmp.out'.format(os.path.basename(sim.name))
@@ -394,11 +395,11 @@ def eval_model(sim):
     fname = '{}.{}.cbc'.format(os.path.basename(sim.name), paktest)
     # open first sfr cbc file
     fpth = os.path.join(sim.simpath, fname)
-    cobj0 = flopy.utils.CellBudgetFile(fpth, precision='double')
+    cobj0 = BudgetFileIndex(fpth, precision='double')
 
     # open second sfr cbc file
     fpth = os.path.join(sim.simpath, 'mf6', fname)
-    cobj1 = flopy.utils.CellBudgetFile(fpth, precision='double')
+    cobj1 = BudgetFileIndex(fpth, precision='double')
 
     # define file path and evaluate difference
     fname = '{}.{}.cbc.cmp.out'.format(os.path.basename(sim.name), paktest)
@@ -520,7 +521,7 @@ def test_mf6model():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -534,7 +535,7 @@ def main():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
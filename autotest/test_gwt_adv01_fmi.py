@@ -19,7 +19,8 @@ except:
 
 from framework import testing_framework
 from simulation import Simulation
-from binary_file_writer import write_head, write_budget, uniform_flow_field
+from binary_file_writer import BinaryFileWriter, BudgetRecord, \
+    uniform_flow_field
 
 ex = ['adv01a_fmi', 'adv01b_fmi', 'adv01c_fmi']
 scheme = ['upstream', 'central', 'tvd']
@@ -106,9 +107,9 @@ def get_model(idx, dir):
 
     # create a heads file with head equal top
     fname = os.path.join(ws, 'myhead.hds')
-    with open(fname, 'wb') as fbin:
-        for kstp in range(1): #nstp[0]):
-            write_head(fbin, top * np.ones((nrow, ncol)), kstp=kstp + 1)
+    kstp = np.arange(1) + 1  # nstp[0]
+    with BinaryFileWriter(fname) as fbin:
+        fbin.write_heads(top * np.ones((nrow, ncol)), kstp=kstp)
 
 
     # create a budget file
@@ -130,21 +131,21 @@ def get_model(idx, dir):
                    ('FLOW', np.float64),
                    ('SATURATION', np.float64),
                    ])
-    sat = np.array([(i, i, 0., 1.) for i in range(nlay * nrow * ncol)], dtype=dt)
+    sat = np.zeros(nlay * nrow * ncol, dtype=dt)
+    sat['ID1'] = np.arange(nlay * nrow * ncol)
+    sat['ID2'] = sat['ID1']
+    sat['SATURATION'] = 1.
 
     fname = os.path.join(ws, 'mybudget.bud')
-    with open(fname, 'wb') as fbin:
-        for kstp in range(1): #nstp[0]):
-            write_budget(fbin, flowja, kstp=kstp + 1)
-            write_budget(fbin, spdis, text='      DATA-SPDIS', imeth=6,
-                         kstp=kstp + 1)
-            write_budget(fbin, sat, text='        DATA-SAT', imeth=6,
-                         kstp=kstp + 1)
-            write_budget(fbin, wel, text='             WEL', imeth=6,
-                         text2id2='           WEL-1', kstp=kstp + 1)
-            write_budget(fbin, chd, text='             CHD', imeth=6,
-                         text2id2='           CHD-1', kstp=kstp + 1)
-    fbin.close()
+    records = [BudgetRecord(flowja),
+               BudgetRecord(spdis, text='      DATA-SPDIS', imeth=6),
+               BudgetRecord(sat, text='        DATA-SAT', imeth=6),
+               BudgetRecord(wel, text='             WEL', imeth=6,
+                            text2id2='           WEL-1'),
+               BudgetRecord(chd, text='             CHD', imeth=6,
+                            text2id2='           CHD-1')]
+    with BinaryFileWriter(fname) as fbin:
+        fbin.write_budgets(records, kstp=kstp)
 
 
     # flow model interface
@@ -308,7 +309,7 @@ def test_mf6model():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
@@ -322,7 +323,7 @@ def main():
     test = testing_framework()
 
     # build the models
-    build_models()
+    test.build_mf6_models(build_models, exdirs)
 
     # run the test models
     for idx, dir in enumerate(exdirs):
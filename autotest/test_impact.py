@@ -0,0 +1,42 @@
+"""
+MODFLOW 6 Autotest
+Test the change-impact selection in impact.py.  A change in the source file
+of the recharge or evapotranspiration package selects the test modules
+that use the list based and the array based package.
+
+"""
+
+import os
+
+import impact
+
+cases = (('src/Model/GroundWaterFlow/gwf3rch8.f90', 'RCH6',
+          ('test_gwf_rch01.py', 'test_gwf_libmf6_rch01.py')),
+         ('src/Model/GroundWaterFlow/gwf3evt8.f90', 'EVT6',
+          ('test_gwf_evt01.py', 'test_gwf_libmf6_evt01.py')))
+
+
+def test_package_source():
+    for fpth, ftype, names in cases:
+        selection = impact.Impact([fpth], fallback='none')
+        assert ftype in selection.ftypes, \
+            '{} is not mapped to {}: {}'.format(fpth, ftype,
+                                                sorted(selection.ftypes))
+        modules = selection.get_modules()
+        for name in names:
+            assert name in modules, \
+                '{} is not selected for {}'.format(name, fpth)
+    return
+
+
+def main():
+    test_package_source()
+    return
+
+
+if __name__ == "__main__":
+    # print message
+    print('standalone run of {}'.format(os.path.basename(__file__)))
+
+    # run main routine
+    main()
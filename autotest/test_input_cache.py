@@ -0,0 +1,91 @@
+"""
+MODFLOW 6 Autotest
+Test that the cache key of the input files written by a test module changes
+when the test module or one of the local modules it imports changes, and
+does not change when an unrelated module changes.
+
+"""
+
+import os
+import shutil
+
+import input_cache
+
+ws = os.path.join('temp', 'input_cache01')
+
+exdirs = [os.path.join('temp', 'cached01')]
+
+sources = {'test_cached01.py': 'import os\n'
+                               'import cached_util\n'
+                               'from cached_grid import get_grid\n',
+           'cached_util.py': 'value = 1\n',
+           'cached_grid.py': 'def get_grid():\n'
+                             '    from cached_geometry import delr\n'
+                             '    return delr\n',
+           'cached_geometry.py': 'delr = 1.\n',
+           'unrelated.py': 'value = 1\n'}
+
+
+def write_sources():
+    if os.path.isdir(ws):
+        shutil.rmtree(ws)
+    os.makedirs(ws)
+    for fname, source in sources.items():
+        with open(os.path.join(ws, fname), 'w') as f:
+            f.write(source)
+    return os.path.join(ws, 'test_cached01.py')
+
+
+def edit(fname, source):
+    with open(os.path.join(ws, fname), 'a') as f:
+        f.write(source)
+    return
+
+
+def test_local_modules():
+    fpth = write_sources()
+    modules = [os.path.basename(m)
+               for m in input_cache.get_local_modules(fpth)]
+    assert modules[0] == 'test_cached01.py', \
+        'the test module is not the first module: {}'.format(modules)
+    assert sorted(modules[1:]) == ['cached_geometry.py', 'cached_grid.py',
+                                   'cached_util.py'], \
+        'unexpected local modules: {}'.format(modules)
+    shutil.rmtree(ws)
+    return
+
+
+def test_key():
+    fpth = write_sources()
+    key = input_cache.get_key(fpth, exdirs)
+    assert input_cache.get_key(fpth, exdirs) == key, \
+        'the key of the same sources changed'
+
+    # a module that is not imported does not change the key
+    edit('unrelated.py', 'value = 2\n')
+    assert input_cache.get_key(fpth, exdirs) == key, \
+        'the key changed after editing a module that is not imported'
+
+    # helpers that are imported directly and through another helper
+    for fname in ('cached_util.py', 'cached_geometry.py', 'test_cached01.py'):
+        edit(fname, 'changed = True\n')
+        new_key = input_cache.get_key(fpth, exdirs)
+        assert new_key != key, \
+            'the key did not change after editing {}'.format(fname)
+        key = new_key
+    shutil.rmtree(ws)
+    return
+
+
+def main():
+    test_local_modules()
+    test_key()
+    return
+
+
+if __name__ == "__main__":
+    # print message
+    print('standalone run of {}'.format(os.path.basename(__file__)))
+
+    # run main routine
+    main()
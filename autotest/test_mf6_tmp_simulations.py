@@ -1,14 +1,6 @@
 import os
 import sys
 
-try:
-    import pymake
-except:
-    msg = 'Error. Pymake package is not available.\n'
-    msg += 'Try installing using the following command:\n'
-    msg += ' pip install https://github.com/modflowpy/pymake/zipball/master'
-    raise Exception(msg)
-
 try:
     import flopy
 except:
@@ -18,9 +10,9 @@ except:
     raise Exception(msg)
 
 from simulation import Simulation
+import testmodels
 
-exdir = os.path.join('..', 'tmp_simulations')
-testpaths = os.path.join('..', exdir)
+exdir = testmodels.get_exdir('tmp_simulations')
 
 
 def get_mf6_models():
@@ -37,61 +29,11 @@ def get_mf6_models():
 
     # build list of directories with valid example files
     exclude = list(exclude + exclude_continuous_integration)
-    dirs = [d for d in os.listdir(exdir)
-            if 'test' in d and d not in exclude]
-    # sort in numerical order for case sensitive os
-    dirs = sorted(dirs, key=lambda v: (v.upper(), v[0].islower()))
+    manifest = testmodels.Manifest(exdir)
+    dirs = manifest.get_dirs(exclude=exclude)
 
     # determine if only a selection of models should be run
-    select_dirs = None
-    select_packages = None
-    for idx, arg in enumerate(sys.argv):
-        if arg.lower() == '--sim':
-            if len(sys.argv) > idx + 1:
-                select_dirs = sys.argv[idx + 1:]
-                break
-        elif arg.lower() == '--pak':
-            if len(sys.argv) > idx + 1:
-                select_packages = sys.argv[idx + 1:]
-                select_packages = [item.upper() for item in select_packages]
-                break
-
-    # determine if the selection of model is in the test models to evaluate
-    if select_dirs is not None:
-        found_dirs = []
-        for d in select_dirs:
-            if d in dirs:
-                found_dirs.append(d)
-        dirs = found_dirs
-        if len(dirs) < 1:
-            msg = 'Selected models not available in test'
-            print(msg)
-
-    # determine if the specified package(s) is in the test models to evaluate
-    if select_packages is not None:
-        found_dirs = []
-        for d in dirs:
-            pth = os.path.join(exdir, d)
-            namefiles = pymake.get_namefiles(pth)
-            ftypes = []
-            for namefile in namefiles:
-                ftype = pymake.autotest.get_mf6_ftypes(namefile,
-                                                       select_packages)
-                if ftype not in ftypes:
-                    ftypes += ftype
-            if len(ftypes) > 0:
-                ftypes = [item.upper() for item in ftypes]
-                for pak in select_packages:
-                    if pak in ftypes:
-                        found_dirs.append(d)
-                        break
-        dirs = found_dirs
-        if len(dirs) < 1:
-            msg = 'Selected packages not available ['
-            for pak in select_packages:
-                msg += ' {}'.format(pak)
-            msg += ']'
-            print(msg)
+    dirs = manifest.select(dirs)
 
     return dirs
 
@@ -128,7 +70,9 @@ def test_mf6model():
 
 
 def dir_avail():
-    avail = os.path.isdir(exdir)
+    avail = False
+    if exdir is not None:
+        avail = os.path.isdir(exdir)
     if not avail:
         print('"{}" does not exist'.format(exdir))
         print('no need to run {}'.format(os.path.basename(__file__)))
@@ -0,0 +1,109 @@
+"""
+MODFLOW 6 Autotest
+Test the decomposition of a simulation name file for a run with MPI in
+mpi_util.py.  The DIS simulation of test_gwf_partition01.py is partitioned
+in four sub-models and the copy of the simulation for a run with 2 and 4
+ranks is set up.  An MPI launcher is not needed.
+
+"""
+
+import os
+import shutil
+
+import mpi_util
+import test_gwf_partition01 as partition01
+from partition_util import ModelPartition
+
+ws = os.path.join('temp', 'mpi_util01')
+
+nparts = 4
+
+
+def build_model():
+    if os.path.isdir(ws):
+        shutil.rmtree(ws)
+    single = os.path.join(ws, partition01.single)
+    sim = partition01.get_model(0, single)
+    sim.write_simulation()
+    partition = ModelPartition(single, nparts)
+    partition.write(ws)
+    return
+
+
+def get_options(namefile):
+    options = []
+    inblock = False
+    with open(namefile, 'r') as f:
+        for line in f:
+            ll = line.strip().split()
+            if len(ll) < 2:
+                continue
+            if ll[0].upper() in ('BEGIN', 'END'):
+                inblock = ll[0].upper() == 'BEGIN' and \
+                          ll[1].upper() == 'OPTIONS'
+                continue
+            if inblock and ll[0].upper() == 'DOMAIN_DECOMPOSITION':
+                options.append(int(ll[1]))
+    return options
+
+
+def check_namefile(namefile, nranks):
+    options = get_options(namefile)
+    assert options == [nranks], \
+        'DOMAIN_DECOMPOSITION options in {}: {}'.format(namefile, options)
+    models = mpi_util.get_models(namefile)
+    gwf = [m for m in models if m[0] == 'GWF6']
+    assert len(gwf) == nparts, \
+        '{} GWF models in {}'.format(len(gwf), namefile)
+    for mtype, fname, mname, isub in gwf:
+        assert isub is not None and 1 <= isub <= nranks, \
+            'subdomain of {} is {}'.format(mname, isub)
+    assert sorted(set([m[3] for m in gwf])) == list(range(1, nranks + 1)), \
+        'not every subdomain has a model in {}'.format(namefile)
+    return
+
+
+def test_setup_mpi():
+    build_model()
+    for nranks in (2, nparts):
+        mpi_ws = mpi_util.setup_mpi(ws, nranks)
+        namefile = os.path.join(mpi_ws, 'mfsim.nam')
+        check_namefile(namefile, nranks)
+
+        # the option and the subdomains are replaced when the name file is
+        # decomposed again
+        mpi_util.set_domain_decomposition(namefile, nranks)
+        check_namefile(namefile, nranks)
+
+        # a new copy of the simulation
+        mpi_ws = mpi_util.setup_mpi(ws, nranks)
+        check_namefile(namefile, nranks)
+
+    # the serial copy is not decomposed
+    mpi_ws = mpi_util.setup_mpi(ws, 1)
+    options = get_options(os.path.join(mpi_ws, 'mfsim.nam'))
+    assert len(options) < 1, \
+        'DOMAIN_DECOMPOSITION in the serial copy: {}'.format(options)
+
+    # more ranks than GWF models
+    try:
+        mpi_util.setup_mpi(ws, nparts + 1)
+        raised = False
+    except ValueError:
+        raised = True
+    assert raised, 'no error for more ranks than GWF models'
+    shutil.rmtree(ws)
+    return
+
+
+def main():
+    test_setup_mpi()
+    return
+
+
+if __name__ == "__main__":
+    # print message
+    print('standalone run of {}'.format(os.path.basename(__file__)))
+
+    # run main routine
+    main()
@@ -0,0 +1,58 @@
+"""
+MODFLOW 6 Autotest
+Test the package index of the autotest modules in testmodels.py.  The
+flopy classes of the array based recharge and evapotranspiration packages
+(ModflowGwfrcha and ModflowGwfevta) have the same package type in the
+name file as the list based packages (RCH6 and EVT6).
+
+"""
+
+import os
+import shutil
+
+import testmodels
+
+ws = os.path.join('temp', 'testmodels01')
+
+
+def test_module_ftypes():
+    for fname, ftype in (('test_gwf_rch01.py', 'RCH6'),
+                         ('test_gwf_libmf6_evt01.py', 'EVT6')):
+        ftypes = testmodels.get_module_ftypes(fname)
+        assert ftype in ftypes, \
+            '{} is not indexed under {}: {}'.format(fname, ftype, ftypes)
+        for name in ('RCHA6', 'EVTA6'):
+            assert name not in ftypes, \
+                '{} is indexed under {}'.format(fname, name)
+    return
+
+
+def test_module_index():
+    if os.path.isdir(ws):
+        shutil.rmtree(ws)
+    os.makedirs(ws)
+    index = testmodels.ModuleIndex(fpth=os.path.join(ws, 'testmodels.json'))
+    modules = index.get_modules()
+    for pak, name in (('rch', 'test_gwf_rch01'),
+                      ('rch', 'test_gwf_libmf6_rch01'),
+                      ('evt', 'test_gwf_evt01'),
+                      ('evt', 'test_gwf_libmf6_evt01')):
+        selected = index.query(modules, [pak])
+        assert name in selected, \
+            '{} is not selected by --pak {}'.format(name, pak)
+    shutil.rmtree(ws)
+    return
+
+
+def main():
+    test_module_ftypes()
+    test_module_index()
+    return
+
+
+if __name__ == "__main__":
+    # print message
+    print('standalone run of {}'.format(os.path.basename(__file__)))
+
+    # run main routine
+    main()
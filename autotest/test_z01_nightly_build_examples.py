@@ -1,15 +1,6 @@
 import os
 import sys
 import subprocess
-import pathlib
-
-try:
-    import pymake
-except:
-    msg = 'Error. Pymake package is not available.\n'
-    msg += 'Try installing using the following command:\n'
-    msg += ' pip install https://github.com/modflowpy/pymake/zipball/master'
-    raise Exception(msg)
 
 try:
     import flopy
@@ -20,34 +11,11 @@ except:
     raise Exception(msg)
 
 from simulation import Simulation
+import testmodels
 
 
-def get_example_directory(base, fdir, subdir='mf6'):
-    exdir = None
-    for root, dirs, files in os.walk(base):
-        for d in dirs:
-            if d.startswith(fdir):
-                exdir = os.path.abspath(os.path.join(root, d, subdir))
-                break
-        if exdir is not None:
-            break
-    return exdir
-
-
-# find path to modflow6-testmodels or modflow6-testmodels.git directory
-home = os.path.expanduser('~')
-print('$HOME={}'.format(home))
-
-fdir = 'modflow6-testmodels'
-exdir = get_example_directory(home, fdir, subdir='mf6')
-if exdir is None:
-    p = pathlib.Path(os.getcwd())
-    home = os.path.abspath(pathlib.Path(*p.parts[:2]))
-    print('$HOME={}'.format(home))
-    exdir = get_example_directory(home, fdir, subdir='mf6')
-
-if exdir is not None:
-    assert os.path.isdir(exdir)
+# find path to the mf6 directory of the modflow6-testmodels repository
+exdir = testmodels.get_exdir('modflow6-testmodels', subdir='mf6')
 
 
 def get_branch():
@@ -106,10 +74,10 @@ def get_mf6_models():
 
     # build list of directories with valid example files
     if exdir is not None:
-        dirs = [d for d in os.listdir(exdir)
-                if 'test' in d and d not in exclude]
+        manifest = testmodels.Manifest(exdir)
+        dirs = manifest.get_dirs(exclude=exclude)
     else:
-        dirs = []
+        return []
 
     # exclude dev examples on master or release branches
     if 'master' in branch.lower() or 'release' in branch.lower():
@@ -120,64 +88,8 @@ def get_mf6_models():
         for d in drmv:
             dirs.remove(d)
 
-    # sort in numerical order for case sensitive os
-    if len(dirs) > 0:
-        dirs = sorted(dirs, key=lambda v: (v.upper(), v[0].islower()))
-
     # determine if only a selection of models should be run
-    select_dirs = None
-    select_packages = None
-    for idx, arg in enumerate(sys.argv):
-        if arg.lower() == '--sim':
-            if len(sys.argv) > idx + 1:
-                select_dirs = sys.argv[idx + 1:]
-                break
-        elif arg.lower() == '--pak':
-            if len(sys.argv) > idx + 1:
-                select_packages = sys.argv[idx + 1:]
-                select_packages = [item.upper() for item in select_packages]
-                break
-        elif arg.lower() == '--match':
-            if len(sys.argv) > idx + 1:
-                like = sys.argv[idx + 1]
-                dirs = [item for item in dirs if like in item]
-                break
-
-    # determine if the selection of model is in the test models to evaluate
-    if select_dirs is not None:
-        found_dirs = []
-        for d in select_dirs:
-            if d in dirs:
-                found_dirs.append(d)
-        dirs = found_dirs
-        if len(dirs) < 1:
-            msg = 'Selected models not available in test'
-            print(msg)
-
-    # determine if the specified package(s) is in the test models to evaluate
-    if select_packages is not None:
-        found_dirs = []
-        for d in dirs:
-            pth = os.path.join(exdir, d)
-            namefiles = pymake.get_namefiles(pth)
-            ftypes = []
-            for namefile in namefiles:
-                ftype = pymake.get_mf6_ftypes(namefile, select_packages)
-                if ftype not in ftypes:
-                    ftypes += ftype
-            if len(ftypes) > 0:
-                ftypes = [item.upper() for item in ftypes]
-                for pak in select_packages:
-                    if pak in ftypes:
-                        found_dirs.append(d)
-                        break
-        dirs = found_dirs
-        if len(dirs) < 1:
-            msg = 'Selected packages not available ['
-            for pak in select_packages:
-                msg += ' {}'.format(pak)
-            msg += ']'
-            print(msg)
+    dirs = manifest.select(dirs)
 
     return dirs
 
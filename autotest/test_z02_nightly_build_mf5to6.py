@@ -1,6 +1,5 @@
 import os
 import sys
-import pathlib
 
 import time
 import shutil
@@ -22,36 +21,13 @@ except:
     raise Exception(msg)
 
 from simulation import Simulation
+import testmodels
 
 from targets import target_dict as target_dict
 
 
-def get_example_directory(base, fdir, subdir='mf6'):
-    exdir = None
-    for root, dirs, files in os.walk(base):
-        for d in dirs:
-            if d.startswith(fdir):
-                exdir = os.path.abspath(os.path.join(root, d, subdir))
-                break
-        if exdir is not None:
-            break
-    return exdir
-
-
-# find path to modflow6-testmodels or modflow6-testmodels.git directory
-home = os.path.expanduser('~')
-print('$HOME={}'.format(home))
-
-fdir = 'modflow6-testmodels'
-exdir = get_example_directory(home, fdir, subdir='mf5to6')
-if exdir is None:
-    p = pathlib.Path(os.getcwd())
-    home = os.path.abspath(pathlib.Path(*p.parts[:2]))
-    print('$HOME={}'.format(home))
-    exdir = get_example_directory(home, fdir, subdir='mf5to6')
-
-if exdir is not None:
-    assert os.path.isdir(exdir)
+# find path to the mf5to6 directory of the modflow6-testmodels repository
+exdir = testmodels.get_exdir('modflow6-testmodels', subdir='mf5to6')
 
 sfmt = '{:25s} - {}'
 
@@ -2,14 +2,6 @@ import os
 import sys
 import nose
 
-try:
-    import pymake
-except:
-    msg = 'Error. Pymake package is not available.\n'
-    msg += 'Try installing using the following command:\n'
-    msg += ' pip install https://github.com/modflowpy/pymake/zipball/master'
-    raise Exception(msg)
-
 try:
     import flopy
 except:
@@ -19,18 +11,10 @@ except:
     raise Exception(msg)
 
 from simulation import Simulation
+import testmodels
 
 # find path to modflow6-largetestmodels directory
-home = os.path.expanduser('~')
-fdir = 'modflow6-largetestmodels'
-exdir = None
-for root, dirs, files in os.walk(home):
-    for d in dirs:
-        if d == fdir or d == fdir + '.git':
-            exdir = os.path.abspath(os.path.join(root, d))
-            break
-    if exdir is not None:
-        break
+exdir = testmodels.get_exdir('modflow6-largetestmodels')
 
 
 def get_mf6_models():
@@ -57,62 +41,13 @@ def get_mf6_models():
 
     # build list of directories with valid example files
     if exdir is not None:
-        dirs = [d for d in os.listdir(exdir)
-                if 'test' in d and d not in exclude]
-        # sort in numerical order for case sensitive os
-        dirs = sorted(dirs, key=lambda v: (v.upper(), v[0].islower()))
+        manifest = testmodels.Manifest(exdir)
+        dirs = manifest.get_dirs(exclude=exclude)
     else:
-        dirs = []
+        return []
 
     # determine if only a selection of models should be run
-    select_dirs = None
-    select_packages = None
-    for idx, arg in enumerate(sys.argv):
-        if arg.lower() == '--sim':
-            if len(sys.argv) > idx + 1:
-                select_dirs = sys.argv[idx + 1:]
-                break
-        elif arg.lower() == '--pak':
-            if len(sys.argv) > idx + 1:
-                select_packages = sys.argv[idx + 1:]
-                select_packages = [item.upper() for item in select_packages]
-                break
-
-    # determine if the selection of model is in the test models to evaluate
-    if select_dirs is not None:
-        found_dirs = []
-        for d in select_dirs:
-            if d in dirs:
-                found_dirs.append(d)
-        dirs = found_dirs
-        if len(dirs) < 1:
-            msg = 'Selected models not available in test'
-            print(msg)
-
-    # determine if the specified package(s) is in the test models to evaluate
-    if select_packages is not None:
-        found_dirs = []
-        for d in dirs:
-            pth = os.path.join(exdir, d)
-            namefiles = pymake.get_namefiles(pth)
-            ftypes = []
-            for namefile in namefiles:
-                ftype = pymake.get_mf6_ftypes(namefile, select_packages)
-                if ftype not in ftypes:
-                    ftypes += ftype
-            if len(ftypes) > 0:
-                ftypes = [item.upper() for item in ftypes]
-                for pak in select_packages:
-                    if pak in ftypes:
-                        found_dirs.append(d)
-                        break
-        dirs = found_dirs
-        if len(dirs) < 1:
-            msg = 'Selected packages not available ['
-            for pak in select_packages:
-                msg += ' {}'.format(pak)
-            msg += ']'
-            print(msg)
+    dirs = manifest.select(dirs)
 
     return dirs
 
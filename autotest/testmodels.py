@@ -0,0 +1,662 @@
+"""
+Discovery of the MODFLOW 6 test model repositories.
+
+The example (test_z01, test_z02), large example (test_z03), and temporary
+simulation (test_mf6_tmp_simulations) runners get the location of their
+simulations from this module instead of searching the home directory.  A
+repository is resolved, in order, from
+
+    1. an environment variable (MF6_TESTMODELS, MF6_LARGETESTMODELS, or
+       MF6_TMP_SIMULATIONS),
+    2. the [repositories] section of the configuration file testmodels.cfg
+       in the autotest directory (or the file in MF6_TESTMODELS_CONFIG),
+    3. the directory that contains the modflow6 repository, or the home
+       directory, with or without a .git suffix.
+
+An example configuration file, relative paths are relative to the file:
+
+    [repositories]
+    modflow6-testmodels = ../../modflow6-testmodels
+    modflow6-largetestmodels = /data/modflow6-largetestmodels
+
+The simulation directories of a repository are scanned once and the result
+is stored in a JSON manifest (.testmodels.json in the autotest directory or
+the file in MF6_TESTMODELS_MANIFEST).  For every simulation the manifest
+contains the package types (FTYPEs) in its name files, the number of cells
+of the MODFLOW 6 models, and the expected run time (median of the
+successful runs in the run time database, see runtimes.py).  A simulation
+is only scanned again when the modification time of its directory, name
+files, or discretization files changed.  The manifest also contains an
+index from package type to simulations, so the --pak selection of the
+runners does not read any name file.  Package queries can combine package
+types, 'csub+mvr' selects the simulations that use CSUB6 and MVR6 and
+'csub maw' the simulations that use CSUB6 or MAW6.  The same index is kept
+for the flopy.mf6 classes used by the autotest modules (ModuleIndex), it is
+used by scheduler.py --pak.
+
+    exdir = testmodels.get_exdir('modflow6-testmodels', subdir='mf6')
+    manifest = testmodels.Manifest(exdir)
+    dirs = manifest.get_dirs(exclude=['test022_MNW2_Fig28'])
+    dirs = manifest.select(dirs, sys.argv)
+
+Run this script to list the simulations in a repository:
+
+    python testmodels.py modflow6-testmodels --subdir mf6
+    python testmodels.py modflow6-largetestmodels --pak uzf6
+    python testmodels.py autotest --pak csub+mvr
+
+"""
+
+import os
+import re
+import sys
+import json
+import configparser
+
+import runtimes
+
+# change this number when the layout of the manifest or the package types
+# of the flopy classes change
+CACHE_VERSION = 2
+
+autotest_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(autotest_dir)
+
+config_file = os.environ.get('MF6_TESTMODELS_CONFIG',
+                             os.path.join(autotest_dir, 'testmodels.cfg'))
+manifest_file = os.environ.get('MF6_TESTMODELS_MANIFEST',
+                               os.path.join(autotest_dir,
+                                            '.testmodels.json'))
+
+# environment variable with the location of each repository
+repositories = {'modflow6-testmodels': 'MF6_TESTMODELS',
+                'modflow6-largetestmodels': 'MF6_LARGETESTMODELS',
+                'tmp_simulations': 'MF6_TMP_SIMULATIONS'}
+
+# discretization packages used to determine the number of cells
+dis_ftypes = ('DIS6', 'DISV6', 'DISU6')
+
+# flopy.mf6 classes used in the autotest modules, ModflowGwfcsub is CSUB6
+RE_FLOPY = re.compile(r'\bmf6\.(?:\w+\.)*Modflow([A-Z][a-z0-9]+)\b')
+RE_MODEL_TYPE = re.compile(r'model_type\s*=\s*[\'"](gw[ft])6?[\'"]',
+                           re.IGNORECASE)
+
+# flopy.mf6 classes that are not named after the package type
+flopy_ftypes = {'GWF': 'GWF6',
+                'GWT': 'GWT6',
+                'IMS': 'IMS6',
+                'TDIS': 'TDIS6',
+                'GWFGWF': 'GWF6-GWF6',
+                'GWFGWT': 'GWF6-GWT6',
+                'GWFRCHA': 'RCH6',
+                'GWFEVTA': 'EVT6',
+                'GWFNAM': None,
+                'GWTNAM': None,
+                'NAM': None}
+
+
+def get_config(fpth=None):
+    """
+    Get the repository locations in the configuration file
+
+    """
+    if fpth is None:
+        fpth = config_file
+    locations = {}
+    if not os.path.isfile(fpth):
+        return locations
+    config = configparser.ConfigParser()
+    try:
+        config.read(fpth)
+    except configparser.Error:
+        print('could not read {}'.format(fpth))
+        return locations
+    if config.has_section('repositories'):
+        base = os.path.dirname(os.path.abspath(fpth))
+        for name, pth in config.items('repositories'):
+            pth = os.path.expanduser(pth.strip())
+            locations[name] = os.path.normpath(os.path.join(base, pth))
+    return locations
+
+
+def get_candidates(name):
+    """
+    Default locations of a repository, next to the modflow6 repository
+    or in the home directory
+
+    """
+    if name == 'tmp_simulations':
+        return [os.path.join(root_dir, name)]
+    candidates = []
+    for base in (os.path.dirname(root_dir), os.path.expanduser('~')):
+        for d in (name, name + '.git'):
+            pth = os.path.join(base, d)
+            if pth not in candidates:
+                candidates.append(pth)
+    return candidates
+
+
+def get_repository(name, verbose=True):
+    """
+    Get the absolute path of a test model repository, None if the
+    repository cannot be found
+
+    """
+    pth = None
+    source = None
+    env = repositories.get(name)
+    if env is not None and os.environ.get(env):
+        pth = os.environ[env]
+        source = '${}'.format(env)
+    if pth is None:
+        locations = get_config()
+        if name in locations:
+            pth = locations[name]
+            source = os.path.basename(config_file)
+    if pth is None:
+        for candidate in get_candidates(name):
+            if os.path.isdir(candidate):
+                pth = candidate
+                source = 'default location'
+                break
+    if pth is None:
+        if verbose:
+            print('{} not found, set ${} or add it to {}'.format(
+                name, env, config_file))
+        return None
+    pth = os.path.abspath(os.path.expanduser(pth))
+    if verbose:
+        print('{} ({}): {}'.format(name, source, pth))
+    return pth
+
+
+def get_exdir(name, subdir=None, verbose=True):
+    """
+    Get the directory with the simulations of a test model repository
+
+    """
+    pth = get_repository(name, verbose=verbose)
+    if pth is not None and subdir is not None:
+        pth = os.path.join(pth, subdir)
+    return pth
+
+
+def get_block(fpth, block):
+    """
+    Get the lines in a block of a MODFLOW 6 input file
+
+    """
+    lines = []
+    inblock = False
+    with open(fpth, 'r', errors='replace') as f:
+        for line in f:
+            ll = line.strip().split()
+            if len(ll) < 1 or ll[0][0] in ('#', '!'):
+                continue
+            key = ll[0].upper()
+            if key == 'BEGIN' and len(ll) > 1 and ll[1].upper() == block:
+                inblock = True
+            elif key == 'END' and inblock:
+                break
+            elif inblock:
+                lines.append(ll)
+    return lines
+
+
+def get_ftypes(namefile):
+    """
+    Get the file types (FTYPE) in a name file
+
+    """
+    ftypes = []
+    with open(namefile, 'r', errors='replace') as f:
+        for line in f:
+            ll = line.strip().split()
+            if len(ll) < 2 or ll[0][0] in ('#', '!'):
+                continue
+            ftype = ll[0].upper()
+            if ftype in ('BEGIN', 'END'):
+                continue
+            if ftype not in ftypes:
+                ftypes.append(ftype)
+    return ftypes
+
+
+def get_ncells(fpth, ftype):
+    """
+    Get the number of cells in a DIS6, DISV6, or DISU6 file
+
+    """
+    dims = {}
+    for ll in get_block(fpth, 'DIMENSIONS'):
+        if len(ll) > 1:
+            try:
+                dims[ll[0].upper()] = int(ll[1])
+            except ValueError:
+                pass
+    try:
+        if ftype == 'DIS6':
+            return dims['NLAY'] * dims['NROW'] * dims['NCOL']
+        elif ftype == 'DISV6':
+            return dims['NLAY'] * dims['NCPL']
+        return dims['NODES']
+    except KeyError:
+        return None
+
+
+def get_mtime(fpth):
+    try:
+        return os.stat(fpth).st_mtime
+    except OSError:
+        return None
+
+
+def scan_simulation(pth):
+    """
+    Scan a simulation directory for its name files, package types, and
+    number of cells
+
+    """
+    namefiles = []
+    for root, dirs, files in os.walk(pth):
+        dirs.sort()
+        for f in sorted(files):
+            if f.lower().endswith('.nam'):
+                namefiles.append(os.path.relpath(os.path.join(root, f), pth))
+
+    # files the entry depends on
+    files = ['.'] + namefiles
+
+    ftypes = []
+    for namefile in namefiles:
+        for ftype in get_ftypes(os.path.join(pth, namefile)):
+            if ftype not in ftypes:
+                ftypes.append(ftype)
+
+    # number of cells in the models of the MODFLOW 6 simulation
+    ncells = None
+    mfsim = os.path.join(pth, 'mfsim.nam')
+    if os.path.isfile(mfsim):
+        for ll in get_block(mfsim, 'MODELS'):
+            if len(ll) < 2:
+                continue
+            namefile = os.path.join(pth, ll[1])
+            if not os.path.isfile(namefile):
+                continue
+            for ftype, fname in [(item[0].upper(), item[1]) for item in
+                                 get_block(namefile, 'PACKAGES')
+                                 if len(item) > 1]:
+                if ftype not in dis_ftypes:
+                    continue
+                fpth = os.path.join(pth, fname)
+                if not os.path.isfile(fpth):
+                    continue
+                files.append(os.path.relpath(fpth, pth))
+                n = get_ncells(fpth, ftype)
+                if n is not None:
+                    ncells = n if ncells is None else ncells + n
+
+    return {'files': dict([(f, get_mtime(os.path.join(pth, f)))
+                           for f in files]),
+            'namefiles': namefiles,
+            'ftypes': sorted(ftypes),
+            'ncells': ncells}
+
+
+def is_current(entry, pth):
+    """
+    Determine if a manifest entry is up to date with the files of the
+    simulation
+
+    """
+    for f, mtime in entry['files'].items():
+        if get_mtime(os.path.join(pth, f)) != mtime:
+            return False
+    return True
+
+
+def get_run_times(fpth=None):
+    """
+    Get the median run time of the successful runs of every test in the
+    run time database
+
+    """
+    history = runtimes.get_history(runtimes.load_records(fpth=fpth))
+    return dict([(test, runtimes.median([r['run_time'] for r in runs]))
+                 for test, runs in history.items()])
+
+
+def get_index(entries):
+    """
+    Index of the names of the entries that use a package type, entries
+    is a dictionary with a list of ftypes for every name
+
+    """
+    index = {}
+    for name, ftypes in entries.items():
+        for ftype in ftypes:
+            index.setdefault(ftype, []).append(name)
+    for ftype in index:
+        index[ftype].sort()
+    return index
+
+
+def parse_packages(args):
+    """
+    Parse package queries, every argument is a package type or package
+    types joined with '+' that must all be used, for example
+
+        ['uzf6']          tests that use UZF6
+        ['csub+mvr']      tests that use CSUB6 and MVR6
+        ['csub', 'maw']   tests that use CSUB6 or MAW6
+
+    """
+    terms = []
+    for arg in args:
+        term = [pak.upper() for pak in arg.split('+') if len(pak) > 0]
+        if len(term) > 0:
+            terms.append(term)
+    return terms
+
+
+def query_index(index, names, terms):
+    """
+    Names that match any of the package queries in terms, the version
+    number of a package type can be omitted (UZF or UZF6)
+
+    """
+    selected = set()
+    for term in terms:
+        found = set(names)
+        for pak in term:
+            found &= set(index.get(pak, [])) | set(index.get(pak + '6', []))
+        selected |= found
+    return [name for name in names if name in selected]
+
+
+def load_manifest(fpth=None):
+    if fpth is None:
+        fpth = manifest_file
+    if not os.path.isfile(fpth):
+        return {}
+    try:
+        with open(fpth, 'r') as f:
+            cached = json.load(f)
+    except (ValueError, OSError):
+        print('could not read {}'.format(fpth))
+        return {}
+    if cached.get('version') != CACHE_VERSION:
+        return {}
+    return cached
+
+
+def write_manifest(cached, fpth=None):
+    if fpth is None:
+        fpth = manifest_file
+    cached['version'] = CACHE_VERSION
+    tmp = '{}.{}'.format(fpth, os.getpid())
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(cached, f, indent=1, sort_keys=True)
+        os.replace(tmp, fpth)
+    except OSError:
+        if os.path.isfile(tmp):
+            os.remove(tmp)
+        print('could not write {}'.format(fpth))
+    return
+
+
+class Manifest(object):
+    """
+    Manifest of the simulation directories in exdir.  The entries of new
+    or modified simulations are updated, and the manifest is written,
+    when the manifest is created.
+
+    """
+
+    def __init__(self, exdir, fpth=None, db=None):
+        self.exdir = os.path.abspath(exdir)
+        self.fpth = fpth
+        self.db = db
+        self.simulations = {}
+        self.index = {}
+        if os.path.isdir(self.exdir):
+            self.update()
+
+    def update(self):
+        cached = load_manifest(self.fpth)
+        repos = cached.setdefault('repositories', {})
+        old = repos.get(self.exdir, {})
+        simulations = {}
+        nscan = 0
+        for d in sorted(os.listdir(self.exdir)):
+            pth = os.path.join(self.exdir, d)
+            if not os.path.isdir(pth):
+                continue
+            entry = old.get('simulations', {}).get(d)
+            if entry is None or not is_current(entry, pth):
+                entry = scan_simulation(pth)
+                nscan += 1
+            simulations[d] = entry
+
+        # expected run times are updated when the database changed
+        fdb = self.db if self.db is not None else runtimes.db_file
+        db_mtime = get_mtime(fdb)
+        if nscan > 0 or db_mtime != old.get('db_mtime'):
+            run_times = get_run_times(fdb)
+            for d, entry in simulations.items():
+                entry['run_time'] = run_times.get(runtimes.get_test_name(d))
+
+        self.simulations = simulations
+        if nscan > 0 or len(simulations) != len(old.get('simulations', {})) \
+                or db_mtime != old.get('db_mtime') or 'index' not in old:
+            self.index = get_index(dict([(d, entry['ftypes']) for d, entry
+                                         in simulations.items()]))
+            repos[self.exdir] = {'db_mtime': db_mtime,
+                                 'simulations': simulations,
+                                 'index': self.index}
+            write_manifest(cached, self.fpth)
+        else:
+            self.index = old['index']
+        if nscan > 0:
+            print('scanned {} of {} simulations in {}'.format(
+                nscan, len(simulations), self.exdir))
+        return
+
+    def get_dirs(self, exclude=None):
+        """
+        Get the test directories in numerical order
+
+        """
+        if exclude is None:
+            exclude = []
+        dirs = [d for d in self.simulations
+                if 'test' in d and d not in exclude]
+        # sort in numerical order for case sensitive os
+        return sorted(dirs, key=lambda v: (v.upper(), v[0].islower()))
+
+    def get_ftypes(self, d):
+        return self.simulations[d]['ftypes']
+
+    def get_ncells(self, d):
+        return self.simulations[d]['ncells']
+
+    def get_run_time(self, d):
+        return self.simulations[d].get('run_time')
+
+    def query(self, dirs, packages):
+        """
+        Simulations in dirs that match any of the package queries, see
+        parse_packages()
+
+        """
+        return query_index(self.index, dirs, parse_packages(packages))
+
+    def select(self, dirs, argv=None):
+        """
+        Select the simulations in dirs with the --sim, --pak, and --match
+        command line arguments
+
+        """
+        if argv is None:
+            argv = sys.argv
+
+        # determine if only a selection of models should be run
+        select_dirs = None
+        select_packages = None
+        for idx, arg in enumerate(argv):
+            if arg.lower() == '--sim':
+                if len(argv) > idx + 1:
+                    select_dirs = argv[idx + 1:]
+                    break
+            elif arg.lower() == '--pak':
+                if len(argv) > idx + 1:
+                    select_packages = [item.upper() for item in
+                                       argv[idx + 1:]]
+                    break
+            elif arg.lower() == '--match':
+                if len(argv) > idx + 1:
+                    like = argv[idx + 1]
+                    dirs = [item for item in dirs if like in item]
+                    break
+
+        # determine if the selection of model is in the test models
+        if select_dirs is not None:
+            dirs = [d for d in select_dirs if d in dirs]
+            if len(dirs) < 1:
+                msg = 'Selected models not available in test'
+                print(msg)
+
+        # determine if the specified package(s) is in the test models
+        if select_packages is not None:
+            dirs = self.query(dirs, select_packages)
+            if len(dirs) < 1:
+                msg = 'Selected packages not available ['
+                for pak in select_packages:
+                    msg += ' {}'.format(pak)
+                msg += ']'
+                print(msg)
+
+        return dirs
+
+
+def get_module_ftypes(fpth):
+    """
+    Package types of the flopy.mf6 classes used in an autotest module
+
+    """
+    with open(fpth, 'r', errors='replace') as f:
+        src = f.read()
+    names = set(RE_FLOPY.findall(src) + RE_MODEL_TYPE.findall(src))
+    ftypes = []
+    for name in names:
+        key = name.upper()
+        if key in flopy_ftypes:
+            ftype = flopy_ftypes[key]
+        elif key[:3] in ('GWF', 'GWT', 'UTL'):
+            ftype = key[3:] + '6'
+        else:
+            ftype = key + '6'
+        if ftype is not None and ftype not in ftypes:
+            ftypes.append(ftype)
+    return sorted(ftypes)
+
+
+class ModuleIndex(object):
+    """
+    Index of the package types used by the autotest modules (test_*.py)
+    in pth.  A module is only scanned again when its modification time
+    changed.
+
+    """
+
+    def __init__(self, pth=None, fpth=None):
+        if pth is None:
+            pth = autotest_dir
+        self.pth = os.path.abspath(pth)
+        self.fpth = fpth
+        self.modules = {}
+        self.index = {}
+        self.update()
+
+    def update(self):
+        cached = load_manifest(self.fpth)
+        indexes = cached.setdefault('modules', {})
+        old = indexes.get(self.pth, {})
+        modules = {}
+        nscan = 0
+        for f in sorted(os.listdir(self.pth)):
+            if not f.startswith('test') or not f.endswith('.py'):
+                continue
+            name = os.path.splitext(f)[0]
+            fpth = os.path.join(self.pth, f)
+            mtime = get_mtime(fpth)
+            entry = old.get('modules', {}).get(name)
+            if entry is None or entry['mtime'] != mtime:
+                entry = {'mtime': mtime, 'ftypes': get_module_ftypes(fpth)}
+                nscan += 1
+            modules[name] = entry
+        self.modules = modules
+        if nscan > 0 or set(modules) != set(old.get('modules', {})):
+            self.index = get_index(dict([(name, entry['ftypes']) for
+                                         name, entry in modules.items()]))
+            indexes[self.pth] = {'modules': modules, 'index': self.index}
+            write_manifest(cached, self.fpth)
+        else:
+            self.index = old['index']
+        return
+
+    def get_modules(self):
+        return sorted(self.modules)
+
+    def get_ftypes(self, name):
+        return self.modules[name]['ftypes']
+
+    def query(self, modules, packages):
+        """
+        Modules that match any of the package queries, see
+        parse_packages()
+
+        """
+        return query_index(self.index, modules, parse_packages(packages))
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1].startswith('--'):
+        print('usage: python testmodels.py repository [--subdir subdir] '
+              '[--sim ...|--pak ...|--match ...]')
+        print('       python testmodels.py autotest [--pak ...]')
+        return 1
+    if sys.argv[1] == 'autotest':
+        index = ModuleIndex()
+        modules = index.get_modules()
+        if '--pak' in sys.argv:
+            idx = sys.argv.index('--pak')
+            modules = index.query(modules, sys.argv[idx + 1:])
+        for name in modules:
+            print('{:40s} {}'.format(name, ' '.join(index.get_ftypes(name))))
+        return 0
+    subdir = None
+    for idx, arg in enumerate(sys.argv):
+        if arg == '--subdir':
+            subdir = sys.argv[idx + 1]
+    exdir = get_exdir(sys.argv[1], subdir=subdir)
+    if exdir is None or not os.path.isdir(exdir):
+        print('"{}" does not exist'.format(exdir))
+        return 1
+    manifest = Manifest(exdir)
+    dirs = manifest.select(manifest.get_dirs())
+    fmt = '{:40s} {:>10s} {:>10s}  {}'
+    print(fmt.format('simulation', 'cells', 'run time', 'packages'))
+    for d in dirs:
+        ncells = manifest.get_ncells(d)
+        run_time = manifest.get_run_time(d)
+        print(fmt.format(d, '-' if ncells is None else str(ncells),
+                         '-' if run_time is None else
+                         '{:.2f}'.format(run_time),
+                         ' '.join(manifest.get_ftypes(d))))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import os
+import sys
 import shutil
 import subprocess
 import importlib
@@ -6,6 +7,10 @@ from contextlib import contextmanager
 
 import flopy
 
+dfnpth = os.path.join('..', 'doc', 'mf6io', 'mf6ivar')
+sys.path.append(dfnpth)
+import dfn_cache
+
 flopypth = flopy.__path__[0]
 print('flopy is installed in {}'.format(flopypth))
 
@@ -34,17 +39,22 @@ def test_delete_dfn():
 
 
 def test_copy_dfn():
-    pth0 = os.path.join('..', 'doc', 'mf6io', 'mf6ivar', 'dfn')
-    files = [entry for entry in os.listdir(pth0) if
-             os.path.isfile(os.path.join(pth0, entry))]
+    pth0 = os.path.join(dfnpth, 'dfn')
     pth1 = os.path.join(flopypth, 'mf6', 'data', 'dfn')
-    for fn in files:
-        ext = os.path.splitext(fn)[1].lower()
-        if 'dfn' in ext:
-            fpth0 = os.path.join(pth0, fn)
-            fpth1 = os.path.join(pth1, fn)
-            print('copying {} from "{}" to "{}"'.format(fn, pth0, pth1))
-            shutil.copyfile(fpth0, fpth1)
+
+    # the dfn files are compiled (and validated) before they are copied,
+    # unchanged dfn files are loaded from the compiled dfn cache
+    dfns = dfn_cache.DfnCache(dfndir=pth0)
+    for name in dfns.get_names():
+        fn = name + '.dfn'
+        fpth0 = os.path.join(pth0, fn)
+        fpth1 = os.path.join(pth1, fn)
+        if os.path.isfile(fpth1):
+            if dfn_cache.get_hash(fpth1) == dfns.get_hash(name):
+                print('{} in "{}" is up to date'.format(fn, pth1))
+                continue
+        print('copying {} from "{}" to "{}"'.format(fn, pth0, pth1))
+        shutil.copyfile(fpth0, fpth1)
 
 
 def test_create_packages():
@@ -0,0 +1,238 @@
+"""
+Copy-free setup of the test workspaces of existing MODFLOW 6 simulations.
+
+pymake.setup_mf6() copies every input file of a simulation to the test
+folder.  MODFLOW 6 only reads its input files, so the input files are linked
+into the test folder instead:
+
+    reflink   - copy-on-write clone of the file (Linux file systems that
+                support FICLONE, like btrfs and xfs)
+    hardlink  - hard link to the file
+    copy      - copy of the file
+
+The default strategy ('auto') tries a reflink, then a hard link, and copies
+the file when neither is possible (for example when the source is on
+another device).  The strategy can be set with the MF6_WORKSPACE environment
+variable.  Only the files MODFLOW 6 writes to (the output files of the
+simulation that already exist in the source folder) are always copied, so
+a run can never modify the source simulation.  Comparison simulations of
+other MODFLOW versions are set up with pymake, as their name files do not
+separate input and output files.
+
+Fixed sleeps are replaced by readiness checks: setup_mf6() waits until the
+files are visible in the test folder and remove_tree() retries the removal
+of a test folder until the files are released (Windows keeps the files of
+a terminated process locked for a short time).
+
+    inpt, outp = workspace.setup_mf6(src, dst)
+    action = workspace.setup_mf6_comparison(src, dst)
+    workspace.remove_tree(dst)
+
+"""
+
+import os
+import sys
+import time
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import pymake
+except:
+    msg = 'Error. Pymake package is not available.\n'
+    msg += 'Try installing using the following command:\n'
+    msg += ' pip install https://github.com/modflowpy/pymake/zipball/master'
+    raise Exception(msg)
+
+strategies = ('auto', 'reflink', 'hardlink', 'copy')
+
+# Linux ioctl request to clone a file, _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+# time (seconds) to wait for the files of a test folder
+ready_timeout = 10.
+
+
+def get_strategy():
+    strategy = os.environ.get('MF6_WORKSPACE', 'auto').lower()
+    if strategy not in strategies:
+        msg = 'MF6_WORKSPACE must be one of {}'.format(', '.join(strategies))
+        raise ValueError(msg)
+    return strategy
+
+
+def reflink(src, dst):
+    """
+    Clone src to dst, raises OSError if the file system does not support
+    reflinks
+
+    """
+    if fcntl is None or not sys.platform.startswith('linux'):
+        raise OSError('reflinks are not supported on {}'.format(sys.platform))
+    with open(src, 'rb') as fsrc:
+        with open(dst, 'wb') as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            except OSError:
+                fdst.close()
+                os.remove(dst)
+                raise
+    shutil.copystat(src, dst)
+    return
+
+
+def link_file(src, dst, strategy=None):
+    """
+    Reflink, hard link, or copy src to dst and return the method that was
+    used
+
+    """
+    if strategy is None:
+        strategy = get_strategy()
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if strategy in ('auto', 'reflink'):
+        try:
+            reflink(src, dst)
+            return 'reflink'
+        except OSError:
+            if strategy == 'reflink':
+                raise
+    if strategy in ('auto', 'hardlink'):
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except OSError:
+            if strategy == 'hardlink':
+                raise
+    shutil.copy2(src, dst)
+    return 'copy'
+
+
+def wait_for_files(files, timeout=None):
+    """
+    Wait until all files exist, returns False if a file does not exist
+    after timeout seconds
+
+    """
+    if timeout is None:
+        timeout = ready_timeout
+    t0 = time.time()
+    delay = 0.01
+    pending = [f for f in files if not os.path.isfile(f)]
+    while len(pending) > 0:
+        if time.time() - t0 > timeout:
+            return False
+        time.sleep(delay)
+        delay = min(2. * delay, 0.5)
+        pending = [f for f in pending if not os.path.isfile(f)]
+    return True
+
+
+def remove_tree(pth, timeout=None):
+    """
+    Remove a folder, the removal is retried until timeout seconds passed
+    when a file is still in use
+
+    """
+    if timeout is None:
+        timeout = ready_timeout
+    t0 = time.time()
+    delay = 0.05
+    while os.path.exists(pth):
+        try:
+            shutil.rmtree(pth)
+        except OSError:
+            if time.time() - t0 > timeout:
+                raise
+            time.sleep(delay)
+            delay = min(2. * delay, 1.)
+    return
+
+
+def setup_mf6(src, dst, mfnamefile='mfsim.nam', remove_existing=True,
+              strategy=None):
+    """
+    Set up the test folder dst for the MODFLOW 6 simulation in src, the
+    same as pymake.setup_mf6() but the input files are linked
+
+    Returns
+    -------
+    mf6inp : list
+        list of MODFLOW 6 input files
+    mf6outp : list
+        list of MODFLOW 6 output files
+
+    """
+    if os.path.exists(dst) and remove_existing:
+        print('Removing folder ' + dst)
+        remove_tree(dst)
+    if not os.path.isdir(dst):
+        os.makedirs(dst)
+
+    fname = os.path.abspath(os.path.join(src, mfnamefile))
+    mf6inp, mf6outp = pymake.get_mf6_files(fname)
+
+    # existing head files are used in the comparison
+    exinp = []
+    for f in mf6outp:
+        if os.path.splitext(f)[1].lower() == '.hds':
+            if os.path.isfile(os.path.join(src, f + '.ex')):
+                exinp.append(f + '.ex')
+
+    # MODFLOW 6 writes to the output files, they are never linked
+    outfiles = set([os.path.normcase(os.path.normpath(f)) for f in mf6outp])
+
+    counts = {}
+    dstfiles = []
+    for f in [mfnamefile] + mf6inp + exinp:
+        srcf = os.path.join(src, f)
+        dstf = os.path.join(dst, f)
+        if not os.path.isfile(srcf):
+            print(srcf + ' does not exist')
+            continue
+        d = os.path.dirname(dstf)
+        if not os.path.isdir(d):
+            os.makedirs(d)
+        if os.path.normcase(os.path.normpath(f)) in outfiles:
+            shutil.copy2(srcf, dstf)
+            method = 'copy'
+        else:
+            method = link_file(srcf, dstf, strategy=strategy)
+        counts[method] = counts.get(method, 0) + 1
+        dstfiles.append(dstf)
+    print('{} files in {}: {}'.format(
+        len(dstfiles), dst,
+        ', '.join(['{} {}'.format(n, method)
+                   for method, n in sorted(counts.items())])))
+
+    assert wait_for_files(dstfiles), 'files in {} are not ready'.format(dst)
+    return mf6inp, mf6outp
+
+
+def setup_mf6_comparison(src, dst, remove_existing=True, strategy=None):
+    """
+    Set up the comparison simulation, MODFLOW 6 comparison simulations are
+    linked and all others are set up with pymake.setup_mf6_comparison()
+
+    Returns
+    -------
+    action : str
+        comparison type
+
+    """
+    action = pymake.get_mf6_comparison(src)
+    if action is None:
+        return action
+    cmppth = os.path.join(src, action)
+    if 'mf6' in action.lower() and \
+            os.path.isfile(os.path.join(cmppth, 'mfsim.nam')):
+        setup_mf6(cmppth, os.path.join(dst, action),
+                  remove_existing=remove_existing, strategy=strategy)
+        return action
+    return pymake.setup_mf6_comparison(src, dst,
+                                       remove_existing=remove_existing)
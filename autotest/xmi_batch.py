@@ -0,0 +1,172 @@
+"""
+Batched access to MODFLOW 6 variables through the XMI.
+
+The memory addresses of a list of variables are resolved into handles once
+(get_var_handles in libmf6).  The values of all double precision variables
+and all integer variables are then copied between MODFLOW 6 and a single
+contiguous buffer in one call per type, instead of one get_value() or
+set_value() call (and address lookup) per variable.
+
+    batch = XmiBatch(mf6, [head_tag, well_tag])
+    while current_time < end_time:
+        ...
+        head, well = batch.get_values()
+        well[:, 0] = head2et_wellrate(head[0])
+        batch.set_values()
+        ...
+    batch.release()
+    mf6.finalize()
+
+The arrays returned by get_values() are views into the buffer of the batch,
+so they are overwritten by the next get_values() call.  release() releases
+the handles of a batch, the handles of other batches remain valid.  All
+handles are released when the model is finalized.
+
+"""
+
+from ctypes import POINTER, byref, c_double, c_int, create_string_buffer
+import numpy as np
+
+
+class XmiBatch(object):
+    """
+    A list of variables that are copied from and to MODFLOW 6 in a single
+    call per type
+
+    Parameters
+    ----------
+    mf6 : xmipy.XmiWrapper
+        initialized MODFLOW 6 library
+    addresses : list
+        memory addresses of the variables (from mf6.get_var_address())
+
+    """
+
+    def __init__(self, mf6, addresses):
+        self.mf6 = mf6
+        self.lib = mf6.lib
+        self.addresses = list(addresses)
+        n = len(self.addresses)
+        if n < 1:
+            raise Exception('no variables in batch')
+
+        # fixed-length, null-terminated addresses in a single buffer
+        lenaddress = c_int.in_dll(self.lib, 'BMI_LENVARADDRESS').value
+        buf = create_string_buffer(n * lenaddress)
+        for i, address in enumerate(self.addresses):
+            b = address.encode('ascii')
+            if len(b) >= lenaddress:
+                msg = 'variable address is too long: {}'.format(address)
+                raise Exception(msg)
+            buf[i * lenaddress:i * lenaddress + len(b)] = b
+        handles = np.zeros(n, dtype=np.int32)
+        self._execute('get_var_handles', buf, byref(c_int(n)),
+                      handles.ctypes.data_as(POINTER(c_int)))
+        self.handles = handles
+
+        sizes = np.zeros(n, dtype=np.int32)
+        self._execute('get_handle_sizes', byref(c_int(n)),
+                      handles.ctypes.data_as(POINTER(c_int)),
+                      sizes.ctypes.data_as(POINTER(c_int)))
+
+        # group the variables by type, every group has a contiguous buffer
+        groups = {'double': [], 'int': []}
+        for i, address in enumerate(self.addresses):
+            var_type = mf6.get_var_type(address).upper()
+            if var_type.startswith('DOUBLE'):
+                groups['double'].append(i)
+            elif var_type.startswith('INTEGER'):
+                groups['int'].append(i)
+            else:
+                msg = 'unsupported type {} for variable {}'.format(var_type,
+                                                                   address)
+                raise Exception(msg)
+        dtypes = {'double': np.float64, 'int': np.int32}
+        ctypes = {'double': c_double, 'int': c_int}
+
+        self.groups = []
+        self.values = [None] * n
+        for key in ('double', 'int'):
+            idx = groups[key]
+            if len(idx) < 1:
+                continue
+            buffer = np.zeros(int(sizes[idx].sum()), dtype=dtypes[key])
+            ipos = 0
+            for i in idx:
+                shape = self._get_shape(self.addresses[i])
+                size = int(sizes[i])
+                self.values[i] = buffer[ipos:ipos + size].reshape(shape)
+                ipos += size
+            self.groups.append({'n': c_int(len(idx)),
+                                'handles': np.ascontiguousarray(handles[idx]),
+                                'buffer': buffer,
+                                'ptr': buffer.ctypes.data_as(
+                                    POINTER(ctypes[key])),
+                                'get': 'get_values_{}'.format(key),
+                                'set': 'set_values_{}'.format(key)})
+
+    def _execute(self, function, *args):
+        if getattr(self.lib, function)(*args) != 0:
+            msg = 'MODFLOW 6 BMI, exception in: {}'.format(function)
+            raise Exception(msg)
+        return
+
+    def _get_shape(self, address):
+        rank = self.mf6.get_var_rank(address)
+        if rank < 1:
+            return ()
+        return tuple(self.mf6.get_var_shape(address))
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __getitem__(self, address):
+        """
+        Buffer view of a variable
+        """
+        return self.values[self.addresses.index(address)]
+
+    def get_values(self):
+        """
+        Copy the values of all variables into the buffers and return the
+        views of the variables in the order of the addresses
+        """
+        for g in self.groups:
+            self._execute(g['get'], byref(g['n']),
+                          g['handles'].ctypes.data_as(POINTER(c_int)),
+                          byref(g['ptr']))
+        return list(self.values)
+
+    def set_values(self, values=None):
+        """
+        Set the values of all variables from the buffers. The values can be
+        passed as a list in the order of the addresses or as a dictionary
+        with addresses and values; otherwise the current values of the
+        views are used.
+        """
+        if values is not None:
+            if isinstance(values, dict):
+                values = [values.get(address) for address in self.addresses]
+            if len(values) != len(self.addresses):
+                raise Exception('the number of values ({}) is not the number '
+                                'of variables ({})'.format(len(values),
+                                                           len(self)))
+            for view, value in zip(self.values, values):
+                if value is not None and value is not view:
+                    view[...] = value
+        for g in self.groups:
+            self._execute(g['set'], byref(g['n']),
+                          g['handles'].ctypes.data_as(POINTER(c_int)),
+                          byref(g['ptr']))
+        return
+
+    def release(self):
+        """
+        Release the handles of the batch
+        """
+        if len(self.groups) < 1:
+            return
+        self._execute('release_var_handles', byref(c_int(len(self.handles))),
+                      self.handles.ctypes.data_as(POINTER(c_int)))
+        self.groups = []
+        return
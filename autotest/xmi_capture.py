@@ -0,0 +1,288 @@
+"""
+Capture MODFLOW 6 results in memory through the XMI.
+
+The heads (or concentrations), the model budgets, and a convergence summary
+are copied from libmf6 at the end of every time step into a ring buffer,
+so a BMI driver can use the results without output control writing head
+and budget files that are read back after the run.
+
+    capture = OutputCapture(mf6, models=['GWF-1'], maxlen=100)
+    capture.run()
+    heads = capture.get_heads('GWF-1')
+    budget = capture.get_budget('GWF-1')
+    print(budget['WEL_IN'], capture.get_convergence()['converged'])
+
+When the simulation is driven by the BMI driver itself, record() is called
+after every time step (after update() or finalize_time_step()).  A callback
+is called as callback(record) for every record, with a dictionary that has
+the time, kper, kstp, heads, budgets, and convergence of the time step.
+The arrays in the records are copies.
+
+get_solve_statistics() and get_solve_timing() return the convergence
+statistics of the last call to solve() and the wall clock time spent in the
+formulate, solve, and budget phases of a solution, and can also be used in a
+driver that calls solve() itself:
+
+    has_converged = mf6.solve(1)
+    inner, dvmax, rmax = get_solve_statistics(mf6, 1)
+
+"""
+
+from collections import deque
+from ctypes import POINTER, byref, c_char_p, c_double, c_int, \
+    create_string_buffer
+import numpy as np
+
+from xmi_view import get_value_view
+
+
+def _execute(mf6, function, *args):
+    if getattr(mf6.lib, function)(*args) != 0:
+        msg = 'MODFLOW 6 BMI, exception in: {}'.format(function)
+        raise Exception(msg)
+    return
+
+
+def get_solve_statistics(mf6, subcomponent_idx=1):
+    """
+    Number of inner iterations, maximum change, and maximum residual of the
+    last call to solve() for a solution
+
+    """
+    inner = c_int(0)
+    dvmax = c_double(0.)
+    rmax = c_double(0.)
+    _execute(mf6, 'get_solve_statistics', byref(c_int(subcomponent_idx)),
+             byref(inner), byref(dvmax), byref(rmax))
+    return inner.value, dvmax.value, rmax.value
+
+
+def get_solve_timing(mf6, subcomponent_idx=1):
+    """
+    Dictionary with the wall clock time in seconds spent in the formulate,
+    solve, and budget phases of a solution since the start of the
+    simulation
+
+    """
+    times = np.zeros(3, dtype=np.float64)
+    _execute(mf6, 'get_solve_timing', byref(c_int(subcomponent_idx)),
+             times.ctypes.data_as(POINTER(c_double)))
+    return {'formulate': times[0], 'solve': times[1], 'budget': times[2]}
+
+
+class OutputCapture(object):
+    """
+    In-memory ring buffer with the results of every time step
+
+    Parameters
+    ----------
+    mf6 : xmipy.XmiWrapper
+        initialized MODFLOW 6 library
+    models : list
+        names of the models for which the heads and budgets are captured
+    heads : bool
+        boolean indicating if the heads (dependent variable X) are captured
+    budgets : bool
+        boolean indicating if the model budgets are captured
+    maxlen : int
+        number of time steps that are kept, all time steps are kept if
+        maxlen is None
+    callback : callable
+        function that is called with every record
+
+    """
+
+    def __init__(self, mf6, models, heads=True, budgets=True, maxlen=None,
+                 callback=None):
+        self.mf6 = mf6
+        self.lib = mf6.lib
+        self.models = [model.upper() for model in models]
+        self.heads = heads
+        self.budgets = budgets
+        self.callback = callback
+        self.records = deque(maxlen=maxlen)
+        self.lenbudtxt = c_int.in_dll(self.lib, 'BMI_LENBUDTXT').value
+        self._budget_names = {}
+        self._timing = {}
+
+        self._time = {}
+        for name in ('KPER', 'KSTP', 'TOTIM'):
+            address = mf6.get_var_address(name, 'TDIS')
+            self._time[name] = get_value_view(mf6, address)
+
+        self._heads = {}
+        if heads:
+            for model in self.models:
+                address = mf6.get_var_address('X', model)
+                self._heads[model] = get_value_view(mf6, address)
+
+        # convergence of every solution
+        self._solutions = []
+        nsolutions = c_int(0)
+        self._execute('get_subcomponent_count', byref(nsolutions))
+        for isln in range(1, nsolutions.value + 1):
+            name = 'SLN_{}'.format(isln)
+            self._solutions.append(
+                (name, isln,
+                 get_value_view(mf6, mf6.get_var_address('ICNVG', name)),
+                 get_value_view(mf6, mf6.get_var_address('ITERTOT_TIMESTEP',
+                                                         name))))
+
+    def _execute(self, function, *args):
+        _execute(self.mf6, function, *args)
+        return
+
+    def get_budget_names(self, model):
+        """
+        Names and labels of the budget terms of a model
+        """
+        c_model = c_char_p(model.upper().encode())
+        count = c_int(0)
+        self._execute('get_budget_count', c_model, byref(count))
+        n = count.value
+        names = create_string_buffer(max(n, 1) * self.lenbudtxt)
+        labels = create_string_buffer(max(n, 1) * self.lenbudtxt)
+        self._execute('get_budget_names', c_model, names, labels)
+        size = self.lenbudtxt
+        names = [names[i * size:(i + 1) * size].split(b'\0')[0].decode()
+                 for i in range(n)]
+        labels = [labels[i * size:(i + 1) * size].split(b'\0')[0].decode()
+                  for i in range(n)]
+        return names, labels
+
+    def _get_budget(self, model):
+        c_model = c_char_p(model.encode())
+        count = c_int(0)
+        self._execute('get_budget_count', c_model, byref(count))
+        n = count.value
+        # the budget terms are only read again when their number changes
+        if model not in self._budget_names or \
+                len(self._budget_names[model][0]) != n:
+            self._budget_names[model] = self.get_budget_names(model)
+        values = np.zeros((n, 4), dtype=np.float64)
+        if n > 0:
+            self._execute('get_budget', c_model,
+                          byref(values.ctypes.data_as(POINTER(c_double))))
+        names, labels = self._budget_names[model]
+        return {'names': names, 'labels': labels, 'values': values}
+
+    def record(self):
+        """
+        Copy the results of the current time step into the buffer
+        """
+        record = {'time': float(self._time['TOTIM'][0]),
+                  'kper': int(self._time['KPER'][0]),
+                  'kstp': int(self._time['KSTP'][0]),
+                  'heads': {}, 'budgets': {}, 'convergence': {}}
+        for model, x in self._heads.items():
+            record['heads'][model] = x.copy()
+        if self.budgets:
+            for model in self.models:
+                record['budgets'][model] = self._get_budget(model)
+        for name, isln, icnvg, itertot in self._solutions:
+            inner, dvmax, rmax = get_solve_statistics(self.mf6, isln)
+            timing = get_solve_timing(self.mf6, isln)
+            previous = self._timing.get(name, {})
+            record['convergence'][name] = {'converged': bool(icnvg[0]),
+                                           'inner': int(itertot[0]),
+                                           'dvmax': dvmax, 'rmax': rmax}
+            # wall clock time of the time step
+            for key, t in timing.items():
+                record['convergence'][name][key] = t - previous.get(key, 0.)
+            self._timing[name] = timing
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+        return record
+
+    def run(self):
+        """
+        Run the simulation to the end time and record every time step
+        """
+        current_time = self.mf6.get_current_time()
+        end_time = self.mf6.get_end_time()
+        while current_time < end_time:
+            self.mf6.update()
+            self.record()
+            current_time = self.mf6.get_current_time()
+        return
+
+    def get_times(self):
+        return np.array([r['time'] for r in self.records])
+
+    def get_kstpkper(self):
+        """
+        List of zero-based (kstp, kper) tuples, as in flopy
+        """
+        return [(r['kstp'] - 1, r['kper'] - 1) for r in self.records]
+
+    def get_heads(self, model):
+        """
+        (ntimes, nodes) array with the heads of a model
+        """
+        return np.array([r['heads'][model.upper()] for r in self.records])
+
+    def get_budget(self, model):
+        """
+        Record array with totim, the zero-based time_step and stress_period,
+        and the TEXT_IN and TEXT_OUT rates of the budget terms of a model for every time
+        step, the same fields as in the budget from flopy.utils.Mf6ListBudget
+        (terms that occur more than once are labeled with the package name)
+        """
+        model = model.upper()
+        columns = []
+        for r in self.records:
+            b = r['budgets'][model]
+            for name, label in zip(b['names'], b['labels']):
+                key = (name, label)
+                if key not in columns:
+                    columns.append(key)
+        counts = {}
+        for name, label in columns:
+            counts[name] = counts.get(name, 0) + 1
+        fields = []
+        for name, label in columns:
+            if counts[name] > 1 and len(label) > 0:
+                name = '{}_{}'.format(name, label)
+            fields.append(name)
+
+        names = [('totim', float), ('time_step', int), ('stress_period', int)]
+        for field in fields:
+            names += [('{}_IN'.format(field), float),
+                      ('{}_OUT'.format(field), float)]
+        d = np.recarray(len(self.records), dtype=np.dtype(names))
+        for name in d.dtype.names:
+            d[name] = 0
+        for i, r in enumerate(self.records):
+            d['totim'][i] = r['time']
+            d['time_step'][i] = r['kstp'] - 1
+            d['stress_period'][i] = r['kper'] - 1
+            b = r['budgets'][model]
+            for name, label, v in zip(b['names'], b['labels'], b['values']):
+                field = fields[columns.index((name, label))]
+                d['{}_IN'.format(field)][i] = v[2]
+                d['{}_OUT'.format(field)][i] = v[3]
+        return d
+
+    def get_convergence(self, solution='SLN_1'):
+        """
+        Record array with the convergence flag, the number of inner
+        iterations, the maximum change and residual of the last outer
+        iteration, and the wall clock time of the formulate, solve, and
+        budget phases of a solution for every time step
+        """
+        d = np.recarray(len(self.records),
+                        dtype=np.dtype([('totim', float),
+                                        ('converged', bool),
+                                        ('inner', int),
+                                        ('dvmax', float),
+                                        ('rmax', float),
+                                        ('formulate', float),
+                                        ('solve', float),
+                                        ('budget', float)]))
+        for i, r in enumerate(self.records):
+            c = r['convergence'][solution]
+            d['totim'][i] = r['time']
+            for key in d.dtype.names[1:]:
+                d[key][i] = c[key]
+        return d
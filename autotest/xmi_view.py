@@ -0,0 +1,121 @@
+"""
+Writable NumPy views of MODFLOW 6 variables through the XMI.
+
+get_value_view() wraps the pointer from get_value_ptr_double() or
+get_value_ptr_int() in a NumPy array without copying, so a BMI driver can
+modify package arrays such as BOUND in place instead of calling get_value()
+and set_value() on every iteration.
+
+    views = get_package_views(mf6, 'GWF-1', 'WEL_0')
+    while kiter < max_iter:
+        views['BOUND'][:, 0] = q
+        has_converged = mf6.solve(1)
+
+The shape of a view is the C-style shape from get_var_shape() (for example
+(maxbound, ncolbnd) for BOUND) and is checked against get_var_nbytes(), so
+the strides of the view match the Fortran layout. Unlike
+XmiWrapper.get_value_ptr(), dimensions with a length of zero are kept.
+Setting values through a view does not trigger the memory set handlers
+that set_value() calls, and a view is no longer valid when MODFLOW 6
+reallocates the array or after finalize().
+
+"""
+
+from ctypes import POINTER, byref, c_char_p, c_double, c_int, c_void_p, \
+    cast
+import numpy as np
+
+
+def get_var_shape(mf6, address):
+    """
+    C-style shape of a variable, an empty tuple for scalars
+    """
+    rank = mf6.get_var_rank(address)
+    if rank < 1:
+        return ()
+    shape = np.zeros(rank, dtype=np.int32)
+    status = mf6.lib.get_var_shape(c_char_p(address.encode()),
+                                   c_void_p(shape.ctypes.data))
+    if status != 0:
+        msg = 'MODFLOW 6 BMI, exception in: get_var_shape ' + \
+              'for variable {}'.format(address)
+        raise Exception(msg)
+    return tuple(int(n) for n in shape)
+
+
+def get_value_view(mf6, address):
+    """
+    Writable NumPy view of a MODFLOW 6 variable, scalars are returned as
+    an array with a single value
+
+    Parameters
+    ----------
+    mf6 : xmipy.XmiWrapper
+        initialized MODFLOW 6 library
+    address : str
+        memory address of the variable (from mf6.get_var_address())
+
+    Returns
+    -------
+    view : numpy.ndarray
+
+    """
+    var_type = mf6.get_var_type(address).upper()
+    if var_type.startswith('DOUBLE'):
+        function = mf6.lib.get_value_ptr_double
+        ctype = c_double
+        dtype = np.float64
+    elif var_type.startswith('INTEGER'):
+        function = mf6.lib.get_value_ptr_int
+        ctype = c_int
+        dtype = np.int32
+    else:
+        msg = 'unsupported type {} for variable {}'.format(var_type, address)
+        raise Exception(msg)
+
+    shape = get_var_shape(mf6, address)
+    if len(shape) < 1:
+        shape = (1,)
+    size = int(np.prod(shape))
+    nbytes = mf6.get_var_nbytes(address)
+    if nbytes != size * np.dtype(dtype).itemsize:
+        msg = 'the size of variable {} ({} bytes) does not match its ' + \
+              'shape {}'
+        raise Exception(msg.format(address, nbytes, shape))
+    if size < 1:
+        return np.zeros(shape, dtype=dtype)
+
+    ptr = c_void_p()
+    if function(c_char_p(address.encode()), byref(ptr)) != 0 or \
+            ptr.value is None:
+        msg = 'MODFLOW 6 BMI, exception in: get_value_ptr ' + \
+              'for variable {}'.format(address)
+        raise Exception(msg)
+    return np.ctypeslib.as_array(cast(ptr, POINTER(ctype)), shape=shape)
+
+
+def get_package_views(mf6, model, package, names=('BOUND', 'HCOF', 'RHS')):
+    """
+    Dictionary with writable views of the arrays of a package
+
+    Parameters
+    ----------
+    mf6 : xmipy.XmiWrapper
+        initialized MODFLOW 6 library
+    model : str
+        model name
+    package : str
+        package name
+    names : tuple
+        names of the package variables
+
+    Returns
+    -------
+    views : dict
+
+    """
+    views = {}
+    for name in names:
+        address = mf6.get_var_address(name, model.upper(), package.upper())
+        views[name] = get_value_view(mf6, address)
+    return views
@@ -0,0 +1,253 @@
+# Compiled definition (dfn) files
+#
+# The dfn files in the dfn folder are parsed once and the resulting variable
+# dictionaries are stored in a single JSON cache (.dfn_cache.json).  Every
+# entry in the cache is keyed by the name of the dfn file and contains the
+# sha256 hash of the dfn file content.  When the cache is loaded the dfn
+# files are hashed and only files with a changed hash (and new files) are
+# parsed again, so the cache does not need to be deleted when a dfn file is
+# modified.
+#
+# Usage:
+#
+#     dfns = DfnCache()
+#     vardict = dfns.get_vardict('gwf-chd')
+#     blocks = dfns.get_blocks('gwf-chd')
+#     v = dfns.get_variable('gwf-chd', 'auxiliary', 'options')
+#
+# Run this script to compile the dfn files:
+#
+#     python dfn_cache.py
+
+import os
+import sys
+import json
+import hashlib
+from collections import OrderedDict
+
+# change this number when the parser or the layout of the cache changes
+CACHE_VERSION = 1
+
+pth = os.path.dirname(os.path.abspath(__file__))
+DFNDIR = os.path.join(pth, 'dfn')
+CACHEFILE = os.path.join(pth, '.dfn_cache.json')
+
+
+def parse_mf6var_file(fname):
+    f = open(fname, 'r')
+    lines = f.readlines()
+    f.close()
+
+    vardict = OrderedDict()
+    vd = {}
+
+    for line in lines:
+
+        # skip blank lines
+        if len(line.strip()) == 0:
+            if len(vd) > 0:
+                name = vd['name']
+                if 'block' in vd:
+                    block = vd['block']
+                    key = (name, block)
+                else:
+                    key = name
+                if name in vardict:
+                    raise Exception(
+                        'Variable already exists in dictionary: ' + name)
+                vardict[key] = vd
+            vd = {}
+            continue
+
+        # skip comments
+        if '#' in line.strip()[0]:
+            continue
+
+        ll = line.strip().split()
+        if len(ll) > 1:
+            k = ll[0]
+            istart = line.index(' ')
+            v = line[istart:].strip()
+            if k in vd:
+                raise Exception('Attribute already exists in dictionary: ' + k)
+            vd[k] = v
+
+    if len(vd) > 0:
+        name = vd['name']
+        if 'block' in vd:
+            block = vd['block']
+            key = (name, block)
+        else:
+            key = name
+        if name in vardict:
+            raise Exception(
+                'Variable already exists in dictionary: ' + name)
+        vardict[key] = vd
+    return vardict
+
+
+def get_hash(fname):
+    """
+    sha256 hash of the content of a file
+
+    """
+    with open(fname, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def compile_dfn(fname):
+    """
+    Parse a dfn file and return a JSON serializable cache entry
+
+    """
+    vardict = parse_mf6var_file(fname)
+    variables = []
+    blocks = []
+    for key, vd in vardict.items():
+        if isinstance(key, tuple):
+            name, block = key
+        else:
+            name, block = key, None
+        variables.append([name, block, vd])
+        if block is not None and block not in blocks:
+            blocks.append(block)
+    return {'hash': get_hash(fname), 'variables': variables,
+            'blocks': blocks}
+
+
+class DfnCache(object):
+    """
+    Compiled dfn files
+
+    Parameters
+    ----------
+    dfndir : str
+        path to the folder with the dfn files
+    cachefile : str
+        path to the JSON cache, the cache is not written if cachefile is
+        None
+    verbose : bool
+        boolean indicating if the files that are compiled are listed
+
+    """
+
+    def __init__(self, dfndir=DFNDIR, cachefile=CACHEFILE, verbose=False):
+        self.dfndir = dfndir
+        self.cachefile = cachefile
+        self.verbose = verbose
+        self.entries = OrderedDict()
+        self.compiled = []
+        self._vardicts = {}
+        self.load()
+
+    def get_dfn_names(self):
+        """
+        Names (without extension) of the dfn files in the dfn folder
+
+        """
+        return sorted([os.path.splitext(f)[0] for f in os.listdir(self.dfndir)
+                       if os.path.splitext(f)[1].lower() == '.dfn'])
+
+    def read_cache(self):
+        if self.cachefile is None or not os.path.isfile(self.cachefile):
+            return {}
+        try:
+            with open(self.cachefile, 'r') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cached.get('version') != CACHE_VERSION:
+            return {}
+        return cached.get('dfns', {})
+
+    def write_cache(self):
+        if self.cachefile is None:
+            return
+        cached = {'version': CACHE_VERSION, 'dfns': self.entries}
+        tmp = '{}.{}'.format(self.cachefile, os.getpid())
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(cached, f, indent=1)
+            os.replace(tmp, self.cachefile)
+        except OSError:
+            if os.path.isfile(tmp):
+                os.remove(tmp)
+            print('could not write {}'.format(self.cachefile))
+        return
+
+    def load(self):
+        """
+        Load the cache and compile the dfn files that changed
+
+        """
+        cached = self.read_cache()
+        changed = len(cached) < 1
+        for name in self.get_dfn_names():
+            fname = os.path.join(self.dfndir, name + '.dfn')
+            entry = cached.get(name)
+            if entry is None or entry['hash'] != get_hash(fname):
+                if self.verbose:
+                    print('compiling {}'.format(fname))
+                entry = compile_dfn(fname)
+                self.compiled.append(name)
+                changed = True
+            self.entries[name] = entry
+        if set(cached) != set(self.entries):
+            changed = True
+        if changed:
+            self.write_cache()
+        return
+
+    def get_names(self):
+        return list(self.entries.keys())
+
+    def get_hash(self, name):
+        return self.entries[name]['hash']
+
+    def get_blocks(self, name):
+        """
+        Block names of a dfn file in the order they are defined
+
+        """
+        return list(self.entries[name]['blocks'])
+
+    def get_vardict(self, name):
+        """
+        Variable dictionary of a dfn file, the same as the dictionary
+        returned by parse_mf6var_file()
+
+        """
+        if name not in self._vardicts:
+            vardict = OrderedDict()
+            for varname, block, vd in self.entries[name]['variables']:
+                if block is None:
+                    key = varname
+                else:
+                    key = (varname, block)
+                vardict[key] = dict(vd)
+            self._vardicts[name] = vardict
+        return self._vardicts[name]
+
+    def get_variable(self, name, varname, block=None):
+        """
+        Attributes of a variable in a dfn file
+
+        """
+        if block is None:
+            return self.get_vardict(name)[varname]
+        return self.get_vardict(name)[(varname, block)]
+
+    def get_block_variables(self, name, block):
+        """
+        Names of the variables in a block of a dfn file
+
+        """
+        return [varname for varname, b, vd in self.entries[name]['variables']
+                if b == block]
+
+
+if __name__ == '__main__':
+    dfns = DfnCache(verbose=True)
+    print('{} dfn files in {}'.format(len(dfns.get_names()), CACHEFILE))
+    print('{} dfn files compiled'.format(len(dfns.compiled)))
+    sys.exit(0)
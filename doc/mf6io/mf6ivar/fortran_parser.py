@@ -1,32 +1,83 @@
+"""
+Indexed scanner for the MODFLOW 6 Fortran source files.
+
+Every .f90 file is read and split into complete lines (comments removed and
+continuation lines appended) once.  The modules, derived types, type
+extensions, and mem_allocate call sites found in a file are stored in a JSON
+cache (.fortran_cache.json) with the size, modification time, and sha256 hash
+of the file.  The next time the source tree is scanned only new files and
+files with a changed hash are read again.
+
+    index = SourceIndex('../../../src')
+    parent = index.get_inheritance_dict()['GwfNpfType']
+    for site in index.get_mem_allocate_sites():
+        print(site['file'], site['module'], site['class'], site['line'])
+
+"""
+
 import os
+import re
+import json
+import hashlib
+from collections import OrderedDict
+
+# change this number when the scanner or the layout of the cache changes
+CACHE_VERSION = 1
+
+pth = os.path.dirname(os.path.abspath(__file__))
+SOURCEDIR = os.path.join(pth, '..', '..', '..', 'src')
+CACHEFILE = os.path.join(pth, '.fortran_cache.json')
+
+RE_MODULE = re.compile(r'^module\s+(\w+)$', re.IGNORECASE)
+RE_TYPE = re.compile(r'^type\s*(,[^:]*)?::\s*(\w+)', re.IGNORECASE)
+RE_TYPE_NOCOLONS = re.compile(r'^type\s+(\w+)$', re.IGNORECASE)
+RE_EXTENDS = re.compile(r'extends\s*\(\s*(\w+)\s*\)', re.IGNORECASE)
+RE_CLASS = re.compile(r'^class\s*\(\s*(\w+)\s*\)', re.IGNORECASE)
+
 
+def clean_line(line):
+    """
+    Strip a line and remove the comment
 
-def get_next_line(line_list):
+    """
+    line = line.strip()
+    if "!" in line:
+        idx = line.index("!")
+        line = line[:idx]
+    return line.strip()
+
+
+def get_next_line(lines, i):
+    """
+    Get the next line that is not empty in a list of clean lines, starting at
+    position i.  The line and the position after the line are returned.
+
+    """
     line = ''
-    while len(line_list) > 0:
-        line = line_list.pop(0)
-        line = r'{}'.format(line)
-        line = line.strip()
-        if "!" in line:
-            idx = line.index("!")
-            line = line[:idx]
-        line = line.strip()
-        if len(line) == 0:
-            continue
-        else:
+    n = len(lines)
+    while i < n:
+        line = lines[i]
+        i += 1
+        if len(line) > 0:
             break
-    return line, line_list
+    return line, i
 
 
 def get_full_lines(fname):
+    """
+    Get the complete lines in a Fortran source file, with the comments
+    removed and continuation lines appended
+
+    """
     with open(fname, 'r') as f:
-        line_list = f.readlines()
+        lines = [clean_line(line) for line in f]
     full_lines = []
-    while len(line_list) > 0:
-        line, line_list = get_next_line(line_list)
+    i = 0
+    while i < len(lines):
+        line, i = get_next_line(lines, i)
         while line.endswith("&"):
             line = line[:-1].strip()
-            lnext, line_list = get_next_line(line_list)
+            lnext, i = get_next_line(lines, i)
             if lnext.startswith("&"):
                 lnext = lnext[1:]
             line += lnext
@@ -34,6 +85,260 @@ def get_full_lines(fname):
     return full_lines
 
 
+def parse_type_extends(line):
+    istart = line.index("(")
+    istop = line.index(")")
+    parent = line[istart + 1:istop]
+    istart = line.index("::")
+    child = line[istart + 2:].strip()
+    return child, parent
+
+
+def scan_lines(full_lines):
+    """
+    Find the modules, derived types, and mem_allocate call sites in a list
+    of complete lines
+
+    Returns
+    -------
+    entry : dict
+        dictionary with a list of module names, a list of types (name,
+        parent, and module), and a list of mem_allocate sites (module,
+        class, and line)
+
+    """
+    modules = []
+    types = []
+    sites = []
+    current_module = None
+    current_class = None
+    for line in full_lines:
+        lower = line.lower()
+        m = RE_MODULE.match(line)
+        if m is not None and m.group(1).lower() != 'procedure':
+            current_module = m.group(1)
+            modules.append(current_module)
+            continue
+        if lower.startswith('type'):
+            m = RE_TYPE.match(line)
+            if m is not None:
+                name = m.group(2)
+                parent = None
+                if m.group(1) is not None:
+                    e = RE_EXTENDS.search(m.group(1))
+                    if e is not None:
+                        parent = e.group(1)
+            else:
+                m = RE_TYPE_NOCOLONS.match(line)
+                if m is None:
+                    continue
+                name = m.group(1)
+                parent = None
+            types.append({'name': name, 'parent': parent,
+                          'module': current_module})
+            continue
+        if lower.startswith('class') and 'this' in lower:
+            m = RE_CLASS.match(line)
+            if m is not None:
+                current_class = m.group(1)
+        if 'mem_allocate(' in line:
+            sites.append({'module': current_module, 'class': current_class,
+                          'line': line})
+    return {'modules': modules, 'types': types, 'sites': sites}
+
+
+def get_hash(fname):
+    """
+    sha256 hash of the content of a file
+
+    """
+    with open(fname, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class SourceIndex(object):
+    """
+    Index of the modules, derived types, and mem_allocate call sites in
+    the Fortran source files of a source tree
+
+    Parameters
+    ----------
+    source_dir : str
+        path to the source tree
+    ext : str
+        extension of the source files
+    cachefile : str
+        path to the JSON cache, the cache is not used if cachefile is None
+    verbose : bool
+        boolean indicating if the files that are scanned are listed
+
+    """
+
+    def __init__(self, source_dir=SOURCEDIR, ext='.f90', cachefile=CACHEFILE,
+                 verbose=False):
+        assert os.path.isdir(source_dir)
+        self.source_dir = source_dir
+        self.ext = ext
+        self.cachefile = cachefile
+        self.verbose = verbose
+        self.entries = OrderedDict()
+        self.scanned = []
+        self.load()
+
+    def get_source_files(self):
+        """
+        Paths, relative to the source tree, of the source files in the order
+        returned by os.walk()
+
+        """
+        files = []
+        for root, dirs, fnames in os.walk(self.source_dir):
+            for f in fnames:
+                if f.endswith(self.ext):
+                    fpth = os.path.join(root, f)
+                    files.append(os.path.relpath(fpth, self.source_dir))
+        return files
+
+    def read_cache(self):
+        if self.cachefile is None or not os.path.isfile(self.cachefile):
+            return {}
+        try:
+            with open(self.cachefile, 'r') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cached.get('version') != CACHE_VERSION or \
+                cached.get('ext') != self.ext:
+            return {}
+        return cached.get('files', {})
+
+    def write_cache(self):
+        if self.cachefile is None:
+            return
+        cached = {'version': CACHE_VERSION, 'ext': self.ext,
+                  'files': self.entries}
+        tmp = '{}.{}'.format(self.cachefile, os.getpid())
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(cached, f, indent=1)
+            os.replace(tmp, self.cachefile)
+        except OSError:
+            if os.path.isfile(tmp):
+                os.remove(tmp)
+            print('could not write {}'.format(self.cachefile))
+        return
+
+    def load(self):
+        """
+        Load the cache and scan the source files that changed.  The hash of
+        a file is only calculated if the size or modification time of the
+        file changed.
+
+        """
+        cached = self.read_cache()
+        changed = False
+        for fname in self.get_source_files():
+            fpth = os.path.join(self.source_dir, fname)
+            stat = os.stat(fpth)
+            entry = cached.get(fname)
+            if entry is not None and (entry['size'] != stat.st_size or
+                                      entry['mtime'] != stat.st_mtime_ns):
+                if entry['hash'] == get_hash(fpth):
+                    entry['size'] = stat.st_size
+                    entry['mtime'] = stat.st_mtime_ns
+                else:
+                    entry = None
+                changed = True
+            if entry is None:
+                if self.verbose:
+                    print("processing {}".format(fname))
+                entry = scan_lines(get_full_lines(fpth))
+                entry['size'] = stat.st_size
+                entry['mtime'] = stat.st_mtime_ns
+                entry['hash'] = get_hash(fpth)
+                self.scanned.append(fname)
+                changed = True
+            self.entries[fname] = entry
+        if changed or list(cached) != list(self.entries):
+            self.write_cache()
+        return
+
+    def get_files(self):
+        return list(self.entries.keys())
+
+    def get_full_lines(self, fname):
+        """
+        Complete lines of a source file (the lines are not cached)
+
+        """
+        return get_full_lines(os.path.join(self.source_dir, fname))
+
+    def get_modules(self):
+        """
+        Dictionary with the source file of every module
+
+        """
+        d = OrderedDict()
+        for fname, entry in self.entries.items():
+            for module in entry['modules']:
+                d[module] = fname
+        return d
+
+    def get_types(self):
+        """
+        Dictionary with the module, parent, and source file of every derived
+        type
+
+        """
+        d = OrderedDict()
+        for fname, entry in self.entries.items():
+            for t in entry['types']:
+                d[t['name']] = {'module': t['module'], 'parent': t['parent'],
+                                'file': fname}
+        return d
+
+    def get_inheritance_dict(self):
+        """
+        Dictionary with the parent of every derived type that extends
+        another type
+
+        """
+        return OrderedDict([(name, t['parent']) for name, t in
+                            self.get_types().items()
+                            if t['parent'] is not None])
+
+    def get_ancestors(self, typename):
+        """
+        List of the parents of a derived type, starting with the parent
+
+        """
+        ihd = self.get_inheritance_dict()
+        ancestors = []
+        while typename in ihd and ihd[typename] not in ancestors:
+            typename = ihd[typename]
+            ancestors.append(typename)
+        return ancestors
+
+    def get_mem_allocate_sites(self, fname=None, module=None):
+        """
+        List of the mem_allocate call sites, optionally for a single source
+        file (the name or path relative to the source tree) or module
+
+        """
+        sites = []
+        for f, entry in self.entries.items():
+            if fname is not None and fname not in (f, os.path.basename(f)):
+                continue
+            for site in entry['sites']:
+                if module is not None and \
+                        (site['module'] or '').lower() != module.lower():
+                    continue
+                d = {'file': f}
+                d.update(site)
+                sites.append(d)
+        return sites
+
+
 def source_dir_to_dict(source_dir=".", ext='.f90', verbose=True):
     assert os.path.isdir(source_dir)
     d = {}
@@ -48,22 +353,5 @@ def source_dir_to_dict(source_dir=".", ext='.f90', verbose=True):
     return d
 
 
-def parse_type_extends(line):
-    istart = line.index("(")
-    istop = line.index(")")
-    parent = line[istart + 1:istop]
-    istart = line.index("::")
-    child = line[istart + 2:].strip()
-    return child, parent
-
-
 def get_inheritance_dict(source_dir):
-    d = source_dir_to_dict(source_dir)
-    inheritance_dict = {}
-    for f in d:
-        full_lines = d[f]
-        for line in full_lines:
-            if "type, extends" in line:
-                child, parent = parse_type_extends(line)
-                inheritance_dict[child] = parent
-    return inheritance_dict
\ No newline at end of file
+    return SourceIndex(source_dir).get_inheritance_dict()
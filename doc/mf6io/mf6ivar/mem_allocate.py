@@ -8,7 +8,7 @@ information on the mf6 variables that are stored in the memory manager.
 """
 
 import os
-from fortran_parser import source_dir_to_dict, get_inheritance_dict
+from fortran_parser import SourceIndex
 
 # Set up and check paths
 source_dir = "../../../src"
@@ -18,23 +18,6 @@ assert os.path.isdir(source_dir)
 print("Starting...")
 
 
-def update_current_class(line, current_class):
-    if line.lower().startswith("class") and "this" in line.lower():
-        if "(" in line:
-            idxstart = line.index("(") + 1
-            idxend = line.index(")")
-            current_class = line[idxstart:idxend]
-            current_class = current_class.strip()
-    return current_class
-
-
-def update_current_module(line, current_module):
-    if line.lower().startswith("module"):
-        ll = line.strip().split()
-        current_module = ll[1]
-    return current_module
-
-
 def parse_mem_allocate_line(line):
     arglist = None
     if "(" in line:
@@ -44,53 +27,51 @@ def parse_mem_allocate_line(line):
     return arglist
 
 
-def line_list_to_var_list(line_list, fname):
-    "convert clean fortran lines into list of memory manager variables"
-    current_class = None
-    current_module = None
+def site_list_to_var_list(site_list, fname):
+    "convert mem_allocate call sites into list of memory manager variables"
     class_varname_list = []
     memvar_list = []
-    for line in line_list:
-        current_class = update_current_class(line, current_class)
-        current_module = update_current_module(line, current_module)
-        if "mem_allocate(" in line:
-            arglist = parse_mem_allocate_line(line)
-
-            # mempath
-            memory_path = arglist.pop()
-
-            # variable name
-            varname = arglist.pop()
-            varname = varname.replace('"', "")
-            varname = varname.replace("'", "")
-
-            # fortran variable name
-            fortran_varname = arglist.pop(0)
-            fortran_varname = fortran_varname.lower()
-            npercents = fortran_varname.count("%")
-            fortran_varname = fortran_varname.replace("this%", "")
-            if current_class is not None:
-                class_varname = "{}.{}".format(current_class, fortran_varname)
-            else:
-                class_varname = fortran_varname
-
-            # source name
-            source_name = os.path.basename(fname)
-
-            # shape
-            shape = ""
-            if len(arglist) > 0:
-                shape = "(" + ",".join(arglist) + ")"
-
-            # number of dimensions
-            dims = len(arglist)
-
-            # check for uniqueness and write to md and tex
-            if class_varname not in class_varname_list:
-                class_varname_list.append(class_varname)
-                l = [source_name, current_module, current_class,
-                     fortran_varname, varname, dims]
-                memvar_list.append(l)
+    for site in site_list:
+        current_class = site["class"]
+        current_module = site["module"]
+        line = site["line"]
+        arglist = parse_mem_allocate_line(line)
+
+        # mempath
+        memory_path = arglist.pop()
+
+        # variable name
+        varname = arglist.pop()
+        varname = varname.replace('"', "")
+        varname = varname.replace("'", "")
+
+        # fortran variable name
+        fortran_varname = arglist.pop(0)
+        fortran_varname = fortran_varname.lower()
+        npercents = fortran_varname.count("%")
+        fortran_varname = fortran_varname.replace("this%", "")
+        if current_class is not None:
+            class_varname = "{}.{}".format(current_class, fortran_varname)
+        else:
+            class_varname = fortran_varname
+
+        # source name
+        source_name = os.path.basename(fname)
+
+        # shape
+        shape = ""
+        if len(arglist) > 0:
+            shape = "(" + ",".join(arglist) + ")"
+
+        # number of dimensions
+        dims = len(arglist)
+
+        # check for uniqueness and write to md and tex
+        if class_varname not in class_varname_list:
+            class_varname_list.append(class_varname)
+            l = [source_name, current_module, current_class,
+                 fortran_varname, varname, dims]
+            memvar_list.append(l)
 
     return memvar_list
 
@@ -115,15 +96,15 @@ def write_tex(memvar_list, ftex):
 
 def write_md_header(f):
     s = "# MODFLOW 6 MEMORY MANAGER VARIABLES\n\n"
-    fmd.write(s)
+    f.write(s)
     s = "| {} | {} | {} | {} | {} |\n".format(
         "source file", "module", "type.variable name", "variable name",
         "dimensions"
     )
-    fmd.write(s)
+    f.write(s)
     s = "| {} | {} | {} | {} | {} |\n".format(":---:", ":---:", ":---:",
                                               ":---:", ":---:")
-    fmd.write(s)
+    f.write(s)
     return
 
 
@@ -178,10 +159,10 @@ def write_tex_record(f, classname, varname, dimension):
     return
 
 
-# use fortran parser to return a dictionary with the key equal the file
-# name and the value equal to a list of complete fortran lines with comments
-# removed and continuation lines appended
-d = source_dir_to_dict(source_dir)
+# use the fortran source index to get the mem_allocate call sites in every
+# source file, only source files that changed since the last run are scanned
+# again
+index = SourceIndex(source_dir)
 
 # setup a markdown file
 fmd = open(markdown_file, "w")
@@ -193,23 +174,20 @@ if latex_file is not None:
     write_tex_header(ftex)
 
 i = 0
-for root, dirs, files in os.walk(source_dir):
-    for f in files:
-        if f.endswith(".f90"):
-            fwpath = os.path.join(root, f)
-            full_lines = d[f]
-            memvar_list = line_list_to_var_list(full_lines, fwpath)
-            if len(memvar_list) > 0:
-                print("{} -- {}".format(i, f))
-                i += 1
-            write_md(memvar_list, fmd)
-            if latex_file is not None:
-                write_tex(memvar_list, ftex)
+for fname in index.get_files():
+    site_list = index.get_mem_allocate_sites(fname=fname)
+    memvar_list = site_list_to_var_list(site_list, fname)
+    if len(memvar_list) > 0:
+        print("{} -- {}".format(i, os.path.basename(fname)))
+        i += 1
+    write_md(memvar_list, fmd)
+    if latex_file is not None:
+        write_tex(memvar_list, ftex)
 
 if latex_file is not None:
     write_tex_footer(ftex)
 
-ihd = get_inheritance_dict(source_dir)
+ihd = index.get_inheritance_dict()
 print("\ninheritance structure")
 for child in ihd:
     print(child, "<--", ihd[child])
@@ -130,70 +130,26 @@
 
 import os
 import sys
-from collections import OrderedDict
+import io
+import json
+import hashlib
+import multiprocessing
 import re
 import shutil
 
+from dfn_cache import DfnCache
+
 VERBOSE = False
 for arg in sys.argv:
     if arg in ("-v", "--verbose"):
         VERBOSE = True
 
 
-def parse_mf6var_file(fname):
-    f = open(fname, 'r')
-    lines = f.readlines()
-    f.close()
-
-    vardict = OrderedDict()
-    vd = {}
-
-    for line in lines:
-
-        # skip blank lines
-        if len(line.strip()) == 0:
-            if len(vd) > 0:
-                name = vd['name']
-                if 'block' in vd:
-                    block = vd['block']
-                    key = (name, block)
-                else:
-                    key = name
-                if name in vardict:
-                    raise Exception(
-                        'Variable already exists in dictionary: ' + name)
-                vardict[key] = vd
-            vd = {}
-            continue
-
-        # skip comments
-        if '#' in line.strip()[0]:
-            continue
-
-        ll = line.strip().split()
-        if len(ll) > 1:
-            k = ll[0]
-            istart = line.index(' ')
-            v = line[istart:].strip()
-            if k in vd:
-                raise Exception('Attribute already exists in dictionary: ' + k)
-            vd[k] = v
-
-    if len(vd) > 0:
-        name = vd['name']
-        if 'block' in vd:
-            block = vd['block']
-            key = (name, block)
-        else:
-            key = name
-        if name in vardict:
-            raise Exception(
-                'Variable already exists in dictionary: ' + name)
-        vardict[key] = vd
-    return vardict
-
+# compiled dfn files, only dfn files that changed since the last run are
+# parsed again
+DFNS = DfnCache(verbose=VERBOSE)
 
-COMMONDESCRIPTIONS = parse_mf6var_file(os.path.join('.', 'dfn', 'common.dfn'))
+COMMONDESCRIPTIONS = DFNS.get_vardict('common')
 
 
 def block_entry(varname, block, vardict, prefix='  '):
@@ -544,14 +500,14 @@ def get_obs_table(component):
 
 def write_md_header(f):
     s = '# MODFLOW 6 INPUT VARIABLES\n\n'
-    fmd.write(s)
+    f.write(s)
     s = '| {} | {} | {} | {} | {} | {} |\n'.format('component', 'package',
                                                    'block', 'variable name',
                                                    'type', 'description')
-    fmd.write(s)
+    f.write(s)
     s = '| {} | {} | {} | {} | {} | {} |\n'.format(':---:', ':---:', ':---:',
                                                    ':---:', ':---:', '---')
-    fmd.write(s)
+    f.write(s)
     return
 
 
@@ -581,7 +537,7 @@ def write_md(f, vardict, component, package):
 
 def write_appendix(texdir, allblocks):
     fname = os.path.join(texdir, 'appendixA.tex')
-    f = open(fname, 'w')
+    f = io.StringIO()
     f.write('\\small\n\\begin{longtable}{p{1.5cm} p{1.5cm} p{3cm} c}\n')
     f.write(
         '\\caption{List of block names organized by component and input file '
@@ -624,87 +580,98 @@ def write_appendix(texdir, allblocks):
 
     f.write(
         '\n\n\\hline\n\\end{longtable}\n\\label{table:blocks}\n\\normalsize\n')
-    f.close()
+    write_file(fname, f.getvalue())
     return
 
 
-if __name__ == '__main__':
+file_order = ['sim-nam',  # dfn completed  tex updated
+              'sim-tdis',  # dfn completed  tex updated
+              'exg-gwfgwf',  # dfn completed  tex updated
+              'exg-gwfgwt',
+              'sln-ims',  # dfn completed  tex updated
+              'gwf-nam',  # dfn completed  tex updated
+              'gwf-dis',  # dfn completed  tex updated
+              'gwf-disv',  # dfn completed  tex updated
+              'gwf-disu',  # dfn completed  tex updated
+              'gwf-ic',  # dfn completed  tex updated
+              'gwf-npf',  # dfn completed  tex updated
+              'gwf-buy',  # dfn completed  tex updated
+              'gwf-sto',  # dfn completed  tex updated
+              'gwf-csub',  # dfn completed  tex updated
+              'gwf-hfb',  # dfn completed  tex updated
+              'gwf-chd',  # dfn completed  tex updated
+              'gwf-wel',  # dfn completed  tex updated
+              'gwf-drn',  # dfn completed  tex updated
+              'gwf-riv',  # dfn completed  tex updated
+              'gwf-ghb',  # dfn completed  tex updated
+              'gwf-rch',  # dfn completed  tex updated
+              'gwf-rcha',  # dfn completed  tex updated
+              'gwf-evt',  # dfn completed  tex updated
+              'gwf-evta',  # dfn completed  tex updated
+              'gwf-maw',  # dfn completed  tex updated
+              'gwf-sfr',  # dfn completed  tex updated
+              'gwf-lak',  # dfn completed  tex updated
+              'gwf-uzf',  # dfn completed  tex updated
+              'gwf-mvr',  # dfn completed  tex updated
+              'gwf-gnc',  # dfn completed  tex updated
+              'gwf-oc',  # dfn completed  tex updated
+              'gwt-adv',
+              'gwt-dsp',
+              'gwt-cnc',
+              'gwt-dis',
+              'gwt-disv',
+              'gwt-disu',
+              'gwt-ic',
+              'gwt-nam',
+              'gwt-oc',
+              'gwt-ssm',
+              'gwt-src',
+              'gwt-mst',
+              'gwt-ist',
+              'gwt-sft',
+              'gwt-lkt',
+              'gwt-mwt',
+              'gwt-uzt',
+              'gwt-fmi',
+              'gwt-mvt',
+              'utl-lak-tab',  # dfn completed  tex updated
+              'utl-obs',
+              'utl-ts',
+              'utl-tas']
+
+# directories
+dfndir = os.path.join('.', 'dfn')
+texdir = os.path.join('.', 'tex')
+mddir = os.path.join('.', 'md')
+docdir = os.path.join("..", "..", "..", ".doc", "_mf6io")
+
+# record of the inputs and outputs of the last run, used to determine which
+# outputs are stale in incremental mode
+STATEFILE = os.path.join('.', '.mf6ivar_state.json')
+
+
+def write_file(fname, s):
+    """
+    Write a file atomically.  The file is not rewritten if the content
+    did not change.  Returns True if the file was written.
 
-    file_order = ['sim-nam',  # dfn completed  tex updated
-                  'sim-tdis',  # dfn completed  tex updated
-                  'exg-gwfgwf',  # dfn completed  tex updated
-                  'exg-gwfgwt',
-                  'sln-ims',  # dfn completed  tex updated
-                  'gwf-nam',  # dfn completed  tex updated
-                  'gwf-dis',  # dfn completed  tex updated
-                  'gwf-disv',  # dfn completed  tex updated
-                  'gwf-disu',  # dfn completed  tex updated
-                  'gwf-ic',  # dfn completed  tex updated
-                  'gwf-npf',  # dfn completed  tex updated
-                  'gwf-buy',  # dfn completed  tex updated
-                  'gwf-sto',  # dfn completed  tex updated
-                  'gwf-csub',  # dfn completed  tex updated
-                  'gwf-hfb',  # dfn completed  tex updated
-                  'gwf-chd',  # dfn completed  tex updated
-                  'gwf-wel',  # dfn completed  tex updated
-                  'gwf-drn',  # dfn completed  tex updated
-                  'gwf-riv',  # dfn completed  tex updated
-                  'gwf-ghb',  # dfn completed  tex updated
-                  'gwf-rch',  # dfn completed  tex updated
-                  'gwf-rcha',  # dfn completed  tex updated
-                  'gwf-evt',  # dfn completed  tex updated
-                  'gwf-evta',  # dfn completed  tex updated
-                  'gwf-maw',  # dfn completed  tex updated
-                  'gwf-sfr',  # dfn completed  tex updated
-                  'gwf-lak',  # dfn completed  tex updated
-                  'gwf-uzf',  # dfn completed  tex updated
-                  'gwf-mvr',  # dfn completed  tex updated
-                  'gwf-gnc',  # dfn completed  tex updated
-                  'gwf-oc',  # dfn completed  tex updated
-                  'gwt-adv',
-                  'gwt-dsp',
-                  'gwt-cnc',
-                  'gwt-dis',
-                  'gwt-disv',
-                  'gwt-disu',
-                  'gwt-ic',
-                  'gwt-nam',
-                  'gwt-oc',
-                  'gwt-ssm',
-                  'gwt-src',
-                  'gwt-mst',
-                  'gwt-ist',
-                  'gwt-sft',
-                  'gwt-lkt',
-                  'gwt-mwt',
-                  'gwt-uzt',
-                  'gwt-fmi',
-                  'gwt-mvt',
-                  'utl-lak-tab',  # dfn completed  tex updated
-                  'utl-obs',
-                  'utl-ts',
-                  'utl-tas']
-
-    # directories
-    dfndir = os.path.join('.', 'dfn')
-    texdir = os.path.join('.', 'tex')
-    mddir = os.path.join('.', 'md')
-    docdir = os.path.join("..", "..", "..", ".doc", "_mf6io")
-
-    # regenerate docdir
-    if os.path.isdir(docdir):
-        shutil.rmtree(docdir)
-    os.makedirs(docdir)
+    """
+    if os.path.isfile(fname):
+        with open(fname, 'r') as f:
+            if f.read() == s:
+                return False
+    tmp = '{}.{}.tmp'.format(fname, os.getpid())
+    with open(tmp, 'w') as f:
+        f.write(s)
+    os.replace(tmp, fname)
+    return True
 
-    # list for storing all block names
-    allblocks = []
 
-    # setup a markdown file
-    fname = os.path.join(mddir, 'mf6ivar.md')
-    fmd = open(fname, 'w')
-    write_md_header(fmd)
+def get_dfn_files():
+    """
+    Get the names of the dfn files to process in the order of file_order
 
-    # construct list of dfn files to process in the order of file_order
+    """
     files = os.listdir(dfndir)
     for f in files:
         if 'common' in f:
@@ -713,130 +680,261 @@ if __name__ == '__main__':
             continue
         if os.path.splitext(f)[0] not in file_order:
             raise Exception('File not in file_order: ', f)
-    files = [fname + '.dfn' for fname in file_order if fname + '.dfn' in files]
-    # files = ['gwf-obs.dfn']
+    return [fname + '.dfn' for fname in file_order if fname + '.dfn' in files]
 
-    # # create rst file for markdown
-    # fpth = os.path.join(docdir, "mf6io.rst")
-    # frst = open(fpth, "w")
-    # s =  ".. toctree::\n"
-    # s += "   :maxdepth: 4\n"
-    # s += "   :name: mf6-io\n\n"
-    # frst.write(s)
 
-    for txtname in files:
-        component, package = os.path.splitext(txtname)[0].split('-')[0:2]
-        vardict = parse_mf6var_file(os.path.join(dfndir, txtname))
-
-        # make list of unique block names
-        blocks = []
-        for k in vardict:
-            v = vardict[k]
-            b = v['block']
-            if b not in blocks:
-                blocks.append(b)
-
-        # add a full block name to allblocks
-        for block in blocks:
-            b = '{}-{}-{}'.format(component, package, block)
-            allblocks.append(b)
+def get_dependencies(txtname):
+    """
+    Get the input files used to create the outputs for a dfn file: the dfn
+    file, common.dfn, the example and observation files, and the scripts
+    that create the outputs
+
+    """
+    mdname = os.path.splitext(txtname)[0]
+    files = [os.path.join(dfndir, txtname),
+             os.path.join(dfndir, 'common.dfn'),
+             os.path.abspath(__file__),
+             os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'dfn_cache.py')]
+    pth = os.path.join('examples')
+    files += [os.path.join(pth, filename) for filename in
+              sorted(os.listdir(pth)) if mdname.lower() in filename.lower()]
+    pth = os.path.join('..', '..', 'Common')
+    files += [os.path.join(pth, filename) for filename in
+              sorted(os.listdir(pth)) if mdname.lower() in filename.lower()
+              and filename.lower().endswith('obs.tex')]
+    return files
+
+
+def get_dependency_hash(txtname):
+    """
+    Hash of the names and contents of the input files for a dfn file
+
+    """
+    h = hashlib.sha256()
+    for fpth in get_dependencies(txtname):
+        h.update(os.path.basename(fpth).encode())
+        with open(fpth, 'rb') as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def load_state():
+    if not os.path.isfile(STATEFILE):
+        return {}
+    try:
+        with open(STATEFILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    write_file(STATEFILE, json.dumps(state, indent=1, sort_keys=True))
+    return
+
+
+def is_stale(txtname, state):
+    """
+    Determine if the outputs for a dfn file need to be regenerated
+
+    """
+    mdname = os.path.splitext(txtname)[0]
+    if mdname not in state:
+        return True
+    entry = state[mdname]
+    if entry['hash'] != get_dependency_hash(txtname):
+        return True
+    for fname in entry['outputs']:
+        if not os.path.isfile(fname):
+            return True
+    return False
+
+
+def build_dfn(txtname):
+    """
+    Create the TeX and markdown files for a dfn file.  Returns the name
+    of the dfn file, the hash of its inputs, and the list of outputs.
+
+    """
+    dfnhash = get_dependency_hash(txtname)
+    dfnname = os.path.splitext(txtname)[0]
+    vardict = DFNS.get_vardict(dfnname)
+
+    # list of unique block names
+    blocks = DFNS.get_blocks(dfnname)
+
+    outputs = []
+
+    # go through each block and write information
+    desc = '% DO NOT MODIFY THIS FILE DIRECTLY.  IT IS CREATED BY mf6ivar.py \n\n'
+    for b in blocks:
+        blk_var_list = []
+
+        # Write the name of the block to the latex file
+        desc += '\item \\textbf{}\n\n'.format('{Block: ' + b.upper() + '}')
 
-        # go through each block and write information
-        desc = '% DO NOT MODIFY THIS FILE DIRECTLY.  IT IS CREATED BY mf6ivar.py \n\n'
-        for b in blocks:
-            blk_var_list = []
-
-            # Write the name of the block to the latex file
-            desc += '\item \\textbf{}\n\n'.format('{Block: ' + b.upper() + '}')
-
-            desc += '\\begin{description}\n'
-            desc += write_desc(vardict, b, blk_var_list,
-                               varexcludeprefix='dev_')
-            desc += '\\end{description}\n'
-
-            fname = os.path.join(texdir, os.path.splitext(txtname)[
-                0] + '-' + b + '.dat')
-            f = open(fname, 'w')
-            s = write_block(vardict, b, blk_var_list,
-                            varexcludeprefix='dev_') + '\n'
-            f.write(s)
-            if VERBOSE:
-                print(s)
-            f.close()
-        fname = os.path.join(texdir,
-                             os.path.splitext(txtname)[0] + '-desc' + '.tex')
-        f = open(fname, 'w')
-        s = desc + '\n'
+        desc += '\\begin{description}\n'
+        desc += write_desc(vardict, b, blk_var_list,
+                           varexcludeprefix='dev_')
+        desc += '\\end{description}\n'
+
+        fname = os.path.join(texdir, dfnname + '-' + b + '.dat')
+        s = write_block(vardict, b, blk_var_list,
+                        varexcludeprefix='dev_') + '\n'
+        write_file(fname, s)
+        outputs.append(fname)
+        if VERBOSE:
+            print(s)
+    fname = os.path.join(texdir, dfnname + '-desc' + '.tex')
+    s = desc + '\n'
+    write_file(fname, s)
+    outputs.append(fname)
+    if VERBOSE:
+        print(s)
+
+    # write markdown description
+    mdname = dfnname
+    fname = os.path.join(docdir, mdname + '.md')
+    f = io.StringIO()
+    f.write("### {}\n\n".format(mdname.upper()))
+    f.write("#### Structure of Blocks\n\n")
+    f.write("_FOR EACH SIMULATION_\n\n")
+    desc = ""
+    for b in blocks:
+        blk_var_list = []
+
+        # Write the name of the block to the latex file
+        desc += '##### Block: {}\n\n'.format(b.upper())
+
+        desc += write_desc_md(vardict, b, blk_var_list,
+                              varexcludeprefix='dev_')
+
+        if "period" in b.lower():
+            f.write("\n_FOR ANY STRESS PERIOD_\n\n")
+        f.write("```adoc\n")
+        s = md_replace(write_block(vardict, b, blk_var_list,
+                                   varexcludeprefix='dev_',
+                                   indent=4)) + "\n"
+        # s = s.replace("@", "") + "\n"
         f.write(s)
+        f.write("```\n")
         if VERBOSE:
             print(s)
-        f.close()
-
-        # write markdown description
-        mdname = os.path.splitext(txtname)[0]
-        fname = os.path.join(docdir, mdname + '.md')
-        f = open(fname, 'w')
-        f.write("### {}\n\n".format(mdname.upper()))
-        f.write("#### Structure of Blocks\n\n")
-        f.write("_FOR EACH SIMULATION_\n\n")
-        desc = ""
-        for b in blocks:
-            blk_var_list = []
-
-            # Write the name of the block to the latex file
-            desc += '##### Block: {}\n\n'.format(b.upper())
-
-            desc += write_desc_md(vardict, b, blk_var_list,
-                                  varexcludeprefix='dev_')
-
-            if "period" in b.lower():
-                f.write("\n_FOR ANY STRESS PERIOD_\n\n")
-            f.write("```adoc\n")
-            s = md_replace(write_block(vardict, b, blk_var_list,
-                                       varexcludeprefix='dev_',
-                                       indent=4)) + "\n"
-            # s = s.replace("@", "") + "\n"
-            f.write(s)
-            f.write("```\n")
-            if VERBOSE:
-                print(s)
-
-        f.write("\n#### Explanation of Variables\n\n")
-        f.write(desc)
-
-        # add examples
-        s = get_examples(mdname)
-        if len(s) > 0:
-            f.write(s)
-
-        # add observation table
-        s = get_obs_table(mdname)
-        if len(s) > 0:
-            f.write(s)
-
-        # add observation examples
-        s = get_obs_examples(mdname)
-        if len(s) > 0:
-            f.write(s)
-
-        # close the markdown file
-        f.close()
-
-        # # add to rst catalog
-        # s = "   {}\n".format(os.path.basename(fname))
-        # frst.write(s)
-
-        # write markdown
-        write_md(fmd, vardict, component, package)
 
-    # # close restart catalog
-    # frst.write("\n\n")
-    # frst.close()
+    f.write("\n#### Explanation of Variables\n\n")
+    f.write(desc)
+
+    # add examples
+    s = get_examples(mdname)
+    if len(s) > 0:
+        f.write(s)
+
+    # add observation table
+    s = get_obs_table(mdname)
+    if len(s) > 0:
+        f.write(s)
+
+    # add observation examples
+    s = get_obs_examples(mdname)
+    if len(s) > 0:
+        f.write(s)
+
+    # write the markdown file
+    write_file(fname, f.getvalue())
+    outputs.append(fname)
+
+    return dfnname, dfnhash, outputs
+
+
+def main(incremental=False, nproc=None):
+    """
+    Create the TeX and markdown files for all of the dfn files
+
+    In incremental mode only the outputs of dfn files with changed inputs
+    (or missing outputs) are regenerated.  Otherwise docdir is removed and
+    all of the outputs are regenerated.  The dfn files are processed in a
+    pool of nproc processes.
+
+    """
+    files = get_dfn_files()
+
+    if incremental:
+        state = load_state()
+    else:
+        # regenerate docdir
+        if os.path.isdir(docdir):
+            shutil.rmtree(docdir)
+        state = {}
+    if not os.path.isdir(docdir):
+        os.makedirs(docdir)
+
+    stale = [txtname for txtname in files if not incremental or
+             is_stale(txtname, state)]
+    if VERBOSE or incremental:
+        print('regenerating outputs for {} of {} dfn files'.format(
+            len(stale), len(files)))
+
+    if nproc is None:
+        nproc = multiprocessing.cpu_count()
+    nproc = min(nproc, len(stale))
+    if nproc > 1:
+        pool = multiprocessing.Pool(nproc)
+        results = pool.map(build_dfn, stale, chunksize=1)
+        pool.close()
+        pool.join()
+    else:
+        results = [build_dfn(txtname) for txtname in stale]
+
+    for dfnname, dfnhash, outputs in results:
+        # remove outputs for blocks that no longer exist
+        if dfnname in state:
+            for fname in state[dfnname]['outputs']:
+                if fname not in outputs and os.path.isfile(fname):
+                    os.remove(fname)
+        state[dfnname] = {'hash': dfnhash, 'outputs': outputs}
+
+    # forget dfn files that were removed
+    names = [os.path.splitext(txtname)[0] for txtname in files]
+    for dfnname in list(state.keys()):
+        if dfnname not in names:
+            del state[dfnname]
+
+    # list for storing all block names
+    allblocks = []
+    for txtname in files:
+        component, package = os.path.splitext(txtname)[0].split('-')[0:2]
+        for block in DFNS.get_blocks(os.path.splitext(txtname)[0]):
+            b = '{}-{}-{}'.format(component, package, block)
+            allblocks.append(b)
 
     if VERBOSE:
         for b in allblocks:
             print(b)
     write_appendix(texdir, allblocks)
 
-    # markdown close
-    fmd.close()
+    # setup a markdown file
+    fmd = io.StringIO()
+    write_md_header(fmd)
+    for txtname in files:
+        component, package = os.path.splitext(txtname)[0].split('-')[0:2]
+        vardict = DFNS.get_vardict(os.path.splitext(txtname)[0])
+        write_md(fmd, vardict, component, package)
+    fname = os.path.join(mddir, 'mf6ivar.md')
+    write_file(fname, fmd.getvalue())
+
+    save_state(state)
+    return
+
+
+if __name__ == '__main__':
+
+    incremental = False
+    nproc = None
+    for idx, arg in enumerate(sys.argv):
+        if arg in ('-i', '--incremental'):
+            incremental = True
+        elif arg in ('-j', '--nproc'):
+            nproc = int(sys.argv[idx + 1])
+
+    main(incremental=incremental, nproc=nproc)
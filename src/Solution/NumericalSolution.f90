@@ -2,7 +2,7 @@
 
 module NumericalSolutionModule
   use KindModule,              only: DP, I4B
-  use TimerModule,             only: code_timer
+  use TimerModule,             only: code_timer, wall_timer
   use ConstantsModule,         only: LINELENGTH, LENSOLUTIONNAME, LENPAKLOC,   &
                                      DPREC, DZERO, DEM20, DEM15, DEM6,         &
                                      DEM4, DEM3, DEM2, DEM1, DHALF,            &
@@ -41,12 +41,15 @@ module NumericalSolutionModule
   type, extends(BaseSolutionType) :: NumericalSolutionType
     character(len=LENMEMPATH)                            :: memoryPath !< the path for storing solution variables in the memory manager
     character(len=LINELENGTH)                            :: fname
-    type(ListType), pointer                              :: modellist !PAR
-    type(ListType), pointer                              :: exchangelist !PAR
+    type(ListType), pointer                              :: modellist => null() !PAR
+    type(ListType), pointer                              :: exchangelist => null() !PAR
     integer(I4B), pointer                                :: id
     integer(I4B), pointer                                :: iu
     real(DP), pointer                                    :: ttform
     real(DP), pointer                                    :: ttsoln
+    real(DP), pointer                                    :: twform => NULL()             !< wall clock time for formulating the system
+    real(DP), pointer                                    :: twsoln => NULL()             !< wall clock time for the linear solves
+    real(DP), pointer                                    :: twbud => NULL()              !< wall clock time for calculating flows and budgets
     integer(I4B), pointer                                :: neq => NULL()
     integer(I4B), pointer                                :: nja => NULL()
     integer(I4B), dimension(:), pointer, contiguous      :: ia => NULL()
@@ -79,6 +82,9 @@ module NumericalSolutionModule
     integer(I4B), pointer                                :: icnvg => NULL()
     integer(I4B), pointer                                :: itertot_timestep => NULL()   !< total nr. of linear solves per call to sln_ca
     integer(I4B), pointer                                :: itertot_sim => NULL()        !< total nr. of inner iterations for simulation
+    integer(I4B), pointer                                :: iterlast => NULL()           !< nr. of inner iterations in the last call to solve
+    real(DP), pointer                                    :: dvmaxlast => NULL()          !< maximum change in the last call to solve
+    real(DP), pointer                                    :: rmaxlast => NULL()           !< maximum residual after the last call to solve
     integer(I4B), pointer                                :: icnvgprev => NULL() !SOL
     integer(I4B), pointer                                :: mxiter => NULL()
     integer(I4B), pointer                                :: linmeth => NULL()
@@ -291,6 +297,9 @@ contains
     call mem_allocate(this%iu, 'IU', this%memoryPath)
     call mem_allocate(this%ttform, 'TTFORM', this%memoryPath)
     call mem_allocate(this%ttsoln, 'TTSOLN', this%memoryPath)
+    call mem_allocate(this%twform, 'TWFORM', this%memoryPath)
+    call mem_allocate(this%twsoln, 'TWSOLN', this%memoryPath)
+    call mem_allocate(this%twbud, 'TWBUD', this%memoryPath)
     call mem_allocate(this%neq, 'NEQ', this%memoryPath)
     call mem_allocate(this%nja, 'NJA', this%memoryPath)
     call mem_allocate(this%dvclose, 'DVCLOSE', this%memoryPath)
@@ -306,6 +315,9 @@ contains
     call mem_allocate(this%icnvgprev, 'ICNVGPREV', this%memoryPath) !SOL
     call mem_allocate(this%itertot_timestep, 'ITERTOT_TIMESTEP', this%memoryPath)
     call mem_allocate(this%itertot_sim, 'INNERTOT_SIM', this%memoryPath)
+    call mem_allocate(this%iterlast, 'ITERLAST', this%memoryPath)
+    call mem_allocate(this%dvmaxlast, 'DVMAXLAST', this%memoryPath)
+    call mem_allocate(this%rmaxlast, 'RMAXLAST', this%memoryPath)
     call mem_allocate(this%mxiter, 'MXITER', this%memoryPath)
     call mem_allocate(this%linmeth, 'LINMETH', this%memoryPath)
     call mem_allocate(this%nonmeth, 'NONMETH', this%memoryPath)
@@ -340,6 +352,9 @@ contains
     this%iu = 0
     this%ttform = DZERO
     this%ttsoln = DZERO
+    this%twform = DZERO
+    this%twsoln = DZERO
+    this%twbud = DZERO
     this%neq = 0
     this%nja = 0
     this%dvclose = DZERO
@@ -353,6 +368,9 @@ contains
     this%icnvg = 0
     this%itertot_timestep = 0
     this%itertot_sim = 0
+    this%iterlast = 0
+    this%dvmaxlast = DZERO
+    this%rmaxlast = DZERO
     this%mxiter = 0
     this%linmeth = 1
     this%nonmeth = 0
@@ -1378,8 +1396,14 @@ contains
     deallocate(this%imslinear)
     !
     ! -- lists
-    call this%modellist%Clear()
-    call this%exchangelist%Clear()
+    if (associated(this%modellist)) then
+      call this%modellist%Clear()
+      deallocate(this%modellist)
+    end if
+    if (associated(this%exchangelist)) then
+      call this%exchangelist%Clear()
+      deallocate(this%exchangelist)
+    end if
     !
     ! -- character arrays
     deallocate(this%caccel)
@@ -1428,6 +1452,9 @@ contains
     call mem_deallocate(this%iu)
     call mem_deallocate(this%ttform)
     call mem_deallocate(this%ttsoln)
+    call mem_deallocate(this%twform)
+    call mem_deallocate(this%twsoln)
+    call mem_deallocate(this%twbud)
     call mem_deallocate(this%neq)
     call mem_deallocate(this%nja)
     call mem_deallocate(this%dvclose)
@@ -1443,6 +1470,9 @@ contains
     call mem_deallocate(this%icnvgprev) !SOL
     call mem_deallocate(this%itertot_timestep)
     call mem_deallocate(this%itertot_sim)
+    call mem_deallocate(this%iterlast)
+    call mem_deallocate(this%dvmaxlast)
+    call mem_deallocate(this%rmaxlast)
     call mem_deallocate(this%mxiter)
     call mem_deallocate(this%linmeth)
     call mem_deallocate(this%nonmeth)
@@ -1727,6 +1757,8 @@ contains
     real(DP) :: ptcf
     real(DP) :: ttform
     real(DP) :: ttsoln
+    real(DP) :: twform
+    real(DP) :: twsoln
     real(DP) :: dpak
     real(DP) :: outer_hncg
     integer(I4B) :: rank !PAR
@@ -1789,6 +1821,7 @@ contains
     ! -- Set amat and rhs to zero
     call this%sln_reset()
     call code_timer(0, ttform, this%ttform)
+    call wall_timer(0, twform, this%twform)
     !
     ! MPI parallel: point-to-point of X, IACTIVE, and SAT (rewetting)
     if (parallelrun) then !PAR
@@ -1853,11 +1886,14 @@ contains
       call mp%model_nr(kiter, this%amat, this%nja, 1)
     enddo
     call code_timer(1, ttform, this%ttform)
+    call wall_timer(1, twform, this%twform)
     !
     ! -- linear solve
     call code_timer(0, ttsoln, this%ttsoln)
+    call wall_timer(0, twsoln, this%twsoln)
     CALL this%sln_ls(kiter, kstp, kper, iter, iptc, ptcf)
     call code_timer(1, ttsoln, this%ttsoln)
+    call wall_timer(1, twsoln, this%twsoln)
     !
     ! -- increment counters storing the total number of linear iterations
     !    for this timestep and all timesteps
@@ -2106,6 +2142,23 @@ contains
       end if
     end if
     !
+    ! -- save the inner iterations, maximum change (including the package
+    !    convergence check), and maximum residual of this call to solve
+    this%iterlast = iter
+    this%dvmaxlast = this%hncg(kiter)
+    if (abs(dpak) > abs(this%dvmaxlast)) then
+      this%dvmaxlast = dpak
+    end if
+    this%rmaxlast = DZERO
+    do im = 1, this%convnmod
+      if (abs(this%drmax(im)) > abs(this%rmaxlast)) then
+        this%rmaxlast = this%drmax(im)
+      end if
+    end do
+    if (parallelrun) then !PAR
+      call this%MpiSol%mpi_global_exchange_all_absmax(this%rmaxlast) !PAR
+    endif !PAR
+    !
     ! -- write to outer iteration csv file
     if (this%icsvouterout > 0) then
       !
@@ -2154,6 +2207,7 @@ contains
     integer(I4B), intent(in) :: isuppress_output
     ! local
     integer(I4B) :: ic, im
+    real(DP) :: twbud
     class(NumericalModelType), pointer :: mp
     class(NumericalExchangeType), pointer :: cp
     
@@ -2201,6 +2255,7 @@ contains
     if (this%icnvg == 0) isgcnvg = 0
     !
     ! -- Calculate flow for each model
+    call wall_timer(0, twbud, this%twbud)
     do im=1,this%modellist%Count()
       mp => GetNumericalModelFromList(this%modellist, im)
       call mp%model_cq(this%icnvg, isuppress_output)
@@ -2223,6 +2278,7 @@ contains
       cp => GetNumericalExchangeFromList(this%exchangelist, ic)
       call cp%exg_bd(isgcnvg, isuppress_output, this%id)
     enddo
+    call wall_timer(1, twbud, this%twbud)
     
   end subroutine finalizeSolve
   
@@ -236,7 +236,7 @@ module MemoryManagerModule
     ! -- set shape
     if (found) then
       if(associated(mt%logicalsclr)) mem_shape = shape(mt%logicalsclr)
-      if(associated(mt%intsclr)) mem_shape = shape(mt%logicalsclr)
+      if(associated(mt%intsclr)) mem_shape = shape(mt%intsclr)
       if(associated(mt%dblsclr)) mem_shape = shape(mt%dblsclr)
       if(associated(mt%aint1d)) mem_shape = shape(mt%aint1d)
       if(associated(mt%aint2d)) mem_shape = shape(mt%aint2d)
@@ -1,6 +1,6 @@
 module TimerModule
   
-  use KindModule, only: DP, I4B
+  use KindModule, only: DP, I4B, I8B
   use ConstantsModule, only: LINELENGTH, DZERO
   use GenericUtilitiesModule, only: sim_message
   implicit none
@@ -8,6 +8,7 @@ module TimerModule
   public :: start_time
   public :: elapsed_time
   public :: code_timer
+  public :: wall_timer
   integer(I4B), dimension(8) :: ibdt
   
   contains
@@ -193,5 +194,37 @@ module TimerModule
     ! -- RETURN
     RETURN
   END SUBROUTINE code_timer
+
+!
+!-------WALL CLOCK TIMER FOR SUBROUTINES
+  subroutine wall_timer(it, t1, ts)
+! ******************************************************************************
+!     Same as code_timer, but the elapsed wall clock time in seconds is added
+!     to ts instead of the processor time
+! ******************************************************************************
+!
+!        SPECIFICATIONS:
+! ------------------------------------------------------------------------------
+    ! -- dummy
+    integer(I4B), intent(in) :: it
+    real(DP), intent(inout) :: t1
+    real(DP), intent(inout) :: ts
+    ! -- local
+    integer(I8B) :: icount
+    integer(I8B) :: irate
+    real(DP) :: t
+! ------------------------------------------------------------------------------
+    !
+    call system_clock(icount, irate)
+    t = real(icount, DP) / real(irate, DP)
+    if (it == 0) then
+      t1 = t
+    else
+      ts = ts + t - t1
+    end if
+    !
+    ! -- return
+    return
+  end subroutine wall_timer
   
 end module TimerModule
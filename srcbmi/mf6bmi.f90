@@ -101,6 +101,7 @@ module mf6bmi
     
     ! we don't want a full stop() here, this disables it:    
     iforcestop = 0    
+    call clear_var_handles()
     call Mf6Finalize()
       
     bmi_status = BMI_SUCCESS
@@ -482,7 +483,11 @@ module mf6bmi
   !! The array is located at @p c_var_address. There is no copying of data involved.
   !! Multi-dimensional arrays are supported and the get_var_rank() function 
   !! can be used to get the variable's dimensionality, and get_var_shape() for
-  !! its shape.
+  !! its shape. The data are contiguous and in Fortran order, so a C-style
+  !! view with the (reversed) shape from get_var_shape() has the same layout.
+  !! The pointer can be used to modify package arrays such as BOUND in place,
+  !! after they have been read from file in prepare_time_step(). Note that 
+  !! HCOF and RHS are recalculated from BOUND at the start of every solve().
   !<
   function get_value_ptr_double(c_var_address, c_arr_ptr) result(bmi_status) bind(C, name="get_value_ptr_double")
   !DEC$ ATTRIBUTES DLLEXPORT :: get_value_ptr_double
@@ -535,7 +540,8 @@ module mf6bmi
   !!
   !! The array is located at @p c_var_address. There is no copying of data involved.
   !! Multi-dimensional arrays are supported and the get_var_rank() function 
-  !! can be used to get the variable's dimensionality.
+  !! can be used to get the variable's dimensionality. The layout is the same
+  !! as for get_value_ptr_double().
   !<
   function get_value_ptr_int(c_var_address, c_arr_ptr) result(bmi_status) bind(C, name="get_value_ptr_int")
   !DEC$ ATTRIBUTES DLLEXPORT :: get_value_ptr_int
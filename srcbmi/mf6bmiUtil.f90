@@ -5,11 +5,13 @@ module mf6bmiUtil
   use iso_c_binding, only: c_int, c_char, c_null_char
   use ConstantsModule, only: MAXCHARLEN, LENMEMPATH, LENVARNAME, &
                              LENMODELNAME, LINELENGTH, LENMEMTYPE, &
-                             LENMEMADDRESS, LENCOMPONENTNAME
+                             LENMEMADDRESS, LENCOMPONENTNAME, LENBUDTXT, &
+                             LENPACKAGENAME
   use KindModule, only: DP, I4B, LGP
   use GenericUtilitiesModule, only: sim_message
   use SimVariablesModule, only: istdout
   use MemoryHelperModule, only: split_mem_address, split_mem_path
+  use MemoryTypeModule, only: MemoryType
   implicit none
   
   ! the following exported parameters will trigger annoying warnings with
@@ -31,6 +33,23 @@ module mf6bmiUtil
   integer(c_int), bind(C, name="BMI_LENVARADDRESS") :: BMI_LENVARADDRESS = LENMEMADDRESS + 1 !< max. length for the variable's address C-string
   !DEC$ ATTRIBUTES DLLEXPORT :: BMI_LENVARADDRESS
 
+  integer(c_int), bind(C, name="BMI_LENBUDTXT") :: BMI_LENBUDTXT = max(LENBUDTXT, LENPACKAGENAME) + 1 !< max. length for budget term and label C-strings
+  !DEC$ ATTRIBUTES DLLEXPORT :: BMI_LENBUDTXT
+
+  !> @brief A variable that is resolved once for the batched get and set routines
+  !!
+  !! The handle points to the entry of the variable in the memory manager, so
+  !! the memory address does not need to be parsed and searched for again and
+  !! the data remain valid when the variable is reallocated.
+  !<
+  type :: XmiHandleType
+    type(MemoryType), pointer :: mt => null() !< memory manager entry of the variable
+  end type XmiHandleType
+
+  type(XmiHandleType), dimension(:), allocatable :: handles !< variables resolved with get_var_handles()
+  integer(I4B) :: nhandles = 0                               !< number of entries in handles
+  integer(I4B) :: handle_offset = 0                          !< offset of the handles in the table, handles of a cleared table are not valid again
+
 contains
    
   !> @brief Split the variable address string
@@ -215,4 +234,38 @@ contains
     if (expected_type == grid_type) is_match = .true.    
   end function confirm_grid_type
 
-end module mf6bmiUtil
\ No newline at end of file
+  !> @brief Get the memory manager entry of a variable handle
+  !!
+  !! The pointer is not associated when the handle was not created by 
+  !! get_var_handles(), or when it was released.
+  !<
+  function get_handle_entry(handle) result(mt)
+    integer(kind=c_int), intent(in) :: handle !< handle of the variable
+    type(MemoryType), pointer :: mt           !< memory manager entry of the variable
+    ! local
+    integer(I4B) :: i
+    
+    mt => null()
+    i = handle - handle_offset
+    if (i > 0 .and. i <= nhandles) then
+      mt => handles(i)%mt
+    end if
+    
+  end function get_handle_entry
+  
+  !> @brief Clear the table with variable handles
+  !!
+  !! The offset of new handles is increased, so the handles in the 
+  !! table remain invalid when new handles are created.
+  !<
+  subroutine clear_var_handles()
+  
+    if (allocated(handles)) then
+      deallocate(handles)
+    end if
+    handle_offset = handle_offset + nhandles
+    nhandles = 0
+    
+  end subroutine clear_var_handles
+
+end module mf6bmiUtil
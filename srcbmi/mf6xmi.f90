@@ -90,7 +90,9 @@ module mf6xmi
   use Mf6CoreModule
   use KindModule
   use bmif, only: BMI_SUCCESS, BMI_FAILURE
-  use iso_c_binding, only: c_int, c_char  
+  use iso_c_binding, only: c_int, c_char, c_double, c_ptr, c_loc, c_f_pointer, &
+                           c_null_char
+  use MemoryTypeModule, only: MemoryType
   implicit none
  
   
@@ -287,6 +289,73 @@ module mf6xmi
     
   end function xmi_finalize_solve  
   
+  !> @brief Get the convergence statistics of the last call to solve()
+  !!
+  !! The statistics are those of the last outer iteration of the Numerical Solution
+  !! indicated by \p subcomponent_idx: the number of inner iterations of the linear 
+  !! solver, the maximum change (including the package convergence checks), and 
+  !! the maximum residual after the last inner iteration. A coupling driver can use 
+  !! these to adapt its iteration strategy between calls to xmi_solve().
+  !<
+  function xmi_get_solve_statistics(subcomponent_idx, inner_iterations, dvmax, rmax) &
+                                    result(bmi_status) bind(C, name="get_solve_statistics")
+  !DEC$ ATTRIBUTES DLLEXPORT :: xmi_get_solve_statistics
+    use NumericalSolutionModule
+    integer(kind=c_int), intent(in) :: subcomponent_idx  !< index of the subcomponent (i.e. Numerical Solution)
+    integer(kind=c_int), intent(out) :: inner_iterations !< number of inner iterations
+    real(kind=c_double), intent(out) :: dvmax            !< maximum change
+    real(kind=c_double), intent(out) :: rmax             !< maximum residual
+    integer(kind=c_int) :: bmi_status                    !< BMI status code
+    ! local
+    class(NumericalSolutionType), pointer :: ns
+    
+    inner_iterations = 0
+    dvmax = 0.0_c_double
+    rmax = 0.0_c_double
+    if (.not. valid_subcomponent(subcomponent_idx)) then
+      bmi_status = BMI_FAILURE
+      return
+    end if
+    
+    ns => getSolution(subcomponent_idx)
+    inner_iterations = ns%iterlast
+    dvmax = ns%dvmaxlast
+    rmax = ns%rmaxlast
+    bmi_status = BMI_SUCCESS
+    
+  end function xmi_get_solve_statistics
+  
+  !> @brief Get the wall clock time spent in the phases of a Numerical Solution
+  !!
+  !! The times in seconds are accumulated from the start of the simulation and are
+  !! copied into the array \p c_times, which should have a length of 3: the time 
+  !! for formulating the system, for the linear solves, and for calculating the
+  !! flows and budgets of the models and exchanges in finalize_solve(). The time 
+  !! spent in a single call is the difference between two calls to this routine.
+  !<
+  function xmi_get_solve_timing(subcomponent_idx, c_times) result(bmi_status) &
+                                bind(C, name="get_solve_timing")
+  !DEC$ ATTRIBUTES DLLEXPORT :: xmi_get_solve_timing
+    use NumericalSolutionModule
+    integer(kind=c_int), intent(in) :: subcomponent_idx !< index of the subcomponent (i.e. Numerical Solution)
+    real(kind=c_double), intent(out) :: c_times(3)      !< formulate, solve, and budget time
+    integer(kind=c_int) :: bmi_status                   !< BMI status code
+    ! local
+    class(NumericalSolutionType), pointer :: ns
+    
+    if (.not. valid_subcomponent(subcomponent_idx)) then
+      bmi_status = BMI_FAILURE
+      return
+    end if
+    
+    ns => getSolution(subcomponent_idx)
+    c_times(1) = ns%twform
+    c_times(2) = ns%twsoln
+    c_times(3) = ns%twbud
+    bmi_status = BMI_SUCCESS
+    
+  end function xmi_get_solve_timing
+  
   !> @brief Get the full address string for a variable
   !!
   !! This routine constructs the full address string of a variable using the
@@ -334,4 +403,607 @@ module mf6xmi
 
   end function get_var_address
 
+  !> @brief Resolve the addresses of a list of variables into handles
+  !!
+  !! The @p n addresses in @p c_var_addresses are fixed-length, null-terminated
+  !! C-strings of BMI_LENVARADDRESS characters. For every address a handle
+  !! (an index larger than 0) is returned in @p c_handles that can be used in
+  !! get_values_double(), set_values_double(), get_values_int(), and 
+  !! set_values_int() to access many variables in a single call. Only INTEGER
+  !! and DOUBLE variables with a rank up to 3 are supported. The handles 
+  !! are valid until they are released with release_var_handles(), or until
+  !! finalize() is called. When an address cannot be resolved, no handles
+  !! are created and all values in @p c_handles are -1.
+  !<
+  function xmi_get_var_handles(c_var_addresses, n, c_handles) result(bmi_status) &
+                               bind(C, name="get_var_handles")
+  !DEC$ ATTRIBUTES DLLEXPORT :: xmi_get_var_handles
+    use ConstantsModule, only: LENMEMPATH, LENVARNAME
+    use MemoryManagerModule, only: get_from_memorylist
+    integer(kind=c_int), intent(in) :: n                                               !< number of variables
+    character(kind=c_char), intent(in) :: c_var_addresses(BMI_LENVARADDRESS, n)        !< memory address strings of the variables
+    integer(kind=c_int), intent(out) :: c_handles(n)                                   !< handles of the variables
+    integer(kind=c_int) :: bmi_status                                                  !< BMI status code
+    ! local
+    character(len=LENMEMPATH) :: mem_path
+    character(len=LENVARNAME) :: var_name
+    logical(LGP) :: found
+    type(MemoryType), pointer :: mt
+    type(XmiHandleType), dimension(:), allocatable :: tmp
+    integer(I4B) :: i
+    integer(I4B) :: nhandles0
+    
+    bmi_status = BMI_SUCCESS
+    c_handles(1:n) = -1
+    nhandles0 = nhandles
+    
+    ! make room for the new handles
+    if (.not. allocated(handles)) then
+      allocate(handles(max(n, 10)))
+    else if (nhandles + n > size(handles)) then
+      allocate(tmp(max(nhandles + n, 2 * size(handles))))
+      do i = 1, nhandles
+        tmp(i)%mt => handles(i)%mt
+      end do
+      call move_alloc(tmp, handles)
+    end if
+    
+    do i = 1, n
+      call split_address(c_var_addresses(:, i), mem_path, var_name, found)
+      if (.not. found) then
+        write(istdout,*) 'BMI Error: unknown variable '//var_name//' at '//mem_path
+        bmi_status = BMI_FAILURE
+        exit
+      end if
+      
+      mt => null()
+      call get_from_memorylist(var_name, mem_path, mt, found, check=.false.)
+      if (.not. found) then
+        write(istdout,*) 'BMI Error: unknown variable '//var_name//' at '//mem_path
+        bmi_status = BMI_FAILURE
+        exit
+      end if
+      if (.not. (associated(mt%intsclr) .or. associated(mt%aint1d) .or.       &
+                 associated(mt%aint2d) .or. associated(mt%aint3d) .or.        &
+                 associated(mt%dblsclr) .or. associated(mt%adbl1d) .or.       &
+                 associated(mt%adbl2d) .or. associated(mt%adbl3d))) then
+        write(istdout,*) 'BMI Error: unsupported type for variable '//var_name
+        bmi_status = BMI_FAILURE
+        exit
+      end if
+      
+      nhandles = nhandles + 1
+      handles(nhandles)%mt => mt
+      c_handles(i) = handle_offset + nhandles
+    end do
+    
+    ! a failed call does not register any handle
+    if (bmi_status /= BMI_SUCCESS) then
+      do i = nhandles0 + 1, nhandles
+        handles(i)%mt => null()
+      end do
+      nhandles = nhandles0
+      c_handles(1:n) = -1
+    end if
+    
+  end function xmi_get_var_handles
+  
+  !> @brief Release a list of handles created with get_var_handles()
+  !!
+  !! The other handles remain valid. The table with handles is cleared when
+  !! all handles are released, handles are never reused.
+  !<
+  function xmi_release_var_handles(n, c_handles) result(bmi_status) &
+                                   bind(C, name="release_var_handles")
+  !DEC$ ATTRIBUTES DLLEXPORT :: xmi_release_var_handles
+    integer(kind=c_int), intent(in) :: n            !< number of handles
+    integer(kind=c_int), intent(in) :: c_handles(n) !< handles of the variables
+    integer(kind=c_int) :: bmi_status               !< BMI status code
+    ! local
+    integer(I4B) :: i
+    
+    bmi_status = BMI_SUCCESS
+    do i = 1, n
+      if (.not. valid_handle(c_handles(i))) then
+        bmi_status = BMI_FAILURE
+        cycle
+      end if
+      handles(c_handles(i) - handle_offset)%mt => null()
+    end do
+    
+    ! clear the table when no handles are left
+    do i = 1, nhandles
+      if (associated(handles(i)%mt)) return
+    end do
+    call clear_var_handles()
+    
+  end function xmi_release_var_handles
+  
+  !> @brief Get the number of elements for a list of handles
+  !!
+  !! This can be used to size the buffer that is passed to the batched
+  !! get and set routines.
+  !<
+  function xmi_get_handle_sizes(n, c_handles, c_sizes) result(bmi_status) &
+                                bind(C, name="get_handle_sizes")
+  !DEC$ ATTRIBUTES DLLEXPORT :: xmi_get_handle_sizes
+    integer(kind=c_int), intent(in) :: n            !< number of handles
+    integer(kind=c_int), intent(in) :: c_handles(n) !< handles of the variables
+    integer(kind=c_int), intent(out) :: c_sizes(n)  !< number of elements of every variable
+    integer(kind=c_int) :: bmi_status               !< BMI status code
+    ! local
+    real(DP), dimension(:), pointer, contiguous :: dbl_ptr
+    integer(I4B), dimension(:), pointer, contiguous :: int_ptr
+    integer(I4B) :: i
+    
+    bmi_status = BMI_SUCCESS
+    do i = 1, n
+      if (.not. valid_handle(c_handles(i))) then
+        bmi_status = BMI_FAILURE
+        return
+      end if
+      call get_handle_dbl(c_handles(i), dbl_ptr)
+      if (associated(dbl_ptr)) then
+        c_sizes(i) = size(dbl_ptr)
+      else
+        call get_handle_int(c_handles(i), int_ptr)
+        c_sizes(i) = size(int_ptr)
+      end if
+    end do
+    
+  end function xmi_get_handle_sizes
+  
+  !> @brief Copy the values of a list of double precision variables into a buffer
+  !!
+  !! The values of the variables are copied, one variable after the other, 
+  !! into the array @p c_arr_ptr which should have the total size of the variables.
+  !! The values of multi-dimensional arrays are in C-style order.
+  !<
+  function xmi_get_values_double(n, c_handles, c_arr_ptr) result(bmi_status) &
+                                 bind(C, name="get_values_double")
+  !DEC$ ATTRIBUTES DLLEXPORT :: xmi_get_values_double
+    integer(kind=c_int), intent(in) :: n            !< number of handles
+    integer(kind=c_int), intent(in) :: c_handles(n) !< handles of the variables
+    type(c_ptr), intent(in) :: c_arr_ptr            !< pointer to the double precision buffer
+    integer(kind=c_int) :: bmi_status               !< BMI status code
+    ! local
+    real(DP), dimension(:), pointer, contiguous :: src_ptr, tgt_ptr
+    integer(I4B) :: i, j, ipos
+    
+    bmi_status = get_total_size_double(n, c_handles, ipos)
+    if (bmi_status /= BMI_SUCCESS) return
+    call c_f_pointer(c_arr_ptr, tgt_ptr, (/ ipos /))
+    
+    ipos = 0
+    do i = 1, n
+      call get_handle_dbl(c_handles(i), src_ptr)
+      do j = 1, size(src_ptr)
+        tgt_ptr(ipos + j) = src_ptr(j)
+      end do
+      ipos = ipos + size(src_ptr)
+    end do
+    
+  end function xmi_get_values_double
+  
+  !> @brief Set the values of a list of double precision variables from a buffer
+  !!
+  !! The layout of the array @p c_arr_ptr is the same as in get_values_double().
+  !<
+  function xmi_set_values_double(n, c_handles, c_arr_ptr) result(bmi_status) &
+                                 bind(C, name="set_values_double")
+  !DEC$ ATTRIBUTES DLLEXPORT :: xmi_set_values_double
+    integer(kind=c_int), intent(in) :: n            !< number of handles
+    integer(kind=c_int), intent(in) :: c_handles(n) !< handles of the variables
+    type(c_ptr), intent(in) :: c_arr_ptr            !< pointer to the double precision buffer
+    integer(kind=c_int) :: bmi_status               !< BMI status code
+    ! local
+    real(DP), dimension(:), pointer, contiguous :: src_ptr, tgt_ptr
+    integer(I4B) :: i, j, ipos
+    
+    bmi_status = get_total_size_double(n, c_handles, ipos)
+    if (bmi_status /= BMI_SUCCESS) return
+    call c_f_pointer(c_arr_ptr, src_ptr, (/ ipos /))
+    
+    ipos = 0
+    do i = 1, n
+      call get_handle_dbl(c_handles(i), tgt_ptr)
+      do j = 1, size(tgt_ptr)
+        tgt_ptr(j) = src_ptr(ipos + j)
+      end do
+      ipos = ipos + size(tgt_ptr)
+      bmi_status = trigger_memory_set(c_handles(i))
+      if (bmi_status /= BMI_SUCCESS) return
+    end do
+    
+  end function xmi_set_values_double
+  
+  !> @brief Copy the values of a list of integer variables into a buffer
+  !!
+  !! The layout of the array @p c_arr_ptr is the same as in get_values_double().
+  !<
+  function xmi_get_values_int(n, c_handles, c_arr_ptr) result(bmi_status) &
+                              bind(C, name="get_values_int")
+  !DEC$ ATTRIBUTES DLLEXPORT :: xmi_get_values_int
+    integer(kind=c_int), intent(in) :: n            !< number of handles
+    integer(kind=c_int), intent(in) :: c_handles(n) !< handles of the variables
+    type(c_ptr), intent(in) :: c_arr_ptr            !< pointer to the integer buffer
+    integer(kind=c_int) :: bmi_status               !< BMI status code
+    ! local
+    integer(I4B), dimension(:), pointer, contiguous :: src_ptr, tgt_ptr
+    integer(I4B) :: i, j, ipos
+    
+    bmi_status = get_total_size_int(n, c_handles, ipos)
+    if (bmi_status /= BMI_SUCCESS) return
+    call c_f_pointer(c_arr_ptr, tgt_ptr, (/ ipos /))
+    
+    ipos = 0
+    do i = 1, n
+      call get_handle_int(c_handles(i), src_ptr)
+      do j = 1, size(src_ptr)
+        tgt_ptr(ipos + j) = src_ptr(j)
+      end do
+      ipos = ipos + size(src_ptr)
+    end do
+    
+  end function xmi_get_values_int
+  
+  !> @brief Set the values of a list of integer variables from a buffer
+  !!
+  !! The layout of the array @p c_arr_ptr is the same as in get_values_double().
+  !<
+  function xmi_set_values_int(n, c_handles, c_arr_ptr) result(bmi_status) &
+                              bind(C, name="set_values_int")
+  !DEC$ ATTRIBUTES DLLEXPORT :: xmi_set_values_int
+    integer(kind=c_int), intent(in) :: n            !< number of handles
+    integer(kind=c_int), intent(in) :: c_handles(n) !< handles of the variables
+    type(c_ptr), intent(in) :: c_arr_ptr            !< pointer to the integer buffer
+    integer(kind=c_int) :: bmi_status               !< BMI status code
+    ! local
+    integer(I4B), dimension(:), pointer, contiguous :: src_ptr, tgt_ptr
+    integer(I4B) :: i, j, ipos
+    
+    bmi_status = get_total_size_int(n, c_handles, ipos)
+    if (bmi_status /= BMI_SUCCESS) return
+    call c_f_pointer(c_arr_ptr, src_ptr, (/ ipos /))
+    
+    ipos = 0
+    do i = 1, n
+      call get_handle_int(c_handles(i), tgt_ptr)
+      do j = 1, size(tgt_ptr)
+        tgt_ptr(j) = src_ptr(ipos + j)
+      end do
+      ipos = ipos + size(tgt_ptr)
+      bmi_status = trigger_memory_set(c_handles(i))
+      if (bmi_status /= BMI_SUCCESS) return
+    end do
+    
+  end function xmi_set_values_int
+  
+  !> @brief Get the number of terms in the budget of a model
+  !!
+  !! The budget is the model budget that is written to the listing file. It is 
+  !! calculated in finalize_solve() and can be retrieved with get_budget_names() 
+  !! and get_budget() without writing the budget or budget files.
+  !<
+  function xmi_get_budget_count(c_model_name, count) result(bmi_status) &
+                                bind(C, name="get_budget_count")
+  !DEC$ ATTRIBUTES DLLEXPORT :: xmi_get_budget_count
+    use BudgetModule, only: BudgetType
+    character(kind=c_char), intent(in) :: c_model_name(*) !< name of the model
+    integer(kind=c_int), intent(out) :: count             !< number of budget terms
+    integer(kind=c_int) :: bmi_status                     !< BMI status code
+    ! local
+    type(BudgetType), pointer :: budget
+    
+    count = 0
+    call get_model_budget(c_model_name, budget)
+    if (.not. associated(budget)) then
+      bmi_status = BMI_FAILURE
+      return
+    end if
+    
+    count = budget%msum - 1
+    bmi_status = BMI_SUCCESS
+    
+  end function xmi_get_budget_count
+  
+  !> @brief Get the names and labels of the terms in the budget of a model
+  !!
+  !! The arrays @p c_names and @p c_labels should be pre-allocated with size
+  !! BMI_LENBUDTXT * get_budget_count(). The strings are written contiguously 
+  !! with stride BMI_LENBUDTXT and are nul-terminated. The label is the package 
+  !! name for budgets that have one, and an empty string otherwise.
+  !<
+  function xmi_get_budget_names(c_model_name, c_names, c_labels) result(bmi_status) &
+                                bind(C, name="get_budget_names")
+  !DEC$ ATTRIBUTES DLLEXPORT :: xmi_get_budget_names
+    use BudgetModule, only: BudgetType
+    character(kind=c_char), intent(in) :: c_model_name(*)      !< name of the model
+    character(kind=c_char,len=1), intent(inout) :: c_names(*)  !< names of the budget terms
+    character(kind=c_char,len=1), intent(inout) :: c_labels(*) !< labels of the budget terms
+    integer(kind=c_int) :: bmi_status                          !< BMI status code
+    ! local
+    type(BudgetType), pointer :: budget
+    character(len=BMI_LENBUDTXT - 1) :: budtxt
+    integer(I4B) :: l, start, i, n
+    
+    call get_model_budget(c_model_name, budget)
+    if (.not. associated(budget)) then
+      bmi_status = BMI_FAILURE
+      return
+    end if
+    
+    start = 1
+    do l = 1, budget%msum - 1
+      budtxt = adjustl(budget%vbnm(l))
+      n = len_trim(budtxt)
+      do i = 1, n
+        c_names(start + i - 1) = budtxt(i:i)
+      end do
+      c_names(start + n) = c_null_char
+      n = 0
+      if (budget%labeled) then
+        budtxt = adjustl(budget%rowlabel(l))
+        n = len_trim(budtxt)
+        do i = 1, n
+          c_labels(start + i - 1) = budtxt(i:i)
+        end do
+      end if
+      c_labels(start + n) = c_null_char
+      start = start + BMI_LENBUDTXT
+    end do
+    bmi_status = BMI_SUCCESS
+    
+  end function xmi_get_budget_names
+  
+  !> @brief Copy the budget of a model into an array
+  !!
+  !! The array @p c_arr_ptr should have shape (get_budget_count(), 4) in 
+  !! C-style order, the columns contain the cumulative inflow and outflow and 
+  !! the inflow and outflow rates for the time step.
+  !<
+  function xmi_get_budget(c_model_name, c_arr_ptr) result(bmi_status) &
+                          bind(C, name="get_budget")
+  !DEC$ ATTRIBUTES DLLEXPORT :: xmi_get_budget
+    use BudgetModule, only: BudgetType
+    character(kind=c_char), intent(in) :: c_model_name(*) !< name of the model
+    type(c_ptr), intent(in) :: c_arr_ptr                  !< pointer to the double precision array
+    integer(kind=c_int) :: bmi_status                     !< BMI status code
+    ! local
+    type(BudgetType), pointer :: budget
+    real(DP), dimension(:,:), pointer, contiguous :: tgt_ptr
+    integer(I4B) :: i, l
+    
+    call get_model_budget(c_model_name, budget)
+    if (.not. associated(budget)) then
+      bmi_status = BMI_FAILURE
+      return
+    end if
+    
+    if (budget%msum > 1) then
+      call c_f_pointer(c_arr_ptr, tgt_ptr, (/ 4, budget%msum - 1 /))
+      do l = 1, budget%msum - 1
+        do i = 1, 4
+          tgt_ptr(i, l) = budget%vbvl(i, l)
+        end do
+      end do
+    end if
+    bmi_status = BMI_SUCCESS
+    
+  end function xmi_get_budget
+  
+  !> @brief Get the budget object of a GWF or GWT model
+  !!
+  !! The pointer is not associated when the model does not exist or
+  !! has no budget.
+  !<
+  subroutine get_model_budget(c_model_name, budget)
+    use ConstantsModule, only: LENMODELNAME
+    use ListsModule, only: basemodellist
+    use BaseModelModule, only: BaseModelType, GetBaseModelFromList
+    use BudgetModule, only: BudgetType
+    use GwfModule, only: GwfModelType
+    use GwtModule, only: GwtModelType
+    use InputOutputModule, only: upcase
+    character(kind=c_char), intent(in) :: c_model_name(*) !< name of the model
+    type(BudgetType), pointer, intent(out) :: budget      !< the budget of the model
+    ! local
+    character(len=LENMODELNAME) :: model_name
+    class(BaseModelType), pointer :: model
+    integer(I4B) :: i
+    
+    budget => null()
+    model_name = char_array_to_string(c_model_name, strlen(c_model_name))
+    call upcase(model_name)
+    do i = 1, basemodellist%Count()
+      model => GetBaseModelFromList(basemodellist, i)
+      if (model%name /= model_name) cycle
+      select type (model)
+      class is (GwfModelType)
+        budget => model%budget
+      class is (GwtModelType)
+        budget => model%budget
+      end select
+      exit
+    end do
+    
+    if (.not. associated(budget)) then
+      write(istdout,*) 'BMI Error: no budget for model '//trim(model_name)
+    end if
+    
+  end subroutine get_model_budget
+  
+  !> @brief Check if a subcomponent index refers to a Numerical Solution
+  !<
+  function valid_subcomponent(subcomponent_idx) result(is_valid)
+    use ListsModule, only: solutiongrouplist
+    integer(kind=c_int), intent(in) :: subcomponent_idx !< index of the subcomponent
+    logical(LGP) :: is_valid                            !< true when valid
+    ! local
+    class(SolutionGroupType), pointer :: sgp
+    
+    is_valid = .false.
+    if (solutiongrouplist%Count() == 1) then
+      sgp => GetSolutionGroupFromList(solutiongrouplist, 1)
+      is_valid = subcomponent_idx > 0 .and. subcomponent_idx <= sgp%nsolutions
+    end if
+    if (.not. is_valid) then
+      write(istdout,'(a,i0)') ' BMI Error: invalid subcomponent index ', subcomponent_idx
+    end if
+    
+  end function valid_subcomponent
+  
+  !> @brief Check if a handle was created by get_var_handles()
+  !<
+  function valid_handle(handle) result(is_valid)
+    integer(kind=c_int), intent(in) :: handle !< handle of the variable
+    logical(LGP) :: is_valid                  !< true when valid
+    
+    is_valid = associated(get_handle_entry(handle))
+    if (.not. is_valid) then
+      write(istdout,'(a,i0)') ' BMI Error: invalid variable handle ', handle
+    end if
+    
+  end function valid_handle
+  
+  !> @brief Get a flat pointer to the data of a double precision variable
+  !!
+  !! The pointer is not associated for other types.
+  !<
+  subroutine get_handle_dbl(handle, flat_ptr)
+    integer(kind=c_int), intent(in) :: handle                            !< handle of the variable
+    real(DP), dimension(:), pointer, contiguous, intent(out) :: flat_ptr !< flat pointer to the data
+    ! local
+    type(MemoryType), pointer :: mt
+    type(c_ptr) :: data_ptr
+    
+    flat_ptr => null()
+    mt => get_handle_entry(handle)
+    if (associated(mt%dblsclr)) then
+      data_ptr = c_loc(mt%dblsclr)
+      call c_f_pointer(data_ptr, flat_ptr, (/ 1 /))
+    else if (associated(mt%adbl1d)) then
+      flat_ptr => mt%adbl1d
+    else if (associated(mt%adbl2d)) then
+      data_ptr = c_loc(mt%adbl2d)
+      call c_f_pointer(data_ptr, flat_ptr, (/ size(mt%adbl2d) /))
+    else if (associated(mt%adbl3d)) then
+      data_ptr = c_loc(mt%adbl3d)
+      call c_f_pointer(data_ptr, flat_ptr, (/ size(mt%adbl3d) /))
+    end if
+    
+  end subroutine get_handle_dbl
+  
+  !> @brief Get a flat pointer to the data of an integer variable
+  !!
+  !! The pointer is not associated for other types.
+  !<
+  subroutine get_handle_int(handle, flat_ptr)
+    integer(kind=c_int), intent(in) :: handle                                !< handle of the variable
+    integer(I4B), dimension(:), pointer, contiguous, intent(out) :: flat_ptr !< flat pointer to the data
+    ! local
+    type(MemoryType), pointer :: mt
+    type(c_ptr) :: data_ptr
+    
+    flat_ptr => null()
+    mt => get_handle_entry(handle)
+    if (associated(mt%intsclr)) then
+      data_ptr = c_loc(mt%intsclr)
+      call c_f_pointer(data_ptr, flat_ptr, (/ 1 /))
+    else if (associated(mt%aint1d)) then
+      flat_ptr => mt%aint1d
+    else if (associated(mt%aint2d)) then
+      data_ptr = c_loc(mt%aint2d)
+      call c_f_pointer(data_ptr, flat_ptr, (/ size(mt%aint2d) /))
+    else if (associated(mt%aint3d)) then
+      data_ptr = c_loc(mt%aint3d)
+      call c_f_pointer(data_ptr, flat_ptr, (/ size(mt%aint3d) /))
+    end if
+    
+  end subroutine get_handle_int
+  
+  !> @brief Check the handles of double precision variables and get their total size
+  !<
+  function get_total_size_double(n, c_handles, total_size) result(bmi_status)
+    integer(kind=c_int), intent(in) :: n            !< number of handles
+    integer(kind=c_int), intent(in) :: c_handles(n) !< handles of the variables
+    integer(I4B), intent(out) :: total_size         !< total number of elements
+    integer(kind=c_int) :: bmi_status               !< BMI status code
+    ! local
+    real(DP), dimension(:), pointer, contiguous :: flat_ptr
+    integer(I4B) :: i
+    
+    bmi_status = BMI_SUCCESS
+    total_size = 0
+    do i = 1, n
+      if (.not. valid_handle(c_handles(i))) then
+        bmi_status = BMI_FAILURE
+        return
+      end if
+      call get_handle_dbl(c_handles(i), flat_ptr)
+      if (.not. associated(flat_ptr)) then
+        write(istdout,*) 'BMI Error: variable '//trim(handles(c_handles(i) - handle_offset)%mt%name)//' is not of type DOUBLE'
+        bmi_status = BMI_FAILURE
+        return
+      end if
+      total_size = total_size + size(flat_ptr)
+    end do
+    
+  end function get_total_size_double
+  
+  !> @brief Check the handles of integer variables and get their total size
+  !<
+  function get_total_size_int(n, c_handles, total_size) result(bmi_status)
+    integer(kind=c_int), intent(in) :: n            !< number of handles
+    integer(kind=c_int), intent(in) :: c_handles(n) !< handles of the variables
+    integer(I4B), intent(out) :: total_size         !< total number of elements
+    integer(kind=c_int) :: bmi_status               !< BMI status code
+    ! local
+    integer(I4B), dimension(:), pointer, contiguous :: flat_ptr
+    integer(I4B) :: i
+    
+    bmi_status = BMI_SUCCESS
+    total_size = 0
+    do i = 1, n
+      if (.not. valid_handle(c_handles(i))) then
+        bmi_status = BMI_FAILURE
+        return
+      end if
+      call get_handle_int(c_handles(i), flat_ptr)
+      if (.not. associated(flat_ptr)) then
+        write(istdout,*) 'BMI Error: variable '//trim(handles(c_handles(i) - handle_offset)%mt%name)//' is not of type INTEGER'
+        bmi_status = BMI_FAILURE
+        return
+      end if
+      total_size = total_size + size(flat_ptr)
+    end do
+    
+  end function get_total_size_int
+  
+  !> @brief Trigger the side effects of setting a variable through the BMI
+  !!
+  !! The memory manager is only searched when a handler is registered
+  !! for the variable.
+  !<
+  function trigger_memory_set(handle) result(bmi_status)
+    use MemorySetHandlerModule, only: on_memory_set
+    integer(kind=c_int), intent(in) :: handle !< handle of the variable
+    integer(kind=c_int) :: bmi_status         !< BMI status code
+    ! local
+    type(MemoryType), pointer :: mt
+    integer(I4B) :: status
+    
+    bmi_status = BMI_SUCCESS
+    mt => get_handle_entry(handle)
+    if (mt%set_handler_idx == 0) return
+    
+    call on_memory_set(mt%name, mt%path, status)
+    if (status /= 0) then
+      ! something went terribly wrong here, aborting
+      write(istdout,*) 'Fatal BMI Error: invalid writing of memory for variable '//mt%name
+      bmi_status = BMI_FAILURE
+    end if
+    
+  end function trigger_memory_set
+
 end module mf6xmi
\ No newline at end of file